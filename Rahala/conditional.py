@@ -0,0 +1,160 @@
+"""
+طلبات GET الشرطية (ETag / If-None-Match) للنقاط كثيرة القراءة
+
+أرقام الإصدارات تُحفظ في الـ cache لكل نطاق (مثل 'trips' أو 'user:5')،
+والكتابة ترفع رقم النطاق فيتغير الـ ETag. ConditionalGetMixin يحسب الـ ETag
+بعد المصادقة وقبل تنفيذ الـ handler، ويرد بـ 304 دون استعلام البيانات أو
+تحويلها عند التطابق.
+"""
+
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings
+
+
+def _version_key(scope):
+    return f"version:{scope}"
+
+
+def get_version(scope):
+    """
+    رقم الإصدار الحالي للنطاق
+
+    يُنشأ من الوقت عند غيابه (أول قراءة أو حذف من الـ cache) حتى لا يتكرر
+    رقم إصدار سابق لمحتوى مختلف.
+    """
+    key = _version_key(scope)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version if version is not None else time.time_ns()
+
+
+def get_versions(scopes):
+    """
+    أرقام إصدارات عدة نطاقات بقراءة واحدة من الـ cache
+
+    Returns:
+        list: الإصدارات بنفس ترتيب النطاقات
+    """
+    found = cache.get_many([_version_key(scope) for scope in scopes])
+    return [
+        found[_version_key(scope)] if _version_key(scope) in found else get_version(scope)
+        for scope in scopes
+    ]
+
+
+def _set_versions(scopes):
+    now = time.time_ns()
+    cache.set_many({_version_key(scope): now for scope in scopes}, None)
+
+
+def bump_version(*scopes):
+    """
+    رفع إصدار النطاقات بعد كتابة عليها
+
+    يُرفع الإصدار فوراً ومرة أخرى بعد الـ commit، حتى لا يبقى في الـ cache
+    محتوى أو ETag بُني من بيانات ما قبل الـ commit.
+    """
+    if not scopes:
+        return
+    _set_versions(scopes)
+    transaction.on_commit(lambda: _set_versions(scopes))
+
+
+def get_viewer_key(request):
+    """
+    مفتاح المستخدم الحالي للـ ETag دون استعلام قاعدة البيانات
+
+    Returns:
+        str | None: معرف المستخدم من JWT، أو 'anon'، أو None إذا تعذر
+        تحديده دون مصادقة كاملة (جلسة أو رمز غير صالح)
+    """
+    auth = JWTAuthentication()
+    header = auth.get_header(request)
+    if header is None:
+        return None if request.COOKIES.get('sessionid') else 'anon'
+    raw_token = auth.get_raw_token(header)
+    if raw_token is None:
+        return None
+    try:
+        token = auth.get_validated_token(raw_token)
+    except (InvalidToken, TokenError):
+        return None
+    return str(token.get(api_settings.USER_ID_CLAIM))
+
+
+class NotModified(Exception):
+    """يُرفع من initial عند تطابق If-None-Match مع الـ ETag الحالي"""
+
+
+class ConditionalGetMixin:
+    """
+    ETag و Cache-Control لطلبات GET في views الـ DRF
+
+    الـ view يعرّف get_etag_version ويعيد قيماً رخيصة تتغير مع المحتوى
+    (أرقام إصدارات أو max(updated_at))، أو None لتعطيل الـ ETag للطلب.
+    """
+    cache_control = 'public, no-cache'
+    etag_vary_on_viewer = False
+
+    def get_etag_version(self, request):
+        """
+        القيم التي يُبنى منها الـ ETag للطلب
+
+        Returns:
+            tuple | None: قيم رخيصة تتغير مع محتوى الاستجابة، أو None لتعطيل الـ ETag
+
+        Raises:
+            ImproperlyConfigured: الـ view لم يعرّف get_etag_version
+        """
+        raise ImproperlyConfigured(
+            f"{type(self).__name__} must define get_etag_version() to use ConditionalGetMixin."
+        )
+
+    def get_etag(self, request):
+        version = self.get_etag_version(request)
+        if version is None:
+            return None
+        parts = [
+            type(self).__name__,
+            request.get_full_path(),
+            request.accepted_renderer.format,
+            *map(str, version),
+        ]
+        if self.etag_vary_on_viewer:
+            parts.append(str(request.user.pk or 'anon'))
+        digest = hashlib.blake2b('|'.join(parts).encode(), digest_size=16).hexdigest()
+        return quote_etag(digest)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.etag = None
+        if request.method in ('GET', 'HEAD'):
+            self.etag = self.get_etag(request)
+            if self.etag is not None and self.etag in parse_etags(request.headers.get('If-None-Match', '')):
+                raise NotModified()
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            return Response(status=status.HTTP_304_NOT_MODIFIED)
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if request.method in ('GET', 'HEAD') and response.status_code in (200, 304):
+            etag = getattr(self, 'etag', None)
+            if etag is not None:
+                response['ETag'] = etag
+            response.setdefault('Cache-Control', self.cache_control)
+        return response
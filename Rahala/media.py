@@ -0,0 +1,209 @@
+"""
+تقديم ملفات الوسائط مع Range و ETag
+
+django.views.static.serve (في DEBUG فقط) يمرر الملف كاملاً عبر Python ويتجاهل
+ترويسة Range، فكل تقديم/ترجيع في الفيديو يعيد تحميل الملف من البداية.
+serve_media يدعم:
+
+- Range بنطاق واحد (206 / 416) و If-Range
+- ETag قوي و Last-Modified مع 304 لـ If-None-Match / If-Modified-Since
+- FileResponse مع fileno() حتى يستخدم خادم WSGI (gunicorn) الدالة sendfile
+  للملف كاملاً أو للنطاق المطلوب دون نسخ البيانات إلى Python
+- MEDIA_ACCEL_REDIRECT_PREFIX: تسليم الملف لـ nginx عبر X-Accel-Redirect بعد
+  التحقق من المسار، فيتولى nginx الـ Range والـ sendfile
+
+ملفات blobs/ تُسمى بـ SHA-256 محتواها ولا تتغير، فتُخزن مؤقتاً لدى العميل سنة
+كاملة (immutable). الرفعات الجزئية والملفات المؤقتة لا تُقدم أبداً.
+"""
+
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_etags, parse_http_date_safe, quote_etag
+from django.views.decorators.http import require_safe
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+STREAM_BLOCK_SIZE = 64 * 1024
+
+# مسارات داخل MEDIA_ROOT لا تُقدم (رفعات غير مكتملة، ملفات تُكتب حالياً)
+PRIVATE_PREFIXES = ('uploads/', 'blobs/tmp/')
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+DEFAULT_CACHE_CONTROL = 'public, max-age=3600'
+
+
+def file_etag(stat):
+    """ETag قوي من الحجم ووقت التعديل بالنانوثانية (نفس فكرة nginx)"""
+    return quote_etag(f'{stat.st_size:x}-{stat.st_mtime_ns:x}')
+
+
+def parse_range(header, size):
+    """
+    قراءة ترويسة Range بنطاق واحد
+
+    Returns:
+        tuple | None: (البداية، النهاية شاملة)، أو None لتجاهل الترويسة
+            (غير صالحة أو عدة نطاقات: يُرد بالملف كاملاً كما يسمح RFC 9110)
+
+    Raises:
+        ValueError: النطاق خارج حدود الملف (416)
+    """
+    match = RANGE_RE.match(header.replace(' ', ''))
+    if not match or match.group(1) == match.group(2) == '':
+        return None
+    start, end = match.groups()
+    if start == '':
+        # bytes=-N: آخر N بايت
+        length = int(end)
+        if length == 0:
+            raise ValueError('Empty suffix range')
+        return max(size - length, 0), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size:
+        raise ValueError('Range starts after end of file')
+    if end < start:
+        return None
+    return start, end
+
+
+class RangeFile:
+    """
+    نافذة بطول محدد على ملف مفتوح
+
+    fileno() متاحة حتى يرسل wsgi.file_wrapper (gunicorn) النطاق بـ sendfile
+    من الموضع الحالي وبطول Content-Length. لا توجد tell/seek حتى لا يعيد
+    FileResponse حساب Content-Length من نهاية الملف.
+    """
+
+    def __init__(self, file, start, length):
+        self.file = file
+        self.name = file.name
+        self.remaining = length
+        file.seek(start)
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def _not_modified(request, etag, mtime):
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match is not None:
+        return if_none_match.strip() == '*' or etag in parse_etags(if_none_match)
+    since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+    return since is not None and int(mtime) <= since
+
+
+def _range_applies(request, etag, mtime):
+    """If-Range: النطاق صالح فقط إذا لم يتغير الملف (ETag قوي أو تاريخ)"""
+    if_range = request.headers.get('If-Range')
+    if if_range is None:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag
+    date = parse_http_date_safe(if_range)
+    return date is not None and int(mtime) == date
+
+
+def _with_headers(response, headers):
+    for header, value in headers.items():
+        response[header] = value
+    return response
+
+
+@require_safe
+def serve_media(request, path):
+    """
+    تقديم ملف من MEDIA_ROOT
+
+    Args:
+        path (str): المسار النسبي بعد MEDIA_URL
+
+    Raises:
+        Http404: ملف غير موجود، خارج MEDIA_ROOT، أو في مسار خاص
+    """
+    path = path.lstrip('/')
+    if not path or path.startswith(PRIVATE_PREFIXES) or '\x00' in path:
+        raise Http404('Not found')
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+        stat = os.stat(full_path)
+    except (OSError, ValueError, SuspiciousFileOperation):
+        raise Http404('Not found')
+    if not os.path.isfile(full_path):
+        raise Http404('Not found')
+    private_dir = os.path.realpath(settings.RESUMABLE_UPLOAD_DIR) + os.sep
+    if os.path.realpath(full_path).startswith(private_dir):
+        raise Http404('Not found')
+
+    etag = file_etag(stat)
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(stat.st_mtime),
+        'Accept-Ranges': 'bytes',
+        'Cache-Control': IMMUTABLE_CACHE_CONTROL if path.startswith('blobs/') else DEFAULT_CACHE_CONTROL,
+    }
+    if _not_modified(request, etag, stat.st_mtime):
+        response = HttpResponseNotModified()
+        return _with_headers(response, headers)
+
+    size = stat.st_size
+    byte_range = None
+    range_header = request.headers.get('Range')
+    if range_header and _range_applies(request, etag, stat.st_mtime):
+        try:
+            byte_range = parse_range(range_header, size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return _with_headers(response, headers)
+
+    content_type, encoding = mimetypes.guess_type(full_path)
+    content_type = content_type or 'application/octet-stream'
+    accel_prefix = getattr(settings, 'MEDIA_ACCEL_REDIRECT_PREFIX', '')
+    if accel_prefix:
+        # nginx يقرأ الملف (internal location) ويطبق Range بنفسه
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = accel_prefix.rstrip('/') + '/' + path
+        return _with_headers(response, headers)
+
+    length = size if byte_range is None else byte_range[1] - byte_range[0] + 1
+    if request.method == 'HEAD':
+        response = HttpResponse(status=200 if byte_range is None else 206, content_type=content_type)
+        response['Content-Length'] = str(length)
+        if byte_range is not None:
+            response['Content-Range'] = f'bytes {byte_range[0]}-{byte_range[1]}/{size}'
+        return _with_headers(response, headers)
+
+    file = open(full_path, 'rb')
+    if byte_range is None:
+        response = FileResponse(file, content_type=content_type)
+        response.block_size = STREAM_BLOCK_SIZE
+        response['Content-Length'] = str(size)
+    else:
+        start, end = byte_range
+        response = FileResponse(RangeFile(file, start, length), status=206, content_type=content_type)
+        response.block_size = STREAM_BLOCK_SIZE
+        response['Content-Length'] = str(length)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    if encoding:
+        response['Content-Encoding'] = encoding
+    return _with_headers(response, headers)
@@ -0,0 +1,66 @@
+"""
+Renderer و Parser لـ JSON مبنيان على orjson
+
+orjson أسرع بكثير من مكتبة json القياسية في ترميز القواميس المتداخلة الكبيرة
+(الفيد، الاستكشاف، الإشعارات) ويرمّز datetime و UUID مباشرة. الناتج يطابق
+JSONRenderer الافتراضي في DRF: UTF-8 دون escape للنص العربي، و'Z' لتوقيت
+UTC، وDecimal كرقم، ومفاتيح القواميس غير النصية كنصوص.
+
+عند غياب orjson، أو طلب indent (مثل Browsable API)، أو ترميز طلب غير UTF-8
+يُستخدم تنفيذ DRF القياسي.
+"""
+
+from django.conf import settings
+from rest_framework import parsers, renderers
+from rest_framework.utils import encoders
+from rest_framework.exceptions import ParseError
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+ORJSON_OPTIONS = (
+    orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+) if orjson is not None else 0
+
+# الأنواع التي لا يرمّزها orjson (Decimal، النصوص المؤجلة، QuerySet، timedelta...)
+# تمر على نفس المحوّل الذي يستخدمه DRF
+_default = encoders.JSONEncoder().default
+
+
+class ORJSONRenderer(renderers.JSONRenderer):
+    """JSONRenderer يستخدم orjson عند توفره"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+
+        renderer_context = renderer_context or {}
+        if self.get_indent(accepted_media_type, renderer_context) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        ret = orjson.dumps(data, default=_default, option=ORJSON_OPTIONS)
+        # نفس escape الذي يطبقه DRF حتى يبقى الناتج JavaScript صالحاً
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
+
+
+class ORJSONParser(parsers.JSONParser):
+    """JSONParser يستخدم orjson لطلبات UTF-8"""
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or encoding.lower().replace('_', '-') not in ('utf-8', 'utf8'):
+            return super().parse(stream, media_type, parser_context)
+
+        try:
+            # orjson يرفض NaN و Infinity كما يفعل DRF في الوضع strict
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
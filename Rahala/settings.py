@@ -140,6 +140,20 @@ FRONTEND_URL = "http://localhost:8080"
 STATIC_URL = 'static/'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# عند وضع nginx أمام التطبيق: location داخلي يشير إلى MEDIA_ROOT (مثل '/protected-media/')
+# فيُسلَّم تقديم الملفات لـ nginx عبر X-Accel-Redirect (Rahala/media.py)
+MEDIA_ACCEL_REDIRECT_PREFIX = env('MEDIA_ACCEL_REDIRECT_PREFIX', default='')
+
+# فحص محتوى وحجم الصور والفيديوهات أثناء استلامها قبل كتابتها (trip/upload_handlers.py)
+FILE_UPLOAD_HANDLERS = [
+    'trip.upload_handlers.MediaUploadGuardHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+
+# الأجزاء المستلمة للرفع القابل للاستئناف قبل نقلها إلى التخزين (trip/uploads.py)
+RESUMABLE_UPLOAD_DIR = env('RESUMABLE_UPLOAD_DIR', default=os.path.join(MEDIA_ROOT, 'uploads', 'partial'))
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -149,7 +163,17 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
-    )
+    ),
+    # orjson مع الرجوع إلى json القياسي عند غيابه (Rahala/renderers.py)
+    'DEFAULT_RENDERER_CLASSES': (
+        'Rahala.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'Rahala.renderers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
 }
 
 SIMPLE_JWT = {
@@ -175,6 +199,34 @@ CHANNEL_LAYERS = {
     },
 }
 
+# Cache مشترك بين العمليات (daphne و outbox relay) عند توفر Redis
+REDIS_URL = env('REDIS_URL', default=None)
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        },
+    }
+
+# تخطي WebSocket push للمستخدمين غير المتصلين (يتطلب cache مشترك)
+PRESENCE_TRACKING = env.bool('PRESENCE_TRACKING', default=bool(REDIS_URL))
+
+# سجل أحداث المشاركة الخام (append-only) يُنظف عبر compact_shares
+SHARE_LOG_ENABLED = env.bool('SHARE_LOG_ENABLED', default=False)
+
+# عدد الخيوط لترميز نسخ الصور (trip/image_variants.py)
+IMAGE_VARIANT_WORKERS = env.int('IMAGE_VARIANT_WORKERS', default=4)
+
+# معالجة الفيديو (trip/video_processing.py، أمر process_videos)
+FFMPEG_BINARY = env('FFMPEG_BINARY', default='ffmpeg')
+FFPROBE_BINARY = env('FFPROBE_BINARY', default='ffprobe')
+VIDEO_MAX_CONCURRENT = env.int('VIDEO_MAX_CONCURRENT', default=2)
+VIDEO_HLS_ENABLED = env.bool('VIDEO_HLS_ENABLED', default=False)
+
+# قاموس المدن المحلي لإحداثيات الرحلات عند غيابها من العميل والـ AI (trip/geo.py)
+GEO_GAZETTEER_PATH = env('GEO_GAZETTEER_PATH', default=str(BASE_DIR / 'trip' / 'data' / 'gazetteer.csv'))
+
 AUTH_USER_MODEL = 'accounts.User'
 
 EMAIL_BACKEND = env('EMAIL_BACKEND')
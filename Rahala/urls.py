@@ -1,10 +1,10 @@
 from django.contrib import admin
 from django.urls import path, include, re_path
 from django.conf import settings
-from django.conf.urls.static import static
 from rest_framework import permissions
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
+from .media import serve_media
 
 schema_view = get_schema_view(
     openapi.Info(
@@ -41,7 +41,7 @@ urlpatterns = [
          name="schema-redoc"),
 ]
 
-# static/media in DEBUG
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL,
-                          document_root=settings.MEDIA_ROOT)
+# media: Range/206 و ETag، مع X-Accel-Redirect لـ nginx إن وُجد (Rahala/media.py)
+urlpatterns += [
+    re_path(rf"^{settings.MEDIA_URL.lstrip('/')}(?P<path>.*)$", serve_media, name="media"),
+]
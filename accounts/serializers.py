@@ -4,6 +4,7 @@ from django.core.exceptions import ValidationError as DjangoValidationError
 from .models import User, Profile, SubscriptionPlan, Payment
 from .utils import validate_password_strength, calculate_password_strength
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from interactions.relationships import RelationshipListSerializer, get_viewer_relationships
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, min_length=8)
@@ -186,6 +187,10 @@ class PublicUserProfileSerializer(serializers.ModelSerializer):
             'trips_count', 'is_following'
         ]
         read_only_fields = ['id', 'username', 'date_joined', 'is_verified']
+        list_serializer_class = RelationshipListSerializer
+
+    def prime_relationships(self, users):
+        get_viewer_relationships(self.context).prime_users([user.id for user in users])
 
     def get_followers_count(self, obj):
         """عدد المتابعين"""
@@ -201,14 +206,7 @@ class PublicUserProfileSerializer(serializers.ModelSerializer):
 
     def get_is_following(self, obj):
         """هل المستخدم الحالي يتابع هذا المستخدم"""
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            from interactions.models import Follow
-            return Follow.objects.filter(
-                follower=request.user,
-                following=obj
-            ).exists()
-        return False
+        return get_viewer_relationships(self.context).is_following(obj.id)
 
 
 class UserSearchSerializer(serializers.ModelSerializer):
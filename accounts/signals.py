@@ -4,6 +4,7 @@ from django.core.mail import send_mail
 from django.conf import settings
 from django.contrib.auth.signals import user_logged_in, user_logged_out, user_login_failed
 from django.utils import timezone
+from Rahala.conditional import bump_version
 from .models import User, Profile
 import logging
 import os
@@ -250,6 +251,14 @@ def profile_updated(sender, instance, created, **kwargs):
         # or send notifications about profile updates
 
 
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=Profile)
+def invalidate_public_profile(sender, instance, **kwargs):
+    """تغيير ETag البروفايل العام عند تعديل المستخدم أو بروفايله"""
+    user_id = instance.pk if sender is User else instance.user_id
+    bump_version(f"user:{user_id}")
+
+
 def get_client_ip(request):
     """
     Get client IP address from request
@@ -2,6 +2,8 @@ from rest_framework import generics, status, permissions
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from django.shortcuts import get_object_or_404
+from django.db.models import Count, Max
+from Rahala.conditional import ConditionalGetMixin
 from .models import SubscriptionPlan, Payment, User
 from .serializers import (
     SubscriptionPlanSerializer,
@@ -15,11 +17,17 @@ import logging
 logger = logging.getLogger(__name__)
 
 
-class SubscriptionPlanListView(generics.ListAPIView):
+class SubscriptionPlanListView(ConditionalGetMixin, generics.ListAPIView):
     """عرض قائمة خطط الاشتراك المتاحة"""
     queryset = SubscriptionPlan.objects.filter(is_active=True)
     serializer_class = SubscriptionPlanSerializer
     permission_classes = [permissions.AllowAny]
+    cache_control = 'public, max-age=300'
+
+    def get_etag_version(self, request):
+        # العدد يكشف حذف خطة، وupdated_at يكشف أي تعديل أو إضافة
+        stats = self.get_queryset().aggregate(last=Max('updated_at'), count=Count('id'))
+        return stats['last'], stats['count']
 
 
 class CreateSubscriptionView(APIView):
@@ -136,3 +136,40 @@ class PasswordValidationTests(APITestCase):
             'password_confirm': 'MyPass123!'
         })
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+
+class ConditionalProfileTests(APITestCase):
+    """ETag و 304 للبروفايل العام وخطط الاشتراك"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='public@example.com', password='PublicPass123', is_active=True, is_verified=True)
+        self.viewer = User.objects.create_user(email='fan@example.com', password='FanPass123', is_active=True, is_verified=True)
+        self.url = reverse('accounts:public_user_profile', args=[self.user.id])
+
+    def test_follow_changes_public_profile_etag(self):
+        from interactions.models import Follow
+        self.client.force_authenticate(user=self.viewer)
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        Follow.objects.create(follower=self.viewer, following=self.user)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['followers_count'], 1)
+        self.assertTrue(response.data['is_following'])
+
+    def test_subscription_plans_etag_tracks_updated_at(self):
+        from .models import SubscriptionPlan
+        plan = SubscriptionPlan.objects.create(name='Pro', plan_type='pro', duration='monthly', price=100)
+        url = reverse('accounts:subscription_plans')
+        response = self.client.get(url)
+        self.assertEqual(response['Cache-Control'], 'public, max-age=300')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        etag = response['ETag']
+        plan.price = 120
+        plan.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
@@ -58,6 +58,7 @@ from django.contrib.auth.tokens import default_token_generator
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from django.utils.encoding import force_bytes, force_str
 from django.shortcuts import get_object_or_404
+from Rahala.conditional import ConditionalGetMixin, get_version
 from .models import User, Profile
 from .serializers import (
     UserSerializer, ProfileSerialzer, CustomTokenObtainPairSerializer,
@@ -524,11 +525,17 @@ class ProfileDetailView(generics.RetrieveUpdateAPIView):
         return profile
 
 
-class PublicUserProfileView(generics.RetrieveAPIView):
+class PublicUserProfileView(ConditionalGetMixin, generics.RetrieveAPIView):
     """عرض البروفايل العام لأي مستخدم مع رحلاته وإحصائياته"""
     serializer_class = PublicUserProfileSerializer
     permission_classes = [permissions.AllowAny]
     lookup_field = 'id'
+    # is_following يختلف لكل مستخدم
+    cache_control = 'private, no-cache'
+    etag_vary_on_viewer = True
+
+    def get_etag_version(self, request):
+        return (get_version(f"user:{self.kwargs.get('id')}"),)
 
     def get_queryset(self):
         return User.objects.select_related('profile').prefetch_related(
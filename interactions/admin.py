@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Follow, Like, Comment, Save, Share, Notification
+from .models import Follow, Like, Comment, Save, Share, Notification, OutboxEvent
 
 
 @admin.register(Follow)
@@ -40,7 +40,7 @@ class SaveAdmin(admin.ModelAdmin):
 
 @admin.register(Share)
 class ShareAdmin(admin.ModelAdmin):
-    list_display = ['user', 'trip', 'created_at']
+    list_display = ['user', 'trip', 'count', 'created_at', 'last_shared_at']
     list_filter = ['created_at']
     search_fields = ['user__username', 'trip__caption']
     raw_id_fields = ['user', 'trip']
@@ -63,3 +63,10 @@ class NotificationAdmin(admin.ModelAdmin):
         queryset.update(is_read=False)
         self.message_user(request, f'{queryset.count()} notifications marked as unread.')
     mark_as_unread.short_description = 'Mark selected notifications as unread'
+
+
+@admin.register(OutboxEvent)
+class OutboxEventAdmin(admin.ModelAdmin):
+    list_display = ['id', 'event_type', 'attempts', 'created_at', 'processed_at']
+    list_filter = ['event_type', 'processed_at']
+    readonly_fields = ['event_type', 'payload', 'attempts', 'last_error', 'created_at', 'processed_at']
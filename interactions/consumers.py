@@ -1,35 +1,63 @@
+import asyncio
 import json
 import logging
+from urllib.parse import parse_qs
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
-from django.contrib.auth import get_user_model
-from django.contrib.auth.models import AnonymousUser
-from rest_framework_simplejwt.tokens import UntypedToken
+from asgiref.sync import sync_to_async
+from rest_framework_simplejwt.tokens import AccessToken
 from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
-from django.conf import settings
+from rest_framework_simplejwt.settings import api_settings
 from .models import Notification
-from .serializers import NotificationSerializer
+from .utils import get_notifications_bootstrap, get_notifications_replay, parse_resume_cursor
+from .presence import PRESENCE_REFRESH, mark_online, mark_offline
 
-User = get_user_model()
 logger = logging.getLogger(__name__)
 
 
 class NotificationConsumer(AsyncWebsocketConsumer):
     """
     WebSocket Consumer للإشعارات في الوقت الفعلي
+
+    الاتصال يكلف رحلة واحدة فقط لقاعدة البيانات (thread pool slot واحد):
+    التوكن يُفك في event loop بدون قاعدة بيانات، ثم تُحمّل بيانات المستخدم
+    (من الـ cache غالباً) والإشعارات وعددها معاً.
+
+    عند إعادة الاتصال يمكن للعميل تمرير ?since=<آخر notification id أو ISO timestamp>
+    لاستلام كل ما فاته من سجل الأحداث الحديثة بدلاً من أحدث 10 إشعارات فقط.
+
+    الحضور يُسجَّل عند الاتصال ويجدده الـ consumer كل PRESENCE_REFRESH ثانية
+    (ومع heartbeat إن أرسله العميل)، ولا تستخدم عمليات الـ cache خيط قاعدة
+    البيانات (thread_sensitive=False).
     """
+    initial_notifications_limit = 10
     
     async def connect(self):
         """اتصال WebSocket جديد"""
         # التحقق من المصادقة
-        user = await self.get_user_from_token()
-        if user is None or user.is_anonymous:
+        user_id = self.get_user_id_from_token()
+        if user_id is None:
             logger.warning("Unauthorized WebSocket connection attempt")
             await self.close()
             return
+
+        query_params = parse_qs(self.scope.get('query_string', b'').decode())
+        cursor = parse_resume_cursor(query_params.get('since', [None])[0])
+
+        if cursor is not None:
+            bootstrap = await database_sync_to_async(get_notifications_replay)(user_id, cursor)
+        else:
+            bootstrap = await database_sync_to_async(get_notifications_bootstrap)(
+                user_id, self.initial_notifications_limit
+            )
+        if bootstrap is None:
+            logger.warning(f"WebSocket connection for unknown or inactive user {user_id}")
+            await self.close()
+            return
         
-        self.user = user
-        self.user_group_name = f"user_{self.user.id}_notifications"
+        self.user_id = user_id
+        self.username = bootstrap['user']['username']
+        self.user_group_name = f"user_{self.user_id}_notifications"
         
         # الانضمام إلى مجموعة المستخدم
         await self.channel_layer.group_add(
@@ -38,19 +66,32 @@ class NotificationConsumer(AsyncWebsocketConsumer):
         )
         
         await self.accept()
-        logger.info(f"User {self.user.username} connected to notifications WebSocket")
+        await sync_to_async(mark_online, thread_sensitive=False)(self.user_id, self.channel_name)
+        self.presence_task = asyncio.create_task(self.refresh_presence())
+        logger.info(f"User {self.username} connected to notifications WebSocket")
         
+        if cursor is not None:
+            await self.send_replay(bootstrap)
+            return
+
         # إرسال الإشعارات غير المقروءة عند الاتصال
-        await self.send_unread_notifications()
+        await self.send(text_data=json.dumps({
+            'type': 'initial_notifications',
+            'notifications': bootstrap['notifications'],
+            'unread_count': bootstrap['unread_count']
+        }))
     
     async def disconnect(self, close_code):
         """قطع اتصال WebSocket"""
+        if hasattr(self, 'presence_task'):
+            self.presence_task.cancel()
         if hasattr(self, 'user_group_name'):
             await self.channel_layer.group_discard(
                 self.user_group_name,
                 self.channel_name
             )
-            logger.info(f"User {self.user.username} disconnected from notifications WebSocket")
+            await sync_to_async(mark_offline, thread_sensitive=False)(self.user_id, self.channel_name)
+            logger.info(f"User {self.username} disconnected from notifications WebSocket")
     
     async def receive(self, text_data):
         """استقبال رسالة من العميل"""
@@ -65,6 +106,10 @@ class NotificationConsumer(AsyncWebsocketConsumer):
                 await self.mark_all_notifications_as_read()
             elif message_type == 'get_unread_count':
                 await self.send_unread_count()
+            elif message_type == 'heartbeat':
+                await self.heartbeat()
+            elif message_type == 'resume':
+                await self.resume(text_data_json.get('since'))
             else:
                 logger.warning(f"Unknown message type: {message_type}")
                 
@@ -87,9 +132,15 @@ class NotificationConsumer(AsyncWebsocketConsumer):
             'unread_count': event['unread_count']
         }))
     
-    @database_sync_to_async
-    def get_user_from_token(self):
-        """استخراج المستخدم من JWT token"""
+    async def video_progress(self, event):
+        """إرسال تقدم معالجة فيديو للعميل"""
+        await self.send(text_data=json.dumps({
+            'type': 'video_progress',
+            'video': event['video']
+        }))
+    
+    def get_user_id_from_token(self):
+        """استخراج معرف المستخدم من JWT token بدون قاعدة بيانات"""
         try:
             # البحث عن التوكن في query parameters أو headers
             token = None
@@ -109,53 +160,58 @@ class NotificationConsumer(AsyncWebsocketConsumer):
             if not token:
                 return None
             
-            # التحقق من صحة التوكن
-            UntypedToken(token)
-            
-            # فك تشفير التوكن للحصول على user_id
-            from rest_framework_simplejwt.tokens import AccessToken
+            # التحقق من صحة التوكن وفك تشفيره
             access_token = AccessToken(token)
-            user_id = access_token['user_id']
-            
-            return User.objects.get(id=user_id)
+            return access_token[api_settings.USER_ID_CLAIM]
             
-        except (InvalidToken, TokenError, User.DoesNotExist) as e:
+        except (InvalidToken, TokenError, KeyError) as e:
             logger.error(f"Token validation error: {str(e)}")
             return None
         except Exception as e:
             logger.error(f"Unexpected error in token validation: {str(e)}")
             return None
     
-    @database_sync_to_async
-    def get_unread_notifications(self):
-        """الحصول على الإشعارات غير المقروءة"""
-        notifications = Notification.objects.filter(
-            recipient=self.user,
-            is_read=False
-        ).select_related('sender', 'trip', 'comment').order_by('-created_at')[:10]
-        
-        serializer = NotificationSerializer(notifications, many=True)
-        return serializer.data
-    
     @database_sync_to_async
     def get_unread_count(self):
         """الحصول على عدد الإشعارات غير المقروءة"""
         return Notification.objects.filter(
-            recipient=self.user,
+            recipient_id=self.user_id,
             is_read=False
         ).count()
     
-    async def send_unread_notifications(self):
-        """إرسال الإشعارات غير المقروءة"""
-        notifications = await self.get_unread_notifications()
-        unread_count = await self.get_unread_count()
-        
+    async def refresh_presence(self):
+        """تجديد الحضور من جهة الخادم طوال الاتصال، دون الاعتماد على heartbeat العميل"""
+        while True:
+            await asyncio.sleep(PRESENCE_REFRESH)
+            try:
+                await sync_to_async(mark_online, thread_sensitive=False)(self.user_id, self.channel_name)
+            except Exception as e:
+                logger.error(f"Failed to refresh presence for user {self.user_id}: {str(e)}")
+
+    async def heartbeat(self):
+        """تجديد الحضور"""
+        await sync_to_async(mark_online, thread_sensitive=False)(self.user_id, self.channel_name)
+        await self.send(text_data=json.dumps({'type': 'heartbeat_ack'}))
+
+    async def resume(self, since):
+        """إعادة إرسال الإشعارات الفائتة بعد مؤشر الاستئناف"""
+        cursor = parse_resume_cursor(since)
+        if cursor is None:
+            logger.warning(f"Invalid resume cursor: {since}")
+            return
+        replay = await database_sync_to_async(get_notifications_replay)(self.user_id, cursor)
+        if replay is not None:
+            await self.send_replay(replay)
+
+    async def send_replay(self, replay):
+        """إرسال الإشعارات الفائتة بترتيب حدوثها"""
         await self.send(text_data=json.dumps({
-            'type': 'initial_notifications',
-            'notifications': notifications,
-            'unread_count': unread_count
+            'type': 'replay',
+            'notifications': replay['notifications'],
+            'source': replay['source'],
+            'has_more': replay['has_more']
         }))
-    
+
     async def send_unread_count(self):
         """إرسال عدد الإشعارات غير المقروءة"""
         unread_count = await self.get_unread_count()
@@ -170,7 +226,7 @@ class NotificationConsumer(AsyncWebsocketConsumer):
         try:
             notification = Notification.objects.get(
                 id=notification_id,
-                recipient=self.user
+                recipient_id=self.user_id
             )
             notification.mark_as_read()
             return True
@@ -181,7 +237,7 @@ class NotificationConsumer(AsyncWebsocketConsumer):
     def mark_all_notifications_as_read(self):
         """تحديد جميع الإشعارات كمقروءة"""
         count = Notification.objects.filter(
-            recipient=self.user,
+            recipient_id=self.user_id,
             is_read=False
         ).update(is_read=True)
         return count
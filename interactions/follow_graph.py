@@ -0,0 +1,460 @@
+"""
+رسم المتابعة في الذاكرة لاقتراحات "أشخاص قد تعرفهم" والمتابعين المشتركين
+
+حواف Follow تُحمّل مرة واحدة في تمثيل CSR بمصفوفات NumPy (اتجاه المتابَعين
+واتجاه المتابعين)، فتصبح قائمة جيران أي مستخدم شريحة مرتبة من مصفوفة واحدة.
+التعديلات بعد التحميل تُحفظ في طبقة فرق صغيرة (إضافات وحذف) تُدمج في CSR
+عند تجاوزها COMPACT_THRESHOLD.
+
+كل عملية تحتفظ بنسختها من الرسم، وتتزامن مع أحداث follow.created و
+follow.deleted من جدول الـ outbox بدءاً من آخر معرف طبقته (مرة كل
+SYNC_INTERVAL على الأكثر). حالة الرسم snapshot لا تتغير بعد نشرها، والكتابة
+تنشر snapshot جديدة بإسناد مرجع واحد، فالطلبات المتزامنة تقرأ دون قفل. المعرفات المتخطاة تُراقب كفجوات حتى GAP_TIMEOUT،
+لأن transaction أقدم قد يلتزم بعد حدث بمعرف أكبر. يُعاد البناء كاملاً كل
+REBUILD_INTERVAL في thread خلفي، والطلبات تستمر بالرسم الحالي حتى يُستبدل.
+"""
+
+import itertools
+import logging
+import threading
+import time
+
+import numpy as np
+from django.db import connection
+from django.db.models import Max, Q
+
+from .models import Follow, OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+COMPACT_THRESHOLD = 10000  # عدد التعديلات قبل إعادة بناء CSR
+REBUILD_INTERVAL = 3600  # ثانية
+SYNC_INTERVAL = 1.0  # ثانية بين مزامنتين مع الـ outbox
+GAP_TIMEOUT = 300  # ثانية: انتظار معرف متخطى قبل اعتباره transaction ملغى
+MAX_GAP = 1000  # قفزة أكبر في المعرفات لا تُتتبع كفجوات
+FOLLOW_EVENTS = ('follow.created', 'follow.deleted')
+
+_EMPTY = np.empty(0, dtype=np.int32)
+
+
+def _build_csr(src, dst, size):
+    """بناء (indptr, indices) مع ترتيب جيران كل عقدة تصاعدياً"""
+    order = np.lexsort((dst, src))
+    indices = dst[order].astype(np.int32)
+    indptr = np.zeros(size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=size), out=indptr[1:])
+    for array in (indptr, indices):
+        array.flags.writeable = False
+    return indptr, indices
+
+
+class _Snapshot:
+    """
+    حالة الرسم في لحظة واحدة: مصفوفات CSR وطبقة الفرق
+
+    لا تُعدَّل بعد نشرها؛ كل كتابة تبني snapshot جديدة وتستبدل المرجع، فالقارئ
+    الذي أخذ المرجع يرى حالة متسقة دون قفل. طبقة الفرق قواميس
+    {عقدة: frozenset}.
+    """
+    __slots__ = (
+        'size', 'out_indptr', 'out_indices', 'in_indptr', 'in_indices',
+        'added_out', 'added_in', 'removed_out', 'removed_in', 'pending_changes',
+    )
+
+    def __init__(self, size, out_csr, in_csr, added_out=None, added_in=None,
+                 removed_out=None, removed_in=None, pending_changes=0):
+        self.size = size
+        self.out_indptr, self.out_indices = out_csr
+        self.in_indptr, self.in_indices = in_csr
+        self.added_out = added_out or {}
+        self.added_in = added_in or {}
+        self.removed_out = removed_out or {}
+        self.removed_in = removed_in or {}
+        self.pending_changes = pending_changes
+
+    @classmethod
+    def build(cls, src, dst):
+        size = int(max(src.max(), dst.max())) + 1 if src.size else 0
+        return cls(size, _build_csr(src, dst, size), _build_csr(dst, src, size))
+
+    def base(self, indptr, indices, node):
+        if node < 0 or node >= self.size:
+            return _EMPTY
+        return indices[indptr[node]:indptr[node + 1]]
+
+    def in_base(self, follower_id, following_id):
+        neighbors = self.base(self.out_indptr, self.out_indices, follower_id)
+        i = np.searchsorted(neighbors, following_id)
+        return i < neighbors.size and neighbors[i] == following_id
+
+    def neighbors(self, indptr, indices, added, removed, node):
+        neighbors = self.base(indptr, indices, node)
+        gone = removed.get(node)
+        if gone:
+            neighbors = neighbors[~np.isin(neighbors, list(gone))]
+        extra = added.get(node)
+        if extra:
+            neighbors = np.union1d(neighbors, np.fromiter(extra, dtype=np.int32, count=len(extra)))
+        return neighbors
+
+    def following(self, user_id):
+        return self.neighbors(self.out_indptr, self.out_indices, self.added_out, self.removed_out, user_id)
+
+    def followers(self, user_id):
+        return self.neighbors(self.in_indptr, self.in_indices, self.added_in, self.removed_in, user_id)
+
+    def edges(self):
+        src = np.repeat(np.arange(self.size, dtype=np.int64), np.diff(self.out_indptr))
+        dst = self.out_indices.astype(np.int64)
+        if self.removed_out:
+            # ترميز كل حافة كعدد واحد follower * size + following
+            removed = np.array([
+                f * self.size + t for f, targets in self.removed_out.items() for t in targets
+            ], dtype=np.int64)
+            keep = ~np.isin(src * self.size + dst, removed)
+            src, dst = src[keep], dst[keep]
+        added = [(f, t) for f, targets in self.added_out.items() for t in targets]
+        if added:
+            extra = np.array(added, dtype=np.int64)
+            src = np.concatenate([src, extra[:, 0]])
+            dst = np.concatenate([dst, extra[:, 1]])
+        return src, dst
+
+
+def _with(deltas, node, value, add):
+    """استبدال مجموعة العقدة في قاموس فرق منسوخ"""
+    current = deltas.get(node, frozenset())
+    deltas[node] = current | {value} if add else current - {value}
+
+
+class FollowGraph:
+    """
+    رسم المتابعة بتمثيل CSR مع طبقة فرق للتحديثات التزايدية
+
+    الرسم مشترك بين threads العملية: القراءة تأخذ مرجع الـ snapshot الحالية مرة
+    واحدة، والكتابة (المزامنة أو add_edge) تبني snapshot جديدة تحت _write_lock
+    ثم تستبدلها بإسناد واحد.
+    """
+
+    def __init__(self, followers, followings, cursor=0, compact_threshold=COMPACT_THRESHOLD):
+        """
+        Args:
+            followers (array): معرفات المتابِعين لكل حافة
+            followings (array): معرفات المتابَعين لكل حافة (بنفس الترتيب)
+            cursor (int): آخر معرف حدث outbox منعكس في الحواف
+            compact_threshold (int): عدد التعديلات قبل الدمج في CSR
+        """
+        self.cursor = cursor
+        self.compact_threshold = compact_threshold
+        self.built_at = self.synced_at = time.monotonic()
+        # معرفات أقل من المؤشر لم تظهر بعد: {المعرف: وقت اكتشافه}
+        self.gaps = {}
+        self.sync_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._snapshot = _Snapshot.build(
+            np.asarray(followers, dtype=np.int64), np.asarray(followings, dtype=np.int64)
+        )
+
+    @classmethod
+    def from_database(cls, **kwargs):
+        """تحميل جميع حواف Follow دون إنشاء كائنات نموذج"""
+        # المؤشر يُقرأ قبل الحواف: الأحداث اللاحقة تُطبق فوقها وتطبيقها idempotent
+        cursor = OutboxEvent.objects.aggregate(last=Max('id'))['last'] or 0
+        # المعرفات الناقصة قبل المؤشر قد تكون transactions لم تلتزم بعد
+        present = set(OutboxEvent.objects.filter(id__gt=cursor - MAX_GAP).values_list('id', flat=True))
+        rows = Follow.objects.values_list('follower_id', 'following_id').order_by()
+        edges = np.fromiter(
+            itertools.chain.from_iterable(rows.iterator(chunk_size=20000)),
+            dtype=np.int64
+        ).reshape(-1, 2)
+        graph = cls(edges[:, 0], edges[:, 1], cursor=cursor, **kwargs)
+        now = time.monotonic()
+        graph.gaps = {
+            event_id: now for event_id in range(max(cursor - MAX_GAP + 1, 1), cursor)
+            if event_id not in present
+        }
+        return graph
+
+    @property
+    def size(self):
+        return self._snapshot.size
+
+    @property
+    def pending_changes(self):
+        return self._snapshot.pending_changes
+
+    @property
+    def edge_count(self):
+        snapshot = self._snapshot
+        added = sum(len(s) for s in snapshot.added_out.values())
+        removed = sum(len(s) for s in snapshot.removed_out.values())
+        return int(snapshot.out_indices.size) + added - removed
+
+    @property
+    def nbytes(self):
+        """حجم مصفوفات CSR بالبايت"""
+        snapshot = self._snapshot
+        return sum(a.nbytes for a in (
+            snapshot.out_indptr, snapshot.out_indices, snapshot.in_indptr, snapshot.in_indices
+        ))
+
+    def following(self, user_id):
+        """معرفات من يتابعهم المستخدم (مصفوفة مرتبة)"""
+        return self._snapshot.following(user_id)
+
+    def followers(self, user_id):
+        """معرفات متابعي المستخدم (مصفوفة مرتبة)"""
+        return self._snapshot.followers(user_id)
+
+    def apply_changes(self, changes):
+        """
+        تطبيق تعديلات على الحواف ونشرها كـ snapshot واحدة (idempotent)
+
+        Args:
+            changes (iterable): ثلاثيات (follower_id, following_id, active)؛
+                active تعني متابعة و False إلغاءها
+
+        Returns:
+            int: عدد التعديلات التي غيرت الرسم
+        """
+        with self._write_lock:
+            current = self._snapshot
+            added_out, added_in = dict(current.added_out), dict(current.added_in)
+            removed_out, removed_in = dict(current.removed_out), dict(current.removed_in)
+            changed = 0
+            for follower_id, following_id, active in changes:
+                follower_id, following_id = int(follower_id), int(following_id)
+                # التعديل يلغي عكسه في طبقة الفرق، أو يُضاف إليها إن خالف الـ CSR
+                undo_out, undo_in, do_out, do_in = (
+                    (removed_out, removed_in, added_out, added_in) if active
+                    else (added_out, added_in, removed_out, removed_in)
+                )
+                if following_id in undo_out.get(follower_id, ()):
+                    _with(undo_out, follower_id, following_id, False)
+                    _with(undo_in, following_id, follower_id, False)
+                elif current.in_base(follower_id, following_id) != active:
+                    if following_id in do_out.get(follower_id, ()):
+                        continue
+                    _with(do_out, follower_id, following_id, True)
+                    _with(do_in, following_id, follower_id, True)
+                else:
+                    continue
+                changed += 1
+
+            snapshot = _Snapshot(
+                current.size,
+                (current.out_indptr, current.out_indices),
+                (current.in_indptr, current.in_indices),
+                {node: s for node, s in added_out.items() if s},
+                {node: s for node, s in added_in.items() if s},
+                {node: s for node, s in removed_out.items() if s},
+                {node: s for node, s in removed_in.items() if s},
+                current.pending_changes + changed,
+            )
+            if snapshot.pending_changes >= self.compact_threshold:
+                snapshot = _Snapshot.build(*snapshot.edges())
+            self._snapshot = snapshot
+        return changed
+
+    def add_edge(self, follower_id, following_id):
+        """تسجيل متابعة جديدة (idempotent)"""
+        self.apply_changes([(follower_id, following_id, True)])
+
+    def remove_edge(self, follower_id, following_id):
+        """تسجيل إلغاء متابعة (idempotent)"""
+        self.apply_changes([(follower_id, following_id, False)])
+
+    def edges(self):
+        """جميع الحواف الحالية كمصفوفتين (followers, followings)"""
+        return self._snapshot.edges()
+
+    def compact(self):
+        """دمج طبقة الفرق في مصفوفات CSR"""
+        with self._write_lock:
+            self._snapshot = _Snapshot.build(*self._snapshot.edges())
+
+    def apply_event(self, event_type, payload):
+        """تطبيق حدث follow.created / follow.deleted من الـ outbox"""
+        self.apply_changes([
+            (payload['follower_id'], payload['following_id'], event_type == 'follow.created')
+        ])
+
+    def sync(self):
+        """
+        تطبيق أحداث المتابعة الجديدة من الـ outbox
+
+        استعلام أول يقرأ المعرفات فقط (كل الأنواع، من الفهرس) بعد المؤشر وبين
+        الفجوات المعروفة، وكل معرف يتخطاه المؤشر يصبح فجوة حتى يظهر أو تمر
+        GAP_TIMEOUT، فالحدث الذي يلتزم متأخراً بمعرف أصغر لا يضيع. ثم تُقرأ
+        أحداث المتابعة فقط من تلك المعرفات الظاهرة (المتابِع والمتابَع دون باقي
+        الـ payload) وتُطبق كـ snapshot واحدة. ترتيب تطبيق أحداث نفس الزوج
+        محفوظ: إلغاء المتابعة لا يلتزم قبل المتابعة التي يحذفها.
+
+        Returns:
+            int: عدد الأحداث المطبقة
+        """
+        now = time.monotonic()
+        self.synced_at = now
+        self.gaps = {event_id: seen for event_id, seen in self.gaps.items() if now - seen < GAP_TIMEOUT}
+
+        condition = Q(id__gt=self.cursor)
+        if self.gaps:
+            condition |= Q(id__in=list(self.gaps))
+        present = list(OutboxEvent.objects.filter(condition).order_by('id').values_list('id', flat=True))
+        if not present:
+            return 0
+
+        cursor = self.cursor
+        filled = [event_id for event_id in present if event_id in self.gaps]
+        for event_id in filled:
+            del self.gaps[event_id]
+        new_gaps = []
+        for event_id in present:
+            if event_id > cursor:
+                if event_id - cursor <= MAX_GAP:
+                    new_gaps.extend(range(cursor + 1, event_id))
+                cursor = event_id
+        self.gaps.update(dict.fromkeys(new_gaps, now))
+
+        # المعرفات التي ظهرت في الاستعلام الأول فقط؛ ما التزم بعده يُقرأ في المزامنة التالية
+        visible = Q(id__gt=self.cursor, id__lte=cursor)
+        if new_gaps:
+            visible &= ~Q(id__in=new_gaps)
+        if filled:
+            visible |= Q(id__in=filled)
+        events = list(
+            OutboxEvent.objects.filter(visible, event_type__in=FOLLOW_EVENTS).order_by('id').values_list(
+                'event_type', 'payload__follower_id', 'payload__following_id'
+            )
+        )
+        self.cursor = cursor
+        self.apply_changes(
+            (follower_id, following_id, event_type == 'follow.created')
+            for event_type, follower_id, following_id in events
+        )
+        return len(events)
+
+    def mutual_followers(self, viewer_id, user_id):
+        """
+        من يتابعهم المستخدم الحالي ويتابعون user_id ("يتابعه فلان و N آخرون")
+
+        Returns:
+            ndarray: معرفات مرتبة
+        """
+        snapshot = self._snapshot
+        return np.intersect1d(
+            snapshot.following(viewer_id), snapshot.followers(user_id), assume_unique=True
+        )
+
+    def mutual_followers_count(self, viewer_id, user_id):
+        return int(self.mutual_followers(viewer_id, user_id).size)
+
+    def follower_overlap(self, user_a, user_b):
+        """
+        تداخل جمهور مستخدمين
+
+        Returns:
+            dict: shared (عدد المتابعين المشتركين) و jaccard
+        """
+        snapshot = self._snapshot
+        a, b = snapshot.followers(user_a), snapshot.followers(user_b)
+        shared = int(np.intersect1d(a, b, assume_unique=True).size)
+        union = a.size + b.size - shared
+        return {
+            'shared': shared,
+            'jaccard': round(shared / union, 4) if union else 0.0,
+        }
+
+    def suggestions(self, user_id, limit=20):
+        """
+        اقتراحات أصدقاء الأصدقاء مرتبة حسب عدد المتابَعين المشتركين
+
+        Args:
+            user_id (int): معرف المستخدم
+            limit (int): الحد الأقصى للاقتراحات
+
+        Returns:
+            list[tuple[int, int]]: (معرف المستخدم المقترح، عدد المشتركين)
+        """
+        snapshot = self._snapshot
+        following = snapshot.following(user_id)
+        if not following.size:
+            return []
+        candidates = np.concatenate([snapshot.following(int(u)) for u in following])
+        ids, counts = np.unique(candidates, return_counts=True)
+        keep = (ids != user_id) & ~np.isin(ids, following, assume_unique=True)
+        ids, counts = ids[keep], counts[keep]
+        # الأكثر اشتراكاً أولاً ثم المعرف الأصغر عند التساوي
+        order = np.lexsort((ids, -counts))[:limit]
+        return [(int(ids[i]), int(counts[i])) for i in order]
+
+
+_graph = None
+_graph_lock = threading.Lock()
+_rebuild_lock = threading.Lock()
+
+
+def rebuild_follow_graph():
+    """
+    بناء رسم جديد من قاعدة البيانات ثم استبدال الرسم المشترك به
+
+    البناء يتم خارج أي قفل تنتظره الطلبات، والاستبدال إسناد مرجع واحد.
+
+    Returns:
+        FollowGraph: الرسم الجديد
+    """
+    global _graph
+    graph = FollowGraph.from_database()
+    _graph = graph
+    return graph
+
+
+def _rebuild_in_background():
+    """إعادة البناء في thread خلفي (واحد على الأكثر لكل عملية)"""
+    if not _rebuild_lock.acquire(blocking=False):
+        return
+
+    def run():
+        try:
+            rebuild_follow_graph()
+        except Exception:
+            logger.exception("Follow graph rebuild failed")
+        finally:
+            # اتصال قاعدة البيانات خاص بهذا الـ thread
+            connection.close()
+            _rebuild_lock.release()
+
+    threading.Thread(target=run, name='follow-graph-rebuild', daemon=True).start()
+
+
+def get_follow_graph():
+    """
+    الرسم المشترك للعملية الحالية
+
+    يُبنى عند أول استخدام فقط داخل الطلب. بعد REBUILD_INTERVAL تبدأ إعادة
+    البناء في الخلفية ويستمر الطلب بالرسم الحالي، والمزامنة مع الـ outbox
+    مرة كل SYNC_INTERVAL يقوم بها طلب واحد دون أن ينتظره الباقون.
+    """
+    global _graph
+    graph = _graph
+    if graph is None:
+        with _graph_lock:
+            if _graph is None:
+                _graph = FollowGraph.from_database()
+            graph = _graph
+    elif time.monotonic() - graph.built_at >= REBUILD_INTERVAL:
+        _rebuild_in_background()
+
+    if time.monotonic() - graph.synced_at >= SYNC_INTERVAL and graph.sync_lock.acquire(blocking=False):
+        try:
+            graph.sync()
+        finally:
+            graph.sync_lock.release()
+    return graph
+
+
+def reset_follow_graph():
+    """إسقاط الرسم المحمل (يُبنى من جديد عند الاستخدام التالي)"""
+    global _graph
+    with _graph_lock:
+        _graph = None
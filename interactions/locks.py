@@ -0,0 +1,39 @@
+"""
+أقفال قصيرة عبر الـ cache
+
+cache.add ذري في Redis و LocMem، فيكفي لتسلسل تعديلات read-modify-write على
+قيمة واحدة في الـ cache بين العمليات (سجل الإشعارات، سجل الحضور).
+"""
+
+import time
+import uuid
+from contextlib import contextmanager
+
+from django.core.cache import cache
+
+
+@contextmanager
+def cache_lock(key, timeout, wait):
+    """
+    أخذ قفل باسم key
+
+    Args:
+        key (str): مفتاح القفل في الـ cache
+        timeout (int): مدة القفل بالثواني إذا توقف صاحبه قبل تحريره
+        wait (float): أقصى انتظار بالثواني لأخذ القفل
+
+    Yields:
+        bool: True إذا أُخذ القفل خلال wait
+    """
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + wait
+    acquired = cache.add(key, token, timeout)
+    while not acquired and time.monotonic() < deadline:
+        time.sleep(0.01)
+        acquired = cache.add(key, token, timeout)
+    try:
+        yield acquired
+    finally:
+        # لا يُحذف قفل انتهت مدته وأخذه غيرنا
+        if acquired and cache.get(key) == token:
+            cache.delete(key)
@@ -0,0 +1,78 @@
+import time
+import numpy as np
+from django.core.management.base import BaseCommand
+from interactions.follow_graph import FollowGraph
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the in-memory follow graph on a synthetic power-law edge set'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=200000,
+            help='Number of synthetic users',
+        )
+        parser.add_argument(
+            '--edges',
+            type=int,
+            default=2000000,
+            help='Number of synthetic follow edges',
+        )
+        parser.add_argument(
+            '--queries',
+            type=int,
+            default=1000,
+            help='Number of timed queries per operation',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=42,
+        )
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['seed'])
+        users, edges = options['users'], options['edges']
+
+        # المتابَعون يتبعون توزيع Zipf (قلة من الحسابات الشائعة) والمتابِعون موزعون بانتظام
+        followers = rng.integers(1, users, size=edges)
+        followings = np.minimum(rng.zipf(1.3, size=edges), users - 1)
+        keep = followers != followings
+        pairs = np.unique(np.stack([followers[keep], followings[keep]], axis=1), axis=0)
+
+        started = time.perf_counter()
+        graph = FollowGraph(pairs[:, 0], pairs[:, 1])
+        build_seconds = time.perf_counter() - started
+
+        self.stdout.write(
+            f'Built graph: {graph.edge_count} edges, {users} users, '
+            f'{graph.nbytes / 1024 / 1024:.1f} MiB in {build_seconds:.2f}s'
+        )
+
+        sample = rng.integers(1, users, size=(options['queries'], 2))
+        operations = {
+            'mutual_followers_count': lambda a, b: graph.mutual_followers_count(a, b),
+            'follower_overlap': lambda a, b: graph.follower_overlap(a, b),
+            'suggestions': lambda a, b: graph.suggestions(a, limit=20),
+        }
+        for name, operation in operations.items():
+            timings = []
+            for a, b in sample.tolist():
+                started = time.perf_counter()
+                operation(a, b)
+                timings.append(time.perf_counter() - started)
+            timings = np.array(timings) * 1000
+            self.stdout.write(
+                f'{name}: p50 {np.percentile(timings, 50):.3f}ms, '
+                f'p99 {np.percentile(timings, 99):.3f}ms, max {timings.max():.3f}ms'
+            )
+
+        started = time.perf_counter()
+        graph.apply_changes((a, b, True) for a, b in sample.tolist())
+        graph.compact()
+        self.stdout.write(
+            f'{len(sample)} incremental follows + compaction: '
+            f'{(time.perf_counter() - started) * 1000:.1f}ms'
+        )
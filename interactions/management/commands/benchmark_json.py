@@ -0,0 +1,138 @@
+import datetime
+import json
+import random
+import time
+import uuid
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from Rahala.renderers import ORJSONRenderer, orjson
+
+CAPTIONS = [
+    'رحلة رائعة إلى الأقصر ومعابدها',
+    'غروب الشمس على كورنيش الإسكندرية',
+    'يوم كامل في واحة سيوة',
+    'Snorkeling trip in Dahab',
+]
+CITIES = [('Egypt', 'Luxor'), ('Egypt', 'Alexandria'), ('Egypt', 'Siwa'), ('Egypt', 'Dahab')]
+
+
+def synthetic_payloads(rng, trips, notifications):
+    """حمولات بنفس شكل الفيد والإشعارات وخطط الترويج"""
+    now = timezone.now()
+
+    def user(i):
+        return {'id': i, 'username': f'user_{i}', 'has_verified_badge': i % 7 == 0}
+
+    feed = {
+        'count': trips * 10,
+        'next': 'http://testserver/api/interactions/feed/?page=2',
+        'previous': None,
+        'results': [
+            {
+                'id': i,
+                'user': f'user_{i % 500}',
+                'caption': rng.choice(CAPTIONS),
+                'location': rng.choice(CITIES)[1],
+                'country': rng.choice(CITIES)[0],
+                'city': rng.choice(CITIES)[1],
+                'tourism_info': {'summary': rng.choice(CAPTIONS) * 3, 'tips': [rng.choice(CAPTIONS)] * 3},
+                'created_at': (now - datetime.timedelta(minutes=i)).isoformat(),
+                'updated_at': (now - datetime.timedelta(minutes=i)).isoformat(),
+                'images': [
+                    {'id': i * 10 + j, 'image': f'http://testserver/media/trips/images/{uuid.uuid4().hex}.jpg'}
+                    for j in range(rng.randint(1, 6))
+                ],
+                'videos': [],
+                'tags': [{'id': i * 10 + j, 'tripTag': tag} for j, tag in enumerate(rng.sample(CAPTIONS, 2))],
+                'likes_count': rng.randint(0, 5000),
+                'comments_count': rng.randint(0, 300),
+                'saves_count': rng.randint(0, 800),
+                'shares_count': rng.randint(0, 200),
+                'is_liked': rng.random() < 0.3,
+                'is_saved': rng.random() < 0.1,
+            }
+            for i in range(trips)
+        ],
+    }
+    # الإشعارات وخطط الترويج تحمل datetime و Decimal و UUID قبل الترميز
+    notifications_page = {
+        'results': [
+            {
+                'id': i,
+                'sender': user(i % 300),
+                'notification_type': rng.choice(['like', 'comment', 'follow', 'share']),
+                'message': rng.choice(CAPTIONS),
+                'trip_id': i,
+                'is_read': rng.random() < 0.5,
+                'created_at': now - datetime.timedelta(seconds=i * 37),
+                'request_id': uuid.uuid4(),
+            }
+            for i in range(notifications)
+        ],
+        'unread_count': notifications // 2,
+    }
+    plans = [
+        {'id': i, 'name': f'خطة {i}', 'price': Decimal(f'{rng.randint(50, 5000)}.{rng.randint(0, 99):02d}'),
+         'created_at': now, 'updated_at': now}
+        for i in range(20)
+    ]
+    return {'feed': feed, 'notifications': notifications_page, 'promotion_plans': plans}
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the orjson renderer against DRF JSONRenderer on synthetic API payloads'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--trips',
+            type=int,
+            default=50,
+            help='Trips per synthetic feed page',
+        )
+        parser.add_argument(
+            '--notifications',
+            type=int,
+            default=100,
+            help='Notifications per synthetic page',
+        )
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=500,
+            help='Timed renders per payload and renderer',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=42,
+        )
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stdout.write(self.style.WARNING('orjson is not installed; ORJSONRenderer falls back to json'))
+
+        payloads = synthetic_payloads(
+            random.Random(options['seed']), options['trips'], options['notifications']
+        )
+        renderers = {'json': JSONRenderer(), 'orjson': ORJSONRenderer()}
+
+        for name, data in payloads.items():
+            outputs = {key: renderer.render(data) for key, renderer in renderers.items()}
+            if json.loads(outputs['json']) != json.loads(outputs['orjson']):
+                self.stdout.write(self.style.ERROR(f'{name}: rendered payloads differ'))
+
+            timings = {}
+            for key, renderer in renderers.items():
+                started = time.perf_counter()
+                for _ in range(options['iterations']):
+                    renderer.render(data)
+                timings[key] = (time.perf_counter() - started) / options['iterations'] * 1000
+
+            self.stdout.write(
+                f"{name}: json {timings['json']:.3f}ms / {len(outputs['json']) / 1024:.1f} KiB, "
+                f"orjson {timings['orjson']:.3f}ms / {len(outputs['orjson']) / 1024:.1f} KiB "
+                f"({timings['json'] / timings['orjson']:.1f}x)"
+            )
@@ -0,0 +1,35 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from interactions.shares import (
+    compact_share_activity, SHARE_BUCKET_ROLLUP_AFTER, SHARE_LOG_RETENTION
+)
+
+
+class Command(BaseCommand):
+    help = 'Roll old hourly share buckets into daily buckets and purge the raw share log'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rollup-days',
+            type=int,
+            default=SHARE_BUCKET_ROLLUP_AFTER.days,
+            help='Merge hourly buckets older than this many days into daily buckets',
+        )
+        parser.add_argument(
+            '--log-retention-days',
+            type=int,
+            default=SHARE_LOG_RETENTION.days,
+            help='Delete raw share log entries older than this many days',
+        )
+
+    def handle(self, *args, **options):
+        result = compact_share_activity(
+            rollup_after=timedelta(days=options['rollup_days']),
+            log_retention=timedelta(days=options['log_retention_days'])
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Compacted {result['buckets_compacted']} hourly buckets, "
+                f"purged {result['log_entries_purged']} share log entries"
+            )
+        )
@@ -0,0 +1,67 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from interactions.outbox import OutboxRelay
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Relay interaction events from the outbox to the channel layer and other consumers'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Number of events claimed per batch',
+        )
+        parser.add_argument(
+            '--max-attempts',
+            type=int,
+            default=5,
+            help='Stop retrying an event after this many failed deliveries',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=1.0,
+            help='Seconds to sleep when the outbox is empty',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Drain the outbox once and exit',
+        )
+        parser.add_argument(
+            '--purge-days',
+            type=int,
+            default=None,
+            help='Delete processed events older than this many days before relaying',
+        )
+
+    def handle(self, *args, **options):
+        relay = OutboxRelay(
+            batch_size=options['batch_size'],
+            max_attempts=options['max_attempts']
+        )
+
+        if options['purge_days'] is not None:
+            purged = relay.purge_processed(timedelta(days=options['purge_days']))
+            self.stdout.write(f'Purged {purged} processed events')
+
+        if not options['once']:
+            self.stdout.write(self.style.SUCCESS('Starting outbox relay...'))
+            try:
+                relay.run(interval=options['interval'])
+            except KeyboardInterrupt:
+                pass
+
+        metrics = relay.drain() if options['once'] else relay.metrics()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Relayed {metrics['processed']} events in {metrics['batches']} batches "
+                f"({metrics['events_per_second']} events/s), "
+                f"failed: {metrics['failed']}, backlog: {metrics['backlog']}"
+            )
+        )
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.5 on 2026-10-19 11:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('interactions', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_type', models.CharField(choices=[('follow.created', 'Follow Created'), ('follow.deleted', 'Follow Deleted'), ('like.created', 'Like Created'), ('like.deleted', 'Like Deleted'), ('comment.created', 'Comment Created'), ('comment.deleted', 'Comment Deleted'), ('save.created', 'Save Created'), ('save.deleted', 'Save Deleted'), ('share.created', 'Share Created'), ('notification.created', 'Notification Created')], db_index=True, max_length=50)),
+                ('payload', models.JSONField(blank=True, default=dict)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Outbox Event',
+                'verbose_name_plural': 'Outbox Events',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['processed_at', 'id'], name='interaction_process_9d6a6e_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.5 on 2026-10-19 11:56
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_replies_count(apps, schema_editor):
+    Comment = apps.get_model('interactions', 'Comment')
+    counts = Comment.objects.filter(
+        parent_id=OuterRef('pk')
+    ).order_by().values('parent_id').annotate(total=Count('id')).values('total')
+    Comment.objects.update(replies_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('interactions', '0003_outboxevent_deferred'),
+        ('trip', '0003_trip_city_trip_country_trip_tourism_info'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='replies_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_replies_count, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['trip', 'parent', '-created_at'], name='interaction_trip_id_538345_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['parent', 'created_at'], name='interaction_parent__154a97_idx'),
+        ),
+    ]
@@ -0,0 +1,96 @@
+# Generated by Django 5.2.5 on 2026-10-19 12:25
+
+import datetime
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, F, Max, Min, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce, TruncHour
+
+
+def merge_shares(apps, schema_editor):
+    Share = apps.get_model('interactions', 'Share')
+    TripShareBucket = apps.get_model('interactions', 'TripShareBucket')
+    Trip = apps.get_model('trip', 'Trip')
+
+    # عدادات الساعات من الصفوف الخام قبل دمجها
+    hourly = Share.objects.annotate(
+        hour=TruncHour('created_at', tzinfo=datetime.timezone.utc)
+    ).order_by().values('trip_id', 'hour').annotate(total=Count('id'))
+    TripShareBucket.objects.bulk_create([
+        TripShareBucket(trip_id=row['trip_id'], bucket=row['hour'], count=row['total'])
+        for row in hourly
+    ], batch_size=1000)
+
+    Share.objects.update(last_shared_at=F('created_at'))
+    duplicates = Share.objects.order_by().values('user_id', 'trip_id').annotate(
+        total=Count('id'), keep_id=Min('id'), last=Max('created_at')
+    ).filter(total__gt=1)
+    for group in duplicates:
+        Share.objects.filter(id=group['keep_id']).update(
+            count=group['total'], last_shared_at=group['last']
+        )
+        Share.objects.filter(
+            user_id=group['user_id'], trip_id=group['trip_id']
+        ).exclude(id=group['keep_id']).delete()
+
+    totals = Share.objects.filter(
+        trip_id=OuterRef('pk')
+    ).order_by().values('trip_id').annotate(total=Sum('count')).values('total')
+    Trip.objects.update(shares_count=Coalesce(Subquery(totals), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('interactions', '0005_outboxevent_batch_created'),
+        ('trip', '0005_trip_shares_count'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='share',
+            name='count',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='share',
+            name='last_shared_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.CreateModel(
+            name='ShareLogEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('trip', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='trip.trip')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Share Log Entry',
+                'verbose_name_plural': 'Share Log Entries',
+            },
+        ),
+        migrations.CreateModel(
+            name='TripShareBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('trip', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='share_buckets', to='trip.trip')),
+            ],
+            options={
+                'verbose_name': 'Trip Share Bucket',
+                'verbose_name_plural': 'Trip Share Buckets',
+                'unique_together': {('trip', 'bucket')},
+            },
+        ),
+        migrations.RunPython(merge_shares, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='share',
+            unique_together={('user', 'trip')},
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 12:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('interactions', '0006_share_upsert_buckets'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='outboxevent',
+            name='event_type',
+            field=models.CharField(choices=[('follow.created', 'Follow Created'), ('follow.deleted', 'Follow Deleted'), ('like.created', 'Like Created'), ('like.deleted', 'Like Deleted'), ('comment.created', 'Comment Created'), ('comment.deleted', 'Comment Deleted'), ('save.created', 'Save Created'), ('save.deleted', 'Save Deleted'), ('share.created', 'Share Created'), ('notification.created', 'Notification Created'), ('notification.batch_created', 'Notification Batch Created'), ('notification.deferred', 'Notification Deferred'), ('trip_image.created', 'Trip Image Created')], db_index=True, max_length=50),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 from trip.models import Trip
 
 
@@ -67,6 +68,8 @@ class Comment(models.Model):
         blank=True, 
         related_name='replies'
     )
+    # عداد مخزن للردود المباشرة (يُحدث عبر signals)
+    replies_count = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -74,13 +77,17 @@ class Comment(models.Model):
         verbose_name = 'Comment'
         verbose_name_plural = 'Comments'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['trip', 'parent', '-created_at']),
+            models.Index(fields=['parent', 'created_at']),
+        ]
     
     def __str__(self):
         return f"{self.user.username} commented on {self.trip.id}"
     
     @property
     def is_reply(self):
-        return self.parent is not None
+        return self.parent_id is not None
 
 
 class Save(models.Model):
@@ -106,7 +113,7 @@ class Save(models.Model):
 
 
 class Share(models.Model):
-    """نموذج مشاركة الرحلات"""
+    """نموذج مشاركة الرحلات - صف واحد لكل (مستخدم، رحلة) مع عدد المشاركات"""
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL, 
         on_delete=models.CASCADE
@@ -116,9 +123,12 @@ class Share(models.Model):
         on_delete=models.CASCADE, 
         related_name='shares'
     )
+    count = models.PositiveIntegerField(default=1)
     created_at = models.DateTimeField(auto_now_add=True)
+    last_shared_at = models.DateTimeField(default=timezone.now)
     
     class Meta:
+        unique_together = ('user', 'trip')
         verbose_name = 'Share'
         verbose_name_plural = 'Shares'
     
@@ -126,6 +136,45 @@ class Share(models.Model):
         return f"{self.user.username} shared {self.trip.id}"
 
 
+class TripShareBucket(models.Model):
+    """عداد مشاركات الرحلة لكل ساعة (يُدمج في أيام بعد فترة)"""
+    trip = models.ForeignKey(
+        Trip,
+        on_delete=models.CASCADE,
+        related_name='share_buckets'
+    )
+    bucket = models.DateTimeField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('trip', 'bucket')
+        verbose_name = 'Trip Share Bucket'
+        verbose_name_plural = 'Trip Share Buckets'
+
+    def __str__(self):
+        return f"Trip {self.trip_id} @ {self.bucket}: {self.count}"
+
+
+class ShareLogEntry(models.Model):
+    """سجل أحداث المشاركة الخام (append-only، اختياري عبر SHARE_LOG_ENABLED)"""
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE
+    )
+    trip = models.ForeignKey(
+        Trip,
+        on_delete=models.CASCADE
+    )
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        verbose_name = 'Share Log Entry'
+        verbose_name_plural = 'Share Log Entries'
+
+    def __str__(self):
+        return f"{self.user_id} shared {self.trip_id} at {self.created_at}"
+
+
 class Notification(models.Model):
     """نموذج الإشعارات"""
     NOTIFICATION_TYPES = [
@@ -175,3 +224,42 @@ class Notification(models.Model):
     def mark_as_read(self):
         self.is_read = True
         self.save()
+
+
+class OutboxEvent(models.Model):
+    """صندوق الصادر للأحداث (Transactional Outbox) - يُكتب في نفس transaction التفاعل"""
+    EVENT_TYPES = [
+        ('follow.created', 'Follow Created'),
+        ('follow.deleted', 'Follow Deleted'),
+        ('like.created', 'Like Created'),
+        ('like.deleted', 'Like Deleted'),
+        ('comment.created', 'Comment Created'),
+        ('comment.deleted', 'Comment Deleted'),
+        ('save.created', 'Save Created'),
+        ('save.deleted', 'Save Deleted'),
+        ('share.created', 'Share Created'),
+        ('notification.created', 'Notification Created'),
+        ('notification.batch_created', 'Notification Batch Created'),
+        ('notification.deferred', 'Notification Deferred'),
+        ('trip_image.created', 'Trip Image Created'),
+    ]
+
+    event_type = models.CharField(max_length=50, choices=EVENT_TYPES, db_index=True)
+    payload = models.JSONField(default=dict, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    # مهلة حجز الـ relay للحدث أثناء تسليمه؛ بعدها يُعاد لأي relay آخر
+    claimed_until = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Outbox Event'
+        verbose_name_plural = 'Outbox Events'
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['processed_at', 'id']),
+        ]
+
+    def __str__(self):
+        return f"{self.event_type} #{self.id}"
@@ -0,0 +1,256 @@
+"""
+Transactional outbox لأحداث التفاعلات
+
+الـ views تكتب الحدث في نفس transaction صف التفاعل (Follow، الإشعارات...)،
+ثم يقوم OutboxRelay بسحب الأحداث على دفعات وتوزيعها على المستهلكين المسجلين:
+إرسال الإشعارات عبر channel layer (هنا)، ونسخ الصور (trip.image_variants)،
+وملخصات الوجهات (trip.destinations).
+
+التسليم at-least-once: الـ relay يحجز الدفعة في transaction قصير (claimed_until)
+ثم يسلمها خارجه، فلا تبقى أقفال الصفوف أثناء group_send أو مستهلك بطيء. لا
+يُعلَّم الحدث كمُعالَج إلا بعد نجاح جميع مستهلكيه، والحجز المنتهي يعيد الحدث
+لأي relay، لذلك يجب أن يكون كل مستهلك idempotent.
+
+حدث دون مستهلك لا يُعلَّم كمُعالَج، إلا أنواع RECORD_ONLY_EVENTS:
+follow.* يقرؤها رسم المتابعة (follow_graph) من الجدول مباشرة. الإعجاب والحفظ
+والتعليق والمشاركة لا تكتب أحداثاً: العدادات تُحدَّث في نفس transaction الكتابة،
+والـ feed والبحث يقرآن الجداول مباشرة.
+"""
+
+import logging
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+_consumers = defaultdict(list)
+
+RECORD_ONLY_EVENTS = frozenset({'follow.created', 'follow.deleted'})
+
+# مدة حجز الدفعة؛ relay توقف أثناء التسليم تعود أحداثه بعدها
+CLAIM_TIMEOUT = timedelta(minutes=5)
+
+
+def register_consumer(*event_types):
+    """
+    تسجيل مستهلك لنوع (أو أنواع) من الأحداث
+
+    Args:
+        *event_types (str): أنواع الأحداث، مثل 'notification.created'
+
+    المستهلك دالة تستقبل OutboxEvent وترفع استثناء عند الفشل
+    حتى يُعاد تسليم الحدث لاحقاً.
+    """
+    def decorator(func):
+        for event_type in event_types:
+            if func not in _consumers[event_type]:
+                _consumers[event_type].append(func)
+        return func
+    return decorator
+
+
+def get_consumers(event_type):
+    """الحصول على مستهلكي نوع حدث معين"""
+    return list(_consumers.get(event_type, []))
+
+
+def record_event(event_type, **payload):
+    """
+    تسجيل حدث في الـ outbox
+
+    يجب استدعاؤها داخل transaction الكتابة حتى يُحفظ الحدث مع صف
+    التفاعل أو لا يُحفظ أبداً.
+
+    Args:
+        event_type (str): نوع الحدث
+        **payload: بيانات الحدث (قيم قابلة للتحويل إلى JSON)
+
+    Returns:
+        OutboxEvent: الحدث المسجل
+    """
+    return OutboxEvent.objects.create(event_type=event_type, payload=payload)
+
+
+def record_events(event_type, payloads):
+    """
+    تسجيل مجموعة أحداث من نفس النوع في INSERT واحد
+
+    Args:
+        event_type (str): نوع الأحداث
+        payloads (list[dict]): بيانات كل حدث
+
+    Returns:
+        list: الأحداث المسجلة
+    """
+    return OutboxEvent.objects.bulk_create([
+        OutboxEvent(event_type=event_type, payload=payload) for payload in payloads
+    ])
+
+
+class OutboxRelay:
+    """سحب أحداث الـ outbox على دفعات وتوزيعها على المستهلكين"""
+
+    def __init__(self, batch_size=100, max_attempts=5):
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.batches = 0
+        self.processed = 0
+        self.failed = 0
+        self.started_at = time.monotonic()
+
+    def pending(self):
+        """الأحداث التي لم تُعالج ولم تتجاوز الحد الأقصى للمحاولات ولا يحجزها relay آخر"""
+        return OutboxEvent.objects.filter(
+            Q(claimed_until__isnull=True) | Q(claimed_until__lt=timezone.now()),
+            processed_at__isnull=True,
+            attempts__lt=self.max_attempts
+        ).order_by('id')
+
+    def claim(self, after_id=0):
+        """
+        حجز الدفعة التالية لـ after_id في transaction قصير
+
+        Returns:
+            list: الأحداث المحجوزة لهذا الـ relay حتى CLAIM_TIMEOUT
+        """
+        with transaction.atomic():
+            events = list(
+                self.pending().filter(id__gt=after_id)
+                .select_for_update(skip_locked=True)[:self.batch_size]
+            )
+            if events:
+                OutboxEvent.objects.filter(id__in=[event.id for event in events]).update(
+                    claimed_until=timezone.now() + CLAIM_TIMEOUT
+                )
+        return events
+
+    def dispatch(self, event):
+        """
+        تسليم حدث واحد لجميع مستهلكيه
+
+        Raises:
+            LookupError: لا يوجد مستهلك لنوع ليس في RECORD_ONLY_EVENTS، فيبقى
+                الحدث غير مُعالَج حتى يُسجل مستهلكه (أو تنتهي محاولاته)
+        """
+        consumers = get_consumers(event.event_type)
+        if not consumers and event.event_type not in RECORD_ONLY_EVENTS:
+            raise LookupError(f"No consumer registered for {event.event_type}")
+        for consumer in consumers:
+            consumer(event)
+
+    def drain_batch(self, after_id=0):
+        """
+        معالجة دفعة واحدة من الأحداث التالية لـ after_id
+
+        Args:
+            after_id (int): آخر معرف تمت معالجته في هذه الجولة
+
+        Returns:
+            int | None: آخر معرف في الدفعة، أو None إذا لم توجد أحداث
+        """
+        events = self.claim(after_id)
+        if not events:
+            return None
+
+        delivered = []
+        failed = []
+        for event in events:
+            try:
+                # transaction لكل حدث حتى لا يُفسد فشل مستهلك واحد الدفعة كلها
+                with transaction.atomic():
+                    self.dispatch(event)
+                delivered.append(event.id)
+            except Exception as e:
+                event.attempts += 1
+                event.last_error = str(e)
+                event.claimed_until = None
+                failed.append(event)
+                logger.error(f"Outbox event {event.id} ({event.event_type}) failed: {str(e)}")
+
+        if delivered:
+            OutboxEvent.objects.filter(id__in=delivered).update(
+                processed_at=timezone.now(),
+                attempts=F('attempts') + 1,
+                claimed_until=None
+            )
+        if failed:
+            OutboxEvent.objects.bulk_update(failed, ['attempts', 'last_error', 'claimed_until'])
+
+        self.batches += 1
+        self.processed += len(delivered)
+        self.failed += len(failed)
+        return events[-1].id
+
+    def drain(self, max_batches=None):
+        """
+        جولة واحدة على الـ outbox حتى نهايته (أو الوصول لعدد الدفعات المحدد)
+
+        الأحداث الفاشلة في هذه الجولة تُعاد في الجولة التالية.
+
+        Returns:
+            dict: مقاييس الأداء
+        """
+        batches = 0
+        cursor = 0
+        while max_batches is None or batches < max_batches:
+            cursor = self.drain_batch(after_id=cursor)
+            if cursor is None:
+                break
+            batches += 1
+        return self.metrics()
+
+    def run(self, interval=1.0, report_every=60.0):
+        """تشغيل الـ relay بشكل مستمر مع تقرير دوري عن الإنتاجية"""
+        last_report = time.monotonic()
+        cursor = 0
+        while True:
+            cursor = self.drain_batch(after_id=cursor)
+            if cursor is None:
+                # نهاية الجولة: الانتظار ثم البدء من جديد لإعادة محاولة الفاشل
+                cursor = 0
+                time.sleep(interval)
+
+            if time.monotonic() - last_report >= report_every:
+                logger.info(f"Outbox relay metrics: {self.metrics()}")
+                last_report = time.monotonic()
+
+    def metrics(self):
+        """مقاييس الإنتاجية منذ بدء تشغيل الـ relay"""
+        elapsed = max(time.monotonic() - self.started_at, 1e-6)
+        return {
+            'batches': self.batches,
+            'processed': self.processed,
+            'failed': self.failed,
+            'elapsed_seconds': round(elapsed, 3),
+            'events_per_second': round(self.processed / elapsed, 2),
+            'backlog': self.pending().count(),
+        }
+
+    @staticmethod
+    def purge_processed(older_than=timedelta(days=7)):
+        """حذف الأحداث المعالجة الأقدم من المدة المحددة"""
+        deleted, _ = OutboxEvent.objects.filter(
+            processed_at__lt=timezone.now() - older_than
+        ).delete()
+        return deleted
+
+
+@register_consumer('notification.created')
+def deliver_notification(event):
+    """إرسال الإشعار عبر channel layer"""
+    from .utils import push_notification
+    push_notification(event.payload['notification_id'])
+
+
+@register_consumer('notification.batch_created')
+def deliver_notification_batch(event):
+    """إرسال دفعة إشعارات (fan-out) عبر channel layer"""
+    from .utils import push_notifications
+    push_notifications(event.payload['notification_ids'])
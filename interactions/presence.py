@@ -0,0 +1,116 @@
+"""
+سجل حضور مستخدمي WebSocket
+
+كل اتصال مفتوح يُسجَّل في الـ cache تحت مفتاح المستخدم مع آخر تجديد،
+والاتصالات التي لم تُجدَّد خلال PRESENCE_TTL تُعتبر منقطعة. الـ consumer
+يجدد حضوره كل PRESENCE_REFRESH ثانية من جهة الخادم، فلا يعتمد على heartbeat
+العميل، واتصال عملية توقفت ينتهي وحده. تعديلات القاموس تمر بقفل لكل مستخدم
+حتى لا تكتب عدة أجهزة تتصل معاً فوق بعضها.
+يُستخدم لتجنب group_send للمستخدمين غير المتصلين.
+"""
+
+import logging
+import time
+from django.conf import settings
+from django.core.cache import cache
+from .locks import cache_lock
+
+logger = logging.getLogger(__name__)
+
+PRESENCE_TTL = 90  # ثانية
+PRESENCE_REFRESH = 30  # ثانية - تجديد الـ consumer لحضوره
+PRESENCE_LOCK_TIMEOUT = 5
+PRESENCE_LOCK_WAIT = 2
+
+DELIVERY_STATS = ('sent', 'skipped', 'deferred')
+
+
+def _presence_key(user_id):
+    return f"presence:{user_id}"
+
+
+def _live_channels(channels, now):
+    return {name: seen for name, seen in channels.items() if now - seen < PRESENCE_TTL}
+
+
+def _update_channels(user_id, update):
+    """
+    تعديل قاموس قنوات المستخدم تحت القفل
+
+    Args:
+        update: دالة تعدل القاموس (بعد حذف المنتهي منه) في مكانه
+
+    Returns:
+        bool: False إذا لم يُؤخذ القفل خلال PRESENCE_LOCK_WAIT
+    """
+    key = _presence_key(user_id)
+    with cache_lock(f"{key}:lock", PRESENCE_LOCK_TIMEOUT, PRESENCE_LOCK_WAIT) as locked:
+        if not locked:
+            return False
+        channels = _live_channels(cache.get(key) or {}, time.time())
+        update(channels)
+        if channels:
+            cache.set(key, channels, PRESENCE_TTL)
+        else:
+            cache.delete(key)
+    return True
+
+
+def mark_online(user_id, channel_name):
+    """
+    تسجيل اتصال مفتوح للمستخدم (يُستدعى عند الاتصال ومع كل تجديد)
+
+    Args:
+        user_id (int): معرف المستخدم
+        channel_name (str): اسم قناة الاتصال
+    """
+    if not _update_channels(user_id, lambda channels: channels.update({channel_name: time.time()})):
+        # التجديد التالي يعيد المحاولة خلال PRESENCE_REFRESH
+        logger.warning(f"Presence for user {user_id} is busy, {channel_name} not refreshed")
+
+
+def mark_offline(user_id, channel_name):
+    """إزالة اتصال المستخدم عند قطعه"""
+    if not _update_channels(user_id, lambda channels: channels.pop(channel_name, None)):
+        # القناة تنتهي وحدها بعد PRESENCE_TTL
+        logger.warning(f"Presence for user {user_id} is busy, {channel_name} left to expire")
+
+
+def is_user_online(user_id):
+    """
+    هل للمستخدم اتصال WebSocket مفتوح؟
+
+    عند تعطيل PRESENCE_TRACKING (cache غير مشترك بين العمليات) يُعتبر
+    جميع المستخدمين متصلين حتى لا تضيع الإشعارات.
+    """
+    if not getattr(settings, 'PRESENCE_TRACKING', False):
+        return True
+    return bool(_live_channels(cache.get(_presence_key(user_id)) or {}, time.time()))
+
+
+def record_delivery(outcome):
+    """
+    زيادة عداد نتيجة الإرسال
+
+    Args:
+        outcome (str): 'sent' أو 'skipped' أو 'deferred'
+    """
+    key = f"notification_delivery:{outcome}"
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # انتهت صلاحية المفتاح بين add و incr
+        cache.set(key, 1, None)
+
+
+def get_delivery_stats():
+    """إحصائيات الإرسال: المرسل، والمتجنب للمستخدمين غير المتصلين، والمؤجل لإعادة الإرسال عند الاتصال"""
+    values = cache.get_many([f"notification_delivery:{outcome}" for outcome in DELIVERY_STATS])
+    stats = {
+        outcome: values.get(f"notification_delivery:{outcome}", 0)
+        for outcome in DELIVERY_STATS
+    }
+    attempted = stats['sent'] + stats['skipped']
+    stats['skipped_ratio'] = round(stats['skipped'] / attempted, 3) if attempted else 0.0
+    return stats
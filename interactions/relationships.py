@@ -0,0 +1,142 @@
+"""
+علاقات المستخدم الحالي (viewer) مع المستخدمين والرحلات في الصفحة
+
+بدلاً من استعلام EXISTS لكل عنصر لمعرفة is_following / is_liked / is_saved،
+تُحمّل العلاقات لجميع معرفات الصفحة باستعلام IN واحد لكل علاقة.
+
+الاستخدام في serializer:
+    class Meta:
+        list_serializer_class = RelationshipListSerializer
+
+    def prime_relationships(self, items):
+        get_viewer_relationships(self.context).prime_users([i.user_id for i in items])
+
+    def get_is_following(self, obj):
+        return get_viewer_relationships(self.context).is_following(obj.user_id)
+
+وبنفس الطريقة يحمّل TripCounters عدد التعليقات لجميع رحلات الصفحة
+باستعلام GROUP BY واحد (الإعجاب والحفظ والمشاركة مخزنة في Trip).
+"""
+
+from django.db import models
+from rest_framework import serializers
+
+from .models import Follow, Like, Comment, Save
+
+
+class ViewerRelationships:
+    """علاقات المستخدم الحالي محملة دفعة واحدة ومحفوظة طوال الطلب"""
+
+    def __init__(self, viewer):
+        self.viewer = viewer if viewer is not None and viewer.is_authenticated else None
+        self._following = {}
+        self._liked = {}
+        self._saved = {}
+
+    def _load(self, known, ids, fetch):
+        missing = {i for i in ids if i is not None and i not in known}
+        if not missing:
+            return
+        found = set(fetch(missing)) if self.viewer is not None else set()
+        for i in missing:
+            known[i] = i in found
+
+    def prime_users(self, user_ids):
+        """تحميل علاقات المتابعة لمجموعة مستخدمين في استعلام واحد"""
+        self._load(
+            self._following,
+            user_ids,
+            lambda ids: Follow.objects.filter(
+                follower=self.viewer, following_id__in=ids
+            ).values_list('following_id', flat=True)
+        )
+
+    def prime_trips(self, trip_ids):
+        """تحميل الإعجابات والحفظ لمجموعة رحلات (استعلام واحد لكل علاقة)"""
+        self._load(
+            self._liked,
+            trip_ids,
+            lambda ids: Like.objects.filter(
+                user=self.viewer, trip_id__in=ids
+            ).values_list('trip_id', flat=True)
+        )
+        self._load(
+            self._saved,
+            trip_ids,
+            lambda ids: Save.objects.filter(
+                user=self.viewer, trip_id__in=ids
+            ).values_list('trip_id', flat=True)
+        )
+
+    def is_following(self, user_id):
+        self.prime_users([user_id])
+        return self._following[user_id]
+
+    def is_liked(self, trip_id):
+        self.prime_trips([trip_id])
+        return self._liked[trip_id]
+
+    def is_saved(self, trip_id):
+        self.prime_trips([trip_id])
+        return self._saved[trip_id]
+
+
+def get_viewer_relationships(context):
+    """
+    الحصول على ViewerRelationships المشترك من context الـ serializer
+
+    يُنشأ مرة واحدة لكل طلب ويُشارك بين جميع الـ serializers المتداخلة.
+    """
+    relationships = context.get('viewer_relationships')
+    if relationships is None:
+        request = context.get('request')
+        relationships = ViewerRelationships(request.user if request else None)
+        context['viewer_relationships'] = relationships
+    return relationships
+
+
+class TripCounters:
+    """عدادات تفاعلات الرحلات محملة دفعة واحدة ومحفوظة طوال الطلب"""
+
+    RELATIONS = {
+        'comments_count': Comment,
+    }
+
+    def __init__(self):
+        self._counts = {}
+
+    def prime(self, trip_ids):
+        """تحميل عدادات مجموعة رحلات (استعلام GROUP BY واحد لكل علاقة)"""
+        missing = {i for i in trip_ids if i is not None and i not in self._counts}
+        if not missing:
+            return
+        counts = {i: dict.fromkeys(self.RELATIONS, 0) for i in missing}
+        for field, model in self.RELATIONS.items():
+            rows = model.objects.filter(
+                trip_id__in=missing
+            ).order_by().values('trip_id').annotate(total=models.Count('id'))
+            for row in rows:
+                counts[row['trip_id']][field] = row['total']
+        self._counts.update(counts)
+
+    def get(self, trip_id):
+        self.prime([trip_id])
+        return self._counts[trip_id]
+
+
+def get_trip_counters(context):
+    """الحصول على TripCounters المشترك من context الـ serializer"""
+    counters = context.get('trip_counters')
+    if counters is None:
+        counters = TripCounters()
+        context['trip_counters'] = counters
+    return counters
+
+
+class RelationshipListSerializer(serializers.ListSerializer):
+    """ListSerializer يحمّل علاقات جميع عناصر الصفحة قبل تسلسلها"""
+
+    def to_representation(self, data):
+        items = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        self.child.prime_relationships(items)
+        return super().to_representation(items)
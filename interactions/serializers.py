@@ -1,11 +1,64 @@
+from datetime import timedelta
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.db.models import CharField, OuterRef, Subquery
+from django.utils import timezone
 from .models import Follow, Like, Comment, Save, Share, Notification
-from trip.models import Trip
+from trip.models import Trip, TripImage
+from trip.serializers import TripSerializer
 from accounts.serializers import UserSerializer
+from .relationships import (
+    RelationshipListSerializer, get_viewer_relationships, get_trip_counters
+)
 
 User = get_user_model()
 
+NOTIFICATION_MESSAGES = {
+    'like': "{sender} أعجب برحلتك",
+    'comment': "{sender} علق على رحلتك",
+    'follow': "{sender} بدأ متابعتك",
+    'share': "{sender} شارك رحلتك",
+}
+
+
+def build_notification_message(notification_type, sender_name):
+    """إنشاء رسالة الإشعار"""
+    template = NOTIFICATION_MESSAGES.get(notification_type)
+    if template is None:
+        return "إشعار جديد"
+    return template.format(sender=sender_name or "مستخدم")
+
+
+def truncate_comment(content):
+    """اختصار محتوى التعليق إلى 100 حرف"""
+    return content[:100] + "..." if len(content) > 100 else content
+
+
+def notification_payload(notification):
+    """
+    تمثيل خفيف للإشعار يُرسل عبر WebSocket
+
+    لا ينفذ أي استعلامات إضافية إذا تم تحميل sender و comment
+    عبر select_related.
+    """
+    sender = notification.sender
+    comment = notification.comment
+    return {
+        'id': notification.id,
+        'notification_type': notification.notification_type,
+        'sender': {'id': sender.id, 'username': sender.username} if sender else None,
+        'trip': notification.trip_id,
+        'comment': notification.comment_id,
+        'comment_content': truncate_comment(comment.content) if comment else None,
+        'notification_message': build_notification_message(
+            notification.notification_type,
+            sender.username if sender else None
+        ),
+        'is_read': notification.is_read,
+        'created_at': notification.created_at.isoformat(),
+    }
+
 
 class FollowSerializer(serializers.ModelSerializer):
     follower = UserSerializer(read_only=True)
@@ -25,21 +78,37 @@ class LikeSerializer(serializers.ModelSerializer):
         model = Like
         fields = ['id', 'user', 'trip', 'created_at', 'is_following']
         read_only_fields = ['id', 'user', 'created_at']
+        list_serializer_class = RelationshipListSerializer
+
+    def prime_relationships(self, likes):
+        get_viewer_relationships(self.context).prime_users([like.user_id for like in likes])
 
     def get_is_following(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return Follow.objects.filter(
-                follower=request.user,
-                following=obj.user
-            ).exists()
-        return False
+        return get_viewer_relationships(self.context).is_following(obj.user_id)
+
+
+class CommentReplySerializer(serializers.ModelSerializer):
+    """رد مختصر بدون ردود متداخلة (العمق محدود بمستوى واحد)"""
+    user = UserSerializer(read_only=True)
+
+    class Meta:
+        model = Comment
+        fields = [
+            'id', 'user', 'trip', 'content', 'parent',
+            'created_at', 'updated_at', 'is_reply', 'replies_count'
+        ]
+        read_only_fields = fields
 
 
 class CommentSerializer(serializers.ModelSerializer):
+    """
+    تعليق مع أول الردود المباشرة
+
+    الردود تُمرر مسبقاً عبر context['reply_previews'] (dict: parent_id -> replies)
+    بدلاً من استعلام لكل تعليق، والباقي متاح من endpoint الردود.
+    """
     user = UserSerializer(read_only=True)
     replies = serializers.SerializerMethodField()
-    replies_count = serializers.SerializerMethodField()
     
     class Meta:
         model = Comment
@@ -48,15 +117,11 @@ class CommentSerializer(serializers.ModelSerializer):
             'created_at', 'updated_at', 'is_reply', 
             'replies', 'replies_count'
         ]
-        read_only_fields = ['id', 'user', 'created_at', 'updated_at', 'is_reply']
+        read_only_fields = ['id', 'user', 'created_at', 'updated_at', 'is_reply', 'replies_count']
     
     def get_replies(self, obj):
-        if obj.replies.exists():
-            return CommentSerializer(obj.replies.all(), many=True, context=self.context).data
-        return []
-    
-    def get_replies_count(self, obj):
-        return obj.replies.count()
+        replies = self.context.get('reply_previews', {}).get(obj.id, [])
+        return CommentReplySerializer(replies, many=True, context=self.context).data
 
 
 class SaveSerializer(serializers.ModelSerializer):
@@ -73,13 +138,19 @@ class ShareSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Share
-        fields = ['id', 'user', 'trip', 'created_at']
-        read_only_fields = ['id', 'user', 'created_at']
+        fields = ['id', 'user', 'trip', 'count', 'created_at', 'last_shared_at']
+        read_only_fields = ['id', 'user', 'count', 'created_at', 'last_shared_at']
 
 
 class NotificationSerializer(serializers.ModelSerializer):
-    sender = UserSerializer(read_only=True)
-    recipient = UserSerializer(read_only=True)
+    """
+    تمثيل مختصر للإشعار في قوائم الإشعارات
+
+    يجب تمرير الـ queryset عبر setup_eager_loading حتى يبقى عدد الاستعلامات
+    ثابتاً مهما كان حجم الصفحة (المرسل والرحلة والتعليق عبر JOIN،
+    وأول صورة للرحلة عبر subquery).
+    """
+    sender = serializers.SerializerMethodField()
     trip_title = serializers.SerializerMethodField()
     trip_image = serializers.SerializerMethodField()
     comment_content = serializers.SerializerMethodField()
@@ -89,51 +160,69 @@ class NotificationSerializer(serializers.ModelSerializer):
     class Meta:
         model = Notification
         fields = [
-            'id', 'recipient', 'sender', 'notification_type',
+            'id', 'sender', 'notification_type',
             'trip', 'comment', 'is_read', 'created_at',
             'trip_title', 'trip_image', 'comment_content',
             'notification_message', 'time_ago'
         ]
         read_only_fields = ['id', 'sender', 'created_at']
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """تحميل كل ما يحتاجه الـ serializer في استعلام واحد"""
+        first_image = TripImage.objects.filter(
+            trip_id=OuterRef('trip_id')
+        ).order_by('id')
+        return queryset.select_related('sender', 'trip', 'comment').annotate(
+            first_trip_image=Subquery(first_image.values('image')[:1]),
+            first_trip_thumbnail=Subquery(
+                first_image.values('variants__thumb__jpeg')[:1], output_field=CharField()
+            )
+        )
+
+    def get_sender(self, obj):
+        """بيانات المرسل المختصرة"""
+        sender = obj.sender
+        return {
+            'id': sender.id,
+            'username': sender.username,
+            'has_verified_badge': sender.has_verified_badge,
+        }
+
     def get_trip_title(self, obj):
         """الحصول على عنوان الرحلة"""
         if obj.trip:
-            return obj.trip.title
+            return obj.trip.caption or obj.trip.location
         return None
 
     def get_trip_image(self, obj):
         """الحصول على صورة الرحلة"""
-        if obj.trip and obj.trip.images.exists():
-            first_image = obj.trip.images.first()
-            if first_image and first_image.image:
-                return first_image.image.url
-        return None
+        if not obj.trip_id:
+            return None
+        # النسخة المصغرة إن وُلدت، وإلا الأصل
+        if hasattr(obj, 'first_trip_image'):
+            path = obj.first_trip_thumbnail or obj.first_trip_image
+        else:
+            first_image = obj.trip.images.order_by('id').first()
+            if first_image is None:
+                return None
+            thumb = first_image.variants.get('thumb')
+            path = thumb['jpeg'] if thumb else first_image.image.name
+        return default_storage.url(path) if path else None
 
     def get_comment_content(self, obj):
         """الحصول على محتوى التعليق"""
         if obj.comment:
-            return obj.comment.content[:100] + "..." if len(obj.comment.content) > 100 else obj.comment.content
+            return truncate_comment(obj.comment.content)
         return None
 
     def get_notification_message(self, obj):
         """إنشاء رسالة الإشعار"""
-        sender_name = obj.sender.username if obj.sender else "مستخدم"
-
-        messages = {
-            'like': f"{sender_name} أعجب برحلتك",
-            'comment': f"{sender_name} علق على رحلتك",
-            'follow': f"{sender_name} بدأ متابعتك",
-            'share': f"{sender_name} شارك رحلتك"
-        }
-
-        return messages.get(obj.notification_type, "إشعار جديد")
+        sender_name = obj.sender.username if obj.sender else None
+        return build_notification_message(obj.notification_type, sender_name)
 
     def get_time_ago(self, obj):
         """حساب الوقت المنقضي منذ الإشعار"""
-        from django.utils import timezone
-        from datetime import timedelta
-
         now = timezone.now()
         diff = now - obj.created_at
 
@@ -152,6 +241,15 @@ class NotificationSerializer(serializers.ModelSerializer):
             return obj.created_at.strftime("%Y-%m-%d")
 
 
+class UserSummarySerializer(serializers.ModelSerializer):
+    """تمثيل مختصر للمستخدم في الاقتراحات والمتابعين المشتركين"""
+    has_verified_badge = serializers.ReadOnlyField()
+
+    class Meta:
+        model = User
+        fields = ['id', 'username', 'has_verified_badge']
+
+
 # Serializers للإحصائيات
 class UserStatsSerializer(serializers.Serializer):
     followers_count = serializers.IntegerField()
@@ -168,3 +266,38 @@ class TripStatsSerializer(serializers.Serializer):
     is_liked = serializers.BooleanField()
     is_saved = serializers.BooleanField()
 
+
+
+class FeedTripSerializer(TripSerializer):
+    """
+    رحلة في قوائم الخلاصة مع العدادات وحالة المستخدم الحالي
+
+    يغني عن استدعاء trip_stats لكل رحلة: عدادات الإعجاب والحفظ والمشاركة
+    مخزنة في الرحلة، وعدد التعليقات مع is_liked / is_saved يُحمّل لجميع
+    رحلات الصفحة دفعة واحدة.
+    """
+    comments_count = serializers.SerializerMethodField()
+    is_liked = serializers.SerializerMethodField()
+    is_saved = serializers.SerializerMethodField()
+
+    class Meta(TripSerializer.Meta):
+        fields = TripSerializer.Meta.fields + [
+            'likes_count', 'comments_count', 'saves_count', 'shares_count',
+            'is_liked', 'is_saved',
+        ]
+        read_only_fields = ['likes_count', 'saves_count', 'shares_count']
+        list_serializer_class = RelationshipListSerializer
+
+    def prime_relationships(self, trips):
+        trip_ids = [trip.id for trip in trips]
+        get_viewer_relationships(self.context).prime_trips(trip_ids)
+        get_trip_counters(self.context).prime(trip_ids)
+
+    def get_comments_count(self, obj):
+        return get_trip_counters(self.context).get(obj.id)['comments_count']
+
+    def get_is_liked(self, obj):
+        return get_viewer_relationships(self.context).is_liked(obj.id)
+
+    def get_is_saved(self, obj):
+        return get_viewer_relationships(self.context).is_saved(obj.id)
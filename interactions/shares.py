@@ -0,0 +1,161 @@
+"""
+تتبع المشاركات بعدادات مخزنة بدلاً من صف لكل نقرة
+
+كل مشاركة تحدّث ثلاثة أماكن في نفس الـ transaction بجمل upsert واحدة:
+- Share: صف واحد لكل (مستخدم، رحلة) مع عدد مشاركاته
+- Trip.shares_count: الإجمالي المقروء في O(1)
+- TripShareBucket: عداد الساعة الحالية للرحلة (للإحصائيات الزمنية)
+
+وعند تفعيل SHARE_LOG_ENABLED يُضاف الحدث الخام إلى ShareLogEntry.
+compact_share_activity تدمج عدادات الساعات القديمة في أيام وتحذف
+السجل الخام بعد مدة الاحتفاظ.
+"""
+
+import datetime
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.db.models.functions import TruncDay
+from django.utils import timezone
+
+from trip.models import Trip
+from trip.read_model import invalidate_trip
+from .models import Share, TripShareBucket, ShareLogEntry
+from .utils import create_and_send_notifications
+
+SHARE_BUCKET_ROLLUP_AFTER = timedelta(days=7)  # تُدمج الساعات الأقدم في أيام
+SHARE_LOG_RETENTION = timedelta(days=30)
+
+
+def bucket_start(moment):
+    """بداية ساعة العداد (UTC) التي تقع فيها اللحظة"""
+    return moment.astimezone(datetime.timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def _db_datetime(model, field_name, value):
+    """القيمة بصيغة التخزين التي يكتبها الـ ORM (SQLite يخزن التاريخ نصاً)"""
+    return model._meta.get_field(field_name).get_db_prep_save(value, connection)
+
+
+def _execute(sql, params):
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchone()
+
+
+def record_share(user, trip_id):
+    """
+    تسجيل مشاركة رحلة
+
+    Args:
+        user (User): المستخدم المشارك
+        trip_id (int): معرف الرحلة
+
+    Returns:
+        tuple: (عدد مشاركات المستخدم لهذه الرحلة، إجمالي مشاركات الرحلة)
+
+    Raises:
+        Trip.DoesNotExist: إذا لم تكن الرحلة موجودة
+    """
+    qn = connection.ops.quote_name
+    now = timezone.now()
+    share_table = qn(Share._meta.db_table)
+    bucket_table = qn(TripShareBucket._meta.db_table)
+    trip_table = qn(Trip._meta.db_table)
+
+    with transaction.atomic():
+        (user_count,) = _execute(
+            f"INSERT INTO {share_table} (user_id, trip_id, count, created_at, last_shared_at) "
+            f"VALUES (%s, %s, 1, %s, %s) ON CONFLICT (user_id, trip_id) DO UPDATE "
+            f"SET count = {share_table}.count + 1, last_shared_at = excluded.last_shared_at "
+            f"RETURNING count",
+            [user.id, trip_id, _db_datetime(Share, 'created_at', now), _db_datetime(Share, 'last_shared_at', now)]
+        )
+        row = _execute(
+            f"UPDATE {trip_table} SET shares_count = shares_count + 1 "
+            f"WHERE id = %s RETURNING shares_count, user_id",
+            [trip_id]
+        )
+        if row is None:
+            # يُلغي الـ INSERT المؤجل التحقق من المفتاح الأجنبي
+            raise Trip.DoesNotExist(f"Trip {trip_id} not found")
+        trip_count, owner_id = row
+
+        _execute(
+            f"INSERT INTO {bucket_table} (trip_id, bucket, count) VALUES (%s, %s, 1) "
+            f"ON CONFLICT (trip_id, bucket) DO UPDATE SET count = {bucket_table}.count + 1 "
+            f"RETURNING count",
+            [trip_id, _db_datetime(TripShareBucket, 'bucket', bucket_start(now))]
+        )
+        if getattr(settings, 'SHARE_LOG_ENABLED', False):
+            ShareLogEntry.objects.create(user=user, trip_id=trip_id, created_at=now)
+
+        invalidate_trip(trip_id)
+        # إشعار صاحب الرحلة عند أول مشاركة فقط من هذا المستخدم
+        if user_count == 1 and owner_id != user.id:
+            create_and_send_notifications(
+                sender=user,
+                notification_type='share',
+                recipient_ids=[owner_id],
+                trip_id=trip_id
+            )
+    return user_count, trip_count
+
+
+def get_share_stats(trip, days=7):
+    """
+    إحصائيات مشاركة الرحلة
+
+    Args:
+        trip (Trip): الرحلة
+        days (int): عدد الأيام في السلسلة الزمنية
+
+    Returns:
+        dict: الإجمالي (من العداد المخزن) وعدادات الفترة
+    """
+    since = bucket_start(timezone.now() - timedelta(days=days))
+    buckets = list(
+        TripShareBucket.objects.filter(
+            trip=trip, bucket__gte=since
+        ).order_by('bucket').values('bucket', 'count')
+    )
+    return {
+        'shares_count': trip.shares_count,
+        'window_days': days,
+        'window_count': sum(bucket['count'] for bucket in buckets),
+        'buckets': buckets,
+    }
+
+
+def compact_share_activity(rollup_after=SHARE_BUCKET_ROLLUP_AFTER, log_retention=SHARE_LOG_RETENTION, now=None):
+    """
+    دمج عدادات الساعات القديمة في عداد يومي وحذف السجل الخام القديم
+
+    آمنة لإعادة التشغيل: اليوم المدموج يبقى صفاً واحداً عند بدايته.
+
+    Returns:
+        dict: عدد صفوف الساعات المدموجة وعدد أحداث السجل المحذوفة
+    """
+    now = now or timezone.now()
+    cutoff = bucket_start(now - rollup_after).replace(hour=0)
+
+    with transaction.atomic():
+        old = TripShareBucket.objects.filter(bucket__lt=cutoff)
+        days = list(
+            old.annotate(
+                day=TruncDay('bucket', tzinfo=datetime.timezone.utc)
+            ).order_by().values('trip_id', 'day').annotate(total=Sum('count'))
+        )
+        compacted, _ = old.delete()
+        TripShareBucket.objects.bulk_create([
+            TripShareBucket(trip_id=day['trip_id'], bucket=day['day'], count=day['total'])
+            for day in days
+        ], batch_size=1000)
+
+    purged, _ = ShareLogEntry.objects.filter(created_at__lt=now - log_retention).delete()
+    return {
+        'buckets_compacted': compacted - len(days),
+        'log_entries_purged': purged,
+    }
@@ -1,8 +1,12 @@
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
+from django.db.models import F
+from Rahala.conditional import bump_version
+from trip.models import Trip
+from trip.read_model import invalidate_trip
 from .models import Follow, Like, Comment, Save, Share, Notification
-from .utils import create_and_send_notification
+from .utils import create_and_send_notification, invalidate_socket_user
 
 User = get_user_model()
 
@@ -60,23 +64,20 @@ def create_comment_notification(sender, instance, created, **kwargs):
         )
 
 
-@receiver(post_save, sender=Share)
-def create_share_notification(sender, instance, created, **kwargs):
-    """إنشاء إشعار عند المشاركة وإرساله فوراً"""
-    if created and instance.trip.user != instance.user:
-        create_and_send_notification(
-            recipient=instance.trip.user,
-            sender=instance.user,
-            notification_type='share',
-            trip=instance.trip
+@receiver(post_save, sender=Comment)
+def increment_replies_count(sender, instance, created, **kwargs):
+    """زيادة عداد ردود التعليق الأب"""
+    if created and instance.parent_id:
+        Comment.objects.filter(id=instance.parent_id).update(
+            replies_count=F('replies_count') + 1
         )
 
 
 @receiver(post_save, sender=Share)
 def create_share_notification(sender, instance, created, **kwargs):
-    """إنشاء إشعار عند المشاركة"""
+    """إنشاء إشعار عند المشاركة وإرساله فوراً"""
     if created and instance.trip.user != instance.user:
-        Notification.objects.get_or_create(
+        create_and_send_notification(
             recipient=instance.trip.user,
             sender=instance.user,
             notification_type='share',
@@ -88,8 +89,8 @@ def create_share_notification(sender, instance, created, **kwargs):
 def delete_follow_notification(sender, instance, **kwargs):
     """حذف إشعار المتابعة عند إلغاء المتابعة"""
     Notification.objects.filter(
-        recipient=instance.following,
-        sender=instance.follower,
+        recipient_id=instance.following_id,
+        sender_id=instance.follower_id,
         notification_type='follow'
     ).delete()
 
@@ -116,3 +117,88 @@ def delete_comment_notification(sender, instance, **kwargs):
         comment=instance
     ).delete()
 
+
+
+@receiver(post_delete, sender=Comment)
+def decrement_replies_count(sender, instance, **kwargs):
+    """إنقاص عداد ردود التعليق الأب"""
+    if instance.parent_id:
+        Comment.objects.filter(id=instance.parent_id, replies_count__gt=0).update(
+            replies_count=F('replies_count') - 1
+        )
+
+
+# العدادات المخزنة في الرحلة لمسارات ORM (InteractionToggle و record_share يحدّثانها بنفسيهما)
+@receiver(post_save, sender=Like)
+def increment_likes_count(sender, instance, created, **kwargs):
+    """زيادة عداد إعجابات الرحلة"""
+    if created:
+        Trip.objects.filter(id=instance.trip_id).update(likes_count=F('likes_count') + 1)
+
+
+@receiver(post_delete, sender=Like)
+def decrement_likes_count(sender, instance, **kwargs):
+    """إنقاص عداد إعجابات الرحلة"""
+    Trip.objects.filter(id=instance.trip_id, likes_count__gt=0).update(
+        likes_count=F('likes_count') - 1
+    )
+
+
+@receiver(post_save, sender=Save)
+def increment_saves_count(sender, instance, created, **kwargs):
+    """زيادة عداد حفظ الرحلة"""
+    if created:
+        Trip.objects.filter(id=instance.trip_id).update(saves_count=F('saves_count') + 1)
+
+
+@receiver(post_delete, sender=Save)
+def decrement_saves_count(sender, instance, **kwargs):
+    """إنقاص عداد حفظ الرحلة"""
+    Trip.objects.filter(id=instance.trip_id, saves_count__gt=0).update(
+        saves_count=F('saves_count') - 1
+    )
+
+
+@receiver(post_save, sender=Share)
+def increment_shares_count(sender, instance, created, **kwargs):
+    """زيادة عداد مشاركات الرحلة"""
+    if created:
+        Trip.objects.filter(id=instance.trip_id).update(
+            shares_count=F('shares_count') + instance.count
+        )
+
+
+@receiver(post_delete, sender=Share)
+def decrement_shares_count(sender, instance, **kwargs):
+    """إنقاص عداد مشاركات الرحلة"""
+    Trip.objects.filter(id=instance.trip_id, shares_count__gte=instance.count).update(
+        shares_count=F('shares_count') - instance.count
+    )
+
+
+# مستند تفاصيل الرحلة المخزن (InteractionToggle و record_share يبطلانه بنفسيهما)
+@receiver(post_save, sender=Like)
+@receiver(post_delete, sender=Like)
+@receiver(post_save, sender=Save)
+@receiver(post_delete, sender=Save)
+@receiver(post_save, sender=Share)
+@receiver(post_delete, sender=Share)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_trip_document(sender, instance, **kwargs):
+    """إبطال مستند الرحلة عند تغيير تفاعلاتها"""
+    invalidate_trip(instance.trip_id)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follow_profiles(sender, instance, **kwargs):
+    """تغيير ETag البروفايل العام للطرفين (عدادات المتابعة)"""
+    bump_version(f"user:{instance.follower_id}", f"user:{instance.following_id}")
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_socket_user_cache(sender, instance, **kwargs):
+    """تعطيل الحساب أو تغيير اسم المستخدم يظهر في اتصالات WebSocket الجديدة"""
+    invalidate_socket_user(instance.id)
@@ -1,7 +1,9 @@
 
+import time
 from rest_framework.test import APITestCase
 from rest_framework import status
 from django.contrib.auth import get_user_model
+from django.test import TransactionTestCase, override_settings
 from django.urls import reverse
 
 User = get_user_model()
@@ -341,3 +343,1321 @@ class NotificationSignalsTest(APITestCase):
         ).first()
 
         self.assertIsNotNone(notification)
+
+
+class OutboxRelayTest(APITestCase):
+    """اختبارات الـ transactional outbox"""
+
+    def setUp(self):
+        self.user1 = User.objects.create_user(
+            email='user1@test.com',
+            password='testpass123',
+            is_active=True,
+            is_verified=True
+        )
+        self.user2 = User.objects.create_user(
+            email='user2@test.com',
+            password='testpass123',
+            is_active=True,
+            is_verified=True
+        )
+        from trip.models import Trip
+        self.trip = Trip.objects.create(
+            user=self.user1,
+            caption='Test Trip',
+            location='Test Location'
+        )
+        self.client.force_authenticate(user=self.user2)
+
+    def test_like_records_only_the_notification_event(self):
+        """الإعجاب يكتب حدث الإشعار فقط؛ لا مستهلك لحدث الإعجاب نفسه"""
+        from .models import OutboxEvent
+
+        response = self.client.post('/api/interactions/like/', {'trip_id': self.trip.id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        event_types = list(OutboxEvent.objects.values_list('event_type', flat=True))
+        self.assertEqual(event_types, ['notification.created'])
+
+    def test_relay_marks_events_processed(self):
+        """الـ relay يوزع الأحداث ويعلمها كمعالجة"""
+        from .models import OutboxEvent
+        from .outbox import OutboxRelay, record_event, register_consumer, _consumers
+
+        received = []
+        consumer = register_consumer('save.created')(lambda event: received.append(event.id))
+        self.addCleanup(_consumers['save.created'].remove, consumer)
+
+        event = record_event('save.created', user_id=self.user2.id, trip_id=self.trip.id)
+        metrics = OutboxRelay(batch_size=10).drain()
+
+        event.refresh_from_db()
+        self.assertEqual(received, [event.id])
+        self.assertIsNotNone(event.processed_at)
+        self.assertEqual(metrics['processed'], 1)
+        self.assertEqual(metrics['backlog'], 0)
+
+    def test_failed_event_is_retried(self):
+        """فشل المستهلك يترك الحدث للمحاولة مرة أخرى"""
+        from .models import OutboxEvent
+        from .outbox import OutboxRelay, record_event, register_consumer, _consumers
+
+        def failing_consumer(event):
+            raise RuntimeError('channel layer down')
+
+        register_consumer('save.deleted')(failing_consumer)
+        self.addCleanup(_consumers['save.deleted'].remove, failing_consumer)
+
+        event = record_event('save.deleted', user_id=self.user2.id, trip_id=self.trip.id)
+        metrics = OutboxRelay(batch_size=10, max_attempts=2).drain()
+
+        event.refresh_from_db()
+        self.assertIsNone(event.processed_at)
+        self.assertEqual(event.attempts, 1)
+        self.assertIn('channel layer down', event.last_error)
+        self.assertEqual(metrics['failed'], 1)
+        self.assertEqual(metrics['backlog'], 1)
+
+    def test_events_are_dispatched_after_the_claim_commits(self):
+        """المستهلك يعمل بعد حجز الحدث وخارج transaction الحجز، فلا يأخذه relay آخر"""
+        from django.db import connection
+        from .outbox import OutboxRelay, record_event, register_consumer, _consumers
+
+        seen = []
+
+        def consumer(event):
+            # savepoint الحدث فقط، دون transaction الحجز
+            seen.append((OutboxRelay().claim(), len(connection.savepoint_ids)))
+
+        register_consumer('save.created')(consumer)
+        self.addCleanup(_consumers['save.created'].remove, consumer)
+
+        event = record_event('save.created', user_id=self.user2.id, trip_id=self.trip.id)
+        savepoints = len(connection.savepoint_ids)
+        OutboxRelay(batch_size=10).drain()
+
+        self.assertEqual(seen, [([], savepoints + 1)])
+        event.refresh_from_db()
+        self.assertIsNotNone(event.processed_at)
+        self.assertIsNone(event.claimed_until)
+
+    def test_event_without_consumer_is_not_acknowledged(self):
+        """حدث لا يستهلكه شيء لا يُعلَّم كمُعالَج، إلا الأنواع المسجلة فقط"""
+        from .outbox import OutboxRelay, record_event
+
+        unhandled = record_event('trip.archived', trip_id=self.trip.id)
+        record_only = record_event('follow.created', follower_id=self.user2.id, following_id=self.user1.id)
+        metrics = OutboxRelay(batch_size=10).drain()
+
+        unhandled.refresh_from_db()
+        record_only.refresh_from_db()
+        self.assertIsNone(unhandled.processed_at)
+        self.assertIn('No consumer registered for trip.archived', unhandled.last_error)
+        self.assertIsNotNone(record_only.processed_at)
+        self.assertEqual(metrics['failed'], 1)
+
+
+class NotificationBootstrapTest(APITestCase):
+    """اختبارات بيانات بدء اتصال WebSocket"""
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.user1 = User.objects.create_user(
+            email='user1@test.com',
+            password='testpass123',
+            is_active=True,
+            is_verified=True
+        )
+        self.user2 = User.objects.create_user(
+            email='user2@test.com',
+            password='testpass123',
+            is_active=True,
+            is_verified=True
+        )
+        from .models import Notification
+        for i in range(12):
+            Notification.objects.create(
+                recipient=self.user1,
+                sender=self.user2,
+                notification_type='follow'
+            )
+
+    def test_bootstrap_returns_list_and_count(self):
+        """القائمة محدودة والعدد يشمل جميع غير المقروء"""
+        from .utils import get_notifications_bootstrap
+
+        bootstrap = get_notifications_bootstrap(self.user1.id, limit=10)
+
+        self.assertEqual(bootstrap['user']['username'], self.user1.username)
+        self.assertEqual(len(bootstrap['notifications']), 10)
+        self.assertEqual(bootstrap['unread_count'], 12)
+        self.assertEqual(bootstrap['notifications'][0]['sender']['id'], self.user2.id)
+
+    def test_bootstrap_query_count(self):
+        """استعلام واحد للإشعارات عند وجود المستخدم في الـ cache"""
+        from .utils import get_notifications_bootstrap
+
+        with self.assertNumQueries(2):
+            get_notifications_bootstrap(self.user1.id)
+        with self.assertNumQueries(1):
+            get_notifications_bootstrap(self.user1.id)
+
+    def test_bootstrap_unknown_user(self):
+        from .utils import get_notifications_bootstrap
+
+        self.assertIsNone(get_notifications_bootstrap(999999))
+
+    def test_cached_socket_user_is_invalidated_on_save(self):
+        from .utils import resolve_socket_user
+
+        self.assertEqual(resolve_socket_user(self.user1.id)['username'], self.user1.username)
+        self.user1.username = 'renamed'
+        self.user1.save()
+        self.assertEqual(resolve_socket_user(self.user1.id)['username'], 'renamed')
+
+        self.user1.is_active = False
+        self.user1.save()
+        self.assertIsNone(resolve_socket_user(self.user1.id))
+
+
+class NotificationReplayTest(APITestCase):
+    """اختبارات إعادة إرسال الإشعارات من مؤشر الاستئناف"""
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.user1 = User.objects.create_user(
+            email='user1@test.com',
+            password='testpass123',
+            is_active=True,
+            is_verified=True
+        )
+        self.user2 = User.objects.create_user(
+            email='user2@test.com',
+            password='testpass123',
+            is_active=True,
+            is_verified=True
+        )
+
+    def _create_and_log(self, count):
+        from .models import Notification
+        from .serializers import notification_payload
+        from .utils import append_to_notification_log
+
+        notifications = []
+        for i in range(count):
+            notification = Notification.objects.create(
+                recipient=self.user1,
+                sender=self.user2,
+                notification_type='follow'
+            )
+            append_to_notification_log(self.user1.id, notification_payload(notification))
+            notifications.append(notification)
+        return notifications
+
+    def test_replay_from_log_without_database(self):
+        """المؤشر داخل السجل لا يلمس قاعدة البيانات"""
+        from .utils import get_notifications_replay, resolve_socket_user
+
+        notifications = self._create_and_log(5)
+        resolve_socket_user(self.user1.id)
+
+        with self.assertNumQueries(0):
+            replay = get_notifications_replay(self.user1.id, ('id', notifications[1].id))
+
+        self.assertEqual(replay['source'], 'log')
+        self.assertEqual(
+            [n['id'] for n in replay['notifications']],
+            [n.id for n in notifications[2:]]
+        )
+
+    def test_replay_by_timestamp(self):
+        from .utils import get_notifications_replay
+
+        notifications = self._create_and_log(3)
+        replay = get_notifications_replay(self.user1.id, ('created_at', notifications[0].created_at))
+
+        self.assertEqual(replay['source'], 'log')
+        self.assertEqual(len(replay['notifications']), 2)
+
+    def test_truncated_log_falls_back_to_database(self):
+        """المؤشر الأقدم من السجل يُخدم من قاعدة البيانات"""
+        from .utils import NOTIFICATION_LOG_SIZE, get_notifications_replay
+
+        notifications = self._create_and_log(NOTIFICATION_LOG_SIZE + 5)
+        replay = get_notifications_replay(self.user1.id, ('id', notifications[0].id), limit=10)
+
+        self.assertEqual(replay['source'], 'database')
+        self.assertTrue(replay['has_more'])
+        self.assertEqual(replay['notifications'][0]['id'], notifications[1].id)
+
+    def _payload(self, notification_id):
+        return {'id': notification_id, 'created_at': f'2026-01-01T10:00:{notification_id % 60:02d}+00:00'}
+
+    def test_out_of_order_event_is_replayed(self):
+        """حدث معاد إرساله يصل بعد إشعار أحدث يبقى قابلاً للإعادة"""
+        from .utils import append_to_notification_log, get_notifications_replay, resolve_socket_user
+
+        resolve_socket_user(self.user1.id)
+        for notification_id in (10, 11, 13, 12):
+            append_to_notification_log(self.user1.id, self._payload(notification_id))
+
+        replay = get_notifications_replay(self.user1.id, ('id', 11))
+        self.assertEqual(replay['source'], 'log')
+        self.assertEqual([n['id'] for n in replay['notifications']], [12, 13])
+
+    def test_trimmed_log_boundary_is_oldest_retained(self):
+        from django.core.cache import cache
+        from .utils import NOTIFICATION_LOG_SIZE, _notification_log_key, append_to_notification_log
+
+        ids = list(range(1, NOTIFICATION_LOG_SIZE + 3))
+        # الحدث 2 يتأخر حتى بعد امتلاء السجل
+        for notification_id in [i for i in ids if i != 2] + [2]:
+            append_to_notification_log(self.user1.id, self._payload(notification_id))
+
+        log = cache.get(_notification_log_key(self.user1.id))
+        self.assertEqual([event['id'] for event in log['events']], ids[-NOTIFICATION_LOG_SIZE:])
+        self.assertEqual(log['complete_after_id'], ids[-NOTIFICATION_LOG_SIZE])
+
+    def test_concurrent_appends_are_not_lost(self):
+        from concurrent.futures import ThreadPoolExecutor
+        from django.core.cache import cache
+        from .utils import _notification_log_key, append_to_notification_log
+
+        append_to_notification_log(self.user1.id, self._payload(1))
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(
+                lambda notification_id: append_to_notification_log(self.user1.id, self._payload(notification_id)),
+                range(2, 42)
+            ))
+
+        log = cache.get(_notification_log_key(self.user1.id))
+        self.assertEqual([event['id'] for event in log['events']], list(range(1, 42)))
+
+    def test_parse_resume_cursor(self):
+        from .utils import parse_resume_cursor
+
+        self.assertEqual(parse_resume_cursor('42'), ('id', 42))
+        self.assertEqual(parse_resume_cursor('2026-01-01T10:00:00 00:00')[0], 'created_at')
+        self.assertIsNone(parse_resume_cursor('yesterday'))
+        self.assertIsNone(parse_resume_cursor(None))
+
+
+@override_settings(PRESENCE_TRACKING=True)
+class PresenceTest(APITestCase):
+    """اختبارات تتبع الحضور وتخطي الإرسال للمستخدمين غير المتصلين"""
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.user1 = User.objects.create_user(
+            email='user1@test.com',
+            password='testpass123',
+            is_active=True,
+            is_verified=True
+        )
+        self.user2 = User.objects.create_user(
+            email='user2@test.com',
+            password='testpass123',
+            is_active=True,
+            is_verified=True
+        )
+
+    def test_online_offline(self):
+        from .presence import is_user_online, mark_online, mark_offline
+
+        self.assertFalse(is_user_online(self.user1.id))
+        mark_online(self.user1.id, 'channel-a')
+        mark_online(self.user1.id, 'channel-b')
+        mark_offline(self.user1.id, 'channel-a')
+        self.assertTrue(is_user_online(self.user1.id))
+        mark_offline(self.user1.id, 'channel-b')
+        self.assertFalse(is_user_online(self.user1.id))
+
+    def test_stale_heartbeat_is_offline(self):
+        from unittest import mock
+        from .presence import PRESENCE_TTL, is_user_online, mark_online
+
+        mark_online(self.user1.id, 'channel-a')
+        with mock.patch('interactions.presence.time.time', return_value=time.time() + PRESENCE_TTL + 1):
+            self.assertFalse(is_user_online(self.user1.id))
+
+    def test_concurrent_connections_are_all_registered(self):
+        import threading
+        from unittest import mock
+        from . import presence
+
+        live_channels = presence._live_channels
+
+        def slow_live_channels(channels, now):
+            # توسيع نافذة القراءة والكتابة حتى يظهر السباق دون القفل
+            time.sleep(0.01)
+            return live_channels(channels, now)
+
+        with mock.patch('interactions.presence._live_channels', side_effect=slow_live_channels):
+            threads = [
+                threading.Thread(target=presence.mark_online, args=(self.user1.id, f'channel-{i}'))
+                for i in range(8)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        from django.core.cache import cache
+        self.assertEqual(len(cache.get(f'presence:{self.user1.id}')), 8)
+
+    def test_consumer_refreshes_presence_without_client_heartbeat(self):
+        import asyncio
+        from unittest import mock
+        from asgiref.sync import async_to_sync
+        from .consumers import NotificationConsumer
+        from .presence import PRESENCE_TTL, is_user_online
+
+        consumer = NotificationConsumer()
+        consumer.user_id = self.user1.id
+        consumer.channel_name = 'channel-a'
+
+        async def run():
+            task = asyncio.create_task(consumer.refresh_presence())
+            await asyncio.sleep(0.2)
+            task.cancel()
+
+        with mock.patch('interactions.consumers.PRESENCE_REFRESH', 0.01):
+            async_to_sync(run)()
+        self.assertTrue(is_user_online(self.user1.id))
+        with mock.patch('interactions.presence.time.time', return_value=time.time() + PRESENCE_TTL + 1):
+            self.assertFalse(is_user_online(self.user1.id))
+
+    def test_push_skipped_and_deferred_for_offline_user(self):
+        from .models import Notification, OutboxEvent
+        from .presence import get_delivery_stats
+        from .utils import (
+            get_notifications_replay, parse_resume_cursor, push_notification, send_unread_count_update
+        )
+
+        notification = Notification.objects.create(
+            recipient=self.user1,
+            sender=self.user2,
+            notification_type='follow'
+        )
+
+        self.assertFalse(push_notification(notification.id))
+        send_unread_count_update(self.user1.id, 1)
+
+        stats = get_delivery_stats()
+        self.assertEqual(stats['skipped'], 2)
+        self.assertEqual(stats['deferred'], 1)
+        # لا قناة push بعد: الإشعار يُعاد عند الاتصال من السجل (?since)
+        self.assertFalse(OutboxEvent.objects.filter(event_type='notification.deferred').exists())
+        replay = get_notifications_replay(self.user1.id, parse_resume_cursor(str(notification.id - 1)))
+        self.assertEqual([n['id'] for n in replay['notifications']], [notification.id])
+
+    def test_delivery_stats_requires_admin(self):
+        self.client.force_authenticate(user=self.user1)
+        response = self.client.get('/api/interactions/notifications/delivery-stats/')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.user1.is_staff = True
+        self.user1.save()
+        response = self.client.get('/api/interactions/notifications/delivery-stats/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('skipped', response.data)
+
+
+class NotificationSerializerQueriesTest(APITestCase):
+    """عدد استعلامات قائمة الإشعارات ثابت مهما كان حجم الصفحة"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='user1@test.com',
+            password='testpass123',
+            is_active=True,
+            is_verified=True
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def _create_notifications(self, count):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from trip.models import Trip, TripImage
+        from .models import Notification
+
+        for i in range(count):
+            sender = User.objects.create_user(
+                email=f'sender{Notification.objects.count()}@test.com',
+                password='testpass123'
+            )
+            trip = Trip.objects.create(user=self.user, caption=f'Trip {i}', location='Cairo')
+            TripImage.objects.create(
+                trip=trip,
+                image=SimpleUploadedFile(f'img{i}.jpg', b'data', content_type='image/jpeg')
+            )
+            Notification.objects.create(
+                recipient=self.user,
+                sender=sender,
+                notification_type='like',
+                trip=trip
+            )
+
+    def _count_queries(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/interactions/notifications/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(context.captured_queries), response
+
+    def test_constant_query_count(self):
+        self._create_notifications(2)
+        small_page, _ = self._count_queries()
+
+        self._create_notifications(15)
+        large_page, response = self._count_queries()
+
+        self.assertEqual(small_page, large_page)
+        first = response.data['results'][0]
+        self.assertNotIn('recipient', first)
+        self.assertTrue(first['trip_title'].startswith('Trip'))
+        self.assertIn('/media/blobs/', first['trip_image'])
+
+
+class CommentThreadTest(APITestCase):
+    """اختبارات تحميل سلاسل التعليقات"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='user1@test.com',
+            password='testpass123',
+            is_active=True,
+            is_verified=True
+        )
+        from trip.models import Trip
+        self.trip = Trip.objects.create(user=self.user, caption='Test Trip', location='Test')
+
+    def _create_thread(self, roots, replies_per_root):
+        from .models import Comment
+
+        created = []
+        for i in range(roots):
+            root = Comment.objects.create(user=self.user, trip=self.trip, content=f'root {i}')
+            for j in range(replies_per_root):
+                Comment.objects.create(user=self.user, trip=self.trip, content=f'reply {j}', parent=root)
+            created.append(root)
+        return created
+
+    def test_replies_count_is_maintained(self):
+        from .models import Comment
+
+        root = self._create_thread(1, 4)[0]
+        root.refresh_from_db()
+        self.assertEqual(root.replies_count, 4)
+
+        Comment.objects.filter(parent=root).first().delete()
+        root.refresh_from_db()
+        self.assertEqual(root.replies_count, 3)
+
+    def test_thread_previews_are_bounded(self):
+        from .views import REPLY_PREVIEWS_PER_COMMENT
+
+        self._create_thread(2, REPLY_PREVIEWS_PER_COMMENT + 2)
+        response = self.client.get(f'/api/interactions/comments/{self.trip.id}/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        for comment in response.data['results']:
+            self.assertEqual(len(comment['replies']), REPLY_PREVIEWS_PER_COMMENT)
+            self.assertEqual(comment['replies_count'], REPLY_PREVIEWS_PER_COMMENT + 2)
+            self.assertNotIn('replies', comment['replies'][0])
+
+    def test_thread_query_count_is_constant(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        self._create_thread(2, 2)
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(f'/api/interactions/comments/{self.trip.id}/')
+
+        self._create_thread(10, 6)
+        with CaptureQueriesContext(connection) as large:
+            self.client.get(f'/api/interactions/comments/{self.trip.id}/')
+
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+
+    def test_more_replies_endpoint(self):
+        root = self._create_thread(1, 5)[0]
+
+        response = self.client.get(f'/api/interactions/comment/{root.id}/replies/?page_size=2')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIsNotNone(response.data['next'])
+
+        response = self.client.get(response.data['next'])
+        self.assertEqual(len(response.data['results']), 2)
+
+    def test_more_replies_after_previews(self):
+        """الردود بعد آخر رد في المعاينة فقط، دون تكرار المعروض"""
+        from .models import Comment
+        from .views import REPLY_PREVIEWS_PER_COMMENT
+
+        root = self._create_thread(1, REPLY_PREVIEWS_PER_COMMENT + 2)[0]
+        replies = list(Comment.objects.filter(parent=root).order_by('created_at', 'id').values_list('id', flat=True))
+        thread = self.client.get(f'/api/interactions/comments/{self.trip.id}/').data['results'][0]
+        previewed = [reply['id'] for reply in thread['replies']]
+        self.assertEqual(previewed, replies[:REPLY_PREVIEWS_PER_COMMENT])
+
+        response = self.client.get(f'/api/interactions/comment/{root.id}/replies/', {'after': previewed[-1]})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([reply['id'] for reply in response.data['results']], replies[REPLY_PREVIEWS_PER_COMMENT:])
+
+        other = self._create_thread(1, 1)[0]
+        other_reply = Comment.objects.get(parent=other)
+        for after in (other_reply.id, 'abc'):
+            response = self.client.get(f'/api/interactions/comment/{root.id}/replies/', {'after': after})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ViewerRelationshipsTest(APITestCase):
+    """اختبارات تحميل علاقات المستخدم الحالي دفعة واحدة"""
+
+    def setUp(self):
+        self.viewer = User.objects.create_user(
+            email='viewer@test.com',
+            password='testpass123',
+            is_active=True,
+            is_verified=True
+        )
+        from trip.models import Trip
+        self.trip = Trip.objects.create(user=self.viewer, caption='Test Trip', location='Test')
+        self.client.force_authenticate(user=self.viewer)
+
+    def _add_likers(self, count, follow_every=2):
+        from .models import Follow, Like
+
+        for i in range(count):
+            liker = User.objects.create_user(
+                email=f'liker{Like.objects.count()}@test.com',
+                password='testpass123'
+            )
+            Like.objects.create(user=liker, trip=self.trip)
+            if i % follow_every == 0:
+                Follow.objects.create(follower=self.viewer, following=liker)
+
+    def _likes_page(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(f'/api/interactions/likes/{self.trip.id}/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(context.captured_queries), response
+
+    def test_likes_page_is_following_in_one_query(self):
+        self._add_likers(2)
+        small_page, _ = self._likes_page()
+
+        self._add_likers(12)
+        large_page, response = self._likes_page()
+
+        self.assertEqual(small_page, large_page)
+        following = [like['is_following'] for like in response.data['results']]
+        self.assertEqual(following.count(True), 7)
+
+    def test_anonymous_viewer(self):
+        from .relationships import ViewerRelationships
+        from django.contrib.auth.models import AnonymousUser
+
+        relationships = ViewerRelationships(AnonymousUser())
+        with self.assertNumQueries(0):
+            self.assertFalse(relationships.is_following(self.viewer.id))
+            self.assertFalse(relationships.is_liked(self.trip.id))
+
+
+class FeedTripStateTest(APITestCase):
+    """اختبارات العدادات وحالة المستخدم الحالي في قوائم الخلاصة"""
+
+    def setUp(self):
+        self.viewer = User.objects.create_user(
+            email='feedviewer@test.com',
+            password='testpass123',
+            is_active=True,
+            is_verified=True
+        )
+        self.author = User.objects.create_user(
+            email='feedauthor@test.com',
+            password='testpass123'
+        )
+        from .models import Follow
+        Follow.objects.create(follower=self.viewer, following=self.author)
+        self.client.force_authenticate(user=self.viewer)
+
+    def _add_trips(self, count):
+        from trip.models import Trip, TripTag
+        from .models import Like, Comment, Save
+
+        for i in range(count):
+            trip = Trip.objects.create(user=self.author, caption=f'Trip {i}', location='Cairo')
+            TripTag.objects.create(trip=trip, tripTag='nile')
+            Like.objects.create(user=self.author, trip=trip)
+            Comment.objects.create(user=self.author, trip=trip, content='nice')
+            if i % 2 == 0:
+                Like.objects.create(user=self.viewer, trip=trip)
+                Save.objects.create(user=self.viewer, trip=trip)
+
+    def _page(self, url):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(context.captured_queries), response
+
+    def test_feed_includes_counters_and_flags(self):
+        self._add_trips(2)
+        _, response = self._page('/api/interactions/feed/')
+
+        trips = {trip['caption']: trip for trip in response.data['results']}
+        self.assertEqual(trips['Trip 0']['likes_count'], 2)
+        self.assertEqual(trips['Trip 0']['comments_count'], 1)
+        self.assertEqual(trips['Trip 0']['saves_count'], 1)
+        self.assertEqual(trips['Trip 0']['shares_count'], 0)
+        self.assertTrue(trips['Trip 0']['is_liked'])
+        self.assertTrue(trips['Trip 0']['is_saved'])
+        self.assertEqual(trips['Trip 1']['likes_count'], 1)
+        self.assertFalse(trips['Trip 1']['is_liked'])
+        self.assertFalse(trips['Trip 1']['is_saved'])
+
+    def test_list_screens_use_constant_queries(self):
+        urls = [
+            '/api/interactions/feed/',
+            '/api/interactions/explore/',
+            '/api/interactions/saved/',
+            '/api/trip/tags/nile/trips/',
+        ]
+        self._add_trips(2)
+        small_pages = [self._page(url)[0] for url in urls]
+
+        self._add_trips(10)
+        large_pages = [self._page(url)[0] for url in urls]
+
+        self.assertEqual(small_pages, large_pages)
+
+    def test_anonymous_explore_flags_are_false(self):
+        self._add_trips(1)
+        self.client.force_authenticate(user=None)
+        _, response = self._page('/api/interactions/explore/')
+
+        trip = response.data['results'][0]
+        self.assertEqual(trip['likes_count'], 2)
+        self.assertFalse(trip['is_liked'])
+        self.assertFalse(trip['is_saved'])
+
+
+class FollowGraphTest(APITestCase):
+    """اختبارات رسم المتابعة في الذاكرة"""
+
+    def setUp(self):
+        from unittest import mock
+        from .follow_graph import reset_follow_graph
+
+        reset_follow_graph()
+        # المزامنة في كل طلب حتى تظهر المتابعة مباشرة في الاختبار
+        patcher = mock.patch('interactions.follow_graph.SYNC_INTERVAL', 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.users = [
+            User.objects.create_user(email=f'graph{i}@test.com', password='testpass123')
+            for i in range(6)
+        ]
+        self.viewer = self.users[0]
+        self.client.force_authenticate(user=self.viewer)
+
+    def _follow(self, follower, following):
+        from .models import Follow
+        Follow.objects.create(follower=follower, following=following)
+
+    def test_suggestions_and_mutuals(self):
+        from .follow_graph import FollowGraph
+
+        a, b, c, d, e = self.users[1:]
+        self._follow(self.viewer, a)
+        self._follow(self.viewer, b)
+        self._follow(a, c)
+        self._follow(b, c)
+        self._follow(b, d)
+        self._follow(a, self.viewer)
+
+        graph = FollowGraph.from_database()
+        self.assertEqual(graph.suggestions(self.viewer.id), [(c.id, 2), (d.id, 1)])
+        self.assertEqual(graph.mutual_followers_count(self.viewer.id, c.id), 2)
+        self.assertEqual(graph.follower_overlap(c.id, d.id), {'shared': 1, 'jaccard': 0.5})
+        self.assertEqual(graph.suggestions(e.id), [])
+
+    def test_incremental_updates_match_rebuild(self):
+        from .follow_graph import FollowGraph
+
+        a, b, c, d, e = self.users[1:]
+        self._follow(self.viewer, a)
+        self._follow(a, b)
+        graph = FollowGraph.from_database(compact_threshold=100)
+
+        graph.add_edge(a.id, c.id)
+        graph.add_edge(a.id, c.id)
+        graph.remove_edge(a.id, b.id)
+        graph.add_edge(e.id, d.id)
+        self.assertEqual(graph.following(a.id).tolist(), [c.id])
+        self.assertEqual(graph.followers(d.id).tolist(), [e.id])
+        self.assertEqual(graph.pending_changes, 3)
+
+        graph.compact()
+        self.assertEqual(graph.pending_changes, 0)
+        self.assertEqual(graph.following(a.id).tolist(), [c.id])
+        self.assertEqual(graph.edge_count, 3)
+
+    def test_graph_syncs_from_outbox(self):
+        a, b = self.users[1:3]
+        self.client.post('/api/interactions/follow/', {'user_id': a.id})
+        self._follow(a, b)
+
+        response = self.client.get('/api/interactions/follow/suggestions/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0]['user']['id'], b.id)
+        self.assertEqual(response.data['results'][0]['mutual_count'], 1)
+
+        # المتابعة وإلغاؤها بعد تحميل الرسم تصل عبر أحداث الـ outbox
+        from .follow_graph import get_follow_graph
+
+        self.client.post('/api/interactions/follow/', {'user_id': b.id})
+        self.client.delete('/api/interactions/unfollow/', {'user_id': a.id}, format='json')
+        response = self.client.get('/api/interactions/follow/suggestions/')
+        self.assertEqual(response.data['results'], [])
+        self.assertEqual(get_follow_graph().following(self.viewer.id).tolist(), [b.id])
+
+    def test_late_committed_event_is_applied(self):
+        """حدث بمعرف أصغر يلتزم بعد حدث أحدث منه لا يُتخطى"""
+        from .follow_graph import FollowGraph
+        from .models import OutboxEvent
+        from .outbox import record_event
+
+        a, b = self.users[1:3]
+        graph = FollowGraph.from_database()
+        # معرف محجوز لـ transaction لم يلتزم بعد
+        reserved = record_event('follow.created', follower_id=self.viewer.id, following_id=a.id)
+        reserved_id = reserved.id
+        reserved.delete()
+        record_event('follow.created', follower_id=self.viewer.id, following_id=b.id)
+
+        self.assertEqual(graph.sync(), 1)
+        self.assertIn(reserved_id, graph.gaps)
+
+        OutboxEvent.objects.create(
+            id=reserved_id, event_type='follow.created',
+            payload={'follower_id': self.viewer.id, 'following_id': a.id}
+        )
+        self.assertEqual(graph.sync(), 1)
+        self.assertEqual(graph.following(self.viewer.id).tolist(), [a.id, b.id])
+        self.assertNotIn(reserved_id, graph.gaps)
+
+    def test_stale_graph_rebuilds_in_background(self):
+        """الطلب لا ينتظر إعادة البناء، والرسم الجديد يُستبدل دفعة واحدة"""
+        from unittest import mock
+        from . import follow_graph
+
+        a = self.users[1]
+        graph = follow_graph.get_follow_graph()
+        graph.built_at -= follow_graph.REBUILD_INTERVAL
+        self._follow(self.viewer, a)
+
+        with mock.patch('interactions.follow_graph.threading.Thread') as thread:
+            self.assertIs(follow_graph.get_follow_graph(), graph)
+        thread.return_value.start.assert_called_once()
+        follow_graph._rebuild_lock.release()
+
+        rebuilt = follow_graph.rebuild_follow_graph()
+        self.assertIsNot(rebuilt, graph)
+        self.assertIs(follow_graph.get_follow_graph(), rebuilt)
+        self.assertEqual(rebuilt.following(self.viewer.id).tolist(), [a.id])
+
+    def test_sync_reads_only_follow_events(self):
+        """المزامنة تقرأ معرفات الأحداث ثم حقلي المتابعة لأحداث follow فقط"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from .follow_graph import FollowGraph
+        from .outbox import record_event
+
+        a = self.users[1]
+        graph = FollowGraph.from_database()
+        record_event('notification.created', notification_id=1, recipient_id=a.id)
+        record_event('follow.created', follower_id=self.viewer.id, following_id=a.id)
+
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(graph.sync(), 1)
+        ids_query, follow_query = (q['sql'] for q in context.captured_queries)
+        self.assertNotIn('payload', ids_query)
+        self.assertIn("'follow.created'", follow_query)
+        self.assertNotIn('AS "payload"', follow_query)
+        self.assertEqual(graph.following(self.viewer.id).tolist(), [a.id])
+
+    def test_updates_do_not_change_published_snapshot(self):
+        """الكتابة تنشر snapshot جديدة؛ القارئ الذي أخذ السابقة يراها كما هي"""
+        from .follow_graph import FollowGraph
+
+        graph = FollowGraph([1, 2], [2, 3], compact_threshold=3)
+        before = graph._snapshot
+        graph.add_edge(1, 3)
+        graph.remove_edge(2, 3)
+        self.assertEqual(graph.following(1).tolist(), [2, 3])
+        self.assertEqual(before.following(1).tolist(), [2])
+        self.assertEqual(before.followers(3).tolist(), [2])
+        self.assertEqual((before.added_out, before.removed_out), ({}, {}))
+
+        # التعديل الثالث يدمج الفرق ويكبر الرسم دون لمس المصفوفات القديمة
+        graph.add_edge(9, 1)
+        self.assertEqual((before.size, graph.size), (4, 10))
+        self.assertEqual(before.following(9).tolist(), [])
+        self.assertEqual(graph.following(9).tolist(), [1])
+        self.assertFalse(graph._snapshot.out_indices.flags.writeable)
+
+    def test_mutual_followers_endpoint(self):
+        a, b, c = self.users[1:4]
+        for user in (a, b):
+            self._follow(self.viewer, user)
+            self._follow(user, c)
+
+        response = self.client.get(f'/api/interactions/followers/{c.id}/mutual/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual([u['id'] for u in response.data['users']], [a.id, b.id])
+
+        response = self.client.get('/api/interactions/followers/999999/mutual/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class BulkFollowTest(APITestCase):
+    """اختبارات المتابعة الجماعية"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='bulkfollower@test.com',
+            password='testpass123',
+            is_active=True,
+            is_verified=True
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def _create_targets(self, count):
+        start = User.objects.count()
+        return [
+            User.objects.create_user(email=f'target{start + i}@test.com', password='testpass123')
+            for i in range(count)
+        ]
+
+    def _bulk_follow(self, data):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post('/api/interactions/follow/bulk/', data, format='json')
+        return len(context.captured_queries), response
+
+    def test_bulk_follow_creates_edges_and_one_fanout_event(self):
+        from .models import Follow, Notification, OutboxEvent
+
+        targets = self._create_targets(3)
+        Follow.objects.create(follower=self.user, following=targets[0])
+
+        _, response = self._bulk_follow({
+            'user_ids': [t.id for t in targets] + [self.user.id, 999999],
+            'usernames': ['missing-user'],
+        })
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['followed'], [targets[1].id, targets[2].id])
+        self.assertEqual(response.data['already_following'], [targets[0].id])
+        self.assertEqual(response.data['not_found'], [999999, 'missing-user'])
+        self.assertEqual(Follow.objects.filter(follower=self.user).count(), 3)
+
+        batch = OutboxEvent.objects.get(event_type='notification.batch_created')
+        self.assertEqual(
+            sorted(batch.payload['notification_ids']),
+            sorted(Notification.objects.filter(
+                sender=self.user, recipient__in=targets[1:]
+            ).values_list('id', flat=True))
+        )
+        self.assertEqual(
+            OutboxEvent.objects.filter(event_type='follow.created').count(), 2
+        )
+
+    def test_bulk_follow_reports_only_rows_it_inserted(self):
+        """متابعة تلتزم من طلب متزامن قبل الإدراج لا تُحسب ولا تُشعر مرتين"""
+        from django.db import connection
+        from .models import Follow, Notification, OutboxEvent
+
+        targets = self._create_targets(2)
+        raced = []
+
+        def concurrent_follow(execute, sql, params, many, context):
+            # INSERT OR IGNORE INTO على SQLite و INSERT INTO ... ON CONFLICT على غيرها
+            if sql.startswith('INSERT') and f'INTO "{Follow._meta.db_table}"' in sql and not raced:
+                raced.append(True)
+                Follow.objects.create(follower=self.user, following=targets[0])
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(concurrent_follow):
+            _, response = self._bulk_follow({'user_ids': [t.id for t in targets]})
+
+        self.assertEqual(response.data['followed'], [targets[1].id])
+        self.assertEqual(response.data['already_following'], [targets[0].id])
+        self.assertEqual(
+            [event.payload['following_id'] for event in OutboxEvent.objects.filter(event_type='follow.created')],
+            [targets[1].id]
+        )
+        self.assertEqual(Notification.objects.filter(recipient=targets[0], notification_type='follow').count(), 1)
+
+    def test_bulk_follow_by_username_is_idempotent(self):
+        target = self._create_targets(1)[0]
+
+        _, response = self._bulk_follow({'usernames': [target.username]})
+        self.assertEqual(response.data['followed'], [target.id])
+
+        _, response = self._bulk_follow({'usernames': [target.username]})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['followed'], [])
+
+    def test_bulk_follow_uses_constant_queries(self):
+        small_batch, _ = self._bulk_follow({'user_ids': [t.id for t in self._create_targets(2)]})
+        large_batch, _ = self._bulk_follow({'user_ids': [t.id for t in self._create_targets(20)]})
+        self.assertEqual(small_batch, large_batch)
+
+    def test_bulk_follow_validation(self):
+        _, response = self._bulk_follow({})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        _, response = self._bulk_follow({'user_ids': ['abc']})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        _, response = self._bulk_follow({'user_ids': list(range(1, 102))})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_unfollow(self):
+        from .models import Follow, Notification
+
+        targets = self._create_targets(2)
+        self._bulk_follow({'user_ids': [t.id for t in targets]})
+
+        response = self.client.delete(
+            '/api/interactions/unfollow/bulk/',
+            {'user_ids': [t.id for t in targets]},
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['unfollowed'], [t.id for t in targets])
+        self.assertFalse(Follow.objects.filter(follower=self.user).exists())
+        self.assertFalse(Notification.objects.filter(sender=self.user).exists())
+
+    def test_batch_delivery_pushes_each_notification(self):
+        from unittest import mock
+        from .outbox import OutboxRelay
+
+        targets = self._create_targets(3)
+        self._bulk_follow({'user_ids': [t.id for t in targets]})
+
+        with mock.patch('interactions.utils.push_notifications', return_value=3) as push:
+            OutboxRelay().drain()
+        push.assert_called_once()
+        self.assertEqual(len(push.call_args.args[0]), 3)
+
+
+class InteractionToggleTest(APITestCase):
+    """اختبارات الإعجاب والحفظ بجملة كتابة واحدة"""
+
+    def setUp(self):
+        from trip.models import Trip
+
+        self.owner = User.objects.create_user(email='toggleowner@test.com', password='testpass123')
+        self.user = User.objects.create_user(
+            email='toggler@test.com',
+            password='testpass123',
+            is_active=True,
+            is_verified=True
+        )
+        self.trip = Trip.objects.create(user=self.owner, caption='Toggle Trip', location='Test')
+        self.client.force_authenticate(user=self.user)
+
+    def _toggle(self, kind, **data):
+        return self.client.post(
+            f'/api/interactions/{kind}/toggle/',
+            {'trip_id': self.trip.id, **data},
+            format='json'
+        )
+
+    def test_like_toggle_is_idempotent(self):
+        from .models import Like, Notification
+
+        response = self._toggle('like', liked=True)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {
+            'trip_id': self.trip.id, 'liked': True, 'likes_count': 1, 'changed': True
+        })
+
+        response = self._toggle('like', liked=True)
+        self.assertEqual(response.data['likes_count'], 1)
+        self.assertFalse(response.data['changed'])
+        self.assertEqual(Like.objects.filter(trip=self.trip).count(), 1)
+        self.assertEqual(
+            Notification.objects.filter(recipient=self.owner, notification_type='like').count(), 1
+        )
+
+        response = self._toggle('like', liked=False)
+        self.assertEqual(response.data['likes_count'], 0)
+        self.assertTrue(response.data['changed'])
+        self.assertFalse(Notification.objects.filter(recipient=self.owner).exists())
+
+        self.trip.refresh_from_db()
+        self.assertEqual(self.trip.likes_count, 0)
+
+    def test_save_toggle_and_legacy_endpoints_share_counter(self):
+        response = self.client.post('/api/interactions/save/', {'trip_id': self.trip.id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['saves_count'], 1)
+
+        response = self._toggle('save', saved=False)
+        self.assertEqual(response.data['saves_count'], 0)
+
+        response = self.client.delete('/api/interactions/unsave/', {'trip_id': self.trip.id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_toggle_stores_created_at_like_the_orm(self):
+        """INSERT المباشر يخزن created_at بنفس صيغة الـ ORM فيصح الترتيب والمقارنة"""
+        from django.db import connection
+        from .models import Like
+
+        self._toggle('like', liked=True)
+        like = Like.objects.get(user=self.user)
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT CAST(created_at AS TEXT) FROM interactions_like WHERE id = %s', [like.id])
+            (stored,) = cursor.fetchone()
+        self.assertEqual(stored, str(connection.ops.adapt_datetimefield_value(like.created_at)))
+
+    def test_toggle_write_needs_no_reads(self):
+        """الإعجاب الثاني لا يقرأ الرحلة قبل الكتابة"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        self._toggle('like', liked=True)
+        with CaptureQueriesContext(connection) as context:
+            self._toggle('like', liked=False)
+        statements = [
+            q['sql'].split()[0] for q in context.captured_queries
+            if not q['sql'].startswith(('SAVEPOINT', 'RELEASE'))
+        ]
+        self.assertEqual(statements[:3], ['DELETE', 'UPDATE', 'DELETE'])
+
+    def test_toggle_validation(self):
+        self.assertEqual(self._toggle('like').status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(
+            '/api/interactions/like/toggle/', {'trip_id': 999999, 'liked': True}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        from .models import Like
+        self.assertFalse(Like.objects.filter(trip_id=999999).exists())
+
+    def test_orm_writes_keep_counter(self):
+        from .models import Like
+
+        like = Like.objects.create(user=self.user, trip=self.trip)
+        self.trip.refresh_from_db()
+        self.assertEqual(self.trip.likes_count, 1)
+
+        like.delete()
+        self.trip.refresh_from_db()
+        self.assertEqual(self.trip.likes_count, 0)
+
+
+class InteractionToggleConcurrencyTest(TransactionTestCase):
+    """نقرات متزامنة على نفس الرحلة من عدة مستخدمين"""
+
+    def test_concurrent_taps_keep_counter_exact(self):
+        import threading
+        from django.db import connection, OperationalError
+        from trip.models import Trip
+        from .models import Like
+        from .toggles import like_toggle
+
+        owner = User.objects.create_user(email='hammerowner@test.com', password='testpass123')
+        trip = Trip.objects.create(user=owner, caption='Hammer', location='Test')
+        users = [
+            User.objects.create_user(email=f'hammer{i}@test.com', password='testpass123')
+            for i in range(4)
+        ]
+        barrier = threading.Barrier(len(users) * 2)
+        errors = []
+
+        def tap(user):
+            barrier.wait()
+            try:
+                for _ in range(10):
+                    while True:
+                        try:
+                            like_toggle.set(user, trip.id, True)
+                            break
+                        except OperationalError:
+                            # SQLite يقفل قاعدة البيانات أثناء كتابة أخرى
+                            time.sleep(0.001)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        # كل مستخدم ينقر من خيطين في نفس الوقت (نقرة مزدوجة)
+        threads = [threading.Thread(target=tap, args=(user,)) for user in users for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        trip.refresh_from_db()
+        self.assertEqual(trip.likes_count, len(users))
+        self.assertEqual(Like.objects.filter(trip=trip).count(), len(users))
+
+
+class ShareTrackingTest(APITestCase):
+    """اختبارات عدادات المشاركة"""
+
+    def setUp(self):
+        from trip.models import Trip
+
+        self.owner = User.objects.create_user(email='shareowner@test.com', password='testpass123')
+        self.user = User.objects.create_user(
+            email='sharer@test.com',
+            password='testpass123',
+            is_active=True,
+            is_verified=True
+        )
+        self.trip = Trip.objects.create(user=self.owner, caption='Shared Trip', location='Test')
+        self.client.force_authenticate(user=self.user)
+
+    def _share(self):
+        return self.client.post('/api/interactions/share/', {'trip_id': self.trip.id}, format='json')
+
+    def test_repeated_shares_upsert_one_row(self):
+        from .models import Share, Notification, TripShareBucket
+
+        for expected in (1, 2, 3):
+            response = self._share()
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            self.assertEqual(response.data['user_shares_count'], expected)
+            self.assertEqual(response.data['shares_count'], expected)
+
+        share = Share.objects.get(user=self.user, trip=self.trip)
+        self.assertEqual(share.count, 3)
+        self.assertEqual(TripShareBucket.objects.get(trip=self.trip).count, 3)
+        self.assertEqual(
+            Notification.objects.filter(recipient=self.owner, notification_type='share').count(), 1
+        )
+
+        self.trip.refresh_from_db()
+        self.assertEqual(self.trip.shares_count, 3)
+
+    def test_raw_share_bucket_merges_with_orm_bucket(self):
+        """الـ upsert يطابق صف الساعة الذي كتبه الـ ORM (مثل compact_share_activity)"""
+        from django.utils import timezone
+        from .models import TripShareBucket
+        from .shares import bucket_start
+
+        TripShareBucket.objects.create(trip=self.trip, bucket=bucket_start(timezone.now()), count=2)
+        self._share()
+        self.assertEqual(list(TripShareBucket.objects.values_list('count', flat=True)), [3])
+
+    def test_share_missing_trip(self):
+        from .models import Share
+
+        response = self.client.post('/api/interactions/share/', {'trip_id': 999999}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertFalse(Share.objects.exists())
+
+    @override_settings(SHARE_LOG_ENABLED=True)
+    def test_share_log_and_compaction(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from .models import ShareLogEntry, TripShareBucket
+        from .shares import bucket_start, compact_share_activity
+
+        self._share()
+        self.assertEqual(ShareLogEntry.objects.count(), 1)
+
+        old_day = bucket_start(timezone.now() - timedelta(days=10)).replace(hour=0)
+        for hour in (0, 5, 23):
+            TripShareBucket.objects.create(
+                trip=self.trip, bucket=old_day + timedelta(hours=hour), count=2
+            )
+        ShareLogEntry.objects.update(created_at=timezone.now() - timedelta(days=40))
+
+        result = compact_share_activity()
+        self.assertEqual(result, {'buckets_compacted': 2, 'log_entries_purged': 1})
+        self.assertEqual(TripShareBucket.objects.get(bucket=old_day).count, 6)
+
+        # إعادة التشغيل لا تغير شيئاً
+        self.assertEqual(compact_share_activity()['buckets_compacted'], 0)
+        self.assertEqual(TripShareBucket.objects.get(bucket=old_day).count, 6)
+
+    def test_share_stats_reads_stored_counter(self):
+        self._share()
+        self._share()
+
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/api/interactions/stats/trip/{self.trip.id}/shares/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['shares_count'], 2)
+        self.assertEqual(response.data['window_count'], 2)
+        self.assertEqual(len(response.data['buckets']), 1)
+
+    def test_save_serializer_has_no_share_fields(self):
+        from .models import Save
+        from .serializers import SaveSerializer
+
+        save = Save.objects.create(user=self.user, trip=self.trip)
+        data = SaveSerializer(save).data
+        self.assertEqual(set(data), {'id', 'user', 'trip', 'created_at'})
+        self.assertEqual(data['trip'], self.trip.id)
+
+
+class ORJSONRendererTest(APITestCase):
+    """تطابق ناتج ORJSONRenderer مع JSONRenderer الافتراضي"""
+
+    def test_matches_drf_renderer_for_special_types(self):
+        import datetime
+        import uuid
+        from decimal import Decimal
+        from rest_framework.renderers import JSONRenderer
+        from Rahala.renderers import ORJSONRenderer
+
+        data = {
+            'price': Decimal('149.99'),
+            'created_at': datetime.datetime(2025, 1, 2, 3, 4, 5, 678000, tzinfo=datetime.timezone.utc),
+            'day': datetime.date(2025, 1, 2),
+            'request_id': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+            'caption': 'رحلة إلى الأقصر ',
+            1: 'int key',
+        }
+        rendered = ORJSONRenderer().render(data)
+        self.assertEqual(rendered, JSONRenderer().render(data))
+        self.assertIn('رحلة'.encode(), rendered)
+        self.assertIn(b'"2025-01-02T03:04:05.678000Z"', rendered)
+        self.assertIn(b'\\u2028', rendered)
+
+    def test_indent_falls_back_to_stdlib(self):
+        from Rahala.renderers import ORJSONRenderer
+        rendered = ORJSONRenderer().render({'a': 1}, 'application/json; indent=4')
+        self.assertEqual(rendered, b'{\n    "a": 1\n}')
+
+    def test_invalid_json_body_returns_400(self):
+        user = User.objects.create_user(email='json@example.com', password='JsonPass123', is_active=True, is_verified=True)
+        self.client.force_authenticate(user=user)
+        response = self.client.post(
+            reverse('interactions:toggle_like'), data=b'{"trip_id": NaN', content_type='application/json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('JSON parse error', response.data['detail'])
@@ -0,0 +1,127 @@
+"""
+إعجاب وحفظ الرحلات بجملة كتابة واحدة
+
+الإضافة INSERT ... ON CONFLICT DO NOTHING والإزالة DELETE مباشر، وعدد الصفوف
+المتأثرة يحدد هل تغيرت الحالة، فلا حاجة لقراءة مسبقة ولا تنتج النقرات
+المزدوجة IntegrityError. العداد المخزن في الرحلة يُحدَّث بنفس الـ transaction
+ويُعاد بـ RETURNING دون إعادة قراءة.
+
+الكتابة هنا لا تمر بـ signals النموذج، لذلك يتولى InteractionToggle
+تحديث العداد والإشعار وإبطال مستند الرحلة بنفسه.
+"""
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from trip.models import Trip
+from trip.read_model import invalidate_trip
+from .models import Like, Save, Notification
+from .utils import create_and_send_notifications
+
+
+class InteractionToggle:
+    """تبديل علاقة (مستخدم، رحلة) مع عداد مخزن في Trip"""
+
+    def __init__(self, model, counter_field, notification_type=None):
+        """
+        Args:
+            model: نموذج العلاقة (Like أو Save) بقيد unique على (user, trip)
+            counter_field (str): حقل العداد في Trip
+            notification_type (str, optional): نوع الإشعار لصاحب الرحلة عند الإضافة
+        """
+        self.model = model
+        self.counter_field = counter_field
+        self.notification_type = notification_type
+
+    def _execute(self, sql, params):
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.rowcount, cursor.fetchone() if 'RETURNING' in sql else None
+
+    def _insert(self, user_id, trip_id):
+        qn = connection.ops.quote_name
+        # نفس صيغة التخزين التي يكتبها الـ ORM (SQLite يخزن التاريخ نصاً)
+        created_at = self.model._meta.get_field('created_at').get_db_prep_save(timezone.now(), connection)
+        rowcount, _ = self._execute(
+            f"INSERT INTO {qn(self.model._meta.db_table)} (user_id, trip_id, created_at) "
+            f"VALUES (%s, %s, %s) ON CONFLICT (user_id, trip_id) DO NOTHING",
+            [user_id, trip_id, created_at]
+        )
+        return rowcount == 1
+
+    def _delete(self, user_id, trip_id):
+        qn = connection.ops.quote_name
+        rowcount, _ = self._execute(
+            f"DELETE FROM {qn(self.model._meta.db_table)} WHERE user_id = %s AND trip_id = %s",
+            [user_id, trip_id]
+        )
+        return rowcount == 1
+
+    def _bump_counter(self, trip_id, delta):
+        qn = connection.ops.quote_name
+        column = qn(self.counter_field)
+        _, row = self._execute(
+            f"UPDATE {qn(Trip._meta.db_table)} SET {column} = {column} + %s "
+            f"WHERE id = %s RETURNING {column}, user_id",
+            [delta, trip_id]
+        )
+        return row
+
+    def set(self, user, trip_id, active):
+        """
+        ضبط الحالة المطلوبة (idempotent)
+
+        Args:
+            user (User): المستخدم الحالي
+            trip_id (int): معرف الرحلة
+            active (bool): الحالة المطلوبة (معجب/محفوظ أم لا)
+
+        Returns:
+            tuple: (changed, count) هل تغيرت الحالة، والعداد بعد التغيير
+
+        Raises:
+            Trip.DoesNotExist: إذا لم تكن الرحلة موجودة
+        """
+        with transaction.atomic():
+            write = self._insert if active else self._delete
+            changed = write(user.id, trip_id)
+
+            if changed:
+                row = self._bump_counter(trip_id, 1 if active else -1)
+            else:
+                row = Trip.objects.filter(id=trip_id).values_list(
+                    self.counter_field, 'user_id'
+                ).first()
+            if row is None:
+                # يُلغي الـ INSERT المؤجل التحقق من المفتاح الأجنبي
+                raise Trip.DoesNotExist(f"Trip {trip_id} not found")
+            count, owner_id = row
+
+            if changed:
+                self._on_change(user, trip_id, owner_id, active)
+        return changed, count
+
+    def _on_change(self, user, trip_id, owner_id, active):
+        invalidate_trip(trip_id)
+
+        if self.notification_type is None or owner_id == user.id:
+            return
+        notifications = Notification.objects.filter(
+            recipient_id=owner_id,
+            sender_id=user.id,
+            notification_type=self.notification_type,
+            trip_id=trip_id
+        )
+        if not active:
+            notifications.delete()
+        elif not notifications.exists():
+            create_and_send_notifications(
+                sender=user,
+                notification_type=self.notification_type,
+                recipient_ids=[owner_id],
+                trip_id=trip_id
+            )
+
+
+like_toggle = InteractionToggle(Like, 'likes_count', notification_type='like')
+save_toggle = InteractionToggle(Save, 'saves_count')
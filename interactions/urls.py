@@ -7,23 +7,30 @@ urlpatterns = [
     # Follow URLs
     path('follow/', views.follow_user, name='follow_user'),
     path('unfollow/', views.unfollow_user, name='unfollow_user'),
+    path('follow/bulk/', views.bulk_follow, name='bulk_follow'),
+    path('unfollow/bulk/', views.bulk_unfollow, name='bulk_unfollow'),
     path('followers/<int:user_id>/', views.FollowersListView.as_view(), name='followers_list'),
     path('following/<int:user_id>/', views.FollowingListView.as_view(), name='following_list'),
+    path('followers/<int:user_id>/mutual/', views.mutual_followers, name='mutual_followers'),
+    path('follow/suggestions/', views.follow_suggestions, name='follow_suggestions'),
     
     # Like URLs
     path('like/', views.like_trip, name='like_trip'),
     path('unlike/', views.unlike_trip, name='unlike_trip'),
+    path('like/toggle/', views.toggle_like, name='toggle_like'),
     path('likes/<int:trip_id>/', views.TripLikesListView.as_view(), name='trip_likes'),
     
     # Comment URLs
     path('comment/', views.CommentCreateView.as_view(), name='create_comment'),
     path('comments/<int:trip_id>/', views.TripCommentsListView.as_view(), name='trip_comments'),
+    path('comment/<int:comment_id>/replies/', views.CommentRepliesListView.as_view(), name='comment_replies'),
     path('comment/<int:pk>/', views.CommentUpdateView.as_view(), name='update_comment'),
     path('comment/<int:pk>/delete/', views.CommentDeleteView.as_view(), name='delete_comment'),
     
     # Save URLs
     path('save/', views.save_trip, name='save_trip'),
     path('unsave/', views.unsave_trip, name='unsave_trip'),
+    path('save/toggle/', views.toggle_save, name='toggle_save'),
     path('saved/', views.SavedTripsListView.as_view(), name='saved_trips'),
     
     # Share URLs
@@ -43,9 +50,11 @@ urlpatterns = [
     path('notifications/recent/', views.get_recent_notifications, name='recent_notifications'),
     path('notifications/settings/', views.get_notification_settings, name='notification_settings'),
     path('notifications/settings/update/', views.update_notification_settings, name='update_notification_settings'),
+    path('notifications/delivery-stats/', views.get_notification_delivery_stats, name='notification_delivery_stats'),
     
     # Stats URLs
     path('stats/user/<int:user_id>/', views.user_stats, name='user_stats'),
     path('stats/trip/<int:trip_id>/', views.trip_stats, name='trip_stats'),
+    path('stats/trip/<int:trip_id>/shares/', views.trip_share_stats, name='trip_share_stats'),
 ]
 
@@ -2,17 +2,31 @@
 Utility functions for real-time notifications
 """
 
+import bisect
 import json
 import logging
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Window
+from django.utils.dateparse import parse_datetime
 from .models import Notification
-from .serializers import NotificationSerializer
+from .serializers import notification_payload
+from .outbox import record_event
+from .locks import cache_lock
+from .presence import is_user_online, record_delivery
 
 User = get_user_model()
 logger = logging.getLogger(__name__)
 
+SOCKET_USER_CACHE_TIMEOUT = 300  # 5 دقائق
+NOTIFICATION_LOG_SIZE = 100
+NOTIFICATION_LOG_TIMEOUT = 60 * 60 * 24  # يوم واحد
+NOTIFICATION_LOG_LOCK_TIMEOUT = 5  # ثوانٍ، إذا توقف الـ relay أثناء الإضافة
+NOTIFICATION_LOG_LOCK_WAIT = 2
+
 
 def send_notification_to_user(user_id, notification_data):
     """
@@ -22,6 +36,12 @@ def send_notification_to_user(user_id, notification_data):
         user_id (int): معرف المستخدم
         notification_data (dict): بيانات الإشعار
     """
+    if not is_user_online(user_id):
+        record_delivery('skipped')
+        if notification_data.get('id'):
+            defer_notification(user_id, notification_data['id'])
+        return
+
     channel_layer = get_channel_layer()
     if channel_layer is None:
         logger.error("Channel layer not configured")
@@ -37,6 +57,7 @@ def send_notification_to_user(user_id, notification_data):
                 'notification': notification_data
             }
         )
+        record_delivery('sent')
         logger.info(f"Notification sent to user {user_id}")
     except Exception as e:
         logger.error(f"Failed to send notification to user {user_id}: {str(e)}")
@@ -50,6 +71,10 @@ def send_unread_count_update(user_id, unread_count):
         user_id (int): معرف المستخدم
         unread_count (int): عدد الإشعارات غير المقروءة
     """
+    if not is_user_online(user_id):
+        record_delivery('skipped')
+        return
+
     channel_layer = get_channel_layer()
     if channel_layer is None:
         logger.error("Channel layer not configured")
@@ -65,14 +90,148 @@ def send_unread_count_update(user_id, unread_count):
                 'unread_count': unread_count
             }
         )
+        record_delivery('sent')
         logger.info(f"Unread count update sent to user {user_id}: {unread_count}")
     except Exception as e:
         logger.error(f"Failed to send unread count update to user {user_id}: {str(e)}")
 
 
+def send_video_progress(user_id, progress_data):
+    """
+    إرسال حالة معالجة فيديو لصاحب الرحلة عبر WebSocket
+
+    التقدم لحظي ولا يُحفظ كإشعار، فلا يؤجل للمستخدمين غير المتصلين.
+
+    Args:
+        user_id (int): معرف المستخدم
+        progress_data (dict): video_id و trip_id و status و progress
+    """
+    if not is_user_online(user_id):
+        return
+
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        logger.error("Channel layer not configured")
+        return
+
+    try:
+        async_to_sync(channel_layer.group_send)(
+            f"user_{user_id}_notifications",
+            {
+                'type': 'video_progress',
+                'video': progress_data
+            }
+        )
+    except Exception as e:
+        logger.error(f"Failed to send video progress to user {user_id}: {str(e)}")
+
+
+def push_notification(notification_id):
+    """
+    إرسال إشعار محفوظ عبر WebSocket مع تحديث عدد غير المقروء
+
+    تُستدعى من OutboxRelay، وترفع أخطاء الـ channel layer حتى يُعاد
+    تسليم الحدث لاحقاً.
+
+    Args:
+        notification_id (int): معرف الإشعار
+
+    Returns:
+        bool: True إذا تم الإرسال
+    """
+    return push_notifications([notification_id]) == 1
+
+
+def push_notifications(notification_ids):
+    """
+    إرسال مجموعة إشعارات محفوظة (fan-out) باستعلام تحميل واحد
+
+    عدد غير المقروء يُحسب للمستخدمين المتصلين فقط باستعلام تجميع واحد.
+
+    Args:
+        notification_ids (list): معرفات الإشعارات
+
+    Returns:
+        int: عدد الإشعارات المرسلة
+    """
+    notifications = list(Notification.objects.select_related(
+        'sender', 'comment'
+    ).filter(id__in=notification_ids).order_by('id'))
+    if not notifications:
+        # حُذفت الإشعارات قبل التسليم (مثل إلغاء الإعجاب)
+        return 0
+
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        logger.error("Channel layer not configured")
+        return 0
+
+    online = []
+    for notification in notifications:
+        notification_data = notification_payload(notification)
+        append_to_notification_log(notification.recipient_id, notification_data)
+
+        # لا يوجد اتصال مفتوح: لا داعي لـ group_send ولا لحساب العدد
+        if not is_user_online(notification.recipient_id):
+            record_delivery('skipped')
+            defer_notification(notification.recipient_id, notification.id)
+            continue
+        online.append((notification, notification_data))
+
+    if not online:
+        return 0
+
+    unread_counts = dict(
+        Notification.objects.filter(
+            recipient_id__in={n.recipient_id for n, _ in online},
+            is_read=False
+        ).order_by().values('recipient_id').annotate(
+            total=Count('id')
+        ).values_list('recipient_id', 'total')
+    )
+
+    for notification, notification_data in online:
+        group_name = f"user_{notification.recipient_id}_notifications"
+        async_to_sync(channel_layer.group_send)(
+            group_name,
+            {
+                'type': 'notification_message',
+                'notification': notification_data
+            }
+        )
+        async_to_sync(channel_layer.group_send)(
+            group_name,
+            {
+                'type': 'unread_count_update',
+                'unread_count': unread_counts.get(notification.recipient_id, 0)
+            }
+        )
+        record_delivery('sent')
+    return len(online)
+
+
+def defer_notification(user_id, notification_id):
+    """
+    ترك إشعار مستخدم غير متصل لإعادة الإرسال عند اتصاله
+
+    الإشعار محفوظ في قاعدة البيانات وفي سجل الأحداث الحديثة، فيستلمه العميل
+    عند إعادة الاتصال بـ ?since=<آخر معرف>. لا توجد قناة push أو digest بعد،
+    لذلك يُحسب التأجيل في الإحصائيات فقط.
+
+    Args:
+        user_id (int): معرف المستخدم
+        notification_id (int): معرف الإشعار
+    """
+    record_delivery('deferred')
+    logger.debug(f"Notification {notification_id} deferred for offline user {user_id}")
+
+
 def create_and_send_notification(recipient, sender, notification_type, trip=None, comment=None):
     """
-    إنشاء إشعار جديد وإرساله فوراً عبر WebSocket
+    إنشاء إشعار جديد وتسجيل حدث إرساله في الـ outbox
+
+    يُكتب الإشعار والحدث في نفس الـ transaction، ويتولى OutboxRelay
+    الإرسال عبر WebSocket خارج مسار الطلب.
     
     Args:
         recipient (User): المستخدم المستقبل للإشعار
@@ -85,30 +244,21 @@ def create_and_send_notification(recipient, sender, notification_type, trip=None
         Notification: الإشعار المنشأ
     """
     try:
-        # إنشاء الإشعار
-        notification = Notification.objects.create(
-            recipient=recipient,
-            sender=sender,
-            notification_type=notification_type,
-            trip=trip,
-            comment=comment
-        )
-        
-        # تسلسل الإشعار
-        serializer = NotificationSerializer(notification)
-        notification_data = serializer.data
-        
-        # إرسال الإشعار عبر WebSocket
-        send_notification_to_user(recipient.id, notification_data)
-        
-        # إرسال تحديث عدد الإشعارات غير المقروءة
-        unread_count = Notification.objects.filter(
-            recipient=recipient,
-            is_read=False
-        ).count()
-        send_unread_count_update(recipient.id, unread_count)
+        with transaction.atomic():
+            notification = Notification.objects.create(
+                recipient=recipient,
+                sender=sender,
+                notification_type=notification_type,
+                trip=trip,
+                comment=comment
+            )
+            record_event(
+                'notification.created',
+                notification_id=notification.id,
+                recipient_id=recipient.id
+            )
         
-        logger.info(f"Notification created and sent: {notification.id}")
+        logger.info(f"Notification created and queued: {notification.id}")
         return notification
         
     except Exception as e:
@@ -116,6 +266,50 @@ def create_and_send_notification(recipient, sender, notification_type, trip=None
         return None
 
 
+def create_and_send_notifications(sender, notification_type, recipient_ids, trip_id=None):
+    """
+    إنشاء إشعار لعدة مستلمين في INSERT واحد مع حدث fan-out واحد
+
+    الإشعار المفرد يُسجَّل كحدث notification.created العادي.
+    يجب استدعاؤها داخل transaction الكتابة مثل record_event.
+
+    Args:
+        sender (User): المستخدم المرسل للإشعار
+        notification_type (str): نوع الإشعار
+        recipient_ids (list): معرفات المستلمين
+        trip_id (int, optional): معرف الرحلة المرتبطة بالإشعار
+
+    Returns:
+        list: الإشعارات المنشأة
+    """
+    if not recipient_ids:
+        return []
+
+    notifications = Notification.objects.bulk_create([
+        Notification(
+            recipient_id=recipient_id,
+            sender=sender,
+            notification_type=notification_type,
+            trip_id=trip_id
+        )
+        for recipient_id in recipient_ids
+    ])
+    if len(notifications) == 1:
+        record_event(
+            'notification.created',
+            notification_id=notifications[0].id,
+            recipient_id=notifications[0].recipient_id
+        )
+    else:
+        record_event(
+            'notification.batch_created',
+            notification_ids=[notification.id for notification in notifications],
+            sender_id=sender.id
+        )
+    logger.info(f"{len(notifications)} {notification_type} notifications created and queued")
+    return notifications
+
+
 def broadcast_notification_to_followers(sender, notification_type, trip=None, comment=None):
     """
     إرسال إشعار لجميع متابعي المستخدم
@@ -223,3 +417,216 @@ def mark_all_notifications_as_read_and_update(user_id):
     except Exception as e:
         logger.error(f"Failed to mark all notifications as read for user {user_id}: {str(e)}")
         return 0
+
+
+def resolve_socket_user(user_id):
+    """
+    الحصول على بيانات مستخدم WebSocket مع cache
+
+    عند إعادة اتصال آلاف العملاء بعد النشر، تُقرأ بيانات المستخدم من الـ cache
+    بدلاً من قاعدة البيانات.
+
+    Args:
+        user_id (int): معرف المستخدم من JWT token
+
+    Returns:
+        dict | None: {'id', 'username'} للمستخدم النشط، أو None
+    """
+    cache_key = f"ws_user:{user_id}"
+    user = cache.get(cache_key)
+    if user is None:
+        user = User.objects.filter(
+            id=user_id,
+            is_active=True
+        ).values('id', 'username').first()
+        if user is not None:
+            cache.set(cache_key, user, SOCKET_USER_CACHE_TIMEOUT)
+    return user
+
+
+def invalidate_socket_user(user_id):
+    """
+    حذف بيانات مستخدم WebSocket من الـ cache بعد تعديله أو حذفه
+
+    الحذف فوري وبعد الالتزام أيضاً: اتصال يقرأ المستخدم قبل التزام التعديل
+    قد يعيد القيمة القديمة إلى الـ cache.
+    """
+    cache_key = f"ws_user:{user_id}"
+    cache.delete(cache_key)
+    transaction.on_commit(lambda: cache.delete(cache_key))
+
+
+def get_notifications_bootstrap(user_id, limit=10):
+    """
+    بيانات بدء اتصال WebSocket في رحلة واحدة لقاعدة البيانات
+
+    أحدث الإشعارات غير المقروءة وعددها الكلي في استعلام واحد
+    (COUNT(*) OVER () يُحسب قبل تطبيق LIMIT).
+
+    Args:
+        user_id (int): معرف المستخدم
+        limit (int): عدد الإشعارات المرسلة
+
+    Returns:
+        dict | None: {'user', 'notifications', 'unread_count'}، أو None إذا لم يوجد المستخدم
+    """
+    user = resolve_socket_user(user_id)
+    if user is None:
+        return None
+
+    notifications = list(
+        Notification.objects.filter(
+            recipient_id=user_id,
+            is_read=False
+        ).select_related('sender', 'comment').annotate(
+            unread_total=Window(expression=Count('id'))
+        ).order_by('-created_at')[:limit]
+    )
+
+    return {
+        'user': user,
+        'notifications': [notification_payload(n) for n in notifications],
+        'unread_count': notifications[0].unread_total if notifications else 0,
+    }
+
+
+def _notification_log_key(user_id):
+    return f"notification_log:{user_id}"
+
+
+def _notification_log_lock(user_id):
+    """
+    قفل السجل لمستخدم واحد
+
+    عدة relays قد تضيف لنفس المستخدم في نفس اللحظة، وبدون القفل يكتب كل منها
+    نسخته من السجل فوق الأخرى.
+    """
+    return cache_lock(
+        f"{_notification_log_key(user_id)}:lock", NOTIFICATION_LOG_LOCK_TIMEOUT, NOTIFICATION_LOG_LOCK_WAIT
+    )
+
+
+def append_to_notification_log(user_id, payload):
+    """
+    إضافة إشعار إلى سجل الأحداث الحديثة للمستخدم (لإعادة الإرسال عند إعادة الاتصال)
+
+    السجل مرتب بمعرف الإشعار ومحدود بـ NOTIFICATION_LOG_SIZE، ويحتفظ بحد
+    complete_after: كل إشعار بعد هذا الحد موجود في السجل. الأحداث المعاد
+    إرسالها قد تصل بعد إشعارات أحدث منها، فتُدرج في موضعها لا في آخر السجل.
+
+    Args:
+        user_id (int): معرف المستخدم
+        payload (dict): تمثيل الإشعار من notification_payload
+    """
+    key = _notification_log_key(user_id)
+    with _notification_log_lock(user_id) as locked:
+        if not locked:
+            # لا يمكن الإضافة بأمان: حذف السجل يعيد الاستئناف لقاعدة البيانات
+            # بدلاً من سجل يدعي اكتمالاً غير صحيح
+            logger.warning(f"Notification log for user {user_id} is busy, dropping it")
+            cache.delete(key)
+            return
+
+        log = cache.get(key)
+        if log is None:
+            log = {
+                'complete_after_id': payload['id'] - 1,
+                'complete_after_at': payload['created_at'],
+                'events': [],
+            }
+
+        # إشعار قبل حد الاكتمال لا يُخدم من السجل أصلاً
+        if payload['id'] <= log['complete_after_id']:
+            return
+
+        ids = [event['id'] for event in log['events']]
+        position = bisect.bisect_left(ids, payload['id'])
+        # التسليم at-least-once قد يكرر نفس الإشعار
+        if position < len(ids) and ids[position] == payload['id']:
+            return
+        log['events'].insert(position, payload)
+
+        if len(log['events']) > NOTIFICATION_LOG_SIZE:
+            log['events'] = log['events'][-NOTIFICATION_LOG_SIZE:]
+            # الحد من أقدم إشعار باقٍ: معرف متأخر بينه وبين المحذوف لم يصل بعد
+            # لا يُعتبر مغطى
+            oldest = log['events'][0]
+            log['complete_after_id'] = oldest['id']
+            log['complete_after_at'] = oldest['created_at']
+
+        cache.set(key, log, NOTIFICATION_LOG_TIMEOUT)
+
+
+def parse_resume_cursor(since):
+    """
+    تحليل مؤشر الاستئناف: معرف آخر إشعار أو timestamp بصيغة ISO
+
+    Returns:
+        tuple | None: ('id', int) أو ('created_at', datetime)، أو None إذا كان غير صالح
+    """
+    if since is None:
+        return None
+    # '+' في offset المنطقة الزمنية يصل كمسافة إذا لم يُرمَّز في query string
+    since = str(since).strip().replace(' ', '+')
+    if since.isdigit():
+        return ('id', int(since))
+    try:
+        timestamp = parse_datetime(since)
+    except ValueError:
+        timestamp = None
+    if timestamp is None or timestamp.tzinfo is None:
+        return None
+    return ('created_at', timestamp)
+
+
+def get_notifications_replay(user_id, cursor, limit=NOTIFICATION_LOG_SIZE):
+    """
+    الإشعارات التي فاتت المستخدم بعد مؤشر الاستئناف
+
+    تُقرأ من سجل الأحداث الحديثة في الـ cache، ولا يتم الرجوع لقاعدة البيانات
+    إلا إذا كان السجل غير موجود أو مقتطعاً قبل المؤشر.
+
+    Args:
+        user_id (int): معرف المستخدم
+        cursor (tuple): ناتج parse_resume_cursor
+        limit (int): الحد الأقصى للإشعارات المرسلة من قاعدة البيانات
+
+    Returns:
+        dict | None: {'user', 'notifications', 'source', 'has_more'}، أو None إذا لم يوجد المستخدم
+    """
+    user = resolve_socket_user(user_id)
+    if user is None:
+        return None
+
+    field, value = cursor
+    log = cache.get(_notification_log_key(user_id))
+
+    if log is not None:
+        if field == 'id':
+            covered = value >= log['complete_after_id']
+            is_missed = lambda event: event['id'] > value
+        else:
+            covered = value >= parse_datetime(log['complete_after_at'])
+            is_missed = lambda event: parse_datetime(event['created_at']) > value
+
+        if covered:
+            return {
+                'user': user,
+                'notifications': [event for event in log['events'] if is_missed(event)],
+                'source': 'log',
+                'has_more': False,
+            }
+
+    notifications = list(
+        Notification.objects.filter(
+            recipient_id=user_id,
+            **{f'{field}__gt': value}
+        ).select_related('sender', 'comment').order_by('id')[:limit + 1]
+    )
+
+    return {
+        'user': user,
+        'notifications': [notification_payload(n) for n in notifications[:limit]],
+        'source': 'database',
+        'has_more': len(notifications) > limit,
+    }
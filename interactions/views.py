@@ -1,20 +1,29 @@
 from rest_framework import generics, status, permissions
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import PageNumberPagination, CursorPagination
+from rest_framework.fields import BooleanField
+from rest_framework.exceptions import ValidationError
 from django.contrib.auth import get_user_model
 from django.shortcuts import get_object_or_404
-from django.db.models import Q, Count
+from django.db.models import Q, F, Window
+from django.db.models.functions import RowNumber
 from django.db import transaction
 
-from .models import Follow, Like, Comment, Save, Share, Notification
+from .models import Follow, Like, Comment, Save, Notification
 from .serializers import (
-    FollowSerializer, LikeSerializer, CommentSerializer, 
-    SaveSerializer, ShareSerializer, NotificationSerializer,
-    UserStatsSerializer, TripStatsSerializer
+    FollowSerializer, LikeSerializer, CommentSerializer,
+    NotificationSerializer, CommentReplySerializer,
+    UserStatsSerializer, TripStatsSerializer, FeedTripSerializer, UserSummarySerializer
 )
+from .outbox import record_event, record_events
+from .utils import create_and_send_notifications
+from .relationships import ViewerRelationships
+from .follow_graph import get_follow_graph
+from .toggles import like_toggle, save_toggle
+from .shares import record_share, get_share_stats
 from trip.models import Trip
-from trip.serializers import TripSerializer
+from Rahala.conditional import bump_version
 
 User = get_user_model()
 
@@ -25,6 +34,52 @@ class StandardResultsSetPagination(PageNumberPagination):
     max_page_size = 100
 
 
+class RepliesCursorPagination(CursorPagination):
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('created_at', 'id')
+
+
+REPLY_PREVIEWS_PER_COMMENT = 3
+FOLLOW_SUGGESTIONS_LIMIT = 20
+MAX_FOLLOW_SUGGESTIONS = 50
+MUTUAL_FOLLOWERS_PREVIEW = 3
+SHARE_STATS_DEFAULT_DAYS = 7
+SHARE_STATS_MAX_DAYS = 90
+BULK_FOLLOW_LIMIT = 100
+
+
+def load_reply_previews(parent_ids, per_parent=REPLY_PREVIEWS_PER_COMMENT):
+    """
+    أول الردود المباشرة لكل تعليق في استعلام واحد
+
+    Args:
+        parent_ids (list): معرفات التعليقات الأب
+        per_parent (int): عدد الردود لكل تعليق
+
+    Returns:
+        dict: parent_id -> قائمة الردود مرتبة من الأقدم
+    """
+    if not parent_ids:
+        return {}
+
+    replies = Comment.objects.filter(
+        parent_id__in=parent_ids
+    ).select_related('user').annotate(
+        position=Window(
+            expression=RowNumber(),
+            partition_by=[F('parent_id')],
+            order_by=[F('created_at').asc(), F('id').asc()]
+        )
+    ).filter(position__lte=per_parent).order_by('parent_id', 'position')
+
+    previews = {}
+    for reply in replies:
+        previews.setdefault(reply.parent_id, []).append(reply)
+    return previews
+
+
 # Follow Views
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
@@ -42,18 +97,20 @@ def follow_user(request):
     if user_to_follow == request.user:
         return Response({'error': 'Cannot follow yourself'}, status=status.HTTP_400_BAD_REQUEST)
     
-    follow, created = Follow.objects.get_or_create(
-        follower=request.user,
-        following=user_to_follow
-    )
+    # الإشعار يُنشأ عبر signal داخل نفس الـ transaction
+    with transaction.atomic():
+        follow, created = Follow.objects.get_or_create(
+            follower=request.user,
+            following=user_to_follow
+        )
+        if created:
+            record_event(
+                'follow.created',
+                follower_id=request.user.id,
+                following_id=user_to_follow.id
+            )
     
     if created:
-        # إنشاء إشعار
-        Notification.objects.create(
-            recipient=user_to_follow,
-            sender=request.user,
-            notification_type='follow'
-        )
         return Response({'message': 'User followed successfully'}, status=status.HTTP_201_CREATED)
     else:
         return Response({'message': 'Already following this user'}, status=status.HTTP_200_OK)
@@ -73,13 +130,146 @@ def unfollow_user(request):
         return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
     
     try:
-        follow = Follow.objects.get(follower=request.user, following=user_to_unfollow)
-        follow.delete()
+        with transaction.atomic():
+            follow = Follow.objects.get(follower=request.user, following=user_to_unfollow)
+            follow.delete()
+            record_event(
+                'follow.deleted',
+                follower_id=request.user.id,
+                following_id=user_to_unfollow.id
+            )
         return Response({'message': 'User unfollowed successfully'}, status=status.HTTP_200_OK)
     except Follow.DoesNotExist:
         return Response({'error': 'Not following this user'}, status=status.HTTP_400_BAD_REQUEST)
 
 
+def _parse_user_ids(values):
+    """تحويل قائمة المعرفات إلى مجموعة أعداد صحيحة (None عند خطأ في الصيغة)"""
+    if not isinstance(values, list):
+        return None
+    try:
+        return {int(value) for value in values}
+    except (TypeError, ValueError):
+        return None
+
+
+def _insert_follows(follower_id, following_ids):
+    """
+    إدراج متابعات في INSERT واحد مع تجاهل الموجود منها
+
+    bulk_create(ignore_conflicts=True) لا يعيد ما أُدرج فعلاً، فتُقرأ الصفوف
+    بعده: auto_now_add يعطي كل كائن وقت إنشائه، والصف الذي كان موجوداً أو أدرجه
+    طلب متزامن يحمل وقتاً آخر.
+
+    Returns:
+        set: معرفات المتابَعين الذين أُدرجت متابعتهم في هذا الاستدعاء
+    """
+    if not following_ids:
+        return set()
+    follows = Follow.objects.bulk_create(
+        [Follow(follower_id=follower_id, following_id=user_id) for user_id in following_ids],
+        ignore_conflicts=True
+    )
+    created_at = {follow.following_id: follow.created_at for follow in follows}
+    return {
+        user_id
+        for user_id, stored in Follow.objects.filter(
+            follower_id=follower_id, following_id__in=following_ids
+        ).values_list('following_id', 'created_at')
+        if stored == created_at[user_id]
+    }
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def bulk_follow(request):
+    """
+    متابعة عدة مستخدمين في طلب واحد (شاشات التعريف واستيراد المتابعات)
+
+    يقبل user_ids و/أو usernames، ويتحقق من المستخدمين باستعلام واحد
+    ويدرج المتابعات الجديدة دفعة واحدة مع حدث إشعارات واحد.
+    """
+    user_ids = _parse_user_ids(request.data.get('user_ids', []))
+    usernames = request.data.get('usernames', [])
+    if user_ids is None or not isinstance(usernames, list):
+        return Response({'error': 'user_ids and usernames must be lists'}, status=status.HTTP_400_BAD_REQUEST)
+    if not user_ids and not usernames:
+        return Response({'error': 'user_ids or usernames is required'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(user_ids) + len(usernames) > BULK_FOLLOW_LIMIT:
+        return Response(
+            {'error': f'Cannot follow more than {BULK_FOLLOW_LIMIT} users at once'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    found = dict(
+        User.objects.filter(
+            Q(id__in=user_ids) | Q(username__in=usernames)
+        ).values_list('id', 'username')
+    )
+    not_found = sorted(user_ids - found.keys()) + sorted(set(usernames) - set(found.values()), key=str)
+    targets = found.keys() - {request.user.id}
+
+    # المتابعات والأحداث والإشعارات في نفس الـ transaction
+    with transaction.atomic():
+        # الصفوف التي أدرجها هذا الطلب فعلاً: طلب متزامن لنفس المتابعة يجد
+        # التعارض فلا يكرر الحدث والإشعار
+        followed = sorted(_insert_follows(request.user.id, targets))
+        already_following = targets - set(followed)
+
+        # الإدراج المباشر لا يرسل post_save، فالإشعارات تُنشأ هنا دفعة واحدة
+        record_events('follow.created', [
+            {'follower_id': request.user.id, 'following_id': user_id} for user_id in followed
+        ])
+        if followed:
+            bump_version(f"user:{request.user.id}", *(f"user:{user_id}" for user_id in followed))
+
+        already_notified = set(
+            Notification.objects.filter(
+                sender=request.user,
+                notification_type='follow',
+                recipient_id__in=followed
+            ).values_list('recipient_id', flat=True)
+        )
+        create_and_send_notifications(
+            sender=request.user,
+            notification_type='follow',
+            recipient_ids=[user_id for user_id in followed if user_id not in already_notified]
+        )
+
+    return Response(
+        {
+            'followed': followed,
+            'already_following': sorted(already_following),
+            'not_found': not_found
+        },
+        status=status.HTTP_201_CREATED if followed else status.HTTP_200_OK
+    )
+
+
+@api_view(['DELETE'])
+@permission_classes([permissions.IsAuthenticated])
+def bulk_unfollow(request):
+    """إلغاء متابعة عدة مستخدمين في طلب واحد"""
+    user_ids = _parse_user_ids(request.data.get('user_ids'))
+    if not user_ids:
+        return Response({'error': 'user_ids is required'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(user_ids) > BULK_FOLLOW_LIMIT:
+        return Response(
+            {'error': f'Cannot unfollow more than {BULK_FOLLOW_LIMIT} users at once'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    with transaction.atomic():
+        follows = Follow.objects.filter(follower=request.user, following_id__in=user_ids)
+        unfollowed = sorted(follows.values_list('following_id', flat=True))
+        follows.delete()
+        record_events('follow.deleted', [
+            {'follower_id': request.user.id, 'following_id': user_id} for user_id in unfollowed
+        ])
+
+    return Response({'unfollowed': unfollowed}, status=status.HTTP_200_OK)
+
+
 class FollowersListView(generics.ListAPIView):
     """قائمة المتابعين"""
     serializer_class = FollowSerializer
@@ -100,57 +290,125 @@ class FollowingListView(generics.ListAPIView):
         return Follow.objects.filter(follower_id=user_id).select_related('follower', 'following')
 
 
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def follow_suggestions(request):
+    """اقتراحات "أشخاص قد تعرفهم" من أصدقاء الأصدقاء"""
+    try:
+        limit = int(request.query_params.get('limit', FOLLOW_SUGGESTIONS_LIMIT))
+    except ValueError:
+        limit = FOLLOW_SUGGESTIONS_LIMIT
+    limit = max(1, min(limit, MAX_FOLLOW_SUGGESTIONS))
+
+    suggestions = get_follow_graph().suggestions(request.user.id, limit=limit)
+    users = User.objects.filter(is_active=True).in_bulk([user_id for user_id, _ in suggestions])
+
+    results = [
+        {
+            'user': UserSummarySerializer(users[user_id]).data,
+            'mutual_count': mutual_count
+        }
+        for user_id, mutual_count in suggestions
+        if user_id in users
+    ]
+    return Response({'results': results})
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def mutual_followers(request, user_id):
+    """من يتابعهم المستخدم الحالي ويتابعون المستخدم المطلوب"""
+    if not User.objects.filter(id=user_id).exists():
+        return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    mutual_ids = get_follow_graph().mutual_followers(request.user.id, user_id)
+    preview = User.objects.filter(
+        id__in=mutual_ids[:MUTUAL_FOLLOWERS_PREVIEW].tolist()
+    ).order_by('id')
+
+    return Response({
+        'count': int(mutual_ids.size),
+        'users': UserSummarySerializer(preview, many=True).data
+    })
+
+
+def _parse_trip_id(value):
+    """تحويل trip_id إلى عدد صحيح (None إذا كان مفقوداً أو غير صالح)"""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _toggle_interaction(request, toggle, state_field, count_field):
+    """ضبط علاقة المستخدم بالرحلة إلى الحالة المطلوبة في state_field"""
+    trip_id = _parse_trip_id(request.data.get('trip_id'))
+    if trip_id is None:
+        return Response({'error': 'trip_id is required'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        active = BooleanField().to_internal_value(request.data.get(state_field))
+    except ValidationError:
+        return Response({'error': f'{state_field} must be true or false'}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        changed, count = toggle.set(request.user, trip_id, active)
+    except Trip.DoesNotExist:
+        return Response({'error': 'Trip not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    return Response({
+        'trip_id': trip_id,
+        state_field: active,
+        count_field: count,
+        'changed': changed
+    }, status=status.HTTP_200_OK)
+
+
 # Like Views
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
 def like_trip(request):
     """إعجاب برحلة"""
-    trip_id = request.data.get('trip_id')
-    if not trip_id:
+    trip_id = _parse_trip_id(request.data.get('trip_id'))
+    if trip_id is None:
         return Response({'error': 'trip_id is required'}, status=status.HTTP_400_BAD_REQUEST)
     
     try:
-        trip = Trip.objects.get(id=trip_id)
+        created, likes_count = like_toggle.set(request.user, trip_id, True)
     except Trip.DoesNotExist:
         return Response({'error': 'Trip not found'}, status=status.HTTP_404_NOT_FOUND)
     
-    like, created = Like.objects.get_or_create(user=request.user, trip=trip)
-    
     if created:
-        # إنشاء إشعار إذا لم يكن المستخدم يعجب بمنشوره الخاص
-        if trip.user != request.user:
-            Notification.objects.create(
-                recipient=trip.user,
-                sender=request.user,
-                notification_type='like',
-                trip=trip
-            )
-        return Response({'message': 'Trip liked successfully'}, status=status.HTTP_201_CREATED)
+        return Response({'message': 'Trip liked successfully', 'likes_count': likes_count}, status=status.HTTP_201_CREATED)
     else:
-        return Response({'message': 'Already liked this trip'}, status=status.HTTP_200_OK)
+        return Response({'message': 'Already liked this trip', 'likes_count': likes_count}, status=status.HTTP_200_OK)
 
 
 @api_view(['DELETE'])
 @permission_classes([permissions.IsAuthenticated])
 def unlike_trip(request):
     """إلغاء الإعجاب برحلة"""
-    trip_id = request.data.get('trip_id')
-    if not trip_id:
+    trip_id = _parse_trip_id(request.data.get('trip_id'))
+    if trip_id is None:
         return Response({'error': 'trip_id is required'}, status=status.HTTP_400_BAD_REQUEST)
     
     try:
-        trip = Trip.objects.get(id=trip_id)
+        deleted, likes_count = like_toggle.set(request.user, trip_id, False)
     except Trip.DoesNotExist:
         return Response({'error': 'Trip not found'}, status=status.HTTP_404_NOT_FOUND)
     
-    try:
-        like = Like.objects.get(user=request.user, trip=trip)
-        like.delete()
-        return Response({'message': 'Trip unliked successfully'}, status=status.HTTP_200_OK)
-    except Like.DoesNotExist:
+    if deleted:
+        return Response({'message': 'Trip unliked successfully', 'likes_count': likes_count}, status=status.HTTP_200_OK)
+    else:
         return Response({'error': 'Not liked this trip'}, status=status.HTTP_400_BAD_REQUEST)
 
 
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def toggle_like(request):
+    """ضبط حالة الإعجاب (idempotent) وإرجاع الحالة الجديدة مع العداد"""
+    return _toggle_interaction(request, like_toggle, 'liked', 'likes_count')
+
+
 class TripLikesListView(generics.ListAPIView):
     """قائمة المعجبين برحلة"""
     serializer_class = LikeSerializer
@@ -175,21 +433,14 @@ class CommentCreateView(generics.CreateAPIView):
     def perform_create(self, serializer):
         trip_id = self.request.data.get('trip_id')
         trip = get_object_or_404(Trip, id=trip_id)
-        comment = serializer.save(user=self.request.user, trip=trip)
-        
-        # إنشاء إشعار
-        if trip.user != self.request.user:
-            Notification.objects.create(
-                recipient=trip.user,
-                sender=self.request.user,
-                notification_type='comment',
-                trip=trip,
-                comment=comment
-            )
+
+        # الإشعار يُنشأ عبر signal داخل نفس الـ transaction
+        with transaction.atomic():
+            serializer.save(user=self.request.user, trip=trip)
 
 
 class TripCommentsListView(generics.ListAPIView):
-    """قائمة تعليقات رحلة"""
+    """قائمة تعليقات رحلة - التعليقات الرئيسية مع أول الردود لكل منها"""
     serializer_class = CommentSerializer
     pagination_class = StandardResultsSetPagination
     
@@ -198,7 +449,45 @@ class TripCommentsListView(generics.ListAPIView):
         return Comment.objects.filter(
             trip_id=trip_id, 
             parent__isnull=True
-        ).select_related('user').prefetch_related('replies')
+        ).select_related('user')
+
+    def list(self, request, *args, **kwargs):
+        page = self.paginate_queryset(self.get_queryset())
+        comments = page if page is not None else list(self.get_queryset())
+
+        context = self.get_serializer_context()
+        context['reply_previews'] = load_reply_previews([c.id for c in comments])
+        serializer = self.get_serializer_class()(comments, many=True, context=context)
+
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
+
+
+class CommentRepliesListView(generics.ListAPIView):
+    """
+    باقي الردود المباشرة على تعليق (cursor pagination)
+
+    ?after=<معرف آخر رد في المعاينة> يبدأ بعد الردود المعروضة مع التعليق
+    (load_reply_previews) بنفس الترتيب، فلا تتكرر. دونه تُعاد كل الردود.
+    """
+    serializer_class = CommentReplySerializer
+    pagination_class = RepliesCursorPagination
+
+    def get_queryset(self):
+        replies = Comment.objects.filter(
+            parent_id=self.kwargs['comment_id']
+        ).select_related('user')
+
+        after = self.request.query_params.get('after')
+        if after is None:
+            return replies
+        last = replies.filter(id=after).values('created_at', 'id').first() if after.isdigit() else None
+        if last is None:
+            raise ValidationError({'after': 'Must be the id of a reply to this comment.'})
+        return replies.filter(
+            Q(created_at__gt=last['created_at']) | Q(created_at=last['created_at'], id__gt=last['id'])
+        )
 
 
 class CommentUpdateView(generics.UpdateAPIView):
@@ -223,53 +512,56 @@ class CommentDeleteView(generics.DestroyAPIView):
 @permission_classes([permissions.IsAuthenticated])
 def save_trip(request):
     """حفظ رحلة"""
-    trip_id = request.data.get('trip_id')
-    if not trip_id:
+    trip_id = _parse_trip_id(request.data.get('trip_id'))
+    if trip_id is None:
         return Response({'error': 'trip_id is required'}, status=status.HTTP_400_BAD_REQUEST)
     
     try:
-        trip = Trip.objects.get(id=trip_id)
+        created, saves_count = save_toggle.set(request.user, trip_id, True)
     except Trip.DoesNotExist:
         return Response({'error': 'Trip not found'}, status=status.HTTP_404_NOT_FOUND)
     
-    save, created = Save.objects.get_or_create(user=request.user, trip=trip)
-    
     if created:
-        return Response({'message': 'Trip saved successfully'}, status=status.HTTP_201_CREATED)
+        return Response({'message': 'Trip saved successfully', 'saves_count': saves_count}, status=status.HTTP_201_CREATED)
     else:
-        return Response({'message': 'Already saved this trip'}, status=status.HTTP_200_OK)
+        return Response({'message': 'Already saved this trip', 'saves_count': saves_count}, status=status.HTTP_200_OK)
 
 
 @api_view(['DELETE'])
 @permission_classes([permissions.IsAuthenticated])
 def unsave_trip(request):
     """إلغاء حفظ رحلة"""
-    trip_id = request.data.get('trip_id')
-    if not trip_id:
+    trip_id = _parse_trip_id(request.data.get('trip_id'))
+    if trip_id is None:
         return Response({'error': 'trip_id is required'}, status=status.HTTP_400_BAD_REQUEST)
     
     try:
-        trip = Trip.objects.get(id=trip_id)
+        deleted, saves_count = save_toggle.set(request.user, trip_id, False)
     except Trip.DoesNotExist:
         return Response({'error': 'Trip not found'}, status=status.HTTP_404_NOT_FOUND)
     
-    try:
-        save = Save.objects.get(user=request.user, trip=trip)
-        save.delete()
-        return Response({'message': 'Trip unsaved successfully'}, status=status.HTTP_200_OK)
-    except Save.DoesNotExist:
+    if deleted:
+        return Response({'message': 'Trip unsaved successfully', 'saves_count': saves_count}, status=status.HTTP_200_OK)
+    else:
         return Response({'error': 'Not saved this trip'}, status=status.HTTP_400_BAD_REQUEST)
 
 
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def toggle_save(request):
+    """ضبط حالة الحفظ (idempotent) وإرجاع الحالة الجديدة مع العداد"""
+    return _toggle_interaction(request, save_toggle, 'saved', 'saves_count')
+
+
 class SavedTripsListView(generics.ListAPIView):
     """قائمة الرحلات المحفوظة"""
-    serializer_class = TripSerializer
+    serializer_class = FeedTripSerializer
     permission_classes = [permissions.IsAuthenticated]
     pagination_class = StandardResultsSetPagination
     
     def get_queryset(self):
         saved_trips = Save.objects.filter(user=self.request.user).values_list('trip_id', flat=True)
-        return Trip.objects.filter(id__in=saved_trips).select_related('user').prefetch_related('images', 'videos')
+        return Trip.objects.filter(id__in=saved_trips).select_related('user').prefetch_related('images', 'videos', 'tags')
 
 
 # Share Views
@@ -277,33 +569,26 @@ class SavedTripsListView(generics.ListAPIView):
 @permission_classes([permissions.IsAuthenticated])
 def share_trip(request):
     """مشاركة رحلة"""
-    trip_id = request.data.get('trip_id')
-    if not trip_id:
+    trip_id = _parse_trip_id(request.data.get('trip_id'))
+    if trip_id is None:
         return Response({'error': 'trip_id is required'}, status=status.HTTP_400_BAD_REQUEST)
     
     try:
-        trip = Trip.objects.get(id=trip_id)
+        user_shares, shares_count = record_share(request.user, trip_id)
     except Trip.DoesNotExist:
         return Response({'error': 'Trip not found'}, status=status.HTTP_404_NOT_FOUND)
     
-    share = Share.objects.create(user=request.user, trip=trip)
-    
-    # إنشاء إشعار
-    if trip.user != request.user:
-        Notification.objects.create(
-            recipient=trip.user,
-            sender=request.user,
-            notification_type='share',
-            trip=trip
-        )
-    
-    return Response({'message': 'Trip shared successfully'}, status=status.HTTP_201_CREATED)
+    return Response({
+        'message': 'Trip shared successfully',
+        'shares_count': shares_count,
+        'user_shares_count': user_shares
+    }, status=status.HTTP_201_CREATED)
 
 
 # Feed Views
 class FeedView(generics.ListAPIView):
     """الخلاصة الرئيسية - منشورات المتابَعين"""
-    serializer_class = TripSerializer
+    serializer_class = FeedTripSerializer
     permission_classes = [permissions.IsAuthenticated]
     pagination_class = StandardResultsSetPagination
     
@@ -319,20 +604,18 @@ class FeedView(generics.ListAPIView):
         return Trip.objects.filter(
             user_id__in=user_ids
         ).select_related('user').prefetch_related(
-            'images', 'videos', 'likes', 'comments', 'saves'
+            'images', 'videos', 'tags'
         ).order_by('-created_at')
 
 
 class ExploreView(generics.ListAPIView):
     """استكشاف المنشورات"""
-    serializer_class = TripSerializer
+    serializer_class = FeedTripSerializer
     pagination_class = StandardResultsSetPagination
     
     def get_queryset(self):
         return Trip.objects.all().select_related('user').prefetch_related(
-            'images', 'videos', 'likes', 'comments', 'saves'
-        ).annotate(
-            likes_count=Count('likes')
+            'images', 'videos', 'tags'
         ).order_by('-likes_count', '-created_at')
 
 
@@ -344,9 +627,9 @@ class NotificationListView(generics.ListAPIView):
     pagination_class = StandardResultsSetPagination
     
     def get_queryset(self):
-        return Notification.objects.filter(
-            recipient=self.request.user
-        ).select_related('sender', 'trip', 'comment')
+        return NotificationSerializer.setup_eager_loading(
+            Notification.objects.filter(recipient=self.request.user)
+        )
 
 
 @api_view(['POST'])
@@ -395,14 +678,14 @@ def get_recent_notifications(request):
     """الحصول على أحدث الإشعارات (مقروءة وغير مقروءة)"""
     limit = int(request.GET.get('limit', 20))
 
-    notifications = Notification.objects.filter(
-        recipient=request.user
-    ).select_related('sender', 'trip', 'comment').order_by('-created_at')[:limit]
+    notifications = list(NotificationSerializer.setup_eager_loading(
+        Notification.objects.filter(recipient=request.user)
+    ).order_by('-created_at')[:limit])
 
     serializer = NotificationSerializer(notifications, many=True)
     return Response({
         'notifications': serializer.data,
-        'count': notifications.count()
+        'count': len(notifications)
     }, status=status.HTTP_200_OK)
 
 
@@ -466,6 +749,15 @@ def update_notification_settings(request):
     return Response({'message': 'Settings updated successfully'}, status=status.HTTP_200_OK)
 
 
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def get_notification_delivery_stats(request):
+    """إحصائيات إرسال الإشعارات عبر WebSocket (المرسلة والمتجنبة للمستخدمين غير المتصلين)"""
+    from .presence import get_delivery_stats
+
+    return Response(get_delivery_stats(), status=status.HTTP_200_OK)
+
+
 # Stats Views
 @api_view(['GET'])
 def user_stats(request, user_id):
@@ -479,12 +771,7 @@ def user_stats(request, user_id):
     following_count = Follow.objects.filter(follower=user).count()
     trips_count = Trip.objects.filter(user=user).count()
     
-    is_following = False
-    if request.user.is_authenticated:
-        is_following = Follow.objects.filter(
-            follower=request.user, 
-            following=user
-        ).exists()
+    is_following = ViewerRelationships(request.user).is_following(user.id)
     
     stats = {
         'followers_count': followers_count,
@@ -505,25 +792,37 @@ def trip_stats(request, trip_id):
     except Trip.DoesNotExist:
         return Response({'error': 'Trip not found'}, status=status.HTTP_404_NOT_FOUND)
     
-    likes_count = Like.objects.filter(trip=trip).count()
     comments_count = Comment.objects.filter(trip=trip).count()
-    saves_count = Save.objects.filter(trip=trip).count()
-    shares_count = Share.objects.filter(trip=trip).count()
     
-    is_liked = False
-    is_saved = False
-    if request.user.is_authenticated:
-        is_liked = Like.objects.filter(user=request.user, trip=trip).exists()
-        is_saved = Save.objects.filter(user=request.user, trip=trip).exists()
+    relationships = ViewerRelationships(request.user)
+    is_liked = relationships.is_liked(trip.id)
+    is_saved = relationships.is_saved(trip.id)
     
     stats = {
-        'likes_count': likes_count,
+        'likes_count': trip.likes_count,
         'comments_count': comments_count,
-        'saves_count': saves_count,
-        'shares_count': shares_count,
+        'saves_count': trip.saves_count,
+        'shares_count': trip.shares_count,
         'is_liked': is_liked,
         'is_saved': is_saved
     }
     
     serializer = TripStatsSerializer(stats)
     return Response(serializer.data)
+
+
+@api_view(['GET'])
+def trip_share_stats(request, trip_id):
+    """إحصائيات مشاركة الرحلة: الإجمالي وعدادات الساعات خلال الفترة"""
+    try:
+        trip = Trip.objects.get(id=trip_id)
+    except Trip.DoesNotExist:
+        return Response({'error': 'Trip not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    try:
+        days = int(request.query_params.get('days', SHARE_STATS_DEFAULT_DAYS))
+    except ValueError:
+        days = SHARE_STATS_DEFAULT_DAYS
+    days = max(1, min(days, SHARE_STATS_MAX_DAYS))
+
+    return Response(get_share_stats(trip, days=days))
@@ -2,7 +2,7 @@ from rest_framework import generics, status, permissions
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from django.shortcuts import get_object_or_404
-from django.db.models import Q, Sum, Count
+from django.db.models import Q, Sum, Count, Max
 from django.utils import timezone
 from .models import PromotionPlan, PromotionRequest, ActivePromotion, PromotionCommission
 from .serializers import (
@@ -17,6 +17,7 @@ from .serializers import (
     TripPromotionInfoSerializer
 )
 from trip.models import Trip
+from Rahala.conditional import ConditionalGetMixin
 from accounts.services import PayMobService
 from accounts.models import Payment
 from .services import PromotionPaymentService, PromotionManagementService
@@ -26,11 +27,17 @@ logger = logging.getLogger(__name__)
 
 # Create your views here.
 
-class PromotionPlanListView(generics.ListAPIView):
+class PromotionPlanListView(ConditionalGetMixin, generics.ListAPIView):
     """عرض قائمة خطط الترويج المتاحة"""
     queryset = PromotionPlan.objects.filter(is_active=True)
     serializer_class = PromotionPlanSerializer
     permission_classes = [permissions.AllowAny]
+    cache_control = 'public, max-age=300'
+
+    def get_etag_version(self, request):
+        # العدد يكشف حذف خطة، وupdated_at يكشف أي تعديل أو إضافة
+        stats = self.get_queryset().aggregate(last=Max('updated_at'), count=Count('id'))
+        return stats['last'], stats['count']
 
 
 class CreatePromotionRequestView(APIView):
@@ -5,12 +5,13 @@ from rest_framework.permissions import AllowAny
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.exceptions import ValidationError
 from django.contrib.auth import get_user_model
-from django.db.models import Q, Count
+from django.db.models import Q, Count, Max, Sum
 from django.core.exceptions import ObjectDoesNotExist
 from accounts.serializers import UserSearchSerializer
 from trip.models import TripTag
 from trip.serializers import TripTagSerializer
 from .models import SearchHistory, PopularSearch
+from Rahala.conditional import ConditionalGetMixin
 from django.core.cache import cache
 from django.utils.encoding import force_str
 import hashlib
@@ -618,9 +619,16 @@ class ClearSearchHistoryView(APIView):
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-class PopularSearchesView(APIView):
+class PopularSearchesView(ConditionalGetMixin, APIView):
     """الكلمات الشائعة في البحث"""
     permission_classes = [AllowAny]
+    cache_control = 'public, max-age=60'
+
+    def get_etag_version(self, request):
+        stats = PopularSearch.objects.aggregate(
+            last=Max('last_searched'), total=Sum('search_count')
+        )
+        return stats['last'], stats['total']
 
     def get(self, request):
         try:
@@ -58,6 +58,8 @@ Return ONLY valid JSON (no extra text):
 {{
   "country": "Country in Arabic",
   "city": "City in Arabic",
+  "latitude": 0.0,
+  "longitude": 0.0,
   "tourism_info": {{
     "description": "Brief tourism description in Arabic (max 80 words)",
     "recommended_places": [
@@ -80,6 +82,7 @@ Return ONLY valid JSON (no extra text):
   }}
 }}
 
+latitude / longitude are the decimal coordinates of the city centre.
 Keep descriptions short and concise. Return ONLY JSON."""
     
     def _call_openrouter_api(self, prompt: str) -> Optional[str]:
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class TripConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'trip'
+
+    def ready(self):
+        import trip.signals
+        import trip.image_variants  # تسجيل مستهلك trip_image.created
@@ -0,0 +1,176 @@
+"""
+إنشاء الرحلات ووسائطها ووسومها بعدد ثابت من الاستعلامات
+
+الصور والفيديوهات والوسوم تُدرج بـ bulk_create داخل transaction واحد، فرحلة بعشر
+صور وثمانية وسوم لا تكلف عشرات الاستعلامات، والفشل في منتصفها لا يترك رحلة ناقصة.
+
+bulk_create لا يطلق post_save، لذلك تنفذ save_media و add_tags ما تفعله إشارات
+trip/signals.py دفعة واحدة: مراجع الملفات (retain_blobs)، وأحداث الـ outbox لتوليد
+نسخ الصور (record_events)، وإبطال مستند الرحلة.
+"""
+
+from django.db import transaction
+
+from Rahala.conditional import bump_version
+from interactions.outbox import record_events
+from . import destinations
+from .geo import geocode, location_fields, valid_coordinates
+from .models import Trip, TripImage, TripVideo, TripTag
+from .read_model import TRIPS_SCOPE, invalidate_trip
+from .storage import retain_blobs
+from .uploads import attach_uploads
+
+# أقصى عدد رحلات في طلب استيراد واحد
+MAX_IMPORT_BATCH = 100
+
+
+def save_media(images=(), videos=()):
+    """
+    إدراج TripImage و TripVideo غير محفوظة دفعة واحدة
+
+    الملفات غير المحفوظة بعد تُكتب في التخزين أثناء الإدراج (pre_save).
+    يجب استدعاؤها داخل transaction.
+
+    Returns:
+        tuple: (قائمة TripImage، قائمة TripVideo) بعد تعيين معرفاتها
+    """
+    images = TripImage.objects.bulk_create(images)
+    videos = TripVideo.objects.bulk_create(videos)
+
+    retain_blobs(
+        [(image.image.name, image.image.size) for image in images if image.image]
+        + [(video.video.name, video.video.size) for video in videos if video.video]
+    )
+    if images:
+        record_events('trip_image.created', [
+            {'image_id': image.id, 'trip_id': image.trip_id} for image in images
+        ])
+    trip_ids = {media.trip_id for media in (*images, *videos)}
+    for trip_id in trip_ids:
+        invalidate_trip(trip_id)
+    if trip_ids:
+        bump_version(TRIPS_SCOPE)
+    return images, videos
+
+
+def add_media(trip, images=(), videos=()):
+    """
+    إضافة ملفات مرفوعة (UploadedFile) كوسائط للرحلة
+
+    Returns:
+        tuple: (قائمة TripImage، قائمة TripVideo)
+    """
+    return save_media(
+        [TripImage(trip=trip, image=image) for image in images],
+        [TripVideo(trip=trip, video=video) for video in videos],
+    )
+
+
+def _tag_rows(trip, names):
+    # الوسوم المكررة أو الفارغة في نفس الطلب تُحذف مع الحفاظ على الترتيب
+    names = dict.fromkeys(name.strip() for name in names if name and name.strip())
+    return [TripTag(trip=trip, tripTag=name) for name in names]
+
+
+def add_tags(trip, names):
+    """
+    إضافة وسوم لرحلة جديدة في INSERT واحد
+
+    Returns:
+        list: TripTag المنشأة
+    """
+    tags = TripTag.objects.bulk_create(_tag_rows(trip, names))
+    if tags:
+        invalidate_trip(trip.id)
+        bump_version(TRIPS_SCOPE)
+        destinations.change_tags([(trip, tag.tripTag) for tag in tags], 1)
+    return tags
+
+
+def create_trip(user, location, caption='', country='', city='', tourism_info=None,
+                coordinates=None, images=(), videos=(), tags=(), upload_ids=()):
+    """
+    إنشاء رحلة مع وسائطها ووسومها كوحدة واحدة
+
+    Args:
+        images / videos: ملفات مرفوعة مع الطلب
+        coordinates (tuple, optional): (latitude, longitude)؛ عند غيابها تؤخذ
+            من قاموس المدن المحلي
+        tags (list[str]): أسماء الوسوم
+        upload_ids (list): رفعات مكتملة عبر /uploads/
+
+    Returns:
+        Trip: الرحلة المنشأة
+
+    Raises:
+        UploadError: رفع غير صالح (لا يُنشأ شيء)
+    """
+    with transaction.atomic():
+        trip = Trip.objects.create(
+            user=user,
+            caption=caption or '',
+            location=location,
+            country=country,
+            city=city,
+            tourism_info=tourism_info or {},
+            **location_fields(coordinates or geocode(location, city)),
+        )
+        add_media(trip, images, videos)
+        attach_uploads(trip, user, upload_ids)
+        add_tags(trip, tags)
+    return trip
+
+
+def import_trips(user, rows):
+    """
+    إنشاء عدة رحلات دفعة واحدة (ترحيل محتوى أو استيراد)
+
+    الرحلات والوسوم والوسائط تُدرج بـ bulk_create لكل جدول، والرفعات تُربط
+    بكل رحلة. إما أن تُنشأ كل الرحلات أو لا شيء. لا يُستدعى الـ AI هنا:
+    country و city و tourism_info والإحداثيات تؤخذ كما هي من البيانات، وعند
+    غياب الإحداثيات من قاموس المدن.
+
+    Args:
+        rows (list[dict]): لكل رحلة location و caption و country و city
+            و tourism_info و latitude و longitude و tags و images و videos
+            (ملفات) و upload_ids
+
+    Returns:
+        list: الرحلات المنشأة بنفس الترتيب
+
+    Raises:
+        UploadError: رفع غير صالح في أي رحلة
+    """
+    with transaction.atomic():
+        trips = Trip.objects.bulk_create([
+            Trip(
+                user=user,
+                caption=row.get('caption') or '',
+                location=row['location'],
+                country=row.get('country', ''),
+                city=row.get('city', ''),
+                tourism_info=row.get('tourism_info') or {},
+                **location_fields(
+                    valid_coordinates(row.get('latitude'), row.get('longitude'))
+                    or geocode(row['location'], row.get('city', ''))
+                ),
+            )
+            for row in rows
+        ])
+
+        tags = TripTag.objects.bulk_create([
+            tag for trip, row in zip(trips, rows) for tag in _tag_rows(trip, row.get('tags', []))
+        ])
+        # ملخصات الوجهات دفعة واحدة بدلاً من post_save لكل رحلة وتاج
+        destinations.add_trips(trips)
+        destinations.change_tags([(tag.trip, tag.tripTag) for tag in tags], 1)
+        save_media(
+            [TripImage(trip=trip, image=image) for trip, row in zip(trips, rows) for image in row.get('images', [])],
+            [TripVideo(trip=trip, video=video) for trip, row in zip(trips, rows) for video in row.get('videos', [])],
+        )
+        for trip, row in zip(trips, rows):
+            attach_uploads(trip, user, row.get('upload_ids', []))
+
+        # بدلاً من post_save لكل رحلة: قوائم الرحلات وبروفايل صاحبها مرة واحدة
+        bump_version(TRIPS_SCOPE, f"user:{user.id}")
+    return trips
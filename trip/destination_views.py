@@ -0,0 +1,60 @@
+from django.shortcuts import get_object_or_404
+from rest_framework import generics, permissions
+from Rahala.conditional import ConditionalGetMixin, get_version
+from interactions.serializers import FeedTripSerializer
+from .destinations import DESTINATIONS_SCOPE
+from .models import Destination, Trip
+from .serializers import DestinationSerializer
+from .views import StandardResultsSetPagination, TripPageConditionalMixin
+
+
+class DestinationListAPIView(ConditionalGetMixin, generics.ListAPIView):
+    """
+    الوجهات الأكثر رحلات أولاً
+
+    GET ?country=<اختياري>&city=<اختياري>؛ كل وجهة صف واحد دون تجميع وقت الطلب
+    """
+    serializer_class = DestinationSerializer
+    permission_classes = [permissions.AllowAny]
+    pagination_class = StandardResultsSetPagination
+
+    def get_etag_version(self, request):
+        return (get_version(DESTINATIONS_SCOPE),)
+
+    def get_queryset(self):
+        queryset = Destination.objects.filter(trips_count__gt=0)
+        country = self.request.query_params.get('country')
+        city = self.request.query_params.get('city')
+        if country:
+            queryset = queryset.filter(country=country)
+        if city:
+            queryset = queryset.filter(city=city)
+        return queryset.order_by('-trips_count', 'id')
+
+
+class DestinationDetailAPIView(ConditionalGetMixin, generics.RetrieveAPIView):
+    queryset = Destination.objects.all()
+    serializer_class = DestinationSerializer
+    permission_classes = [permissions.AllowAny]
+    lookup_field = 'id'
+
+    def get_etag_version(self, request):
+        return (get_version(DESTINATIONS_SCOPE),)
+
+
+class DestinationTripsAPIView(TripPageConditionalMixin, generics.ListAPIView):
+    """رحلات الوجهة الأحدث أولاً (فهرس country, city, -created_at)"""
+    serializer_class = FeedTripSerializer
+    permission_classes = [permissions.AllowAny]
+    pagination_class = StandardResultsSetPagination
+    # العدادات وحالة الإعجاب والحفظ تختلف لكل مستخدم
+    cache_control = 'private, no-cache'
+    etag_vary_on_viewer = True
+
+    def get_queryset(self):
+        destination = get_object_or_404(Destination, id=self.kwargs['id'])
+        return Trip.objects.filter(
+            country=destination.country, city=destination.city
+        ).select_related('user').prefetch_related(
+            'images', 'videos', 'tags'
+        ).order_by('-created_at')
@@ -0,0 +1,248 @@
+"""
+ملخصات الوجهات (دولة، مدينة)
+
+كل وجهة صف واحد في Destination يُقرأ كما هو لصفحة الوجهة وقائمة الوجهات.
+العدادات تُحدَّث في نفس transaction الكتابة بجمل INSERT ... ON CONFLICT:
+
+- trips_count للوجهة مع كل إنشاء أو حذف رحلة
+- DestinationContributor: عدد رحلات كل مستخدم في الوجهة
+- DestinationTag: عدد رحلات الوجهة لكل تاج
+
+القوائم المشتقة (top_tags و top_contributors و tourism_info المدمجة والإحداثيات)
+تُعاد بناؤها من العدادات المفهرسة عبر حدث destination.changed في الـ outbox،
+فيبقى إنشاء الرحلة سريعاً، وإعادة البناء idempotent مع التسليم at-least-once.
+
+تغيير country / city لرحلة قائمة عبر API التعديل ينقلها بين الوجهتين
+(move_trip). التعديل من مسارات أخرى (admin، shell) لا يُتتبع، و
+rebuild_destinations يعيد حساب كل الملخصات من جدول الرحلات.
+"""
+
+import operator
+from collections import Counter
+from functools import reduce
+
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+
+from Rahala.conditional import bump_version
+from interactions.outbox import record_events, register_consumer
+from .models import Destination, DestinationContributor, DestinationTag, Trip, TripTag
+
+DESTINATIONS_SCOPE = 'destinations'
+
+TOP_TAGS = 10
+TOP_CONTRIBUTORS = 10
+# عدد أحدث الرحلات التي تُدمج معلوماتها السياحية، وأقصى عناصر لكل قائمة
+MERGE_TRIPS = 20
+MERGE_LIST_ITEMS = 8
+
+
+def destination_key(trip):
+    """(country, city) للرحلة، أو None لرحلة دون مدينة"""
+    return (trip.country, trip.city) if trip.city else None
+
+
+def _increment(model, key_columns, counts, count_column='count', returning=None):
+    """
+    إضافة قيم لعداد في جملة واحدة، مع إنشاء الصفوف الناقصة
+
+    Args:
+        model: النموذج
+        key_columns (tuple): أعمدة القيد الفريد
+        counts (dict): {قيم المفتاح: الزيادة (قد تكون سالبة)}
+        returning (tuple, optional): أعمدة تُعاد لكل صف
+
+    Returns:
+        list: الصفوف المعادة إن طُلبت
+    """
+    if not counts:
+        return []
+    qn = connection.ops.quote_name
+    table = qn(model._meta.db_table)
+    column = qn(count_column)
+    fields = {field.column: field for field in model._meta.concrete_fields}
+
+    # الأعمدة الإلزامية الأخرى تأخذ قيمها الافتراضية عند الإنشاء
+    extra = [
+        name for name, field in fields.items()
+        if name not in (*key_columns, count_column) and not field.primary_key and not field.null
+    ]
+    now = timezone.now()
+    defaults = []
+    for name in extra:
+        field = fields[name]
+        value = now if getattr(field, 'auto_now', False) else field.get_default()
+        defaults.append(field.get_db_prep_save(value, connection))
+
+    columns = ', '.join(qn(name) for name in (*key_columns, count_column, *extra))
+    placeholders = ', '.join(['%s'] * (len(key_columns) + 1 + len(extra)))
+    params = []
+    for key, delta in counts.items():
+        params += [*key, delta, *defaults]
+    sql = (
+        f"INSERT INTO {table} ({columns}) VALUES {', '.join([f'({placeholders})'] * len(counts))} "
+        f"ON CONFLICT ({', '.join(qn(name) for name in key_columns)}) "
+        f"DO UPDATE SET {column} = {table}.{column} + excluded.{column}"
+    )
+    if 'updated_at' in fields:
+        sql += ", updated_at = excluded.updated_at"
+    if returning:
+        sql += f" RETURNING {', '.join(qn(name) for name in returning)}"
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall() if returning else []
+
+
+def _changed(destination_ids):
+    """طلب إعادة بناء القوائم المشتقة وإبطال قائمة الوجهات"""
+    destination_ids = sorted(set(destination_ids))
+    if destination_ids:
+        record_events('destination.changed', [{'destination_id': i} for i in destination_ids])
+        bump_version(DESTINATIONS_SCOPE)
+
+
+def _apply_trips(trips, delta):
+    keyed = [(destination_key(trip), trip.user_id) for trip in trips if destination_key(trip)]
+    if not keyed:
+        return {}
+    trip_counts = Counter(key for key, _ in keyed)
+    rows = _increment(
+        Destination, ('country', 'city'), {key: count * delta for key, count in trip_counts.items()},
+        count_column='trips_count', returning=('id', 'country', 'city')
+    )
+    ids = {(country, city): destination_id for destination_id, country, city in rows}
+    contributors = Counter((ids[key], user_id) for key, user_id in keyed)
+    _increment(
+        DestinationContributor, ('destination_id', 'user_id'),
+        {key: count * delta for key, count in contributors.items()}
+    )
+    if delta < 0:
+        DestinationContributor.objects.filter(destination_id__in=ids.values(), count__lte=0).delete()
+    return ids
+
+
+def add_trips(trips):
+    """احتساب رحلات جديدة في وجهاتها"""
+    _changed(_apply_trips(trips, 1).values())
+
+
+def remove_trips(trips):
+    """
+    إزالة رحلات من وجهاتها قبل حذفها (مع تاجاتها)
+
+    يجب استدعاؤها قبل حذف الصفوف (pre_delete) حتى تُقرأ التاجات.
+    """
+    trips = [trip for trip in trips if destination_key(trip)]
+    if not trips:
+        return
+    by_id = {trip.id: trip for trip in trips}
+    tags = TripTag.objects.filter(trip_id__in=by_id).values_list('trip_id', 'tripTag')
+    change_tags([(by_id[trip_id], tag) for trip_id, tag in tags], -1, notify=False)
+    ids = _apply_trips(trips, -1)
+    # الوجهة دون رحلات تُحذف مع عداداتها
+    Destination.objects.filter(id__in=ids.values(), trips_count__lte=0).delete()
+    _changed(ids.values())
+
+
+def move_trip(previous, trip):
+    """
+    نقل رحلة تغيرت country / city من وجهتها القديمة إلى الجديدة
+
+    Args:
+        previous (Trip): نسخة بالقيم قبل التعديل (id و user_id و country و city)
+        trip (Trip): الرحلة بعد الحفظ
+    """
+    if destination_key(previous) == destination_key(trip):
+        return
+    remove_trips([previous])
+    add_trips([trip])
+    tags = TripTag.objects.filter(trip_id=trip.id).values_list('tripTag', flat=True)
+    change_tags([(trip, tag) for tag in tags], 1, notify=False)
+
+
+def change_tags(items, delta, notify=True):
+    """
+    تعديل عدادات التاجات لوجهات الرحلات
+
+    Args:
+        items (list): أزواج (الرحلة، اسم التاج)
+        delta (int): 1 عند الإضافة و -1 عند الحذف
+    """
+    counts = Counter((destination_key(trip), tag) for trip, tag in items if destination_key(trip))
+    if not counts:
+        return
+    keys = {key for key, _ in counts}
+    ids = {
+        (country, city): destination_id
+        for destination_id, country, city in Destination.objects.filter(
+            reduce(operator.or_, (Q(country=country, city=city) for country, city in keys))
+        ).values_list('id', 'country', 'city')
+    }
+    # وجهة غير موجودة: رحلة أُنشئت قبل الملخصات ولم يُشغل rebuild_destinations
+    _increment(DestinationTag, ('destination_id', 'tag'), {
+        (ids[key], tag): count * delta for (key, tag), count in counts.items() if key in ids
+    })
+    if delta < 0:
+        DestinationTag.objects.filter(destination_id__in=ids.values(), count__lte=0).delete()
+    if notify:
+        _changed(ids.values())
+
+
+def merge_tourism_info(infos):
+    """
+    دمج المعلومات السياحية لعدة رحلات (الأحدث أولاً)
+
+    القيم النصية تؤخذ من أحدث رحلة تحتويها، والقوائم تُجمع دون تكرار حتى
+    MERGE_LIST_ITEMS عنصراً.
+    """
+    merged = {}
+    for info in infos:
+        if not isinstance(info, dict):
+            continue
+        for key, value in info.items():
+            if isinstance(value, list):
+                items = merged.setdefault(key, [])
+                for item in value:
+                    if len(items) >= MERGE_LIST_ITEMS:
+                        break
+                    if item and item not in items:
+                        items.append(item)
+            elif value and key not in merged:
+                merged[key] = value
+    return merged
+
+
+def refresh_destination(destination):
+    """إعادة بناء القوائم المشتقة من العدادات المفهرسة وأحدث الرحلات"""
+    destination.top_tags = [
+        {'tag': tag, 'count': count}
+        for tag, count in destination.tag_counts.order_by('-count', 'tag').values_list('tag', 'count')[:TOP_TAGS]
+    ]
+    destination.top_contributors = [
+        {'id': user_id, 'username': username, 'trips_count': count}
+        for user_id, username, count in destination.contributors.order_by('-count', 'user_id').values_list(
+            'user_id', 'user__username', 'count'
+        )[:TOP_CONTRIBUTORS]
+    ]
+    recent = list(
+        Trip.objects.filter(country=destination.country, city=destination.city)
+        .order_by('-created_at')
+        .values_list('tourism_info', 'latitude', 'longitude')[:MERGE_TRIPS]
+    )
+    destination.tourism_info = merge_tourism_info(info for info, _, _ in recent)
+    destination.latitude, destination.longitude = next(
+        ((latitude, longitude) for _, latitude, longitude in recent if latitude is not None), (None, None)
+    )
+    destination.save(update_fields=[
+        'top_tags', 'top_contributors', 'tourism_info', 'latitude', 'longitude', 'updated_at'
+    ])
+
+
+@register_consumer('destination.changed')
+def refresh_changed_destination(event):
+    """إعادة بناء ملخص الوجهة بعد تغيير عداداتها (الوجهة قد تكون حُذفت)"""
+    destination = Destination.objects.filter(id=event.payload['destination_id']).first()
+    if destination is not None:
+        refresh_destination(destination)
+        bump_version(DESTINATIONS_SCOPE)
@@ -0,0 +1,259 @@
+"""
+إحداثيات الرحلات والاستعلامات المكانية
+
+لكل رحلة latitude و longitude و geohash (9 أحرف ≈ 5 أمتار). الـ geohash يرتب
+النقاط المتقاربة متجاورة، فمنطقة على الخريطة تُغطى بعدد صغير من خلايا geohash،
+وكل مجموعة خلايا متتالية تصبح نطاقاً واحداً (geohash >= 'sv8' AND < 'svb{') يقرأ
+من فهرس B-tree عادي على SQLite و PostgreSQL دون امتدادات مكانية. النتائج
+تُصفى بعدها بالإحداثيات الدقيقة.
+
+الإحداثيات تأتي من العميل، ثم من الـ AI، ثم من قاموس مدن محلي
+(trip/data/gazetteer.csv) عند غيابهما.
+"""
+
+import csv
+import math
+import operator
+from functools import lru_cache, reduce
+
+from django.conf import settings
+from django.db.models import Q
+
+GEOHASH_PRECISION = 9
+_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+_INDEX = {char: i for i, char in enumerate(_BASE32)}
+
+# أقصى عدد خلايا لتغطية منطقة (كل خلية أو مجموعة متتالية = نطاق في الاستعلام)
+MAX_COVER_CELLS = 32
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = 111.32
+
+
+def valid_coordinates(latitude, longitude):
+    """
+    تحويل الإحداثيات إلى float والتحقق من حدودها
+
+    Returns:
+        tuple | None: (latitude, longitude)، أو None إذا كانت ناقصة أو غير صالحة
+    """
+    try:
+        latitude, longitude = float(latitude), float(longitude)
+    except (TypeError, ValueError):
+        return None
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        return None
+    if math.isnan(latitude) or math.isnan(longitude):
+        return None
+    return latitude, longitude
+
+
+def _bits(precision):
+    """عدد بتات خط الطول وخط العرض في geohash بطول معين"""
+    total = 5 * precision
+    return (total + 1) // 2, total // 2
+
+
+def _cell_size(precision):
+    """(عرض، ارتفاع) خلية geohash بالدرجات"""
+    lng_bits, lat_bits = _bits(precision)
+    return 360 / 2 ** lng_bits, 180 / 2 ** lat_bits
+
+
+def _encode_cell(x, y, precision):
+    """geohash من رقم الخلية على محوري الطول (x) والعرض (y)"""
+    lng_bits, lat_bits = _bits(precision)
+    value = 0
+    for i in range(5 * precision):
+        # البتات الزوجية لخط الطول والفردية لخط العرض، من الأعلى للأدنى
+        if i % 2 == 0:
+            lng_bits -= 1
+            bit = (x >> lng_bits) & 1
+        else:
+            lat_bits -= 1
+            bit = (y >> lat_bits) & 1
+        value = (value << 1) | bit
+    return ''.join(_BASE32[(value >> 5 * (precision - i - 1)) & 31] for i in range(precision))
+
+
+def _cell_index(latitude, longitude, precision):
+    width, height = _cell_size(precision)
+    lng_cells, lat_cells = round(360 / width), round(180 / height)
+    x = min(int((longitude + 180) / width), lng_cells - 1)
+    y = min(int((latitude + 90) / height), lat_cells - 1)
+    return x, y
+
+
+def encode(latitude, longitude, precision=GEOHASH_PRECISION):
+    """geohash لنقطة"""
+    return _encode_cell(*_cell_index(latitude, longitude, precision), precision)
+
+
+def decode(geohash):
+    """
+    مركز خلية geohash
+
+    Returns:
+        tuple: (latitude, longitude)
+    """
+    value = 0
+    for char in geohash:
+        value = (value << 5) | _INDEX[char]
+    x = y = 0
+    for i in range(5 * len(geohash)):
+        bit = (value >> (5 * len(geohash) - i - 1)) & 1
+        if i % 2 == 0:
+            x = (x << 1) | bit
+        else:
+            y = (y << 1) | bit
+    width, height = _cell_size(len(geohash))
+    return -90 + (y + 0.5) * height, -180 + (x + 0.5) * width
+
+
+def location_fields(coordinates):
+    """قيم latitude و longitude و geohash لحفظها في Trip"""
+    if coordinates is None:
+        return {'latitude': None, 'longitude': None, 'geohash': ''}
+    latitude, longitude = coordinates
+    return {'latitude': latitude, 'longitude': longitude, 'geohash': encode(latitude, longitude)}
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """المسافة على سطح الأرض بالكيلومتر"""
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def split_bbox(min_lat, min_lng, max_lat, max_lng):
+    """
+    تقسيم منطقة تعبر خط الطول 180 إلى منطقتين
+
+    Returns:
+        list: مناطق (min_lat, min_lng, max_lat, max_lng) بحيث min_lng <= max_lng
+    """
+    if min_lng <= max_lng:
+        return [(min_lat, min_lng, max_lat, max_lng)]
+    return [(min_lat, min_lng, max_lat, 180.0), (min_lat, -180.0, max_lat, max_lng)]
+
+
+def radius_bbox(latitude, longitude, radius_km):
+    """المناطق المستطيلة التي تحيط بدائرة (قد تكون اثنتين عند خط الطول 180)"""
+    d_lat = radius_km / KM_PER_DEGREE
+    min_lat, max_lat = max(latitude - d_lat, -90.0), min(latitude + d_lat, 90.0)
+    cos_lat = min(math.cos(math.radians(min_lat)), math.cos(math.radians(max_lat)))
+    d_lng = radius_km / (KM_PER_DEGREE * cos_lat) if cos_lat > 1e-9 else 360
+    if d_lng >= 180:
+        return [(min_lat, -180.0, max_lat, 180.0)]
+    min_lng, max_lng = longitude - d_lng, longitude + d_lng
+    if min_lng < -180:
+        min_lng += 360
+    if max_lng > 180:
+        max_lng -= 360
+    return split_bbox(min_lat, min_lng, max_lat, max_lng)
+
+
+def cover_precision(min_lat, min_lng, max_lat, max_lng, max_cells=MAX_COVER_CELLS):
+    """أكبر دقة geohash تغطي المنطقة بما لا يزيد عن max_cells خلية (1 على الأقل)"""
+    for precision in range(GEOHASH_PRECISION, 1, -1):
+        x1, y1 = _cell_index(min_lat, min_lng, precision)
+        x2, y2 = _cell_index(max_lat, max_lng, precision)
+        if (x2 - x1 + 1) * (y2 - y1 + 1) <= max_cells:
+            return precision
+    return 1
+
+
+def cover_cells(min_lat, min_lng, max_lat, max_lng, max_cells=MAX_COVER_CELLS):
+    """
+    خلايا geohash بأكبر دقة تغطي المنطقة دون تجاوز max_cells
+
+    Returns:
+        list: الخلايا مرتبة
+    """
+    precision = cover_precision(min_lat, min_lng, max_lat, max_lng, max_cells)
+    x1, y1 = _cell_index(min_lat, min_lng, precision)
+    x2, y2 = _cell_index(max_lat, max_lng, precision)
+    return sorted(
+        _encode_cell(x, y, precision)
+        for x in range(x1, x2 + 1) for y in range(y1, y2 + 1)
+    )
+
+
+def _cell_value(cell):
+    value = 0
+    for char in cell:
+        value = value * 32 + _INDEX[char]
+    return value
+
+
+def cell_ranges(cells):
+    """
+    دمج الخلايا المتتالية (بنفس الدقة) في نطاقات
+
+    Returns:
+        list: (أول خلية، آخر خلية) لكل نطاق
+    """
+    ranges = []
+    for cell in cells:
+        if ranges and _cell_value(cell) == _cell_value(ranges[-1][1]) + 1:
+            ranges[-1] = (ranges[-1][0], cell)
+        else:
+            ranges.append((cell, cell))
+    return ranges
+
+
+def bbox_filter(boxes):
+    """
+    شرط ORM يطابق الرحلات داخل المناطق
+
+    نطاقات الـ geohash تستخدم الفهرس، وشرط الإحداثيات يستبعد أطراف الخلايا
+    خارج المنطقة. الحرف '{' يأتي بعد كل أحرف الـ geohash فيشمل الحد الأعلى
+    جميع ما يبدأ بآخر خلية.
+    """
+    conditions = []
+    for min_lat, min_lng, max_lat, max_lng in boxes:
+        ranges = [
+            Q(geohash__gte=first, geohash__lt=last + '{')
+            for first, last in cell_ranges(cover_cells(min_lat, min_lng, max_lat, max_lng))
+        ]
+        conditions.append(
+            reduce(operator.or_, ranges)
+            & Q(latitude__range=(min_lat, max_lat), longitude__range=(min_lng, max_lng))
+        )
+    return reduce(operator.or_, conditions)
+
+
+def _normalize(name):
+    return ' '.join(name.casefold().replace('-', ' ').split())
+
+
+@lru_cache(maxsize=1)
+def _gazetteer():
+    entries = {}
+    with open(settings.GEO_GAZETTEER_PATH, encoding='utf-8') as file:
+        for row in csv.DictReader(file):
+            coordinates = (float(row['latitude']), float(row['longitude']))
+            for name in (row['city'], *filter(None, row['aliases'].split('|'))):
+                entries.setdefault(_normalize(name), coordinates)
+    return entries
+
+
+def geocode(location, city=''):
+    """
+    إحداثيات رحلة من قاموس المدن المحلي
+
+    المدينة تُجرب أولاً ثم نص الموقع، كل منهما كاملاً ثم أجزاؤه المفصولة
+    بفواصل ("Old Town, Dubai").
+
+    Returns:
+        tuple | None: (latitude, longitude)، أو None لمكان غير معروف
+    """
+    entries = _gazetteer()
+    for name in (city, location):
+        if not name:
+            continue
+        for candidate in (name, *name.split(',')):
+            coordinates = entries.get(_normalize(candidate))
+            if coordinates:
+                return coordinates
+    return None
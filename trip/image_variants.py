@@ -0,0 +1,179 @@
+"""
+نسخ مصغرة ومتجاوبة لصور الرحلات
+
+لكل TripImage تُولَّد ثلاث نسخ (thumb / feed / full) بصيغتي WebP و JPEG بعد
+تصحيح الاتجاه من EXIF، ودون نقل بيانات EXIF (الموقع الجغرافي، الكاميرا...).
+النسخ تُحفظ بجوار الأصل، ومساراتها وأبعادها في TripImage.variants.
+
+التوليد خارج مسار الطلب: حفظ TripImage جديدة يسجل حدث trip_image.created
+في الـ outbox، ويقوم المستهلك هنا بالتوليد. ترميز النسخ يتم بالتوازي في
+ThreadPoolExecutor مشترك (Pillow يحرر الـ GIL أثناء التحجيم والترميز).
+"""
+
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from interactions.outbox import register_consumer
+from .placeholders import PLACEHOLDER_FIELDS, compute_placeholder
+
+logger = logging.getLogger(__name__)
+
+# (الاسم، أقصى طول للضلع الأطول)
+RENDITIONS = (
+    ('thumb', 320),
+    ('feed', 1080),
+    ('full', 2048),
+)
+
+# (المفتاح، صيغة Pillow، الامتداد، خيارات الحفظ)
+FORMATS = (
+    ('webp', 'WEBP', 'webp', {'quality': 80, 'method': 4}),
+    ('jpeg', 'JPEG', 'jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+)
+
+_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'IMAGE_VARIANT_WORKERS', 4),
+    thread_name_prefix='image-variants'
+)
+
+
+def load_image(file):
+    """فتح الصورة وتطبيق اتجاه EXIF"""
+    image = Image.open(file)
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'PA') else 'RGB')
+    return image
+
+
+def _flatten(image):
+    """JPEG لا يدعم الشفافية: دمج الصورة على خلفية بيضاء"""
+    if image.mode != 'RGBA':
+        return image
+    background = Image.new('RGB', image.size, (255, 255, 255))
+    background.paste(image, mask=image.getchannel('A'))
+    return background
+
+
+def _render(image, size):
+    resized = image.copy()
+    resized.thumbnail((size, size), Image.LANCZOS)
+    encoded = {}
+    for key, fmt, _, options in FORMATS:
+        buffer = io.BytesIO()
+        # لا يُمرَّر exif عند الحفظ فتُحذف بيانات EXIF من النسخ
+        (resized if fmt == 'WEBP' else _flatten(resized)).save(buffer, fmt, **options)
+        encoded[key] = buffer.getvalue()
+    return resized.size, encoded
+
+
+def render_variants(image):
+    """
+    ترميز جميع النسخ لصورة محملة
+
+    النسخ التي لا تختلف أبعادها عن النسخة الأصغر منها (صورة أصلية صغيرة)
+    لا تُكرر.
+
+    Returns:
+        dict: {الاسم: ((العرض، الارتفاع)، {الصيغة: bytes})}
+    """
+    results = _executor.map(lambda rendition: _render(image, rendition[1]), RENDITIONS)
+    variants = {}
+    previous = None
+    for (name, _), (dimensions, encoded) in zip(RENDITIONS, results):
+        if dimensions == previous:
+            continue
+        variants[name] = (dimensions, encoded)
+        previous = dimensions
+    return variants
+
+
+def variant_path(original_name, rendition, extension):
+    """مسار النسخة بجوار الأصل: blobs/ab/cd/<digest>_<rendition>.<ext>"""
+    stem, _ = os.path.splitext(original_name)
+    return f'{stem}_{rendition}.{extension}'
+
+
+def generate_variants(trip_image, storage=default_storage):
+    """
+    توليد نسخ صورة وحفظها وتحديث TripImage.variants و placeholder الصورة
+
+    آمنة لإعادة التشغيل: النسخ الموجودة بنفس المسار تُستبدل.
+
+    Returns:
+        dict | None: قيمة variants الجديدة، أو None إذا تعذرت قراءة الصورة
+    """
+    try:
+        with trip_image.image.open('rb') as file:
+            image = load_image(file)
+            image.load()
+    except (UnidentifiedImageError, OSError) as e:
+        logger.warning(f"Cannot generate variants for TripImage {trip_image.id}: {str(e)}")
+        return None
+
+    placeholder = compute_placeholder(image)
+    extensions = {key: extension for key, _, extension, _ in FORMATS}
+    variants = {}
+    for name, ((width, height), encoded) in render_variants(image).items():
+        variant = {'width': width, 'height': height}
+        for key, content in encoded.items():
+            path = variant_path(trip_image.image.name, name, extensions[key])
+            if storage.exists(path):
+                storage.delete(path)
+            variant[key] = storage.save(path, ContentFile(content))
+        variants[name] = variant
+
+    trip_image.variants = variants
+    for field, value in placeholder.items():
+        setattr(trip_image, field, value)
+    trip_image.save(update_fields=['variants', *PLACEHOLDER_FIELDS])
+    return variants
+
+
+def build_srcset(variants, url):
+    """
+    قيم srcset لكل صيغة
+
+    Args:
+        variants (dict): قيمة TripImage.variants
+        url (callable): تحويل مسار التخزين إلى URL
+
+    Returns:
+        dict | None: {'webp': 'url 320w, url 1080w', 'jpeg': ...}
+    """
+    if not variants:
+        return None
+    return {
+        key: ', '.join(
+            f"{url(variant[key])} {variant['width']}w"
+            for variant in variants.values() if key in variant
+        )
+        for key, _, _, _ in FORMATS
+    }
+
+
+@register_consumer('trip_image.created')
+def generate_trip_image_variants(event):
+    """توليد نسخ الصورة المرفوعة"""
+    from .models import TripImage
+    trip_image = TripImage.objects.filter(id=event.payload['image_id']).first()
+    # الصورة حُذفت قبل المعالجة أو وُلدت نسخها بالفعل
+    if trip_image is None or trip_image.variants:
+        return
+    # نفس الملف (نفس المحتوى) له نسخ مولدة من صورة أخرى
+    existing = TripImage.objects.filter(image=trip_image.image.name).exclude(
+        variants={}
+    ).values('variants', *PLACEHOLDER_FIELDS).first()
+    if existing:
+        for field, value in existing.items():
+            setattr(trip_image, field, value)
+        trip_image.save(update_fields=['variants', *PLACEHOLDER_FIELDS])
+        return
+    generate_variants(trip_image)
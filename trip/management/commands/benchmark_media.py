@@ -0,0 +1,92 @@
+import os
+import random
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+from django.views.static import serve
+from Rahala.media import serve_media
+
+SAMPLE_VIDEO = 'trips/2/videos/6399-191636228_tiny.mp4'
+
+
+def consume(response):
+    """قراءة جسم الرد كما يفعل خادم WSGI دون sendfile؛ يعيد عدد البايتات"""
+    transferred = 0
+    try:
+        for chunk in response.streaming_content if response.streaming else [response.content]:
+            transferred += len(chunk)
+    finally:
+        response.close()
+    return transferred
+
+
+class Command(BaseCommand):
+    help = 'Benchmark media serving (full downloads and seeks) against django.views.static.serve'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path',
+            default=SAMPLE_VIDEO,
+            help='File to serve, relative to MEDIA_ROOT',
+        )
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=50,
+            help='Full downloads per implementation',
+        )
+        parser.add_argument(
+            '--seeks',
+            type=int,
+            default=200,
+            help='Random seeks (256 KiB ranges) per implementation',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=42,
+        )
+
+    def handle(self, *args, **options):
+        full_path = os.path.join(settings.MEDIA_ROOT, options['path'])
+        if not os.path.isfile(full_path):
+            raise CommandError(f'{full_path} does not exist')
+        size = os.path.getsize(full_path)
+        factory = RequestFactory()
+        rng = random.Random(options['seed'])
+        ranges = [rng.randrange(size) for _ in range(options['seeks'])]
+
+        views = {
+            'static.serve': lambda request: serve(request, options['path'], document_root=settings.MEDIA_ROOT),
+            'serve_media': lambda request: serve_media(request, options['path']),
+        }
+        self.stdout.write(f"{options['path']}: {size / 1024:.1f} KiB")
+
+        for name, view in views.items():
+            tracemalloc.start()
+            started = time.perf_counter()
+            transferred = 0
+            for _ in range(options['iterations']):
+                transferred += consume(view(factory.get('/')))
+            elapsed = time.perf_counter() - started
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            seek_started = time.perf_counter()
+            seek_transferred = 0
+            partial = 0
+            for start in ranges:
+                response = view(factory.get('/', HTTP_RANGE=f'bytes={start}-{start + 256 * 1024 - 1}'))
+                partial += response.status_code == 206
+                seek_transferred += consume(response)
+            seek_elapsed = time.perf_counter() - seek_started
+
+            self.stdout.write(
+                f"{name}: full {transferred / elapsed / 1024 ** 2:.1f} MiB/s, peak memory {peak / 1024:.1f} KiB; "
+                f"seeks {seek_elapsed / max(len(ranges), 1) * 1000:.3f}ms each, "
+                f"{seek_transferred / max(len(ranges), 1) / 1024:.1f} KiB transferred per seek, "
+                f"{partial}/{len(ranges)} answered with 206"
+            )
@@ -0,0 +1,41 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from trip.storage import collect_garbage, storage_report, GC_GRACE_PERIOD
+
+
+class Command(BaseCommand):
+    help = 'Delete media blobs no trip image or video references, and report deduplication savings'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace-hours',
+            type=float,
+            default=GC_GRACE_PERIOD.total_seconds() / 3600,
+            help='Keep unreferenced blobs younger than this many hours',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report what would be deleted',
+        )
+        parser.add_argument(
+            '--report-only',
+            action='store_true',
+            help='Print the storage report without collecting garbage',
+        )
+
+    def handle(self, *args, **options):
+        if not options['report_only']:
+            result = collect_garbage(timedelta(hours=options['grace_hours']), dry_run=options['dry_run'])
+            action = 'Would remove' if options['dry_run'] else 'Removed'
+            self.stdout.write(self.style.SUCCESS(
+                f"{action} {result['files_removed']} files ({result['bytes_freed']} bytes)"
+            ))
+
+        report = storage_report()
+        self.stdout.write(
+            f"{report['blobs']} blobs referenced {report['references']} times: "
+            f"{report['stored_bytes']} bytes stored for {report['logical_bytes']} logical bytes, "
+            f"{report['saved_bytes']} bytes saved by deduplication, "
+            f"{report['orphaned_blobs']} orphaned blobs awaiting collection"
+        )
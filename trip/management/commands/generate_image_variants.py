@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+from trip.models import TripImage
+from trip.image_variants import generate_variants
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Generate thumbnail/feed/full renditions for trip images that do not have them yet'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Regenerate renditions for every image, not only missing ones',
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=None,
+            help='Process at most this many images',
+        )
+
+    def handle(self, *args, **options):
+        images = TripImage.objects.order_by('id')
+        if not options['force']:
+            images = images.filter(variants={})
+        if options['limit'] is not None:
+            images = images[:options['limit']]
+
+        generated = skipped = 0
+        for trip_image in images.iterator(chunk_size=100):
+            if generate_variants(trip_image) is None:
+                skipped += 1
+            else:
+                generated += 1
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Generated renditions for {generated} images, skipped {skipped} unreadable')
+        )
@@ -0,0 +1,60 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from trip.models import TripImage, TripVideo
+from trip.placeholders import PLACEHOLDER_FIELDS, placeholder_from_file
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Compute BlurHash / dominant colour placeholders for trip images and video posters missing them'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Recompute placeholders that already exist',
+        )
+
+    def handle(self, *args, **options):
+        images = TripImage.objects.order_by('id')
+        videos = TripVideo.objects.filter(processing_status='ready').order_by('id')
+        if not options['force']:
+            images = images.filter(blurhash='')
+            videos = videos.filter(blurhash='')
+
+        done = skipped = 0
+        for trip_image in images.iterator(chunk_size=100):
+            try:
+                with trip_image.image.open('rb') as file:
+                    placeholder = placeholder_from_file(file)
+            except OSError:
+                placeholder = None
+            if self.save(trip_image, placeholder):
+                done += 1
+            else:
+                skipped += 1
+
+        for video in videos.iterator(chunk_size=100):
+            poster = video.renditions.get('poster')
+            placeholder = None
+            if poster and default_storage.exists(poster):
+                with default_storage.open(poster, 'rb') as file:
+                    placeholder = placeholder_from_file(file)
+            if placeholder and video.height:
+                placeholder['aspect_ratio'] = round(video.width / video.height, 4)
+            if self.save(video, placeholder):
+                done += 1
+            else:
+                skipped += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Computed {done} placeholders, skipped {skipped} unreadable'))
+
+    def save(self, media, placeholder):
+        if placeholder is None:
+            return False
+        for field, value in placeholder.items():
+            setattr(media, field, value)
+        media.save(update_fields=list(PLACEHOLDER_FIELDS))
+        return True
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+from Rahala.conditional import bump_version
+from trip.geo import geocode, location_fields, valid_coordinates
+from trip.models import Trip
+from trip.read_model import TRIPS_SCOPE, invalidate_trip
+
+FIELDS = ['latitude', 'longitude', 'geohash']
+
+
+class Command(BaseCommand):
+    help = ('Fill latitude / longitude / geohash for trips missing them, from stored coordinates '
+            'or the local city gazetteer (no AI calls)')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Trips updated per bulk_update (default: 500)',
+        )
+
+    def handle(self, *args, **options):
+        trips = Trip.objects.filter(geohash='').only('id', 'location', 'city', *FIELDS).order_by('id')
+        # المعرفات أولاً حتى لا تُقرأ الصفوف أثناء تعديلها
+        trip_ids = list(trips.values_list('id', flat=True))
+        size = options['batch_size']
+        located = unknown = 0
+        for start in range(0, len(trip_ids), size):
+            batch = []
+            for trip in trips.filter(id__in=trip_ids[start:start + size]):
+                coordinates = valid_coordinates(trip.latitude, trip.longitude) or geocode(trip.location, trip.city)
+                if coordinates is None:
+                    unknown += 1
+                    continue
+                for field, value in location_fields(coordinates).items():
+                    setattr(trip, field, value)
+                batch.append(trip)
+            if batch:
+                located += self.save(batch)
+        bump_version(TRIPS_SCOPE)
+
+        self.stdout.write(self.style.SUCCESS(f'Geocoded {located} trips, {unknown} locations not found'))
+
+    def save(self, trips):
+        # bulk_update لا يطلق post_save، فتُبطل مستندات الرحلات هنا
+        updated = Trip.objects.bulk_update(trips, FIELDS)
+        for trip in trips:
+            invalidate_trip(trip.id)
+        return updated
@@ -0,0 +1,70 @@
+from contextlib import ExitStack
+import json
+import os
+
+from django.contrib.auth import get_user_model
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+from trip.creation import import_trips
+from trip.serializers import TripImportSerializer
+
+
+class Command(BaseCommand):
+    help = ('Bulk-create trips from a JSON Lines file. Each line holds location, caption, country, city, '
+            'tourism_info, tags and images / videos as local file paths')
+
+    def add_arguments(self, parser):
+        parser.add_argument('email', help='Owner of the imported trips')
+        parser.add_argument('path', help='JSON Lines file, one trip per line')
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=50,
+            help='Trips created per transaction (default: 50)',
+        )
+
+    def handle(self, *args, **options):
+        user = get_user_model().objects.filter(email=options['email']).first()
+        if user is None:
+            raise CommandError(f"No user with email {options['email']}")
+
+        batch, created = [], 0
+        with open(options['path'], encoding='utf-8') as lines:
+            for number, line in enumerate(lines, 1):
+                if not line.strip():
+                    continue
+                batch.append(self.parse(number, line))
+                if len(batch) >= options['batch_size']:
+                    created += self.create(user, batch)
+                    batch = []
+        if batch:
+            created += self.create(user, batch)
+
+        self.stdout.write(self.style.SUCCESS(f'Imported {created} trips'))
+
+    def parse(self, number, line):
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            raise CommandError(f'Line {number}: {e}')
+        media = {kind: row.pop(kind, []) for kind in ('images', 'videos')}
+        serializer = TripImportSerializer(data=row)
+        if not serializer.is_valid():
+            raise CommandError(f'Line {number}: {serializer.errors}')
+        for path in (*media['images'], *media['videos']):
+            if not os.path.isfile(path):
+                raise CommandError(f'Line {number}: no such file {path}')
+        if not media['images'] and not media['videos']:
+            raise CommandError(f'Line {number}: at least one image or video is required')
+        return {**serializer.validated_data, **media}
+
+    def create(self, user, rows):
+        # الملفات تبقى مفتوحة حتى يكتبها bulk_create في التخزين
+        with ExitStack() as stack:
+            for row in rows:
+                for kind in ('images', 'videos'):
+                    row[kind] = [
+                        File(stack.enter_context(open(path, 'rb')), name=os.path.basename(path))
+                        for path in row[kind]
+                    ]
+            return len(import_trips(user, rows))
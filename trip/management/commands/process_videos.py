@@ -0,0 +1,81 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from trip.models import TripVideo
+from trip.video_processing import claim_next_video, process_video
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Probe, extract posters and transcode pending trip videos with ffmpeg'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=getattr(settings, 'VIDEO_MAX_CONCURRENT', 2),
+            help='Number of videos processed concurrently by this worker',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exit when no pending videos are left instead of polling',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5.0,
+            help='Seconds to wait between polls when the queue is empty',
+        )
+        parser.add_argument(
+            '--retry-failed',
+            action='store_true',
+            help='Queue failed videos for processing again before starting',
+        )
+
+    def handle(self, *args, **options):
+        if options['retry_failed']:
+            retried = TripVideo.objects.filter(processing_status='failed').update(
+                processing_status='pending', processing_error='', progress=0
+            )
+            self.stdout.write(f'Queued {retried} failed videos again')
+
+        with ThreadPoolExecutor(max_workers=options['workers'], thread_name_prefix='video-worker') as executor:
+            results = list(executor.map(
+                lambda _: self.work(options['once'], options['interval']), range(options['workers'])
+            ))
+
+        ready = sum(result[0] for result in results)
+        failed = sum(result[1] for result in results)
+        self.stdout.write(self.style.SUCCESS(f'Processed {ready + failed} videos: {ready} ready, {failed} failed'))
+
+    def work(self, once, interval):
+        """حلقة عامل واحد: حجز فيديو ومعالجته حتى تفرغ الطابور (مع --once)"""
+        ready = failed = 0
+        try:
+            while True:
+                close_old_connections()
+                video = claim_next_video()
+                if video is None:
+                    if once:
+                        break
+                    time.sleep(interval)
+                    continue
+                try:
+                    video = process_video(video)
+                except Exception:
+                    # حتى فشل حفظ الحالة لا يوقف العامل؛ الفيديو يُعاد حجزه بعد المهلة
+                    logger.exception(f"Worker failed on TripVideo {video.id}")
+                    failed += 1
+                    continue
+                if video.processing_status == 'ready':
+                    ready += 1
+                else:
+                    failed += 1
+        finally:
+            close_old_connections()
+        return ready, failed
@@ -0,0 +1,19 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from trip.uploads import purge_expired_uploads, UPLOAD_EXPIRY
+
+
+class Command(BaseCommand):
+    help = 'Delete resumable uploads that were never finished or never attached to a trip'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours',
+            type=int,
+            default=int(UPLOAD_EXPIRY.total_seconds() // 3600),
+            help='Delete uploads idle for longer than this many hours',
+        )
+
+    def handle(self, *args, **options):
+        purged = purge_expired_uploads(timedelta(hours=options['hours']))
+        self.stdout.write(self.style.SUCCESS(f'Purged {purged} expired uploads'))
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from Rahala.conditional import bump_version
+from trip.destinations import DESTINATIONS_SCOPE, refresh_destination
+from trip.models import Destination, DestinationContributor, DestinationTag, Trip, TripTag
+
+
+class Command(BaseCommand):
+    help = ('Recompute destination rollups (trip counts, tag and contributor counts, top lists, '
+            'merged tourism info) from the trips table')
+
+    def handle(self, *args, **options):
+        trips = Trip.objects.exclude(city='').order_by()
+        tags = TripTag.objects.exclude(trip__city='').order_by()
+        trip_counts = trips.values('country', 'city').annotate(count=Count('id')).values_list(
+            'country', 'city', 'count'
+        )
+        contributor_counts = trips.values('country', 'city', 'user_id').annotate(count=Count('id')).values_list(
+            'country', 'city', 'user_id', 'count'
+        )
+        tag_counts = tags.values('trip__country', 'trip__city', 'tripTag').annotate(count=Count('id')).values_list(
+            'trip__country', 'trip__city', 'tripTag', 'count'
+        )
+
+        with transaction.atomic():
+            Destination.objects.all().delete()
+            destinations = Destination.objects.bulk_create([
+                Destination(country=country, city=city, trips_count=count)
+                for country, city, count in trip_counts
+            ], batch_size=1000)
+            ids = {(d.country, d.city): d.id for d in destinations}
+            DestinationContributor.objects.bulk_create([
+                DestinationContributor(destination_id=ids[country, city], user_id=user_id, count=count)
+                for country, city, user_id, count in contributor_counts
+            ], batch_size=1000)
+            DestinationTag.objects.bulk_create([
+                DestinationTag(destination_id=ids[country, city], tag=tag, count=count)
+                for country, city, tag, count in tag_counts
+            ], batch_size=1000)
+            for destination in destinations:
+                refresh_destination(destination)
+            bump_version(DESTINATIONS_SCOPE)
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {len(destinations)} destinations'))
@@ -0,0 +1,154 @@
+import math
+
+from django.db.models import Avg, Count, Max
+from django.db.models.functions import Substr
+from rest_framework.exceptions import ParseError
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from Rahala.conditional import ConditionalGetMixin, get_version
+from .geo import bbox_filter, cover_precision, haversine_km, radius_bbox, split_bbox, valid_coordinates
+from .models import Trip
+from .read_model import TRIPS_SCOPE
+from .serializers import TripPinSerializer
+
+MAX_NEARBY_RADIUS_KM = 500
+MAX_PINS = 500
+# عدد الخلايا التقريبي في إطار الخريطة عند التجميع (~ شاشة هاتف أو متصفح)
+CLUSTER_CELLS = 256
+
+
+def _number(request, name, default=None, minimum=None, maximum=None, cast=float):
+    """
+    قراءة معامل رقمي من الـ query string
+
+    Raises:
+        ParseError: القيمة مفقودة (دون default) أو غير رقمية أو غير منتهية (nan / inf)
+            أو خارج الحدود (400)
+    """
+    value = request.query_params.get(name)
+    if value in (None, ''):
+        if default is None:
+            raise ParseError(f'{name} is required.')
+        return default
+    try:
+        value = cast(value)
+    except ValueError:
+        raise ParseError(f'{name} must be a number.')
+    # nan و inf تتجاوز مقارنات الحدود
+    if not math.isfinite(value):
+        raise ParseError(f'{name} must be a finite number.')
+    if (minimum is not None and value < minimum) or (maximum is not None and value > maximum):
+        raise ParseError(f'{name} must be between {minimum} and {maximum}.')
+    return value
+
+
+def _bbox(request):
+    """
+    bbox=min_lng,min_lat,max_lng,max_lat (ترتيب GeoJSON)؛ min_lng > max_lng
+    يعني منطقة تعبر خط الطول 180
+
+    Returns:
+        list: المناطق بعد التقسيم عند خط الطول 180
+    """
+    try:
+        min_lng, min_lat, max_lng, max_lat = (float(part) for part in request.query_params['bbox'].split(','))
+    except (KeyError, ValueError):
+        raise ParseError('bbox must be min_lng,min_lat,max_lng,max_lat.')
+    if not (valid_coordinates(min_lat, min_lng) and valid_coordinates(max_lat, max_lng)) or min_lat > max_lat:
+        raise ParseError('bbox is out of range.')
+    return split_bbox(min_lat, min_lng, max_lat, max_lng)
+
+
+def _pins(trip_ids):
+    """الرحلات بترتيب المعرفات مع وسائط الـ cover في استعلامين"""
+    trips = Trip.objects.select_related('user').prefetch_related('images', 'videos').in_bulk(trip_ids)
+    return [trips[trip_id] for trip_id in trip_ids if trip_id in trips]
+
+
+class MapViewMixin(ConditionalGetMixin):
+    """ETag من إصدار قوائم الرحلات: يتغير مع كل إنشاء أو حذف"""
+
+    def get_etag_version(self, request):
+        return (get_version(TRIPS_SCOPE),)
+
+
+class NearbyTripsAPIView(MapViewMixin, APIView):
+    """
+    أقرب الرحلات لنقطة
+
+    GET ?lat=&lng=&radius=<كم، افتراضي 10>&limit=<افتراضي 20>
+    المرشحون من نطاقات geohash حول الدائرة، ثم المسافة الفعلية (haversine).
+    """
+
+    def get(self, request):
+        latitude = _number(request, 'lat', minimum=-90, maximum=90)
+        longitude = _number(request, 'lng', minimum=-180, maximum=180)
+        radius = _number(request, 'radius', 10.0, minimum=0, maximum=MAX_NEARBY_RADIUS_KM)
+        limit = _number(request, 'limit', 20, minimum=1, maximum=100, cast=int)
+
+        candidates = Trip.objects.filter(bbox_filter(radius_bbox(latitude, longitude, radius))).values_list(
+            'id', 'latitude', 'longitude'
+        )
+        distances = []
+        for trip_id, trip_latitude, trip_longitude in candidates.iterator():
+            distance = haversine_km(latitude, longitude, trip_latitude, trip_longitude)
+            if distance <= radius:
+                distances.append((distance, trip_id))
+        distances = sorted(distances)[:limit]
+
+        trips = _pins([trip_id for _, trip_id in distances])
+        distance_of = {trip_id: distance for distance, trip_id in distances}
+        results = TripPinSerializer(trips, many=True, context={'request': request}).data
+        for item in results:
+            item['distance_km'] = round(distance_of[item['id']], 3)
+        return Response(results)
+
+
+class TripsInBoundsAPIView(MapViewMixin, APIView):
+    """
+    الرحلات داخل إطار الخريطة (الأحدث أولاً)
+
+    GET ?bbox=min_lng,min_lat,max_lng,max_lat&limit=<افتراضي 100>
+    """
+
+    def get(self, request):
+        boxes = _bbox(request)
+        limit = _number(request, 'limit', 100, minimum=1, maximum=MAX_PINS, cast=int)
+        trip_ids = list(
+            Trip.objects.filter(bbox_filter(boxes)).order_by('-created_at').values_list('id', flat=True)[:limit]
+        )
+        trips = _pins(trip_ids)
+        return Response(TripPinSerializer(trips, many=True, context={'request': request}).data)
+
+
+class TripClustersAPIView(MapViewMixin, APIView):
+    """
+    تجميع الرحلات في خلايا geohash لعرض الخريطة
+
+    GET ?bbox=min_lng,min_lat,max_lng,max_lat
+    دقة الخلايا تُختار بحيث يغطي الإطار نحو CLUSTER_CELLS خلية، والتجميع في
+    قاعدة البيانات (GROUP BY بادئة الـ geohash) على نطاقات الفهرس. لكل خلية:
+    العدد ومتوسط الإحداثيات، ومعرف الرحلة إذا كانت وحيدة.
+    """
+
+    def get(self, request):
+        boxes = _bbox(request)
+        precision = min(cover_precision(*box, max_cells=CLUSTER_CELLS) for box in boxes)
+        cells = (
+            Trip.objects.filter(bbox_filter(boxes))
+            .annotate(cell=Substr('geohash', 1, precision))
+            .values('cell')
+            .annotate(count=Count('id'), center_lat=Avg('latitude'), center_lng=Avg('longitude'), last_id=Max('id'))
+            .order_by('cell')
+        )
+        clusters = [
+            {
+                'geohash': cell['cell'],
+                'count': cell['count'],
+                'latitude': round(cell['center_lat'], 6),
+                'longitude': round(cell['center_lng'], 6),
+                'trip_id': cell['last_id'] if cell['count'] == 1 else None,
+            }
+            for cell in cells
+        ]
+        return Response({'precision': precision, 'clusters': clusters})
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.5 on 2026-10-19 12:16
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_counters(apps, schema_editor):
+    Trip = apps.get_model('trip', 'Trip')
+    Like = apps.get_model('interactions', 'Like')
+    Save = apps.get_model('interactions', 'Save')
+
+    def count_of(model):
+        return Coalesce(Subquery(
+            model.objects.filter(
+                trip_id=OuterRef('pk')
+            ).order_by().values('trip_id').annotate(total=Count('id')).values('total')
+        ), 0)
+
+    Trip.objects.update(likes_count=count_of(Like), saves_count=count_of(Save))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trip', '0003_trip_city_trip_country_trip_tourism_info'),
+        ('interactions', '0005_outboxevent_batch_created'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trip',
+            name='likes_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='trip',
+            name='saves_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='trip',
+            index=models.Index(fields=['-likes_count', '-created_at'], name='trip_trip_likes_c_0e65e6_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 12:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trip', '0004_trip_likes_count_saves_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trip',
+            name='shares_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 12:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trip', '0005_trip_shares_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tripimage',
+            name='variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.5 on 2026-10-19 12:49
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trip', '0006_tripimage_variants'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaUpload',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('image', 'Image'), ('video', 'Video')], max_length=10)),
+                ('filename', models.CharField(max_length=255)),
+                ('size', models.PositiveBigIntegerField(help_text='الحجم الكلي المعلن بالبايت')),
+                ('offset', models.PositiveBigIntegerField(default=0, help_text='عدد البايتات المستلمة')),
+                ('checksum', models.CharField(blank=True, help_text='SHA-256 للملف كاملاً (hex)', max_length=64)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('completed', 'Completed'), ('attached', 'Attached')], default='pending', max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='media_uploads', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'updated_at'], name='trip_mediau_status_dd0c5c_idx')],
+            },
+        ),
+    ]
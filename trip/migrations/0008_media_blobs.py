@@ -0,0 +1,66 @@
+# Generated by Django 5.2.5 on 2026-10-19 12:53
+
+import os
+from collections import Counter
+
+import trip.models
+import trip.storage
+import trip.validators
+from django.conf import settings
+from django.db import migrations, models
+
+
+def count_existing_references(apps, schema_editor):
+    """MediaBlob للملفات الموجودة بأسمائها القديمة حتى يشملها العد والحذف"""
+    TripImage = apps.get_model('trip', 'TripImage')
+    TripVideo = apps.get_model('trip', 'TripVideo')
+    MediaBlob = apps.get_model('trip', 'MediaBlob')
+
+    references = Counter(TripImage.objects.exclude(image='').values_list('image', flat=True))
+    references.update(TripVideo.objects.exclude(video='').values_list('video', flat=True))
+
+    def size(name):
+        try:
+            return os.path.getsize(os.path.join(settings.MEDIA_ROOT, name))
+        except OSError:
+            return 0
+
+    MediaBlob.objects.bulk_create([
+        MediaBlob(name=name, size=size(name), ref_count=count)
+        for name, count in references.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trip', '0007_mediaupload'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='tripimage',
+            name='image',
+            field=models.ImageField(storage=trip.storage.get_media_storage, upload_to=trip.models.trip_image_path, validators=[trip.validators.validate_image_file_extension]),
+        ),
+        migrations.AlterField(
+            model_name='tripvideo',
+            name='video',
+            field=models.FileField(storage=trip.storage.get_media_storage, upload_to=trip.models.trip_video_path, validators=[trip.validators.validate_video_file_extension]),
+        ),
+        migrations.CreateModel(
+            name='MediaBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('size', models.PositiveBigIntegerField(default=0)),
+                ('ref_count', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['ref_count', 'updated_at'], name='trip_mediab_ref_cou_0293f3_idx')],
+            },
+        ),
+        migrations.RunPython(count_existing_references, migrations.RunPython.noop),
+    ]
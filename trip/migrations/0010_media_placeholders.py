@@ -0,0 +1,43 @@
+# Generated by Django 5.2.5 on 2026-10-19 13:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trip', '0009_tripvideo_processing'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tripimage',
+            name='aspect_ratio',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='tripimage',
+            name='blurhash',
+            field=models.CharField(blank=True, max_length=32),
+        ),
+        migrations.AddField(
+            model_name='tripimage',
+            name='dominant_color',
+            field=models.CharField(blank=True, max_length=7),
+        ),
+        migrations.AddField(
+            model_name='tripvideo',
+            name='aspect_ratio',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='tripvideo',
+            name='blurhash',
+            field=models.CharField(blank=True, max_length=32),
+        ),
+        migrations.AddField(
+            model_name='tripvideo',
+            name='dominant_color',
+            field=models.CharField(blank=True, max_length=7),
+        ),
+    ]
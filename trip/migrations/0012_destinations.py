@@ -0,0 +1,132 @@
+# Generated by Django 5.2.5 on 2026-10-19 13:41
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_destinations(apps, schema_editor):
+    """
+    عدادات الوجهات للرحلات الموجودة (نفس حساب rebuild_destinations)
+
+    القوائم المشتقة (top_tags و top_contributors و tourism_info والإحداثيات)
+    يبنيها مستهلك destination.changed بعد تشغيل الـ relay.
+    """
+    Trip = apps.get_model('trip', 'Trip')
+    TripTag = apps.get_model('trip', 'TripTag')
+    Destination = apps.get_model('trip', 'Destination')
+    DestinationContributor = apps.get_model('trip', 'DestinationContributor')
+    DestinationTag = apps.get_model('trip', 'DestinationTag')
+    OutboxEvent = apps.get_model('interactions', 'OutboxEvent')
+
+    trips = Trip.objects.exclude(city='').order_by()
+    Destination.objects.bulk_create([
+        Destination(country=row['country'], city=row['city'], trips_count=row['count'])
+        for row in trips.values('country', 'city').annotate(count=Count('id'))
+    ], batch_size=1000)
+    ids = {(d.country, d.city): d.id for d in Destination.objects.only('id', 'country', 'city')}
+    DestinationContributor.objects.bulk_create([
+        DestinationContributor(destination_id=ids[row['country'], row['city']], user_id=row['user_id'], count=row['count'])
+        for row in trips.values('country', 'city', 'user_id').annotate(count=Count('id'))
+    ], batch_size=1000)
+    DestinationTag.objects.bulk_create([
+        DestinationTag(destination_id=ids[row['trip__country'], row['trip__city']], tag=row['tripTag'], count=row['count'])
+        for row in TripTag.objects.exclude(trip__city='').order_by().values(
+            'trip__country', 'trip__city', 'tripTag'
+        ).annotate(count=Count('id'))
+    ], batch_size=1000)
+    OutboxEvent.objects.bulk_create([
+        OutboxEvent(event_type='destination.changed', payload={'destination_id': destination_id})
+        for destination_id in sorted(ids.values())
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trip', '0011_trip_geohash'),
+        ('interactions', '0007_outboxevent_trip_image_created'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Destination',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('country', models.CharField(blank=True, max_length=100)),
+                ('city', models.CharField(max_length=100)),
+                ('trips_count', models.IntegerField(default=0)),
+                ('top_tags', models.JSONField(blank=True, default=list)),
+                ('top_contributors', models.JSONField(blank=True, default=list)),
+                ('tourism_info', models.JSONField(blank=True, default=dict)),
+                ('latitude', models.FloatField(blank=True, null=True)),
+                ('longitude', models.FloatField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DestinationContributor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DestinationTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tag', models.CharField(max_length=50)),
+                ('count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='trip',
+            index=models.Index(fields=['country', 'city', '-created_at'], name='trip_trip_country_7017f0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='destination',
+            index=models.Index(fields=['-trips_count', 'id'], name='trip_destin_trips_c_d7d96c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='destination',
+            index=models.Index(fields=['country', '-trips_count'], name='trip_destin_country_99d353_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='destination',
+            constraint=models.UniqueConstraint(fields=('country', 'city'), name='unique_destination'),
+        ),
+        migrations.AddField(
+            model_name='destinationcontributor',
+            name='destination',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='contributors', to='trip.destination'),
+        ),
+        migrations.AddField(
+            model_name='destinationcontributor',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='destinationtag',
+            name='destination',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tag_counts', to='trip.destination'),
+        ),
+        migrations.AddIndex(
+            model_name='destinationcontributor',
+            index=models.Index(fields=['destination', '-count'], name='trip_destin_destina_367991_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='destinationcontributor',
+            constraint=models.UniqueConstraint(fields=('destination', 'user'), name='unique_destination_contributor'),
+        ),
+        migrations.AddIndex(
+            model_name='destinationtag',
+            index=models.Index(fields=['destination', '-count'], name='trip_destin_destina_d39f0e_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='destinationtag',
+            constraint=models.UniqueConstraint(fields=('destination', 'tag'), name='unique_destination_tag'),
+        ),
+        migrations.RunPython(backfill_destinations, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,10 @@
 
+import uuid
+
 from django.db import models
 from django.conf import settings
 from .validators import validate_image_file_extension, validate_video_file_extension
+from .storage import get_media_storage
 
 
 def trip_image_path(instance, filename):
@@ -28,9 +31,28 @@ class Trip(models.Model):
         help_text="معلومات سياحية شاملة من AI"
     )
 
+    # الإحداثيات و geohash للاستعلامات المكانية (trip/geo.py)
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    geohash = models.CharField(max_length=12, blank=True)
+
+    # عدادات مخزنة تُحدَّث مع كل إعجاب/حفظ/مشاركة
+    likes_count = models.PositiveIntegerField(default=0)
+    saves_count = models.PositiveIntegerField(default=0)
+    shares_count = models.PositiveIntegerField(default=0)
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-likes_count', '-created_at']),
+            # يغطي استعلامات الخريطة دون قراءة صفوف الجدول
+            models.Index(fields=['geohash', 'latitude', 'longitude']),
+            # رحلات وجهة معينة (الأحدث أولاً)
+            models.Index(fields=['country', 'city', '-created_at']),
+        ]
+
     def __str__(self):
         return self.caption or f"رحلة في {self.location}"
 
@@ -42,8 +64,15 @@ class TripImage(models.Model):
     )
     image = models.ImageField(
         upload_to=trip_image_path,
+        storage=get_media_storage,
         validators=[validate_image_file_extension]
     )
+    # النسخ المولدة (thumb / feed / full): الأبعاد ومسار كل صيغة، فارغة حتى التوليد
+    variants = models.JSONField(default=dict, blank=True)
+    # placeholder يُعرض قبل تحميل الملف (trip/placeholders.py)، فارغ حتى المعالجة
+    blurhash = models.CharField(max_length=32, blank=True)
+    dominant_color = models.CharField(max_length=7, blank=True)
+    aspect_ratio = models.FloatField(null=True, blank=True)
 
 class TripVideo(models.Model):
     trip = models.ForeignKey(
@@ -53,8 +82,31 @@ class TripVideo(models.Model):
     )
     video = models.FileField(
         upload_to=trip_video_path,
+        storage=get_media_storage,
         validators=[validate_video_file_extension]
     )
+    PROCESSING_STATUSES = [
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('ready', 'Ready'),
+        ('failed', 'Failed'),
+    ]
+    # مرحلة المعالجة (trip/video_processing.py): الأصل يُعرض كما هو حتى تصبح ready
+    processing_status = models.CharField(
+        max_length=20, choices=PROCESSING_STATUSES, default='pending', db_index=True
+    )
+    progress = models.PositiveSmallIntegerField(default=0)
+    processing_started_at = models.DateTimeField(null=True, blank=True)
+    processing_error = models.TextField(blank=True)
+    duration = models.FloatField(null=True, blank=True)
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    # مسارات الناتج: poster و mp4 ({path, width, height}) و hls (master playlist)
+    renditions = models.JSONField(default=dict, blank=True)
+    # placeholder يُعرض قبل تحميل الملف من صورة poster، فارغ حتى المعالجة
+    blurhash = models.CharField(max_length=32, blank=True)
+    dominant_color = models.CharField(max_length=7, blank=True)
+    aspect_ratio = models.FloatField(null=True, blank=True)
 
 class TripTag(models.Model):
     trip = models.ForeignKey(
@@ -72,3 +124,117 @@ class TripTag(models.Model):
 
     def __str__(self):
         return f"{self.tripTag} - {self.trip.id}"
+
+
+class MediaUpload(models.Model):
+    """رفع ملف على أجزاء قابل للاستئناف، يُربط برحلة بعد اكتماله"""
+    KIND_CHOICES = [
+        ('image', 'Image'),
+        ('video', 'Video'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('completed', 'Completed'),
+        ('attached', 'Attached'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='media_uploads'
+    )
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField(help_text="الحجم الكلي المعلن بالبايت")
+    offset = models.PositiveBigIntegerField(default=0, help_text="عدد البايتات المستلمة")
+    checksum = models.CharField(max_length=64, blank=True, help_text="SHA-256 للملف كاملاً (hex)")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'updated_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.filename} ({self.offset}/{self.size})"
+
+
+class MediaBlob(models.Model):
+    """ملف وسائط مخزن مرة واحدة بحسب محتواه مع عدد من يشير إليه"""
+    name = models.CharField(max_length=255, unique=True)
+    size = models.PositiveBigIntegerField(default=0)
+    ref_count = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['ref_count', 'updated_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.ref_count} refs)"
+
+
+class Destination(models.Model):
+    """
+    ملخص وجهة (دولة، مدينة) مخزن في صف واحد
+
+    trips_count وعدادات DestinationTag / DestinationContributor تُحدَّث مع كل
+    إنشاء أو حذف رحلة أو تاج (trip/destinations.py)، و top_tags و
+    top_contributors و tourism_info تُبنى منها.
+    """
+    country = models.CharField(max_length=100, blank=True)
+    city = models.CharField(max_length=100)
+    trips_count = models.IntegerField(default=0)
+    top_tags = models.JSONField(default=list, blank=True)
+    top_contributors = models.JSONField(default=list, blank=True)
+    tourism_info = models.JSONField(default=dict, blank=True)
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['country', 'city'], name='unique_destination'),
+        ]
+        indexes = [
+            models.Index(fields=['-trips_count', 'id']),
+            models.Index(fields=['country', '-trips_count']),
+        ]
+
+    def __str__(self):
+        return f"{self.city}, {self.country}" if self.country else self.city
+
+
+class DestinationTag(models.Model):
+    """عدد رحلات الوجهة التي تحمل تاجاً معيناً"""
+    destination = models.ForeignKey(Destination, on_delete=models.CASCADE, related_name='tag_counts')
+    tag = models.CharField(max_length=50)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['destination', 'tag'], name='unique_destination_tag'),
+        ]
+        indexes = [
+            models.Index(fields=['destination', '-count']),
+        ]
+
+
+class DestinationContributor(models.Model):
+    """عدد رحلات المستخدم في الوجهة"""
+    destination = models.ForeignKey(Destination, on_delete=models.CASCADE, related_name='contributors')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['destination', 'user'], name='unique_destination_contributor'),
+        ]
+        indexes = [
+            models.Index(fields=['destination', '-count']),
+        ]
@@ -0,0 +1,133 @@
+"""
+Placeholders لصور وفيديوهات الرحلات
+
+لكل صورة (ولصورة poster الفيديو) يُحسب أثناء المعالجة:
+- BlurHash: نص قصير (~28 حرفاً) يرسم منه العميل صورة ضبابية فوراً
+- اللون الغالب (#rrggbb) للعملاء التي لا تفك BlurHash
+- نسبة العرض إلى الارتفاع حتى يُحجز مكان الصورة قبل تحميلها
+
+القيم تُحفظ في أعمدة صغيرة على TripImage / TripVideo وتُضمن في TripSerializer،
+فلا يحتاج العميل لأي طلب إضافي. الحساب على نسخة مصغرة (64 بكسل) بـ numpy.
+"""
+
+import logging
+
+import numpy as np
+from PIL import Image, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+BLURHASH_COMPONENTS = (4, 3)  # (أفقي، رأسي)
+SAMPLE_SIZE = 64
+PALETTE_SIZE = 8
+
+# الأعمدة المشتركة بين TripImage و TripVideo
+PLACEHOLDER_FIELDS = ('blurhash', 'dominant_color', 'aspect_ratio')
+
+_BASE83 = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~'
+
+
+def _base83(value, length):
+    return ''.join(_BASE83[value // 83 ** (length - i - 1) % 83] for i in range(length))
+
+
+def _srgb_to_linear(values):
+    values = values / 255.0
+    return np.where(values <= 0.04045, values / 12.92, ((values + 0.055) / 1.055) ** 2.4)
+
+
+def _linear_to_srgb(value):
+    value = min(max(value, 0.0), 1.0)
+    if value <= 0.0031308:
+        return int(value * 12.92 * 255 + 0.5)
+    return int((1.055 * value ** (1 / 2.4) - 0.055) * 255 + 0.5)
+
+
+def encode_blurhash(image, components=BLURHASH_COMPONENTS):
+    """
+    BlurHash لصورة RGB (يُفضل تمرير نسخة مصغرة)
+
+    Returns:
+        str: النص المرمز بـ base83
+    """
+    x_components, y_components = components
+    pixels = _srgb_to_linear(np.asarray(image.convert('RGB'), dtype=np.float64))
+    height, width, _ = pixels.shape
+
+    # معاملات DCT: لكل (j, i) مجموع البكسلات مضروبة في cos الأفقي والرأسي
+    cos_x = np.cos(np.pi * np.outer(np.arange(x_components), np.arange(width)) / width)
+    cos_y = np.cos(np.pi * np.outer(np.arange(y_components), np.arange(height)) / height)
+    factors = np.einsum('jy,ix,yxc->jic', cos_y, cos_x, pixels) * 2 / (width * height)
+    factors[0, 0] /= 2  # التطبيع 1 لـ DC و 2 لباقي المعاملات
+    factors = factors.reshape(-1, 3)
+
+    dc, ac = factors[0], factors[1:]
+    result = _base83((x_components - 1) + (y_components - 1) * 9, 1)
+    if len(ac):
+        quantised_max = int(max(0, min(82, np.floor(np.abs(ac).max() * 166 - 0.5))))
+        max_value = (quantised_max + 1) / 166
+    else:
+        quantised_max, max_value = 0, 1
+    result += _base83(quantised_max, 1)
+    result += _base83(
+        (_linear_to_srgb(dc[0]) << 16) + (_linear_to_srgb(dc[1]) << 8) + _linear_to_srgb(dc[2]), 4
+    )
+
+    scaled = np.sign(ac) * np.abs(ac / max_value) ** 0.5
+    quantised = np.clip(np.floor(scaled * 9 + 9.5), 0, 18).astype(int)
+    for r, g, b in quantised:
+        result += _base83(r * 19 * 19 + g * 19 + b, 2)
+    return result
+
+
+def dominant_color(image):
+    """اللون الأكثر تكراراً بعد تقليل الألوان إلى PALETTE_SIZE"""
+    quantised = image.convert('RGB').quantize(PALETTE_SIZE)
+    palette = quantised.getpalette()
+    _, index = max(quantised.getcolors())
+    r, g, b = palette[index * 3:index * 3 + 3]
+    return f'#{r:02x}{g:02x}{b:02x}'
+
+
+def compute_placeholder(image):
+    """
+    قيم الـ placeholder لصورة محملة (بعد تصحيح اتجاه EXIF)
+
+    Returns:
+        dict: blurhash و dominant_color و aspect_ratio
+    """
+    width, height = image.size
+    sample = image.copy()
+    sample.thumbnail((SAMPLE_SIZE, SAMPLE_SIZE), Image.BILINEAR)
+    sample = sample.convert('RGB')
+    return {
+        'blurhash': encode_blurhash(sample),
+        'dominant_color': dominant_color(sample),
+        'aspect_ratio': round(width / height, 4) if height else None,
+    }
+
+
+def placeholder_from_file(file):
+    """
+    placeholder من ملف صورة مفتوح
+
+    Returns:
+        dict | None: None إذا تعذرت قراءة الصورة
+    """
+    from .image_variants import load_image
+    try:
+        return compute_placeholder(load_image(file))
+    except (UnidentifiedImageError, OSError) as e:
+        logger.warning(f"Cannot compute placeholder: {str(e)}")
+        return None
+
+
+def serialize_placeholder(obj):
+    """الـ placeholder كما يُضمن في الـ API (None قبل المعالجة)"""
+    if not obj.blurhash:
+        return None
+    return {
+        'blurhash': obj.blurhash,
+        'color': obj.dominant_color,
+        'aspect_ratio': obj.aspect_ratio,
+    }
@@ -0,0 +1,90 @@
+"""
+نموذج قراءة لتفاصيل الرحلة
+
+مستند الرحلة (البيانات، الوسائط، التاجات، العدادات، أول التعليقات) يُبنى
+بعدد ثابت من الاستعلامات ويُخزن في الـ cache تحت رقم إصدار الرحلة. أي كتابة
+على الرحلة أو تفاعلاتها ترفع الإصدار فيصبح المستند القديم غير مستخدم.
+
+الإصدار يُحفظ في الـ cache أيضاً (Rahala.conditional)، فيمكن حساب ETag
+والرد بـ 304 دون أي استعلام لقاعدة البيانات. حالة المستخدم الحالي (is_liked / is_saved) لا تُخزن
+في المستند وتُضاف لكل طلب.
+"""
+
+from django.core.cache import cache
+from django.db.models import Count
+from django.utils.http import quote_etag
+
+from Rahala.conditional import bump_version, get_version, get_versions
+from interactions.models import Comment
+from interactions.serializers import CommentReplySerializer
+from .models import Trip
+from .serializers import TripSerializer
+
+TRIP_DOCUMENT_TIMEOUT = 60 * 60  # ساعة
+TRIP_DETAIL_COMMENTS = 3
+
+# نطاق إصدار يتغير مع أي تعديل على محتوى الرحلات (القوائم العامة)
+TRIPS_SCOPE = 'trips'
+
+
+def get_trip_version(trip_id):
+    """رقم إصدار الرحلة الحالي"""
+    return get_version(f"trip:{trip_id}")
+
+
+def get_trip_versions(trip_ids):
+    """أرقام إصدارات عدة رحلات (صفحة من قائمة) بقراءة واحدة من الـ cache"""
+    return get_versions([f"trip:{trip_id}" for trip_id in trip_ids])
+
+
+def invalidate_trip(trip_id):
+    """إبطال مستند الرحلة بعد كتابة عليها أو على تفاعلاتها"""
+    bump_version(f"trip:{trip_id}")
+
+
+def trip_etag(trip_id, viewer_key):
+    """ETag لمستند الرحلة كما يراه مستخدم معين"""
+    return quote_etag(f"trip-{trip_id}-{get_trip_version(trip_id)}-{viewer_key}")
+
+
+def build_trip_document(trip_id, request=None):
+    """
+    بناء مستند الرحلة من قاعدة البيانات
+
+    Returns:
+        dict | None: المستند، أو None إذا لم تكن الرحلة موجودة
+    """
+    trip = Trip.objects.select_related('user').prefetch_related(
+        'images', 'videos', 'tags'
+    ).annotate(
+        comments_count=Count('comments')
+    ).filter(id=trip_id).first()
+    if trip is None:
+        return None
+
+    comments = Comment.objects.filter(
+        trip_id=trip_id, parent__isnull=True
+    ).select_related('user').order_by('-created_at')[:TRIP_DETAIL_COMMENTS]
+
+    context = {'request': request}
+    document = dict(TripSerializer(trip, context=context).data)
+    document.update({
+        'likes_count': trip.likes_count,
+        'saves_count': trip.saves_count,
+        'shares_count': trip.shares_count,
+        'comments_count': trip.comments_count,
+        'comments': CommentReplySerializer(comments, many=True, context=context).data,
+    })
+    return document
+
+
+def get_trip_document(trip_id, request=None):
+    """مستند الرحلة من الـ cache أو بناؤه وتخزينه تحت الإصدار الحالي"""
+    host = request.get_host() if request is not None else ''
+    key = f"trip_detail:{trip_id}:{get_trip_version(trip_id)}:{host}"
+    document = cache.get(key)
+    if document is None:
+        document = build_trip_document(trip_id, request)
+        if document is not None:
+            cache.set(key, document, TRIP_DOCUMENT_TIMEOUT)
+    return document
@@ -1,17 +1,71 @@
 # trip/serializers.py
 
+from django.core.files.storage import default_storage
 from rest_framework import serializers
-from .models import Trip, TripImage, TripVideo, TripTag
+from .models import Trip, TripImage, TripVideo, TripTag, MediaUpload, Destination
+from .image_variants import build_srcset
+from .placeholders import serialize_placeholder
 
 class TripImageSerializer(serializers.ModelSerializer):
+    thumbnail = serializers.SerializerMethodField()
+    srcset = serializers.SerializerMethodField()
+    placeholder = serializers.SerializerMethodField()
+
     class Meta:
         model = TripImage
-        fields = ['id', 'image']
+        fields = ['id', 'image', 'thumbnail', 'srcset', 'placeholder']
+
+    def _url(self, path):
+        url = default_storage.url(path)
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request is not None else url
+
+    def get_thumbnail(self, obj):
+        """نسخة thumb بصيغة JPEG، أو الأصل قبل توليد النسخ"""
+        # بالاسم لا بالترتيب: jsonb في PostgreSQL لا يحفظ ترتيب المفاتيح
+        thumb = (obj.variants or {}).get('thumb')
+        return self._url(thumb['jpeg'] if thumb else obj.image.name)
+
+    def get_srcset(self, obj):
+        """srcset لكل صيغة (None حتى يتم توليد النسخ)"""
+        return build_srcset(obj.variants, self._url)
+
+    def get_placeholder(self, obj):
+        return serialize_placeholder(obj)
 
 class TripVideoSerializer(serializers.ModelSerializer):
+    playback_url = serializers.SerializerMethodField()
+    poster = serializers.SerializerMethodField()
+    hls = serializers.SerializerMethodField()
+    placeholder = serializers.SerializerMethodField()
+
     class Meta:
         model = TripVideo
-        fields = ['id', 'video']
+        fields = [
+            'id', 'video', 'playback_url', 'poster', 'hls', 'placeholder', 'processing_status', 'progress',
+            'duration', 'width', 'height'
+        ]
+
+    def _url(self, path):
+        url = default_storage.url(path)
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request is not None else url
+
+    def get_playback_url(self, obj):
+        """نسخة MP4 المحولة، أو الأصل قبل انتهاء المعالجة"""
+        mp4 = obj.renditions.get('mp4')
+        return self._url(mp4['path'] if mp4 else obj.video.name)
+
+    def get_poster(self, obj):
+        poster = obj.renditions.get('poster')
+        return self._url(poster) if poster else None
+
+    def get_hls(self, obj):
+        hls = obj.renditions.get('hls')
+        return self._url(hls) if hls else None
+
+    def get_placeholder(self, obj):
+        return serialize_placeholder(obj)
 
 class TripTagSerializer(serializers.ModelSerializer):
     class Meta:
@@ -23,12 +77,69 @@ class TripSerializer(serializers.ModelSerializer):
     videos = TripVideoSerializer(many=True, read_only=True)
     tags = TripTagSerializer(many=True, read_only=True)
     user = serializers.StringRelatedField(read_only=True)
+    cover = serializers.SerializerMethodField()
 
     class Meta:
         model = Trip
         fields = [
             'id', 'user', 'caption', 'location',
             'country', 'city', 'tourism_info',  # الحقول الجديدة للمعلومات السياحية
+            'latitude', 'longitude',
             'created_at', 'updated_at',
-            'images', 'videos', 'tags',
+            'cover', 'images', 'videos', 'tags',
+        ]
+        read_only_fields = ['latitude', 'longitude']
+
+    def get_cover(self, obj):
+        """placeholder أول وسيط في الرحلة لرسم بطاقة الفيد قبل تحميل أي ملف"""
+        # من الـ prefetch دون استعلام إضافي
+        for media in (*obj.images.all(), *obj.videos.all()):
+            placeholder = serialize_placeholder(media)
+            if placeholder:
+                return placeholder
+        return None
+
+
+class MediaUploadSerializer(serializers.ModelSerializer):
+    checksum = serializers.RegexField(r'^[0-9a-fA-F]{64}$', required=False, allow_blank=True)
+
+    class Meta:
+        model = MediaUpload
+        fields = ['id', 'kind', 'filename', 'size', 'offset', 'checksum', 'status', 'created_at']
+        read_only_fields = ['id', 'offset', 'status', 'created_at']
+        extra_kwargs = {'size': {'min_value': 1}}
+
+
+class TripImportSerializer(serializers.Serializer):
+    """رحلة واحدة في طلب الاستيراد؛ الوسائط رفعات مكتملة عبر /uploads/"""
+    location = serializers.CharField(max_length=255)
+    caption = serializers.CharField(required=False, allow_blank=True, default='')
+    country = serializers.CharField(max_length=100, required=False, allow_blank=True, default='')
+    city = serializers.CharField(max_length=100, required=False, allow_blank=True, default='')
+    tourism_info = serializers.JSONField(required=False, default=dict)
+    latitude = serializers.FloatField(min_value=-90, max_value=90, required=False, allow_null=True, default=None)
+    longitude = serializers.FloatField(min_value=-180, max_value=180, required=False, allow_null=True, default=None)
+    tags = serializers.ListField(child=serializers.CharField(max_length=50), required=False, default=list)
+    upload_ids = serializers.ListField(child=serializers.UUIDField(), required=False, default=list)
+
+
+class TripPinSerializer(serializers.ModelSerializer):
+    """رحلة على الخريطة: الموقع والـ placeholder دون قوائم الوسائط"""
+    user = serializers.StringRelatedField(read_only=True)
+    cover = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Trip
+        fields = ['id', 'user', 'caption', 'location', 'country', 'city', 'latitude', 'longitude', 'cover']
+
+    get_cover = TripSerializer.get_cover
+
+
+class DestinationSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Destination
+        fields = [
+            'id', 'country', 'city', 'trips_count', 'top_tags', 'top_contributors', 'tourism_info',
+            'latitude', 'longitude', 'updated_at',
         ]
+        read_only_fields = fields
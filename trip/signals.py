@@ -0,0 +1,81 @@
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+from Rahala.conditional import bump_version
+from interactions.outbox import record_event
+from .models import Trip, TripImage, TripVideo, TripTag
+from .read_model import TRIPS_SCOPE, invalidate_trip
+from .storage import retain_blob, release_blob
+from . import destinations
+
+
+@receiver(post_save, sender=Trip)
+@receiver(post_delete, sender=Trip)
+def invalidate_trip_document(sender, instance, **kwargs):
+    """إبطال مستند الرحلة وقوائم الرحلات وبروفايل صاحبها عند تعديلها أو حذفها"""
+    invalidate_trip(instance.id)
+    bump_version(TRIPS_SCOPE, f"user:{instance.user_id}")
+
+
+@receiver(post_save, sender=TripImage)
+@receiver(post_delete, sender=TripImage)
+@receiver(post_save, sender=TripVideo)
+@receiver(post_delete, sender=TripVideo)
+@receiver(post_save, sender=TripTag)
+@receiver(post_delete, sender=TripTag)
+def invalidate_trip_media(sender, instance, **kwargs):
+    """إبطال مستند الرحلة وقوائم الرحلات عند تغيير الوسائط أو التاجات"""
+    invalidate_trip(instance.trip_id)
+    bump_version(TRIPS_SCOPE)
+
+
+@receiver(post_save, sender=TripImage)
+def request_image_variants(sender, instance, created, **kwargs):
+    """طلب توليد نسخ الصورة الجديدة خارج مسار الطلب"""
+    if created:
+        record_event('trip_image.created', image_id=instance.id, trip_id=instance.trip_id)
+
+
+@receiver(post_save, sender=TripImage)
+@receiver(post_save, sender=TripVideo)
+def retain_media_blob(sender, instance, created, **kwargs):
+    """مرجع جديد لملف الوسائط (الملف نفسه قد يكون مشتركاً مع رحلات أخرى)"""
+    if created:
+        file = instance.image if sender is TripImage else instance.video
+        if file:
+            retain_blob(file.name, file.size)
+
+
+@receiver(post_delete, sender=TripImage)
+@receiver(post_delete, sender=TripVideo)
+def release_media_blob(sender, instance, **kwargs):
+    """إزالة المرجع؛ الملفات دون مراجع تُحذف في gc_media"""
+    file = instance.image if sender is TripImage else instance.video
+    if file:
+        release_blob(file.name)
+
+
+@receiver(post_save, sender=Trip)
+def count_destination_trip(sender, instance, created, **kwargs):
+    """احتساب الرحلة الجديدة في ملخص وجهتها"""
+    if created:
+        destinations.add_trips([instance])
+
+
+@receiver(pre_delete, sender=Trip)
+def uncount_destination_trip(sender, instance, **kwargs):
+    """إزالة الرحلة وتاجاتها من ملخص وجهتها قبل حذف التاجات"""
+    destinations.remove_trips([instance])
+
+
+@receiver(post_save, sender=TripTag)
+def count_destination_tag(sender, instance, created, **kwargs):
+    if created:
+        destinations.change_tags([(instance.trip, instance.tripTag)], 1)
+
+
+@receiver(post_delete, sender=TripTag)
+def uncount_destination_tag(sender, instance, origin=None, **kwargs):
+    """حذف تاج مباشرة؛ تاجات رحلة محذوفة احتُسبت في uncount_destination_trip"""
+    model = getattr(origin, 'model', type(origin))
+    if model is TripTag:
+        destinations.change_tags([(instance.trip, instance.tripTag)], -1)
@@ -0,0 +1,210 @@
+"""
+تخزين الوسائط بحسب المحتوى (content-addressed) مع إزالة التكرار
+
+كل ملف يُحسب SHA-256 له أثناء كتابته على دفعات، ويُخزن مرة واحدة تحت
+blobs/<ab>/<cd>/<digest><ext>. رفع نفس المحتوى مرة أخرى (إعادة نشر، نفس الصورة
+في عدة رحلات) لا يكتب ملفاً جديداً ويشير إلى نفس الـ blob.
+
+MediaBlob يحفظ عدد مراجع كل ملف من TripImage و TripVideo (تُحدَّث في
+trip/signals.py)، و collect_garbage يحذف الملفات التي لم يعد لها مراجع بعد
+فترة سماح، مع ما وُلد منها (نسخ الصور، poster ونسخ الفيديو).
+"""
+
+import hashlib
+import os
+import tempfile
+from collections import Counter
+from datetime import timedelta
+
+from django.core.files.storage import FileSystemStorage
+from django.db import connection
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+
+BLOB_ROOT = 'blobs'
+BLOB_TMP = f'{BLOB_ROOT}/tmp'
+GC_GRACE_PERIOD = timedelta(hours=1)  # حماية الرفعات التي لم يُلتزم صفها بعد
+
+
+def blob_name(digest, extension):
+    return f'{BLOB_ROOT}/{digest[:2]}/{digest[2:4]}/{digest}{extension}'
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """FileSystemStorage يسمي الملفات بـ SHA-256 محتواها"""
+
+    def get_available_name(self, name, max_length=None):
+        # الاسم النهائي يُحدد من المحتوى في _save
+        return name
+
+    def _save(self, name, content):
+        extension = os.path.splitext(name)[1].lower()
+        tmp_dir = self.path(BLOB_TMP)
+        os.makedirs(tmp_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+        try:
+            digest = hashlib.sha256()
+            with os.fdopen(fd, 'wb') as file:
+                if hasattr(content, 'seek'):
+                    content.seek(0)
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    file.write(chunk)
+
+            name = blob_name(digest.hexdigest(), extension)
+            full_path = self.path(name)
+            try:
+                # نفس المحتوى مخزن بالفعل: تحديث وقت التعديل يمنع collect_garbage
+                # من حذفه قبل أن يُلتزم مرجعه الجديد (retain_blobs)
+                os.utime(full_path)
+            except FileNotFoundError:
+                os.makedirs(os.path.dirname(full_path), exist_ok=True)
+                os.replace(tmp_path, full_path)
+                if self.file_permissions_mode is not None:
+                    os.chmod(full_path, self.file_permissions_mode)
+            else:
+                os.remove(tmp_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return name
+
+
+def get_media_storage():
+    """التخزين المستخدم لحقول TripImage.image و TripVideo.video"""
+    return ContentAddressedStorage()
+
+
+def retain_blob(name, size):
+    """إضافة مرجع لملف (INSERT ... ON CONFLICT في جملة واحدة)"""
+    retain_blobs([(name, size)])
+
+
+def retain_blobs(files):
+    """
+    إضافة مراجع لعدة ملفات في جملة واحدة
+
+    Args:
+        files (list): أزواج (الاسم، الحجم)؛ الاسم المكرر يضيف مرجعاً لكل تكرار
+    """
+    from .models import MediaBlob
+    counts = Counter(name for name, _ in files)
+    if not counts:
+        return
+    sizes = dict(files)
+    qn = connection.ops.quote_name
+    table = qn(MediaBlob._meta.db_table)
+    # نفس صيغة التخزين التي يكتبها الـ ORM، فمقارنة updated_at في collect_garbage صحيحة
+    now = MediaBlob._meta.get_field('updated_at').get_db_prep_save(timezone.now(), connection)
+    params = []
+    for name, count in counts.items():
+        params += [name, sizes[name], count, now, now]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} (name, size, ref_count, created_at, updated_at) "
+            f"VALUES {', '.join(['(%s, %s, %s, %s, %s)'] * len(counts))} ON CONFLICT (name) DO UPDATE "
+            f"SET ref_count = {table}.ref_count + excluded.ref_count, updated_at = excluded.updated_at",
+            params
+        )
+
+
+def release_blob(name):
+    """إزالة مرجع لملف (يُحذف لاحقاً في collect_garbage عند وصوله للصفر)"""
+    from .models import MediaBlob
+    MediaBlob.objects.filter(name=name, ref_count__gt=0).update(
+        ref_count=F('ref_count') - 1, updated_at=timezone.now()
+    )
+
+
+def _blob_files(name, storage):
+    """الملف الأصلي وكل ما وُلد منه (<digest>_*: نسخ الصور، poster، MP4، HLS)"""
+    directory = os.path.dirname(name)
+    prefix = os.path.splitext(os.path.basename(name))[0] + '_'
+    try:
+        _, files = storage.listdir(directory)
+    except FileNotFoundError:
+        return [name]
+    return [name] + [f'{directory}/{filename}' for filename in files if filename.startswith(prefix)]
+
+
+def collect_garbage(grace=GC_GRACE_PERIOD, dry_run=False, now=None, storage=None):
+    """
+    حذف الملفات التي لا يشير إليها أي TripImage أو TripVideo
+
+    يشمل ملفات blobs/ التي ليس لها MediaBlob (رفع أُلغي الـ transaction الخاص به)
+    والملفات المؤقتة المتروكة. الملفات الأحدث من فترة السماح لا تُلمس، ومنها
+    blob بلا مراجع أعاد _save استخدامه لرفع جديد لم يُلتزم مرجعه بعد.
+
+    Returns:
+        dict: عدد الملفات المحذوفة والبايتات المحررة
+    """
+    from .models import MediaBlob
+    storage = storage or get_media_storage()
+    now = now or timezone.now()
+    cutoff = now - grace
+    cutoff_ts = cutoff.timestamp()
+    removed = freed = 0
+
+    def touched(path):
+        try:
+            return os.path.getmtime(storage.path(path)) >= cutoff_ts
+        except FileNotFoundError:
+            return False
+
+    def remove(path):
+        nonlocal removed, freed
+        if not storage.exists(path):
+            return
+        freed += storage.size(path)
+        removed += 1
+        if not dry_run:
+            storage.delete(path)
+
+    orphans = MediaBlob.objects.filter(ref_count__lte=0, updated_at__lt=cutoff)
+    for blob in orphans.iterator():
+        if touched(blob.name):
+            continue
+        # إعادة التحقق عند الحذف: مرجع جديد قد يكون أُضيف بعد القراءة
+        if dry_run or MediaBlob.objects.filter(pk=blob.pk, ref_count__lte=0).delete()[0]:
+            # رفع لمس الملف بين الفحص وحذف الصف: يبقى الملف ويعيد retain_blobs
+            # إنشاء الصف (أو يُجمع لاحقاً كملف دون MediaBlob إذا أُلغي الرفع)
+            if touched(blob.name):
+                continue
+            for path in _blob_files(blob.name, storage):
+                remove(path)
+
+    root = storage.path(BLOB_ROOT)
+    known = {
+        os.path.basename(name)[:64]
+        for name in MediaBlob.objects.values_list('name', flat=True).iterator()
+    }
+    for directory, _, files in os.walk(root):
+        for filename in files:
+            full_path = os.path.join(directory, filename)
+            path = os.path.relpath(full_path, storage.location).replace(os.sep, '/')
+            in_tmp = path.startswith(f'{BLOB_TMP}/')
+            if (in_tmp or filename[:64] not in known) and os.path.getmtime(full_path) < cutoff_ts:
+                remove(path)
+
+    return {'files_removed': removed, 'bytes_freed': freed}
+
+
+def storage_report():
+    """
+    إحصائيات إزالة التكرار
+
+    Returns:
+        dict: عدد الملفات والمراجع، والبايتات المخزنة مقابل المنطقية والموفرة
+    """
+    from .models import MediaBlob
+    stats = MediaBlob.objects.filter(ref_count__gt=0).aggregate(
+        blobs=Count('id'),
+        references=Sum('ref_count'),
+        stored_bytes=Sum('size'),
+        logical_bytes=Sum(F('size') * F('ref_count')),
+    )
+    stats = {key: value or 0 for key, value in stats.items()}
+    stats['saved_bytes'] = stats['logical_bytes'] - stats['stored_bytes']
+    stats['orphaned_blobs'] = MediaBlob.objects.filter(ref_count__lte=0).count()
+    return stats
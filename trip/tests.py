@@ -8,19 +8,30 @@ from django.core.files.uploadedfile import SimpleUploadedFile
 
 User = get_user_model()
 
+# ترويسة MP4 (صندوق ftyp) حتى يقبل فحص المحتوى ملفات الفيديو في الاختبارات
+MP4_HEADER = b'\x00\x00\x00\x18ftypmp42\x00\x00\x00\x00mp42isom'
+
+
+def image_bytes(color=(10, 20, 30), size=(8, 8)):
+    import io
+    from PIL import Image
+    buffer = io.BytesIO()
+    Image.new('RGB', size, color).save(buffer, 'JPEG')
+    return buffer.getvalue()
+
 class TripAPITests(APITestCase):
     def test_upload_image_no_auth(self):
         self.client.force_authenticate(user=None)
         trip = Trip.objects.create(user=self.user, caption='No Auth', location='Cairo')
         url = f'/api/trip/{trip.id}/images/'
-        image = SimpleUploadedFile('test.jpg', b'file_content', content_type='image/jpeg')
+        image = SimpleUploadedFile('test.jpg', image_bytes(), content_type='image/jpeg')
         response = self.client.post(url, {'images': [image]}, format='multipart')
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
 
     def test_delete_image_not_owner(self):
         other_user = User.objects.create_user(email='other2@example.com', password='OtherPass123', is_active=True, is_verified=True)
         trip = Trip.objects.create(user=other_user, caption='Not Owner', location='Cairo')
-        image = SimpleUploadedFile('test.jpg', b'file_content', content_type='image/jpeg')
+        image = SimpleUploadedFile('test.jpg', image_bytes(), content_type='image/jpeg')
         img_obj = trip.images.create(image=image)
         url = f'/api/trip/images/{img_obj.id}/'
         response = self.client.delete(url)
@@ -29,8 +40,8 @@ class TripAPITests(APITestCase):
     def test_upload_multiple_images(self):
         trip = Trip.objects.create(user=self.user, caption='Multi Images', location='Cairo')
         url = f'/api/trip/{trip.id}/images/'
-        image1 = SimpleUploadedFile('test1.jpg', b'file_content1', content_type='image/jpeg')
-        image2 = SimpleUploadedFile('test2.jpg', b'file_content2', content_type='image/jpeg')
+        image1 = SimpleUploadedFile('test1.jpg', image_bytes((255, 0, 0)), content_type='image/jpeg')
+        image2 = SimpleUploadedFile('test2.jpg', image_bytes((0, 0, 255)), content_type='image/jpeg')
         response = self.client.post(url, {'images': [image1, image2]}, format='multipart')
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertEqual(len(response.data), 2)
@@ -38,8 +49,8 @@ class TripAPITests(APITestCase):
     def test_upload_multiple_videos(self):
         trip = Trip.objects.create(user=self.user, caption='Multi Videos', location='Cairo')
         url = f'/api/trip/{trip.id}/videos/'
-        video1 = SimpleUploadedFile('test1.mp4', b'file_content1', content_type='video/mp4')
-        video2 = SimpleUploadedFile('test2.mp4', b'file_content2', content_type='video/mp4')
+        video1 = SimpleUploadedFile('test1.mp4', MP4_HEADER + b'file_content1', content_type='video/mp4')
+        video2 = SimpleUploadedFile('test2.mp4', MP4_HEADER + b'file_content2', content_type='video/mp4')
         response = self.client.post(url, {'videos': [video1, video2]}, format='multipart')
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertEqual(len(response.data), 2)
@@ -61,20 +72,20 @@ class TripAPITests(APITestCase):
     def test_upload_image(self):
         trip = Trip.objects.create(user=self.user, caption='Upload Image', location='Cairo')
         url = f'/api/trip/{trip.id}/images/'
-        image = SimpleUploadedFile('test.jpg', b'file_content', content_type='image/jpeg')
+        image = SimpleUploadedFile('test.jpg', image_bytes(), content_type='image/jpeg')
         response = self.client.post(url, {'images': [image]}, format='multipart')
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
 
     def test_upload_video(self):
         trip = Trip.objects.create(user=self.user, caption='Upload Video', location='Cairo')
         url = f'/api/trip/{trip.id}/videos/'
-        video = SimpleUploadedFile('test.mp4', b'file_content', content_type='video/mp4')
+        video = SimpleUploadedFile('test.mp4', MP4_HEADER + b'file_content', content_type='video/mp4')
         response = self.client.post(url, {'videos': [video]}, format='multipart')
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
 
     def test_delete_image(self):
         trip = Trip.objects.create(user=self.user, caption='Delete Image', location='Cairo')
-        image = SimpleUploadedFile('test.jpg', b'file_content', content_type='image/jpeg')
+        image = SimpleUploadedFile('test.jpg', image_bytes(), content_type='image/jpeg')
         img_obj = trip.images.create(image=image)
         url = f'/api/trip/images/{img_obj.id}/'
         response = self.client.delete(url)
@@ -82,7 +93,7 @@ class TripAPITests(APITestCase):
 
     def test_delete_video(self):
         trip = Trip.objects.create(user=self.user, caption='Delete Video', location='Cairo')
-        video = SimpleUploadedFile('test.mp4', b'file_content', content_type='video/mp4')
+        video = SimpleUploadedFile('test.mp4', MP4_HEADER + b'file_content', content_type='video/mp4')
         vid_obj = trip.videos.create(video=video)
         url = f'/api/trip/videos/{vid_obj.id}/'
         response = self.client.delete(url)
@@ -111,7 +122,7 @@ class TripAPITests(APITestCase):
         self.assertIn('detail', response.data)
 
     def test_create_trip_with_image(self):
-        image = SimpleUploadedFile('test.jpg', b'file_content', content_type='image/jpeg')
+        image = SimpleUploadedFile('test.jpg', image_bytes(), content_type='image/jpeg')
         data = {
             'caption': 'Trip with image',
             'location': 'Alex',
@@ -168,3 +179,1214 @@ class TripAPITests(APITestCase):
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data['caption'], 'Detail Trip')
+
+
+class TripDetailReadModelTests(APITestCase):
+    """تفاصيل الرحلة من نموذج القراءة المخزن مع ETag"""
+
+    def setUp(self):
+        from rest_framework_simplejwt.tokens import RefreshToken
+        self.owner = User.objects.create_user(email='owner@example.com', password='OwnerPass123', is_active=True, is_verified=True)
+        self.viewer = User.objects.create_user(email='viewer@example.com', password='ViewerPass123', is_active=True, is_verified=True)
+        self.trip = Trip.objects.create(user=self.owner, caption='Read Model', location='Luxor')
+        TripTag.objects.create(trip=self.trip, tripTag='history')
+        self.url = f'/api/trip/{self.trip.id}/'
+        token = RefreshToken.for_user(self.viewer).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_document_includes_counters_comments_and_viewer_state(self):
+        from interactions.models import Comment, Like
+        Like.objects.create(user=self.viewer, trip=self.trip)
+        for i in range(5):
+            Comment.objects.create(user=self.owner, trip=self.trip, content=f'comment {i}')
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['likes_count'], 1)
+        self.assertEqual(response.data['comments_count'], 5)
+        self.assertEqual(len(response.data['comments']), 3)
+        self.assertEqual(response.data['comments'][0]['content'], 'comment 4')
+        self.assertEqual([t['tripTag'] for t in response.data['tags']], ['history'])
+        self.assertTrue(response.data['is_liked'])
+        self.assertFalse(response.data['is_saved'])
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+
+    def test_matching_etag_returns_304_without_queries(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_cached_document_skips_hydration(self):
+        self.client.get(self.url)
+        # إعجاب وحفظ المستخدم الحالي فقط، دون المصادقة أو بناء المستند
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_interaction_writes_change_etag(self):
+        from interactions.models import Comment
+        first = self.client.get(self.url)['ETag']
+
+        self.client.post('/api/interactions/like/toggle/', {'trip_id': self.trip.id, 'liked': True}, format='json')
+        second = self.client.get(self.url, HTTP_IF_NONE_MATCH=first)
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(second['ETag'], first)
+        self.assertEqual(second.data['likes_count'], 1)
+        self.assertTrue(second.data['is_liked'])
+
+        Comment.objects.create(user=self.owner, trip=self.trip, content='new')
+        third = self.client.get(self.url, HTTP_IF_NONE_MATCH=second['ETag'])
+        self.assertEqual(third.status_code, status.HTTP_200_OK)
+        self.assertEqual(third.data['comments_count'], 1)
+
+    def test_etag_is_per_viewer(self):
+        etag = self.client.get(self.url)['ETag']
+        self.client.credentials()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.data['is_liked'])
+
+    def test_missing_trip_returns_404(self):
+        response = self.client.get('/api/trip/999999/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ConditionalTripListTests(APITestCase):
+    """ETag و 304 لقوائم الرحلات"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='lists@example.com', password='ListsPass123', is_active=True, is_verified=True)
+        self.trip = Trip.objects.create(user=self.user, caption='Listed', location='Aswan')
+        TripTag.objects.create(trip=self.trip, tripTag='nile')
+
+    def test_trip_list_returns_304_until_a_trip_changes(self):
+        response = self.client.get('/api/trip/')
+        etag = response['ETag']
+        self.assertEqual(response['Cache-Control'], 'public, no-cache')
+
+        response = self.client.get('/api/trip/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+
+        Trip.objects.create(user=self.user, caption='Another', location='Aswan')
+        response = self.client.get('/api/trip/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_tag_trips_etag_varies_by_viewer_and_interactions(self):
+        url = '/api/trip/tags/nile/trips/'
+        etag = self.client.get(url)['ETag']
+        # معرفات الصفحة فقط
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+
+        self.client.post('/api/interactions/like/toggle/', {'trip_id': self.trip.id, 'liked': True}, format='json')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data['results'][0]['is_liked'])
+
+    def test_tag_trips_etag_ignores_activity_outside_the_page(self):
+        from interactions.models import Like
+        other = Trip.objects.create(user=self.user, caption='Elsewhere', location='Cairo')
+        newer = Trip.objects.create(user=self.user, caption='Newer', location='Aswan')
+        TripTag.objects.create(trip=newer, tripTag='nile')
+        url = '/api/trip/tags/nile/trips/?page_size=1'
+        etag = self.client.get(url)['ETag']
+
+        # رحلة بتاج آخر، ورحلة بنفس التاج في الصفحة الثانية
+        Like.objects.create(user=self.user, trip=other)
+        Like.objects.create(user=self.user, trip=self.trip)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+
+        Like.objects.create(user=self.user, trip=newer)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0]['likes_count'], 1)
+
+    def test_view_without_etag_version_is_improperly_configured(self):
+        from django.core.exceptions import ImproperlyConfigured
+        from rest_framework.views import APIView
+        from Rahala.conditional import ConditionalGetMixin
+
+        class UnversionedView(ConditionalGetMixin, APIView):
+            pass
+
+        with self.assertRaisesMessage(ImproperlyConfigured, 'UnversionedView must define get_etag_version()'):
+            UnversionedView().get_etag_version(None)
+
+
+class ImageVariantsTests(APITestCase):
+    """توليد النسخ المصغرة والمتجاوبة لصور الرحلات"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='photos@example.com', password='PhotosPass123', is_active=True, is_verified=True)
+        self.trip = Trip.objects.create(user=self.user, caption='Photos', location='Siwa')
+
+    def _jpeg(self, size, orientation=None):
+        import io
+        from PIL import Image
+        image = Image.new('RGB', size, (200, 120, 40))
+        exif = Image.Exif()
+        if orientation:
+            exif[0x0112] = orientation
+        exif[0x010F] = 'TestCam'
+        buffer = io.BytesIO()
+        image.save(buffer, 'JPEG', exif=exif)
+        return SimpleUploadedFile('photo.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+    def test_relay_generates_oriented_stripped_variants(self):
+        from PIL import Image
+        from django.core.files.storage import default_storage
+        from interactions.outbox import OutboxRelay
+        from .models import TripImage
+
+        # اتجاه 6: الصورة مخزنة أفقية وتُعرض عمودية
+        trip_image = TripImage.objects.create(trip=self.trip, image=self._jpeg((3000, 2000), orientation=6))
+        self.assertEqual(trip_image.variants, {})
+        OutboxRelay().drain()
+
+        trip_image.refresh_from_db()
+        self.assertEqual(list(trip_image.variants), ['thumb', 'feed', 'full'])
+        self.assertEqual(
+            (trip_image.variants['thumb']['width'], trip_image.variants['thumb']['height']), (213, 320)
+        )
+        self.assertEqual(trip_image.variants['full']['height'], 2048)
+        for variant in trip_image.variants.values():
+            self.assertTrue(variant['webp'].startswith('blobs/'))
+            with default_storage.open(variant['jpeg']) as file:
+                self.assertEqual(len(Image.open(file).getexif()), 0)
+
+    def test_small_images_do_not_duplicate_renditions(self):
+        from .image_variants import generate_variants
+        from .models import TripImage
+        trip_image = TripImage.objects.create(trip=self.trip, image=self._jpeg((600, 400)))
+        variants = generate_variants(trip_image)
+        self.assertEqual(list(variants), ['thumb', 'feed'])
+        self.assertEqual(variants['feed']['width'], 600)
+
+    def test_serializer_exposes_srcset(self):
+        from .image_variants import generate_variants
+        from .models import TripImage
+        trip_image = TripImage.objects.create(trip=self.trip, image=self._jpeg((1600, 1200)))
+        response = self.client.get(f'/api/trip/{self.trip.id}/')
+        self.assertIsNone(response.data['images'][0]['srcset'])
+
+        generate_variants(trip_image)
+        response = self.client.get(f'/api/trip/{self.trip.id}/')
+        image = response.data['images'][0]
+        self.assertTrue(image['thumbnail'].endswith('_thumb.jpg'))
+        self.assertIn('_thumb.webp 320w', image['srcset']['webp'])
+        self.assertIn('_full.jpg 1600w', image['srcset']['jpeg'])
+
+    def test_thumbnail_does_not_depend_on_variant_key_order(self):
+        from .models import TripImage
+        from .serializers import TripImageSerializer
+        trip_image = TripImage.objects.create(trip=self.trip, image=self._jpeg((1600, 1200)))
+        # ترتيب مفاتيح jsonb في PostgreSQL (الأقصر أولاً)
+        trip_image.variants = {
+            name: {'width': width, 'jpeg': f'blobs/x_{name}.jpg', 'webp': f'blobs/x_{name}.webp'}
+            for name, width in (('feed', 1080), ('full', 1600), ('thumb', 320))
+        }
+        self.assertTrue(TripImageSerializer(trip_image).data['thumbnail'].endswith('x_thumb.jpg'))
+
+    def test_unreadable_image_is_skipped(self):
+        from .image_variants import generate_variants
+        from .models import TripImage
+        image = SimpleUploadedFile('broken.jpg', b'not an image', content_type='image/jpeg')
+        trip_image = TripImage.objects.create(trip=self.trip, image=image)
+        self.assertIsNone(generate_variants(trip_image))
+
+
+class ResumableUploadTests(APITestCase):
+    """الرفع على أجزاء مع الاستئناف وربط الرفعات بالرحلات"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='uploader@example.com', password='UploadPass123', is_active=True, is_verified=True)
+        self.client.force_authenticate(user=self.user)
+        self.content = MP4_HEADER + bytes(range(256)) * 40  # ~10 KiB
+
+    def _create(self, kind='video', filename='clip.mp4', content=None, **extra):
+        import hashlib
+        content = self.content if content is None else content
+        data = {'kind': kind, 'filename': filename, 'size': len(content),
+                'checksum': hashlib.sha256(content).hexdigest(), **extra}
+        return self.client.post('/api/trip/uploads/', data, format='json')
+
+    def _patch(self, upload_id, offset, chunk, **headers):
+        return self.client.generic(
+            'PATCH', f'/api/trip/uploads/{upload_id}/', chunk,
+            content_type='application/offset+octet-stream', HTTP_UPLOAD_OFFSET=str(offset), **headers
+        )
+
+    def test_chunks_resume_from_server_offset_and_attach_to_trip(self):
+        from .models import MediaUpload, TripVideo
+        response = self._create()
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        upload_id = response.data['id']
+
+        self.assertEqual(self._patch(upload_id, 0, self.content[:4096])['Upload-Offset'], '4096')
+        # إعادة إرسال جزء بعد انقطاع: الخادم يرفض الـ offset القديم ويعيد الصحيح
+        response = self._patch(upload_id, 0, self.content[:4096])
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response['Upload-Offset'], '4096')
+        self.assertEqual(self.client.head(f'/api/trip/uploads/{upload_id}/')['Upload-Offset'], '4096')
+
+        response = self._patch(upload_id, 4096, self.content[4096:])
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        response = self.client.post(f'/api/trip/uploads/{upload_id}/finalize/')
+        self.assertEqual(response.data['status'], 'completed')
+
+        response = self.client.post(
+            '/api/trip/create/', {'caption': 'Uploaded', 'location': 'Dahab', 'upload_ids': [upload_id]}, format='multipart'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        video = TripVideo.objects.get(trip_id=response.data['id'])
+        with video.video.open('rb') as file:
+            self.assertEqual(file.read(), self.content)
+        self.assertEqual(MediaUpload.objects.get(id=upload_id).status, 'attached')
+
+        # الرفع لا يُستخدم مرتين
+        response = self.client.post(
+            '/api/trip/create/', {'caption': 'Again', 'location': 'Dahab', 'upload_ids': [upload_id]}, format='multipart'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_chunk_checksum_mismatch_is_discarded(self):
+        import base64
+        import hashlib
+        upload_id = self._create()['Location'].rstrip('/').rsplit('/', 1)[-1]
+        wrong = base64.b64encode(hashlib.sha256(b'other').digest()).decode()
+        response = self._patch(upload_id, 0, self.content[:1024], HTTP_UPLOAD_CHECKSUM=f'sha256 {wrong}')
+        self.assertEqual(response.status_code, 460)
+        self.assertEqual(response['Upload-Offset'], '0')
+
+        right = base64.b64encode(hashlib.sha256(self.content[:1024]).digest()).decode()
+        response = self._patch(upload_id, 0, self.content[:1024], HTTP_UPLOAD_CHECKSUM=f'sha256 {right}')
+        self.assertEqual(response['Upload-Offset'], '1024')
+
+    def test_finalize_rejects_incomplete_or_corrupt_uploads(self):
+        upload_id = self._create(checksum='0' * 64).data['id']
+        response = self.client.post(f'/api/trip/uploads/{upload_id}/finalize/')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+        self._patch(upload_id, 0, self.content)
+        response = self.client.post(f'/api/trip/uploads/{upload_id}/finalize/')
+        self.assertEqual(response.status_code, 460)
+        self.assertEqual(response['Upload-Offset'], '0')
+
+    def test_rejects_oversized_chunks_and_unsupported_files(self):
+        upload_id = self._create().data['id']
+        response = self._patch(upload_id, 0, self.content + b'extra')
+        self.assertEqual(response.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        self.assertEqual(self._create(filename='clip.exe').status_code, status.HTTP_400_BAD_REQUEST)
+        response = self._create(kind='image', filename='huge.jpg', content=b'x', size=10 ** 9)
+        self.assertEqual(response.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+    def test_uploads_are_private_to_their_owner(self):
+        upload_id = self._create().data['id']
+        other = User.objects.create_user(email='other-uploader@example.com', password='OtherPass123', is_active=True, is_verified=True)
+        self.client.force_authenticate(user=other)
+        self.assertEqual(self._patch(upload_id, 0, b'abc').status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_chunk_is_streamed_outside_the_transaction(self):
+        """قراءة الجزء من الطلب لا تتم داخل transaction يقفل صف الرفع"""
+        import io
+        from django.db import connection
+        from .models import MediaUpload
+        from .uploads import append_chunk
+        upload = MediaUpload.objects.get(id=self._create().data['id'])
+        depth = len(connection.savepoint_ids)
+        depths = []
+
+        class Stream(io.BytesIO):
+            def read(inner, size=-1):
+                depths.append(len(connection.savepoint_ids))
+                return super().read(size)
+
+        append_chunk(upload, 0, Stream(self.content[:4096]))
+        self.assertEqual(set(depths), {depth})
+        self.assertEqual(MediaUpload.objects.get(id=upload.id).offset, 4096)
+
+    def test_concurrent_chunks_do_not_both_commit(self):
+        """جزء ثانٍ أثناء كتابة الأول يُرفض، وتغيّر offset أثناء الكتابة يلغي الجزء"""
+        import io
+        from .models import MediaUpload
+        from .uploads import OffsetMismatch, append_chunk
+        upload = MediaUpload.objects.get(id=self._create().data['id'])
+        content = self.content
+
+        class Racing(io.BytesIO):
+            def read(inner, size=-1):
+                if inner.tell() == 0:
+                    with self.assertRaises(OffsetMismatch):
+                        append_chunk(upload, 0, io.BytesIO(content[:1024]))
+                return super().read(size)
+
+        append_chunk(upload, 0, Racing(content[:4096]))
+        self.assertEqual(MediaUpload.objects.get(id=upload.id).offset, 4096)
+
+        class Restarted(io.BytesIO):
+            def read(inner, size=-1):
+                # إعادة بدء الرفع (مثل finalize بعد checksum خاطئ) أثناء الكتابة
+                MediaUpload.objects.filter(id=upload.id).update(offset=0)
+                return super().read(size)
+
+        with self.assertRaises(OffsetMismatch):
+            append_chunk(upload, 4096, Restarted(content[4096:8192]))
+        self.assertEqual(MediaUpload.objects.get(id=upload.id).offset, 0)
+
+
+class StorageDedupTests(APITestCase):
+    """تخزين الوسائط بحسب المحتوى وعد المراجع وجمع الملفات المهملة"""
+
+    def setUp(self):
+        import shutil
+        import tempfile
+        from django.test import override_settings
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = User.objects.create_user(email='dedup@example.com', password='DedupPass123', is_active=True, is_verified=True)
+        self.trips = [Trip.objects.create(user=self.user, caption=f'Trip {i}', location='Aswan') for i in range(2)]
+        self.content = b'\x00video-bytes' * 512
+
+    def _video(self, trip, content=None):
+        from .models import TripVideo
+        video = SimpleUploadedFile('clip.mp4', content or self.content, content_type='video/mp4')
+        return TripVideo.objects.create(trip=trip, video=video)
+
+    def test_same_content_is_stored_once(self):
+        import hashlib
+        from .models import MediaBlob
+        from .storage import storage_report
+        first, second = (self._video(trip) for trip in self.trips)
+
+        self.assertEqual(first.video.name, second.video.name)
+        self.assertIn(hashlib.sha256(self.content).hexdigest(), first.video.name)
+        blob = MediaBlob.objects.get()
+        self.assertEqual((blob.ref_count, blob.size), (2, len(self.content)))
+        report = storage_report()
+        self.assertEqual(report['stored_bytes'], len(self.content))
+        self.assertEqual(report['saved_bytes'], len(self.content))
+
+    def test_unreferenced_blobs_are_collected_after_grace_period(self):
+        from datetime import timedelta
+        from .models import MediaBlob
+        from .storage import collect_garbage
+        first, second = (self._video(trip) for trip in self.trips)
+        storage = first.video.storage
+        name = first.video.name
+
+        first.delete()
+        self.assertEqual(MediaBlob.objects.get().ref_count, 1)
+        self.trips[1].delete()
+        self.assertEqual(MediaBlob.objects.get().ref_count, 0)
+
+        # داخل فترة السماح لا يُحذف شيء
+        self.assertEqual(collect_garbage()['files_removed'], 0)
+        self.assertTrue(storage.exists(name))
+        self.assertEqual(collect_garbage(grace=timedelta(0), dry_run=True)['files_removed'], 1)
+        self.assertTrue(storage.exists(name))
+
+        result = collect_garbage(grace=timedelta(0))
+        self.assertEqual(result, {'files_removed': 1, 'bytes_freed': len(self.content)})
+        self.assertFalse(storage.exists(name))
+        self.assertFalse(MediaBlob.objects.exists())
+
+    def test_reupload_during_gc_keeps_orphaned_blob(self):
+        """رفع نفس المحتوى يعيد استخدام blob بلا مراجع قبل التزام مرجعه"""
+        import os
+        from datetime import timedelta
+        from django.core.files.base import ContentFile
+        from django.utils import timezone
+        from .models import MediaBlob
+        from .storage import collect_garbage, get_media_storage
+        video = self._video(self.trips[0])
+        name = video.video.name
+        self.trips[0].delete()
+        storage = get_media_storage()
+        old = (timezone.now() - timedelta(hours=2)).timestamp()
+        os.utime(storage.path(name), (old, old))
+        MediaBlob.objects.update(updated_at=timezone.now() - timedelta(hours=2))
+
+        # الملف موجود فلا يُكتب من جديد، ومرجعه لم يُضف بعد
+        self.assertEqual(storage.save('clip.mp4', ContentFile(self.content)), name)
+        self.assertEqual(collect_garbage()['files_removed'], 0)
+        self.assertTrue(storage.exists(name))
+        self.assertEqual(MediaBlob.objects.get().ref_count, 0)
+
+    def test_raw_upsert_stores_datetimes_like_the_orm(self):
+        """صيغة created_at/updated_at في upsert الخام تطابق ما يكتبه الـ ORM"""
+        from django.db import connection
+        from .models import MediaBlob
+        from .storage import release_blob, retain_blobs
+        retain_blobs([('blobs/raw.bin', 10)])
+        table = connection.ops.quote_name(MediaBlob._meta.db_table)
+
+        def stored():
+            blob = MediaBlob.objects.get(name='blobs/raw.bin')
+            with connection.cursor() as cursor:
+                cursor.execute(f"SELECT CAST(created_at AS TEXT), CAST(updated_at AS TEXT) FROM {table} WHERE id = %s", [blob.pk])
+                return blob, cursor.fetchone()
+
+        blob, row = stored()
+        self.assertEqual(row, (
+            str(connection.ops.adapt_datetimefield_value(blob.created_at)),
+            str(connection.ops.adapt_datetimefield_value(blob.updated_at)),
+        ))
+        # قيمة يكتبها الـ ORM تُقارن نصياً مع قيمة الـ upsert
+        release_blob('blobs/raw.bin')
+        blob, row = stored()
+        self.assertEqual(row[1], str(connection.ops.adapt_datetimefield_value(blob.updated_at)))
+        self.assertEqual(MediaBlob.objects.filter(updated_at__gte=blob.created_at).count(), 1)
+
+    def test_untracked_blob_files_are_collected(self):
+        from datetime import timedelta
+        from django.core.files.base import ContentFile
+        from .storage import collect_garbage, get_media_storage
+        kept = self._video(self.trips[0])
+        storage = get_media_storage()
+        # ملف كُتب ثم أُلغي الـ transaction الذي كان سيشير إليه
+        stray = storage.save('clip.mp4', ContentFile(b'rolled back'))
+
+        collect_garbage(grace=timedelta(0))
+        self.assertFalse(storage.exists(stray))
+        self.assertTrue(storage.exists(kept.video.name))
+
+    def test_gc_media_command_reports_savings(self):
+        from io import StringIO
+        from django.core.management import call_command
+        for trip in self.trips:
+            self._video(trip)
+        out = StringIO()
+        call_command('gc_media', '--report-only', stdout=out)
+        self.assertIn(f'{len(self.content)} bytes saved', out.getvalue())
+
+
+class VideoProcessingTests(APITestCase):
+    """مرحلة معالجة الفيديو: الحجز، حد التزامن، الفشل، والتحويل بـ ffmpeg"""
+
+    def setUp(self):
+        import shutil
+        import tempfile
+        from django.test import override_settings
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = User.objects.create_user(email='videos@example.com', password='VideosPass123', is_active=True, is_verified=True)
+        self.trip = Trip.objects.create(user=self.user, caption='Videos', location='Fayoum')
+
+    def _video(self, content=b'not really a video'):
+        from .models import TripVideo
+        return TripVideo.objects.create(
+            trip=self.trip, video=SimpleUploadedFile('clip.mp4', content, content_type='video/mp4')
+        )
+
+    def _sample(self):
+        import os
+        from django.conf import settings
+        with open(os.path.join(settings.BASE_DIR, 'media', 'trips', '2', 'videos', '6399-191636228_tiny.mp4'), 'rb') as file:
+            return file.read()
+
+    def test_claim_respects_concurrency_limit_and_reclaims_stale_jobs(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from .video_processing import claim_next_video
+        first, second = self._video(b'first'), self._video(b'second')
+
+        self.assertEqual(claim_next_video(max_concurrent=1).id, first.id)
+        self.assertIsNone(claim_next_video(max_concurrent=1))
+        self.assertEqual(claim_next_video(max_concurrent=2).id, second.id)
+        self.assertIsNone(claim_next_video(max_concurrent=5))
+
+        # عامل توقف أثناء المعالجة: يُعاد حجز الفيديو بعد انتهاء المهلة
+        later = timezone.now() + timedelta(hours=3)
+        self.assertEqual(claim_next_video(max_concurrent=1, now=later).id, first.id)
+
+    def test_claim_rechecks_limit_when_another_worker_claims_first(self):
+        """عامل آخر يحجز بين العدّ والحجز: الحد لا يُتجاوز"""
+        from django.db import connection
+        from django.utils import timezone
+        from .models import TripVideo
+        from .video_processing import claim_next_video
+        first, second = self._video(b'first'), self._video(b'second')
+        raced = []
+
+        def other_worker(execute, sql, params, many, context):
+            result = execute(sql, params, many, context)
+            if not raced and sql.startswith('SELECT COUNT'):
+                raced.append(sql)
+                TripVideo.objects.filter(pk=second.pk).update(
+                    processing_status='processing', processing_started_at=timezone.now()
+                )
+            return result
+
+        with connection.execute_wrapper(other_worker):
+            self.assertIsNone(claim_next_video(max_concurrent=1))
+        self.assertTrue(raced)
+        self.assertEqual(TripVideo.objects.filter(processing_status='processing').count(), 1)
+        first.refresh_from_db()
+        self.assertEqual(first.processing_status, 'pending')
+
+    def test_missing_ffmpeg_marks_video_failed_and_keeps_original(self):
+        from django.test import override_settings
+        from .video_processing import claim_next_video, process_video
+        video = self._video()
+        with override_settings(FFPROBE_BINARY='/nonexistent/ffprobe'):
+            video = process_video(claim_next_video())
+        self.assertEqual(video.processing_status, 'failed')
+        self.assertIn('not installed', video.processing_error)
+
+        data = self.client.get(f'/api/trip/{self.trip.id}/').data['videos'][0]
+        self.assertEqual(data['processing_status'], 'failed')
+        self.assertTrue(data['playback_url'].endswith('.mp4'))
+        self.assertIsNone(data['poster'])
+
+    def _fake_binary(self, script):
+        import os
+        import shutil
+        import tempfile
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        path = os.path.join(directory, 'fake-ffmpeg')
+        with open(path, 'w') as file:
+            file.write('#!/bin/sh\n' + script + '\n')
+        os.chmod(path, 0o755)
+        return path
+
+    def test_hung_ffmpeg_times_out_and_stderr_is_drained(self):
+        import time
+        from django.test import override_settings
+        from .video_processing import VideoProcessingError, _transcode
+
+        # لا يكتب شيئاً على stdout ولا ينتهي
+        with override_settings(FFMPEG_BINARY=self._fake_binary('exec sleep 30')):
+            started = time.monotonic()
+            with self.assertRaisesMessage(VideoProcessingError, 'timed out'):
+                _transcode([], 10, lambda fraction: None, timeout=0.5)
+        self.assertLess(time.monotonic() - started, 10)
+
+        # stderr أكبر من سعة الـ pipe لا يوقف العملية
+        noisy = self._fake_binary('yes x | head -c 200000 >&2; echo broken >&2; exit 1')
+        with override_settings(FFMPEG_BINARY=noisy):
+            with self.assertRaisesMessage(VideoProcessingError, 'broken'):
+                _transcode([], 10, lambda fraction: None, timeout=30)
+
+    def test_unexpected_error_marks_video_failed(self):
+        from django.test import override_settings
+        from .video_processing import claim_next_video, process_video
+        self._video()
+        with override_settings(FFPROBE_BINARY=self._fake_binary('echo "not json"')):
+            video = process_video(claim_next_video())
+        self.assertEqual(video.processing_status, 'failed')
+        self.assertIn('Invalid ffprobe output', video.processing_error)
+
+        from unittest import mock
+        self._video(b'other bytes')
+        with mock.patch('trip.video_processing.probe_video', side_effect=OSError('disk full')):
+            video = process_video(claim_next_video())
+        video.refresh_from_db()
+        self.assertEqual(video.processing_status, 'failed')
+        self.assertIn('OSError: disk full', video.processing_error)
+
+    def test_same_content_reuses_processed_renditions(self):
+        from .video_processing import process_video
+        first = self._video()
+        first.processing_status = 'ready'
+        first.renditions = {'poster': 'blobs/poster.jpg', 'mp4': {'path': 'blobs/720p.mp4', 'width': 1280, 'height': 720}}
+        first.save()
+
+        # نفس المحتوى: لا يُستدعى ffmpeg
+        second = process_video(self._video())
+        self.assertEqual(second.processing_status, 'ready')
+        self.assertEqual(second.renditions, first.renditions)
+        self.assertEqual(second.progress, 100)
+
+    def test_process_videos_command_transcodes_sample(self):
+        import shutil
+        from io import StringIO
+        from unittest import mock
+        from django.core.files.storage import default_storage
+        from django.core.management import call_command
+        from django.test import override_settings
+        if not (shutil.which('ffmpeg') and shutil.which('ffprobe')):
+            self.skipTest('ffmpeg is not installed')
+
+        video = self._video(self._sample())
+        out = StringIO()
+        with override_settings(VIDEO_HLS_ENABLED=True), \
+                mock.patch('interactions.utils.send_video_progress') as send_progress:
+            call_command('process_videos', '--once', '--workers', '1', stdout=out)
+        self.assertIn('1 ready', out.getvalue())
+
+        video.refresh_from_db()
+        self.assertEqual((video.processing_status, video.progress), ('ready', 100))
+        self.assertGreater(video.duration, 0)
+        for path in (video.renditions['poster'], video.renditions['mp4']['path'], video.renditions['hls']):
+            self.assertTrue(default_storage.exists(path))
+        self.assertLessEqual(min(video.renditions['mp4']['width'], video.renditions['mp4']['height']), 720)
+        statuses = [call.args[1]['status'] for call in send_progress.call_args_list]
+        self.assertEqual(statuses[-1], 'ready')
+
+
+class MediaServingTests(APITestCase):
+    """تقديم الوسائط مع Range و ETag"""
+
+    def setUp(self):
+        import os
+        import shutil
+        import tempfile
+        from django.test import override_settings
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(
+            MEDIA_ROOT=media_root, RESUMABLE_UPLOAD_DIR=os.path.join(media_root, 'uploads', 'partial')
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.content = bytes(range(256)) * 400
+        os.makedirs(os.path.join(media_root, 'blobs', 'ab', 'cd'))
+        with open(os.path.join(media_root, 'blobs', 'ab', 'cd', 'abcd.mp4'), 'wb') as file:
+            file.write(self.content)
+        os.makedirs(os.path.join(media_root, 'uploads', 'partial'))
+        with open(os.path.join(media_root, 'uploads', 'partial', 'secret.part'), 'wb') as file:
+            file.write(b'partial')
+        self.url = '/media/blobs/ab/cd/abcd.mp4'
+
+    def _body(self, response):
+        body = b''.join(response.streaming_content)
+        response.close()
+        return body
+
+    def test_full_response_has_validators(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self._body(response), self.content)
+        self.assertEqual(response['Content-Type'], 'video/mp4')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertTrue(response['ETag'].startswith('"'))
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_byte_ranges(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=100-199')
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(response['Content-Range'], f'bytes 100-199/{len(self.content)}')
+        self.assertEqual(response['Content-Length'], '100')
+        self.assertEqual(self._body(response), self.content[100:200])
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-10')
+        self.assertEqual(self._body(response), self.content[-10:])
+        response = self.client.get(self.url, HTTP_RANGE=f'bytes={len(self.content) - 5}-')
+        self.assertEqual(self._body(response), self.content[-5:])
+
+        response = self.client.get(self.url, HTTP_RANGE=f'bytes={len(self.content)}-')
+        self.assertEqual(response.status_code, status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(self.content)}')
+
+        # عدة نطاقات غير مدعومة: الملف كاملاً
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-1,5-6')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(self._body(response)), len(self.content))
+
+    def test_if_range_falls_back_to_full_file_when_changed(self):
+        etag = self.client.head(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE=etag)
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        response.close()
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response.close()
+
+    def test_private_and_outside_paths_are_not_served(self):
+        self.assertEqual(self.client.get('/media/uploads/partial/secret.part').status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get('/media/../manage.py').status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get('/media/blobs/').status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.post(self.url).status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    def test_accel_redirect_hands_file_to_nginx(self):
+        from django.test import override_settings
+        with override_settings(MEDIA_ACCEL_REDIRECT_PREFIX='/protected-media/'):
+            response = self.client.get(self.url, HTTP_RANGE='bytes=0-9')
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/blobs/ab/cd/abcd.mp4')
+        self.assertEqual(response.content, b'')
+
+
+class UploadGuardTests(APITestCase):
+    """رفض الملفات بحسب محتواها وحجمها أثناء الاستلام"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='guard@example.com', password='GuardPass123', is_active=True, is_verified=True)
+        self.client.force_authenticate(user=self.user)
+        self.trip = Trip.objects.create(user=self.user, caption='Guarded', location='Luxor')
+
+    def _png_header(self, width, height):
+        """PNG صغير الحجم يعلن أبعاداً كبيرة (IHDR ثم بداية IDAT)"""
+        import struct
+        import zlib
+
+        def chunk(kind, data):
+            return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+        ihdr = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+        return b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', ihdr) + chunk(b'IDAT', zlib.compress(b'\x00' * 1000))
+
+    def test_sniffs_formats_from_content(self):
+        from .uploads import sniff_format
+        self.assertEqual(sniff_format(image_bytes()), 'jpeg')
+        self.assertEqual(sniff_format(self._png_header(1, 1)), 'png')
+        self.assertEqual(sniff_format(MP4_HEADER), 'mp4')
+        self.assertEqual(sniff_format(b'\x00\x00\x00\x14ftypqt  \x00\x00\x00\x00'), 'mov')
+        self.assertEqual(sniff_format(b'\x00\x00\x00\x18ftypheic\x00\x00\x00\x00'), None)
+        self.assertEqual(sniff_format(b'MZ\x90\x00 executable'), None)
+
+    def test_multipart_rejects_fake_and_mismatched_media(self):
+        from .models import TripImage
+        url = f'/api/trip/{self.trip.id}/images/'
+        fake = SimpleUploadedFile('photo.jpg', b'MZ' + b'\x00' * 100000, content_type='image/jpeg')
+        response = self.client.post(url, {'images': [fake]}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+        self.assertIn('error', response.data)
+
+        video = SimpleUploadedFile('photo.jpg', MP4_HEADER + b'\x00' * 100, content_type='image/jpeg')
+        response = self.client.post(url, {'images': [video]}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+        self.assertFalse(TripImage.objects.filter(trip=self.trip).exists())
+
+    def test_rejects_decompression_bombs_from_header(self):
+        bomb = SimpleUploadedFile('bomb.png', self._png_header(20000, 20000), content_type='image/png')
+        response = self.client.post(f'/api/trip/{self.trip.id}/images/', {'images': [bomb]}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+    def test_size_limit_is_enforced_while_streaming(self):
+        from unittest import mock
+        from .uploads import UploadGuard, UploadTooLarge
+        guard = UploadGuard('video')
+        with mock.patch.dict('trip.uploads.MAX_UPLOAD_SIZE', {'video': 1000}):
+            guard.feed(MP4_HEADER + b'\x00' * 500)
+            self.assertTrue(guard.checked)
+            with self.assertRaises(UploadTooLarge):
+                guard.feed(b'\x00' * 500)
+
+    def test_resumable_upload_rejects_bad_first_chunk(self):
+        import hashlib
+        content = b'not a video at all' * 100
+        upload_id = self.client.post('/api/trip/uploads/', {
+            'kind': 'video', 'filename': 'clip.mp4', 'size': len(content),
+            'checksum': hashlib.sha256(content).hexdigest()
+        }, format='json').data['id']
+        response = self.client.generic(
+            'PATCH', f'/api/trip/uploads/{upload_id}/', content[:1024],
+            content_type='application/offset+octet-stream', HTTP_UPLOAD_OFFSET='0'
+        )
+        self.assertEqual(response.status_code, status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+        self.assertEqual(response['Upload-Offset'], '0')
+
+
+class MediaPlaceholderTests(APITestCase):
+    """BlurHash واللون الغالب ونسبة الأبعاد لصور الرحلات"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='placeholder@example.com', password='PlaceholderPass123', is_active=True, is_verified=True)
+        self.trip = Trip.objects.create(user=self.user, caption='Colours', location='Nuweiba')
+
+    def test_blurhash_of_solid_image(self):
+        from PIL import Image
+        from .placeholders import compute_placeholder
+        placeholder = compute_placeholder(Image.new('RGB', (300, 200), (255, 0, 0)))
+        # نفس ناتج مكتبة blurhash المرجعية؛ TI:j هو DC الأحمر
+        self.assertEqual(placeholder['blurhash'], 'L7TI:j;$fQ;$|cjtfQjtfQfQfQfQ')
+        self.assertEqual(placeholder['dominant_color'], '#ff0000')
+        self.assertEqual(placeholder['aspect_ratio'], 1.5)
+
+    def test_ingest_stores_placeholder_inlined_in_trip(self):
+        import io
+        from PIL import Image
+        from interactions.outbox import OutboxRelay
+        from .models import TripImage
+        buffer = io.BytesIO()
+        Image.new('RGB', (400, 800), (0, 128, 255)).save(buffer, 'JPEG')
+        TripImage.objects.create(
+            trip=self.trip, image=SimpleUploadedFile('tall.jpg', buffer.getvalue(), content_type='image/jpeg')
+        )
+        self.assertIsNone(self.client.get(f'/api/trip/{self.trip.id}/').data['cover'])
+
+        OutboxRelay().drain()
+        data = self.client.get(f'/api/trip/{self.trip.id}/').data
+        placeholder = data['images'][0]['placeholder']
+        self.assertEqual(len(placeholder['blurhash']), 28)
+        self.assertEqual(placeholder['aspect_ratio'], 0.5)
+        self.assertTrue(placeholder['color'].startswith('#'))
+        self.assertEqual(data['cover'], placeholder)
+
+
+class BulkTripCreationTests(APITestCase):
+    """إنشاء الرحلة ووسائطها ووسومها بعدد ثابت من الاستعلامات، والاستيراد الجماعي"""
+
+    def setUp(self):
+        import shutil
+        import tempfile
+        from django.test import override_settings
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = User.objects.create_user(email='bulk@example.com', password='BulkPass123', is_active=True, is_verified=True)
+        self.client.force_authenticate(user=self.user)
+
+    def _create(self, image_count, tag_count):
+        from unittest import mock
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        images = [
+            SimpleUploadedFile(f'{i}.jpg', image_bytes((i * 20, 0, 0)), content_type='image/jpeg')
+            for i in range(image_count)
+        ]
+        data = {'caption': 'Bulk', 'location': 'Cairo', 'images': images, 'tags': [f'tag{i}' for i in range(tag_count)]}
+        with mock.patch('trip.views.TourismAIService') as ai, CaptureQueriesContext(connection) as queries:
+            ai.return_value.get_destination_info.return_value = {'country': 'Egypt', 'city': 'Cairo', 'tourism_info': {}}
+            response = self.client.post('/api/trip/create/', data, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response, len(queries)
+
+    def test_query_count_does_not_grow_with_media_and_tags(self):
+        from interactions.models import OutboxEvent
+        from .models import MediaBlob
+        _, small = self._create(image_count=1, tag_count=1)
+        response, large = self._create(image_count=10, tag_count=8)
+        # كان 70 استعلاماً لعشر صور وثمانية وسوم (INSERT و SAVEPOINT لكل صف)؛
+        # 12 للرحلة ووسائطها و 6 لعدادات ملخص الوجهة
+        self.assertEqual(small, large)
+        self.assertLessEqual(large, 18)
+
+        trip = Trip.objects.get(id=response.data['id'])
+        self.assertEqual(trip.images.count(), 10)
+        self.assertEqual(trip.tags.count(), 8)
+        self.assertEqual(len(response.data['images']), 10)
+        # ما كانت تفعله الإشارات لكل صف: مراجع الملفات وأحداث توليد النسخ
+        self.assertEqual(MediaBlob.objects.filter(name__in=trip.images.values('image')).count(), 10)
+        self.assertEqual(OutboxEvent.objects.filter(event_type='trip_image.created', payload__trip_id=trip.id).count(), 10)
+
+    def test_duplicate_tags_are_created_once(self):
+        from unittest import mock
+        with mock.patch('trip.views.TourismAIService') as ai:
+            ai.return_value.get_destination_info.return_value = {}
+            response = self.client.post('/api/trip/create/', {
+                'location': 'Luxor', 'tags': ['nile', 'nile', 'temples'],
+                'images': [SimpleUploadedFile('a.jpg', image_bytes(), content_type='image/jpeg')],
+            }, format='multipart')
+        self.assertEqual(
+            sorted(TripTag.objects.filter(trip_id=response.data['id']).values_list('tripTag', flat=True)),
+            ['nile', 'temples']
+        )
+
+    def test_import_endpoint_creates_trips_in_one_request(self):
+        import io
+        from .models import MediaUpload, TripImage
+        from .uploads import create_upload, append_chunk, finalize_upload
+        upload_ids = []
+        for i in range(3):
+            content = image_bytes((0, i * 50, 0))
+            upload = create_upload(self.user, 'image', f'{i}.png', len(content))
+            append_chunk(upload, 0, io.BytesIO(content), len(content))
+            upload_ids.append(str(finalize_upload(upload).id))
+
+        rows = [
+            {'location': 'Siwa', 'country': 'Egypt', 'city': 'Siwa', 'tags': ['desert'], 'upload_ids': upload_ids[:2]},
+            {'location': 'Fayoum', 'caption': 'Lakes', 'upload_ids': upload_ids[2:]},
+        ]
+        response = self.client.post('/api/trip/import/', {'trips': rows}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        siwa, fayoum = (Trip.objects.get(id=trip_id) for trip_id in response.data['created'])
+        self.assertEqual((siwa.city, fayoum.caption), ('Siwa', 'Lakes'))
+        self.assertEqual(TripImage.objects.filter(trip=siwa).count(), 2)
+        self.assertEqual(list(siwa.tags.values_list('tripTag', flat=True)), ['desert'])
+        self.assertEqual(MediaUpload.objects.filter(status='attached').count(), 3)
+
+        # رفع مستخدم مسبقاً: لا تُنشأ أي رحلة من الدفعة
+        response = self.client.post('/api/trip/import/', {'trips': [
+            {'location': 'Dahab', 'upload_ids': upload_ids[:1]},
+        ]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Trip.objects.count(), 2)
+
+        response = self.client.post('/api/trip/import/', {'trips': [{'location': 'Dahab'}]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_import_command_reads_local_files(self):
+        import json
+        import os
+        import tempfile
+        from django.core.management import call_command
+        from .models import TripImage, TripVideo
+        from django.conf import settings
+        directory = tempfile.mkdtemp(dir=settings.MEDIA_ROOT)
+        paths = {}
+        for name, content in (('a.jpg', image_bytes()), ('b.mp4', MP4_HEADER + b'\x00' * 64)):
+            paths[name] = os.path.join(directory, name)
+            with open(paths[name], 'wb') as file:
+                file.write(content)
+        source = os.path.join(directory, 'trips.jsonl')
+        with open(source, 'w') as file:
+            file.write(json.dumps({'location': 'Aswan', 'tags': ['nubia'], 'images': [paths['a.jpg']]}) + '\n')
+            file.write(json.dumps({'location': 'Luxor', 'videos': [paths['b.mp4']]}) + '\n')
+
+        call_command('import_trips', self.user.email, source, '--batch-size', '1', stdout=open(os.devnull, 'w'))
+        self.assertEqual(TripImage.objects.filter(trip__location='Aswan').count(), 1)
+        self.assertEqual(TripVideo.objects.filter(trip__location='Luxor').count(), 1)
+        self.assertTrue(TripTag.objects.filter(trip__location='Aswan', tripTag='nubia').exists())
+
+
+class TripGeoTests(APITestCase):
+    """إحداثيات الرحلات و geohash واستعلامات القرب والخريطة"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='geo@example.com', password='GeoPass123', is_active=True, is_verified=True)
+        self.client.force_authenticate(user=self.user)
+
+    def _trip(self, location, latitude, longitude, **extra):
+        from .geo import location_fields
+        return Trip.objects.create(
+            user=self.user, caption=location, location=location,
+            **location_fields((latitude, longitude)), **extra
+        )
+
+    def test_geohash_encoding_and_cover(self):
+        from .geo import encode, decode, cover_cells, cell_ranges, radius_bbox
+        self.assertEqual(encode(57.64911, 10.40744, 11), 'u4pruydqqvj')
+        self.assertEqual(encode(40.7128, -74.0060), 'dr5regw3p')
+        latitude, longitude = decode('u4pruydqqvj')
+        self.assertAlmostEqual(latitude, 57.64911, places=4)
+        self.assertAlmostEqual(longitude, 10.40744, places=4)
+        # الخلايا المتتالية تُدمج في نطاق واحد
+        self.assertEqual(cell_ranges(['stq4', 'stq5', 'stq6', 'stq7', 'stqk']), [('stq4', 'stq7'), ('stqk', 'stqk')])
+        self.assertLessEqual(len(cover_cells(29.9, 31.1, 30.2, 31.4)), 32)
+        # دائرة عند خط الطول 180 تُقسم إلى منطقتين
+        self.assertEqual(len(radius_bbox(0, 179.9, 50)), 2)
+
+    def test_create_uses_client_ai_or_gazetteer_coordinates(self):
+        from unittest import mock
+        image = lambda: SimpleUploadedFile('a.jpg', image_bytes(), content_type='image/jpeg')
+        with mock.patch('trip.views.TourismAIService') as ai:
+            ai.return_value.get_destination_info.return_value = {'city': 'القاهرة', 'latitude': 'n/a'}
+            gazetteer = self.client.post('/api/trip/create/', {'location': 'Downtown', 'images': [image()]}, format='multipart')
+            ai.return_value.get_destination_info.return_value = {'city': 'X', 'latitude': 10.5, 'longitude': 20.5}
+            from_ai = self.client.post('/api/trip/create/', {'location': 'Somewhere', 'images': [image()]}, format='multipart')
+            from_client = self.client.post('/api/trip/create/', {
+                'location': 'Somewhere', 'latitude': '-33.9', 'longitude': '18.4', 'images': [image()]
+            }, format='multipart')
+
+        self.assertEqual((gazetteer.data['latitude'], gazetteer.data['longitude']), (30.0444, 31.2357))
+        self.assertEqual((from_ai.data['latitude'], from_ai.data['longitude']), (10.5, 20.5))
+        self.assertEqual((from_client.data['latitude'], from_client.data['longitude']), (-33.9, 18.4))
+        self.assertEqual(Trip.objects.get(id=from_client.data['id']).geohash[:3], 'k3v')
+
+    def test_nearby_orders_by_distance_within_radius(self):
+        pyramids = self._trip('Giza', 29.9792, 31.1342)
+        downtown = self._trip('Cairo', 30.0444, 31.2357)
+        self._trip('Alexandria', 31.2001, 29.9187)
+
+        response = self.client.get('/api/trip/nearby/', {'lat': 30.0, 'lng': 31.2, 'radius': 25})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([trip['id'] for trip in response.data], [downtown.id, pyramids.id])
+        self.assertAlmostEqual(response.data[0]['distance_km'], 6.02, delta=0.05)
+
+        response = self.client.get('/api/trip/nearby/', {'lat': 30.0, 'lng': 31.2, 'radius': 9000})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get('/api/trip/nearby/', {'lng': 31.2}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_nearby_rejects_non_finite_numbers(self):
+        for params in ({'lat': 'nan', 'lng': 31.2}, {'lat': 30.0, 'lng': 'NaN'},
+                       {'lat': 30.0, 'lng': 31.2, 'radius': 'nan'}, {'lat': 'inf', 'lng': 31.2}):
+            response = self.client.get('/api/trip/nearby/', params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, params)
+
+    def test_bbox_and_clusters_including_antimeridian(self):
+        cairo = [self._trip(f'Cairo {i}', 30.04 + i * 0.001, 31.23 + i * 0.001) for i in range(3)]
+        luxor = self._trip('Luxor', 25.6872, 32.6396)
+        suva = self._trip('Suva', -18.1248, 178.4501)
+        self._trip('Honolulu', 21.3069, -157.8583)
+        Trip.objects.create(user=self.user, location='Unknown place')
+
+        response = self.client.get('/api/trip/map/', {'bbox': '29,24,34,31'})
+        self.assertEqual({trip['id'] for trip in response.data}, {*(trip.id for trip in cairo), luxor.id})
+
+        # min_lng > max_lng: المنطقة تعبر خط الطول 180
+        response = self.client.get('/api/trip/map/', {'bbox': '170,-30,-170,0'})
+        self.assertEqual([trip['id'] for trip in response.data], [suva.id])
+
+        response = self.client.get('/api/trip/map/clusters/', {'bbox': '29,24,34,31'})
+        clusters = sorted(response.data['clusters'], key=lambda cluster: cluster['count'])
+        self.assertEqual([cluster['count'] for cluster in clusters], [1, 3])
+        self.assertEqual(clusters[0]['trip_id'], luxor.id)
+        self.assertIsNone(clusters[1]['trip_id'])
+        self.assertAlmostEqual(clusters[1]['latitude'], 30.041, places=3)
+
+        self.assertEqual(self.client.get('/api/trip/map/', {'bbox': '1,2,3'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_geocode_command_backfills_known_locations(self):
+        import os
+        from django.core.management import call_command
+        known = Trip.objects.create(user=self.user, location='Old Town, Dubai')
+        unknown = Trip.objects.create(user=self.user, location='Nowhere')
+        call_command('geocode_trips', stdout=open(os.devnull, 'w'))
+        known.refresh_from_db()
+        unknown.refresh_from_db()
+        self.assertEqual((known.latitude, known.longitude), (25.2048, 55.2708))
+        self.assertTrue(known.geohash.startswith('thrr'))
+        self.assertEqual(unknown.geohash, '')
+
+
+class DestinationRollupTests(APITestCase):
+    """ملخصات الوجهات: العدادات مع الإنشاء والحذف والقوائم المشتقة"""
+
+    def setUp(self):
+        self.users = [
+            User.objects.create_user(email=f'traveller{i}@example.com', password='TravelPass123', is_active=True, is_verified=True)
+            for i in range(2)
+        ]
+
+    def _trip(self, user, tags=(), city='Istanbul', country='Turkey', **extra):
+        from .creation import add_tags
+        trip = Trip.objects.create(user=user, location=city, country=country, city=city, **extra)
+        add_tags(trip, tags)
+        return trip
+
+    def _destination(self, city='Istanbul'):
+        from interactions.outbox import OutboxRelay
+        from .models import Destination
+        OutboxRelay().drain()
+        return Destination.objects.filter(city=city).first()
+
+    def test_counts_follow_trip_and_tag_changes(self):
+        from .models import DestinationTag
+        first = self._trip(self.users[0], ['food', 'bosphorus'], tourism_info={
+            'currency': 'ليرة', 'recommended_places': ['آيا صوفيا', 'غلطة'],
+        })
+        second = self._trip(self.users[0], ['food'], tourism_info={'recommended_places': ['غلطة', 'تقسيم']})
+        third = self._trip(self.users[1], ['history'])
+        self._trip(self.users[1], ['desert'], city='Dubai', country='UAE')
+
+        destination = self._destination()
+        self.assertEqual(destination.trips_count, 3)
+        self.assertEqual(destination.top_tags[0], {'tag': 'food', 'count': 2})
+        self.assertEqual(
+            [(c['id'], c['trips_count']) for c in destination.top_contributors],
+            [(self.users[0].id, 2), (self.users[1].id, 1)]
+        )
+        self.assertEqual(destination.tourism_info['currency'], 'ليرة')
+        self.assertEqual(destination.tourism_info['recommended_places'], ['غلطة', 'تقسيم', 'آيا صوفيا'])
+
+        # حذف تاج مباشرة ثم حذف رحلة مع تاجاتها
+        TripTag.objects.get(trip=first, tripTag='bosphorus').delete()
+        second.delete()
+        destination = self._destination()
+        self.assertEqual(destination.trips_count, 2)
+        self.assertEqual(
+            dict(DestinationTag.objects.filter(destination=destination).values_list('tag', 'count')),
+            {'food': 1, 'history': 1}
+        )
+        self.assertEqual([c['trips_count'] for c in destination.top_contributors], [1, 1])
+
+        # آخر رحلة في الوجهة: يُحذف الصف
+        first.delete()
+        third.delete()
+        self.assertIsNone(self._destination())
+        self.assertEqual(self._destination('Dubai').trips_count, 1)
+
+    def test_bulk_import_and_rebuild_match_incremental_counts(self):
+        import os
+        from django.core.management import call_command
+        from .creation import import_trips
+        from .models import Destination
+        import_trips(self.users[0], [
+            {'location': 'Sultanahmet', 'country': 'Turkey', 'city': 'Istanbul', 'tags': ['history', 'food']},
+            {'location': 'Kadikoy', 'country': 'Turkey', 'city': 'Istanbul', 'tags': ['food']},
+            {'location': 'Nowhere'},
+        ])
+        self._trip(self.users[1], ['food'])
+        incremental = self._destination()
+        self.assertEqual(incremental.trips_count, 3)
+
+        call_command('rebuild_destinations', stdout=open(os.devnull, 'w'))
+        rebuilt = Destination.objects.get()
+        for field in ('country', 'city', 'trips_count', 'top_tags', 'top_contributors'):
+            self.assertEqual(getattr(rebuilt, field), getattr(incremental, field))
+
+    def test_updating_city_moves_trip_between_destinations(self):
+        from rest_framework.test import APIRequestFactory, force_authenticate
+        from .models import DestinationTag
+        from .views import TripUpdateAPIView
+        trip = self._trip(self.users[0], ['food'])
+        self._trip(self.users[1], ['food'])
+        self._destination()
+
+        request = APIRequestFactory().patch('/', {'city': 'Dubai', 'country': 'UAE'}, format='json')
+        force_authenticate(request, user=self.users[0])
+        response = TripUpdateAPIView.as_view()(request, id=trip.id)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        istanbul, dubai = self._destination(), self._destination('Dubai')
+        self.assertEqual((istanbul.trips_count, dubai.trips_count), (1, 1))
+        self.assertEqual([c['id'] for c in istanbul.top_contributors], [self.users[1].id])
+        self.assertEqual([c['id'] for c in dubai.top_contributors], [self.users[0].id])
+        self.assertEqual(DestinationTag.objects.get(destination=istanbul).count, 1)
+        self.assertEqual(dubai.top_tags, [{'tag': 'food', 'count': 1}])
+
+    def test_migration_backfills_existing_trips(self):
+        from importlib import import_module
+        from django.apps import apps
+        from .models import Destination
+        self._trip(self.users[0], ['food', 'history'])
+        self._trip(self.users[1], ['food'])
+        incremental = self._destination()
+        Destination.objects.all().delete()
+
+        import_module('trip.migrations.0012_destinations').backfill_destinations(apps, None)
+        backfilled = self._destination()
+        for field in ('trips_count', 'top_tags', 'top_contributors'):
+            self.assertEqual(getattr(backfilled, field), getattr(incremental, field))
+
+    def test_listing_detail_and_trips(self):
+        for user in self.users:
+            self._trip(user, ['food'])
+        self._trip(self.users[0], city='Cairo', country='Egypt')
+        self._trip(self.users[0], city='')
+        istanbul = self._destination()
+
+        response = self.client.get('/api/trip/destinations/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([d['city'] for d in response.data['results']], ['Istanbul', 'Cairo'])
+        response = self.client.get('/api/trip/destinations/', {'country': 'Egypt'})
+        self.assertEqual([d['city'] for d in response.data['results']], ['Cairo'])
+
+        response = self.client.get(f'/api/trip/destinations/{istanbul.id}/')
+        self.assertEqual(response.data['top_tags'], [{'tag': 'food', 'count': 2}])
+        etag = response['ETag']
+        self.assertEqual(
+            self.client.get(f'/api/trip/destinations/{istanbul.id}/', HTTP_IF_NONE_MATCH=etag).status_code,
+            status.HTTP_304_NOT_MODIFIED
+        )
+
+        response = self.client.get(f'/api/trip/destinations/{istanbul.id}/trips/')
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(self.client.get('/api/trip/destinations/999/trips/').status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,55 @@
+"""
+فحص الوسائط المرفوعة بـ multipart أثناء استلامها
+
+MediaUploadGuardHandler يأتي أولاً في FILE_UPLOAD_HANDLERS: يمرر كل جزء
+لـ UploadGuard قبل أن يكتبه المعالج التالي (ذاكرة أو ملف مؤقت)، فالملف الذي
+ليس صورة/فيديو فعلاً، أو يتجاوز حد الحجم أو البكسلات، يُرفض عند أول جزء يكشفه
+دون استلام باقي الطلب أو كتابته على القرص.
+"""
+
+from django.core.files.uploadhandler import FileUploadHandler
+from rest_framework.exceptions import APIException
+
+from .uploads import UploadError, UploadGuard
+
+# حقول الطلب التي تحمل وسائط الرحلات ونوع كل منها
+MEDIA_FIELDS = {
+    'images': 'image',
+    'image': 'image',
+    'videos': 'video',
+    'video': 'video',
+}
+
+
+class RejectedUpload(APIException):
+    """رفض الملف أثناء تحليل الطلب (بنفس شكل أخطاء الـ views)"""
+
+    def __init__(self, error):
+        self.status_code = error.status_code
+        super().__init__({'error': str(error)})
+
+
+class MediaUploadGuardHandler(FileUploadHandler):
+    """فحص ملفات حقول الوسائط جزءاً جزءاً وتمريرها للمعالج التالي"""
+
+    def new_file(self, field_name, *args, **kwargs):
+        super().new_file(field_name, *args, **kwargs)
+        kind = MEDIA_FIELDS.get(field_name)
+        self.guard = UploadGuard(kind) if kind else None
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.guard is not None:
+            try:
+                self.guard.feed(raw_data)
+            except UploadError as e:
+                raise RejectedUpload(e)
+        return raw_data
+
+    def file_complete(self, file_size):
+        if self.guard is not None:
+            try:
+                self.guard.finish()
+            except UploadError as e:
+                raise RejectedUpload(e)
+        # المعالج التالي هو من يُنشئ الملف
+        return None
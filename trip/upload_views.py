@@ -0,0 +1,103 @@
+from rest_framework import status, permissions
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from django.shortcuts import get_object_or_404
+from .models import MediaUpload
+from .serializers import MediaUploadSerializer
+from .uploads import (
+    UploadError, create_upload, append_chunk, finalize_upload, discard_upload, parse_checksum_header
+)
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _upload_headers(upload):
+    return {
+        'Upload-Offset': str(upload.offset),
+        'Upload-Length': str(upload.size),
+        'Cache-Control': 'no-store',
+    }
+
+
+def _error(e, upload=None):
+    """رد الخطأ مع offset الحالي حتى يعرف العميل من أين يستأنف"""
+    headers = None
+    if upload is not None:
+        headers = _upload_headers(MediaUpload.objects.get(pk=upload.pk))
+    return Response({'error': str(e)}, status=e.status_code, headers=headers)
+
+
+class MediaUploadCreateAPIView(APIView):
+    """بدء رفع قابل للاستئناف"""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        serializer = MediaUploadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            upload = create_upload(request.user, **serializer.validated_data)
+        except UploadError as e:
+            return _error(e)
+
+        headers = _upload_headers(upload)
+        headers['Location'] = request.build_absolute_uri(f'{upload.id}/')
+        return Response(MediaUploadSerializer(upload).data, status=status.HTTP_201_CREATED, headers=headers)
+
+
+class MediaUploadAPIView(APIView):
+    """
+    حالة الرفع (GET/HEAD)، إرسال جزء (PATCH)، أو إلغاؤه (DELETE)
+
+    PATCH يستقبل الجزء كـ application/offset+octet-stream مع ترويسة
+    Upload-Offset، وترويسة Upload-Checksum اختيارية ('sha256 <base64>').
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_upload(self, request, upload_id):
+        return get_object_or_404(MediaUpload, id=upload_id, user=request.user)
+
+    def get(self, request, upload_id):
+        upload = self.get_upload(request, upload_id)
+        return Response(MediaUploadSerializer(upload).data, headers=_upload_headers(upload))
+
+    def patch(self, request, upload_id):
+        upload = self.get_upload(request, upload_id)
+        try:
+            offset = int(request.headers.get('Upload-Offset', ''))
+        except ValueError:
+            return Response({'error': 'Upload-Offset header is required'}, status=status.HTTP_400_BAD_REQUEST)
+        length = request.META.get('CONTENT_LENGTH')
+
+        try:
+            chunk_digest = parse_checksum_header(request.headers.get('Upload-Checksum'))
+            # الجسم يُقرأ من stream مباشرة دون المرور بالـ parsers
+            upload = append_chunk(
+                upload, offset, request.stream,
+                length=int(length) if length else None,
+                chunk_digest=chunk_digest
+            )
+        except UploadError as e:
+            return _error(e, upload)
+
+        return Response(status=status.HTTP_204_NO_CONTENT, headers=_upload_headers(upload))
+
+    def delete(self, request, upload_id):
+        upload = self.get_upload(request, upload_id)
+        if upload.status == 'attached':
+            return Response({'error': 'Upload is already attached to a trip'}, status=status.HTTP_400_BAD_REQUEST)
+        discard_upload(upload)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class MediaUploadFinalizeAPIView(APIView):
+    """إنهاء الرفع والتحقق من الـ checksum"""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, upload_id):
+        upload = get_object_or_404(MediaUpload, id=upload_id, user=request.user)
+        try:
+            upload = finalize_upload(upload)
+        except UploadError as e:
+            return _error(e, upload)
+        return Response(MediaUploadSerializer(upload).data, headers=_upload_headers(upload))
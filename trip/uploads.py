@@ -0,0 +1,426 @@
+"""
+رفع الوسائط على أجزاء مع الاستئناف (بروتوكول مشابه لـ tus)
+
+1. إنشاء الرفع بالاسم والحجم الكلي (و SHA-256 اختياري للملف كاملاً)
+2. إرسال الأجزاء بـ PATCH مع Upload-Offset؛ كل جزء يُقرأ من الطلب على دفعات
+   ويُكتب مباشرة في ملف جزئي، فالذاكرة المستخدمة ثابتة مهما كان الحجم.
+   عند انقطاع الاتصال يسأل العميل عن offset ويكمل منه.
+3. الإنهاء: التحقق من اكتمال الحجم ومن الـ checksum بقراءة الملف على دفعات.
+
+الرفع المكتمل يُربط برحلة بمعرفه (upload_ids) فيُنقل إلى التخزين كـ
+TripImage أو TripVideo، فلا يرتبط إنشاء الرحلة بسرعة الرفع.
+"""
+
+import base64
+import hashlib
+import io
+import os
+import warnings
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files import File, locks
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image, UnidentifiedImageError
+
+from .models import MediaUpload, TripImage, TripVideo
+from .validators import validate_image_file_extension, validate_video_file_extension
+
+UPLOAD_READ_SIZE = 64 * 1024
+UPLOAD_EXPIRY = timedelta(days=1)  # الرفع غير المكتمل يُحذف بعدها
+
+MAX_UPLOAD_SIZE = {
+    'image': 20 * 1024 * 1024,
+    'video': 1024 * 1024 * 1024,
+}
+# أقصى عدد بكسلات للصورة (حماية من decompression bombs: ملف صغير بأبعاد ضخمة)
+MAX_IMAGE_PIXELS = 50_000_000
+# أقصى ما يُقرأ من بداية الملف لمعرفة نوعه وأبعاده (EXIF/ICC قد تسبق أبعاد JPEG)
+SNIFF_LIMIT = 512 * 1024
+
+# الصيغ المقبولة بحسب المحتوى لكل نوع
+MEDIA_FORMATS = {
+    'image': {'jpeg', 'png', 'gif', 'webp'},
+    'video': {'mp4', 'mov', 'avi', 'mkv', 'webm'},
+}
+# علامات ftyp لصور HEIF/AVIF (ليست فيديو رغم أنها حاويات ISO)
+_IMAGE_FTYP_BRANDS = {b'heic', b'heix', b'mif1', b'msf1', b'avif'}
+
+_EXTENSION_VALIDATORS = {
+    'image': validate_image_file_extension,
+    'video': validate_video_file_extension,
+}
+
+
+class UploadError(Exception):
+    """خطأ في بروتوكول الرفع مع رمز HTTP المناسب"""
+    status_code = 400
+
+
+class OffsetMismatch(UploadError):
+    status_code = 409
+
+
+class ChecksumMismatch(UploadError):
+    # رمز tus لعدم تطابق الـ checksum
+    status_code = 460
+
+
+class UploadTooLarge(UploadError):
+    status_code = 413
+
+
+class UnsupportedMedia(UploadError):
+    status_code = 415
+
+
+def sniff_format(header):
+    """
+    معرفة صيغة الملف من بداياته (magic bytes) بغض النظر عن امتداده
+
+    Returns:
+        str | None: مثل 'jpeg' أو 'mp4'، أو None إذا لم تُعرف
+    """
+    if header.startswith(b'\xff\xd8\xff'):
+        return 'jpeg'
+    if header.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'png'
+    if header[:6] in (b'GIF87a', b'GIF89a'):
+        return 'gif'
+    if header[:4] == b'RIFF':
+        return {b'WEBP': 'webp', b'AVI ': 'avi'}.get(header[8:12])
+    if header[4:8] == b'ftyp':
+        brand = header[8:12]
+        if brand in _IMAGE_FTYP_BRANDS:
+            return None
+        return 'mov' if brand == b'qt  ' else 'mp4'
+    if header.startswith(b'\x1a\x45\xdf\xa3'):
+        return 'webm' if b'webm' in header[:64] else 'mkv'
+    return None
+
+
+def image_dimensions(header):
+    """
+    أبعاد الصورة من ترويستها دون فك ترميز البكسلات
+
+    Returns:
+        tuple | None: (العرض، الارتفاع)، أو None إذا لم تكتمل الترويسة بعد
+    """
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', Image.DecompressionBombWarning)
+        try:
+            with Image.open(io.BytesIO(header)) as image:
+                return image.size
+        except Image.DecompressionBombError:
+            # أبعاد أكبر من ضعف حد Pillow: تُرفض في check
+            return (MAX_IMAGE_PIXELS, MAX_IMAGE_PIXELS)
+        except (UnidentifiedImageError, OSError, SyntaxError, ValueError):
+            return None
+
+
+class UploadGuard:
+    """
+    فحص ملف مرفوع أثناء استلامه
+
+    تُمرر الأجزاء بالترتيب إلى feed: أول الأجزاء تحدد الصيغة من المحتوى
+    (وأبعاد الصور)، والحجم يُراقب مع كل جزء، فيُرفض الملف قبل استلام باقيه.
+
+    Raises:
+        UnsupportedMedia: المحتوى ليس صيغة مقبولة للنوع
+        UploadTooLarge: تجاوز حد الحجم أو عدد البكسلات
+    """
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.size = 0
+        self.header = b''
+        self.format = None
+        self.dimensions = None
+        self.checked = False
+
+    def feed(self, data):
+        self.size += len(data)
+        if self.size > MAX_UPLOAD_SIZE[self.kind]:
+            raise UploadTooLarge(f'{self.kind} uploads are limited to {MAX_UPLOAD_SIZE[self.kind]} bytes')
+        if not self.checked:
+            self.header += data[:SNIFF_LIMIT - len(self.header)]
+            self.check(final=len(self.header) >= SNIFF_LIMIT)
+
+    def finish(self):
+        """نهاية الملف: ما لم يُحسم من الترويسة يُحسم الآن"""
+        if not self.checked:
+            self.check(final=True)
+
+    def check(self, final=False):
+        if len(self.header) < 16 and not final:
+            return
+        self.format = sniff_format(self.header)
+        if self.format not in MEDIA_FORMATS[self.kind]:
+            raise UnsupportedMedia(f'File content is not a supported {self.kind} format')
+
+        if self.kind == 'image':
+            self.dimensions = image_dimensions(self.header)
+            if self.dimensions is None:
+                if not final:
+                    return
+                raise UnsupportedMedia('Could not read image dimensions')
+            width, height = self.dimensions
+            if width * height > MAX_IMAGE_PIXELS:
+                raise UploadTooLarge(f'Images are limited to {MAX_IMAGE_PIXELS} pixels')
+        self.checked = True
+
+
+def partial_path(upload):
+    return os.path.join(settings.RESUMABLE_UPLOAD_DIR, f'{upload.id}.part')
+
+
+def parse_checksum_header(value):
+    """
+    قراءة ترويسة Upload-Checksum بصيغة tus: 'sha256 <base64>'
+
+    Returns:
+        bytes | None: الـ digest المتوقع
+    """
+    if not value:
+        return None
+    algorithm, _, encoded = value.partition(' ')
+    if algorithm.lower() != 'sha256':
+        raise UploadError('Only sha256 checksums are supported')
+    try:
+        return base64.b64decode(encoded.strip(), validate=True)
+    except ValueError:
+        raise UploadError('Invalid Upload-Checksum header')
+
+
+def create_upload(user, kind, filename, size, checksum=''):
+    """
+    بدء رفع جديد
+
+    Raises:
+        UploadError: نوع أو امتداد غير مدعوم
+        UploadTooLarge: الحجم يتجاوز الحد المسموح للنوع
+    """
+    if kind not in MAX_UPLOAD_SIZE:
+        raise UploadError('kind must be image or video')
+    try:
+        _EXTENSION_VALIDATORS[kind](File(None, name=filename))
+    except ValidationError as e:
+        raise UploadError(e.messages[0])
+    if size > MAX_UPLOAD_SIZE[kind]:
+        raise UploadTooLarge(f'{kind} uploads are limited to {MAX_UPLOAD_SIZE[kind]} bytes')
+
+    upload = MediaUpload.objects.create(
+        user=user, kind=kind, filename=os.path.basename(filename), size=size, checksum=checksum.lower()
+    )
+    os.makedirs(settings.RESUMABLE_UPLOAD_DIR, exist_ok=True)
+    open(partial_path(upload), 'wb').close()
+    return upload
+
+
+def append_chunk(upload, offset, stream, length=None, chunk_digest=None):
+    """
+    كتابة جزء من الطلب في الملف الجزئي
+
+    Args:
+        upload (MediaUpload): الرفع (يُعاد قراءته بعد قفل الملف الجزئي)
+        offset (int): موضع الجزء كما أرسله العميل
+        stream: مصدر البيانات (request.stream)
+        length (int, optional): طول الجزء من Content-Length
+        chunk_digest (bytes, optional): SHA-256 المتوقع للجزء
+
+    Returns:
+        MediaUpload: الرفع بعد تحديث offset
+
+    Raises:
+        OffsetMismatch: offset لا يطابق ما استُلم أو جزء آخر قيد الكتابة (يجب السؤال عنه والاستئناف)
+        UploadTooLarge: الجزء يتجاوز الحجم المعلن، أو الصورة تتجاوز حد البكسلات
+        UnsupportedMedia: محتوى الملف ليس صيغة مقبولة (يُفحص من أول الأجزاء)
+        ChecksumMismatch: الجزء لا يطابق الـ checksum (يُتجاهل بالكامل)
+    """
+    with open(partial_path(upload), 'r+b') as file:
+        # قفل الملف لا قفل الصف: جزءان متزامنان لا يكتبان في نفس الموضع،
+        # والطلب البطيء لا يبقي transaction وقفل صف مفتوحين طوال الرفع
+        if not locks.lock(file, locks.LOCK_EX | locks.LOCK_NB):
+            raise OffsetMismatch('Another chunk is being written')
+        with transaction.atomic():
+            upload = MediaUpload.objects.select_for_update().get(pk=upload.pk)
+        if upload.status != 'pending':
+            raise OffsetMismatch('Upload is already complete')
+        if offset != upload.offset:
+            raise OffsetMismatch(f'Expected offset {upload.offset}')
+        remaining = upload.size - upload.offset
+        if length is not None and length > remaining:
+            raise UploadTooLarge(f'Chunk exceeds the remaining {remaining} bytes')
+
+        digest = hashlib.sha256()
+        written = 0
+        guard = None
+        # بقايا جزء سابق لم يُسجل offset له تُحذف
+        file.truncate(upload.offset)
+        if upload.offset < SNIFF_LIMIT:
+            # الترويسة لم تُفحص بالكامل بعد: الفحص يكمل من البايتات المحفوظة
+            guard = UploadGuard(upload.kind)
+            file.seek(0)
+            guard.feed(file.read(upload.offset))
+        file.seek(upload.offset)
+        try:
+            while True:
+                data = stream.read(min(UPLOAD_READ_SIZE, remaining - written + 1)) if stream else b''
+                if not data:
+                    break
+                written += len(data)
+                if written > remaining:
+                    raise UploadTooLarge(f'Chunk exceeds the remaining {remaining} bytes')
+                if guard is not None and not guard.checked:
+                    guard.feed(data)
+                digest.update(data)
+                file.write(data)
+            if guard is not None and upload.offset + written == upload.size:
+                guard.finish()
+        except UploadError:
+            file.truncate(upload.offset)
+            raise
+
+        if chunk_digest is not None and digest.digest() != chunk_digest:
+            file.truncate(upload.offset)
+            raise ChecksumMismatch('Chunk checksum mismatch')
+        file.flush()
+
+        # الـ offset يتقدم فقط إذا لم يتغير منذ الفحص (إلغاء أو إعادة بدء أثناء الكتابة)
+        now = timezone.now()
+        updated = MediaUpload.objects.filter(pk=upload.pk, status='pending', offset=upload.offset).update(
+            offset=upload.offset + written, updated_at=now
+        )
+        if not updated:
+            raise OffsetMismatch('Upload changed while the chunk was being written')
+    upload.offset += written
+    upload.updated_at = now
+    return upload
+
+
+def file_sha256(path):
+    """SHA-256 لملف بقراءته على دفعات"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for data in iter(lambda: file.read(UPLOAD_READ_SIZE), b''):
+            digest.update(data)
+    return digest.hexdigest()
+
+
+def finalize_upload(upload):
+    """
+    إنهاء الرفع بعد استلام كل البايتات
+
+    Raises:
+        OffsetMismatch: لم يكتمل الاستلام بعد
+        ChecksumMismatch: الملف لا يطابق الـ checksum المعلن (يُعاد من البداية)
+    """
+    with transaction.atomic():
+        upload = MediaUpload.objects.select_for_update().get(pk=upload.pk)
+        if upload.status != 'pending':
+            return upload
+        if upload.offset != upload.size:
+            raise OffsetMismatch(f'Upload incomplete: {upload.offset}/{upload.size} bytes received')
+
+        digest = file_sha256(partial_path(upload))
+        corrupt = upload.checksum and digest != upload.checksum
+        if corrupt:
+            upload.offset = 0
+            open(partial_path(upload), 'wb').close()
+        else:
+            upload.checksum = digest
+            upload.status = 'completed'
+        upload.save(update_fields=['offset', 'checksum', 'status', 'updated_at'])
+
+    # خارج الـ transaction حتى لا يُلغى تصفير offset
+    if corrupt:
+        raise ChecksumMismatch('File checksum mismatch, upload restarted')
+    return upload
+
+
+def attach_uploads(trip, user, upload_ids, kinds=('image', 'video')):
+    """
+    نقل رفعات مكتملة إلى التخزين كوسائط للرحلة
+
+    يجب استدعاؤها داخل transaction إنشاء الرحلة أو الوسائط.
+
+    Returns:
+        tuple: (قائمة TripImage، قائمة TripVideo)
+
+    Raises:
+        UploadError: رفع غير موجود، أو لمستخدم آخر، أو غير مكتمل، أو من نوع غير مسموح
+    """
+    upload_ids = list(dict.fromkeys(str(upload_id) for upload_id in upload_ids))
+    if not upload_ids:
+        return [], []
+    try:
+        uploads = list(
+            MediaUpload.objects.select_for_update().filter(
+                id__in=upload_ids, user=user, status='completed', kind__in=kinds
+            )
+        )
+    except ValidationError:
+        raise UploadError('Invalid upload id')
+    if len(uploads) != len(upload_ids):
+        found = {str(upload.id) for upload in uploads}
+        missing = [upload_id for upload_id in upload_ids if upload_id not in found]
+        raise UploadError(f'Uploads not found or not completed: {", ".join(missing)}')
+
+    order = {upload_id: i for i, upload_id in enumerate(upload_ids)}
+    uploads.sort(key=lambda upload: order[str(upload.id)])
+
+    images, videos = [], []
+    for upload in uploads:
+        # الملف يُكتب في التخزين هنا، والصفوف تُدرج دفعة واحدة في save_media
+        with open(partial_path(upload), 'rb') as file:
+            if upload.kind == 'image':
+                media = TripImage(trip=trip)
+                media.image.save(upload.filename, File(file), save=False)
+                images.append(media)
+            else:
+                media = TripVideo(trip=trip)
+                media.video.save(upload.filename, File(file), save=False)
+                videos.append(media)
+
+    MediaUpload.objects.filter(id__in=[upload.id for upload in uploads]).update(
+        status='attached', updated_at=timezone.now()
+    )
+    paths = [partial_path(upload) for upload in uploads]
+    transaction.on_commit(lambda: [_remove(path) for path in paths])
+
+    from .creation import save_media
+    return save_media(images, videos)
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def discard_upload(upload):
+    """إلغاء رفع وحذف ملفه الجزئي"""
+    path = partial_path(upload)
+    upload.delete()
+    _remove(path)
+
+
+def purge_expired_uploads(older_than=UPLOAD_EXPIRY, now=None):
+    """
+    حذف الرفعات غير المكتملة أو غير المستخدمة بعد مدة
+
+    Returns:
+        int: عدد الرفعات المحذوفة
+    """
+    now = now or timezone.now()
+    expired = MediaUpload.objects.filter(
+        status__in=['pending', 'completed'], updated_at__lt=now - older_than
+    )
+    count = 0
+    for upload in expired.iterator():
+        discard_upload(upload)
+        count += 1
+    return count
@@ -1,11 +1,15 @@
 from django.urls import path
-from .views import (TripCreateAPIView, TripListAPIView, TripDetailAPIView, TripDeleteAPIView,
+from .views import (TripCreateAPIView, TripImportAPIView, TripListAPIView, TripDetailAPIView, TripDeleteAPIView,
                     TripImageUploadAPIView, TripVideoUploadAPIView, TripImageDeleteAPIView, TripVideoDeleteAPIView,
                     TripTagAddAPIView, TripTagRemoveAPIView, TripTagListForTripAPIView, TagTripsView,
                     )
+from .upload_views import MediaUploadCreateAPIView, MediaUploadAPIView, MediaUploadFinalizeAPIView
+from .map_views import NearbyTripsAPIView, TripsInBoundsAPIView, TripClustersAPIView
+from .destination_views import DestinationListAPIView, DestinationDetailAPIView, DestinationTripsAPIView
 
 urlpatterns = [
     path('create/', TripCreateAPIView.as_view(), name='trip-create'),
+    path('import/', TripImportAPIView.as_view(), name='trip-import'),
     path('', TripListAPIView.as_view(), name='trip-list'),  
     path('<int:id>/', TripDetailAPIView.as_view(), name='trip-detail'),  
     path('<int:id>/delete/', TripDeleteAPIView.as_view(), name='trip-delete'),
@@ -17,6 +21,21 @@ urlpatterns = [
     path('<int:trip_id>/tags/<int:tag_id>/', TripTagRemoveAPIView.as_view(), name='trip-tag-remove'),
     path('<int:trip_id>/tags/list/', TripTagListForTripAPIView.as_view(), name='trip-tag-list'),
 
+    # Resumable uploads
+    path('uploads/', MediaUploadCreateAPIView.as_view(), name='upload-create'),
+    path('uploads/<uuid:upload_id>/', MediaUploadAPIView.as_view(), name='upload-detail'),
+    path('uploads/<uuid:upload_id>/finalize/', MediaUploadFinalizeAPIView.as_view(), name='upload-finalize'),
+
+    # Map
+    path('nearby/', NearbyTripsAPIView.as_view(), name='trip-nearby'),
+    path('map/', TripsInBoundsAPIView.as_view(), name='trip-map'),
+    path('map/clusters/', TripClustersAPIView.as_view(), name='trip-map-clusters'),
+
+    # Destinations
+    path('destinations/', DestinationListAPIView.as_view(), name='destination-list'),
+    path('destinations/<int:id>/', DestinationDetailAPIView.as_view(), name='destination-detail'),
+    path('destinations/<int:id>/trips/', DestinationTripsAPIView.as_view(), name='destination-trips'),
+
     # Tag filtering
     path('tags/<str:tag_name>/trips/', TagTripsView.as_view(), name='tag-trips'),
 ]
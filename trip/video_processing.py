@@ -0,0 +1,415 @@
+"""
+معالجة فيديوهات الرحلات بـ ffmpeg
+
+لكل TripVideo جديد (processing_status='pending'):
+1. ffprobe لقراءة المدة والأبعاد
+2. استخراج صورة poster (JPEG) وحساب placeholder منها (trip/placeholders.py)
+3. تحويل إلى MP4 (H.264/AAC) بمعدل بت محدود و faststart للتشغيل أثناء التحميل
+4. اختيارياً (VIDEO_HLS_ENABLED) سلم HLS بعدة جودات مع master playlist
+
+المعالجة تأخذ دقائق، فلا تتم داخل OutboxRelay (الذي يحمل transaction الدفعة)
+بل في عامل مستقل (أمر process_videos) يحجز الفيديوهات من قاعدة البيانات
+بتحديث شرطي، مع حد لعدد المعالجات المتزامنة. التقدم يُحفظ في TripVideo.progress
+ويُرسل لصاحب الرحلة عبر WebSocket.
+
+الناتج يُحفظ بجوار الأصل (<stem>_poster.jpg، <stem>_720p.mp4، <stem>_hls.m3u8...)
+فيُحذف معه في collect_garbage.
+"""
+
+import json
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Count, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import TripVideo
+from .placeholders import PLACEHOLDER_FIELDS, placeholder_from_file
+
+logger = logging.getLogger(__name__)
+
+# أقصى طول للضلع الأقصر ومعدل البت لنسخة MP4
+MP4_SHORT_SIDE = 720
+MP4_VIDEO_BITRATE = '2500k'
+AUDIO_BITRATE = '128k'
+
+# سلم HLS: (الضلع الأقصر، معدل بت الفيديو)
+HLS_LADDER = (
+    (360, '800k'),
+    (540, '1400k'),
+    (720, '2500k'),
+)
+HLS_SEGMENT_SECONDS = 6
+
+# الفيديو العالق في processing أكثر من هذه المدة (عامل توقف) يُعاد حجزه
+PROCESSING_TIMEOUT = timedelta(hours=2)
+PROGRESS_STEP = 5  # لا يُحفظ/يُرسل التقدم إلا عند تغيره بهذا القدر
+
+
+class VideoProcessingError(Exception):
+    """فشل ffmpeg/ffprobe أو ملف غير صالح"""
+
+
+def _ffmpeg():
+    return getattr(settings, 'FFMPEG_BINARY', 'ffmpeg')
+
+
+def _ffprobe():
+    return getattr(settings, 'FFPROBE_BINARY', 'ffprobe')
+
+
+def _run(args, timeout=None):
+    try:
+        result = subprocess.run(args, capture_output=True, text=True, timeout=timeout)
+    except FileNotFoundError:
+        raise VideoProcessingError(f'{args[0]} is not installed')
+    except subprocess.TimeoutExpired:
+        raise VideoProcessingError(f'{os.path.basename(args[0])} timed out')
+    if result.returncode != 0:
+        raise VideoProcessingError(result.stderr.strip()[-500:] or f'{args[0]} failed')
+    return result.stdout
+
+
+def probe_video(path):
+    """
+    قراءة بيانات الفيديو بـ ffprobe
+
+    Returns:
+        dict: duration و width و height (بعد تطبيق الدوران) و has_audio
+
+    Raises:
+        VideoProcessingError: ليس فيديو صالحاً
+    """
+    output = _run([
+        _ffprobe(), '-v', 'error', '-print_format', 'json',
+        '-show_format', '-show_streams', path
+    ], timeout=60)
+    try:
+        data = json.loads(output or '{}')
+        streams = data.get('streams', [])
+        video = next((stream for stream in streams if stream.get('codec_type') == 'video'), None)
+        if video is None:
+            raise VideoProcessingError('No video stream found')
+
+        width, height = int(video.get('width') or 0), int(video.get('height') or 0)
+        rotation = int(video.get('tags', {}).get('rotate', 0) or 0)
+        for side_data in video.get('side_data_list', []):
+            rotation = int(side_data.get('rotation', rotation) or 0)
+        if abs(rotation) % 180 == 90:
+            width, height = height, width
+
+        duration = video.get('duration') or data.get('format', {}).get('duration')
+        return {
+            'duration': float(duration) if duration else None,
+            'width': width,
+            'height': height,
+            'has_audio': any(stream.get('codec_type') == 'audio' for stream in streams),
+        }
+    except (ValueError, TypeError, AttributeError) as e:
+        # ناتج ffprobe غير متوقع (JSON تالف أو قيم غير رقمية)
+        raise VideoProcessingError(f'Invalid ffprobe output: {e}')
+
+
+def _scaled(width, height, short_side):
+    """الأبعاد بعد تصغير الضلع الأقصر إلى short_side (أرقام زوجية لـ H.264)"""
+    scale = min(1.0, short_side / max(min(width, height), 1))
+    return (
+        max(2, int(width * scale) // 2 * 2),
+        max(2, int(height * scale) // 2 * 2),
+    )
+
+
+def _encode_args(size, bitrate, has_audio):
+    width, height = size
+    args = [
+        '-map', '0:v:0', '-vf', f'scale={width}:{height}',
+        '-c:v', 'libx264', '-preset', 'veryfast', '-profile:v', 'high', '-pix_fmt', 'yuv420p',
+        '-b:v', bitrate, '-maxrate', bitrate, '-bufsize', f'{int(bitrate[:-1]) * 2}k',
+    ]
+    if has_audio:
+        args += ['-map', '0:a:0', '-c:a', 'aac', '-b:a', AUDIO_BITRATE, '-ac', '2']
+    return args
+
+
+def _transcode(args, duration, on_progress, timeout=None):
+    """
+    تشغيل ffmpeg مع قراءة التقدم من -progress
+
+    المهلة تُفرض بـ watchdog يقتل العملية أثناء القراءة، لأن ffmpeg العالق لا
+    يغلق stdout. و stderr يُقرأ في thread حتى لا يمتلئ الـ pipe فيتوقف ffmpeg.
+
+    Args:
+        on_progress (callable): تستقبل نسبة الإنجاز بين 0 و 1
+        timeout (float, optional): أقصى مدة بالثواني
+
+    Raises:
+        VideoProcessingError: ffmpeg غير موجود أو فشل أو تجاوز المهلة
+    """
+    try:
+        process = subprocess.Popen(
+            [_ffmpeg(), '-v', 'error', '-y', '-nostats', '-progress', 'pipe:1'] + args,
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+        )
+    except FileNotFoundError:
+        raise VideoProcessingError(f'{_ffmpeg()} is not installed')
+
+    errors = []
+    reader = threading.Thread(target=lambda: errors.append(process.stderr.read()), daemon=True)
+    reader.start()
+    timed_out = threading.Event()
+
+    def kill():
+        timed_out.set()
+        process.kill()
+
+    watchdog = threading.Timer(timeout, kill) if timeout else None
+    if watchdog is not None:
+        watchdog.daemon = True
+        watchdog.start()
+    try:
+        for line in process.stdout:
+            key, _, value = line.strip().partition('=')
+            # out_time_us (وقديماً out_time_ms) بالميكروثانية رغم الاسم
+            if key in ('out_time_us', 'out_time_ms') and duration and value.isdigit():
+                on_progress(min(int(value) / 1_000_000 / duration, 1.0))
+        process.wait()
+    finally:
+        if watchdog is not None:
+            watchdog.cancel()
+        # خطأ في on_progress لا يترك ffmpeg يعمل
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        reader.join()
+        process.stdout.close()
+        process.stderr.close()
+    if timed_out.is_set():
+        raise VideoProcessingError('ffmpeg timed out')
+    if process.returncode != 0:
+        raise VideoProcessingError(''.join(errors).strip()[-500:] or 'ffmpeg failed')
+
+
+def output_path(original_name, suffix):
+    """مسار الناتج بجوار الأصل: blobs/ab/cd/<digest>_<suffix>"""
+    stem, _ = os.path.splitext(original_name)
+    return f'{stem}_{suffix}'
+
+
+def _store(storage, local_path, name):
+    if storage.exists(name):
+        storage.delete(name)
+    with open(local_path, 'rb') as file:
+        return storage.save(name, File(file))
+
+
+class VideoProgress:
+    """حفظ وإرسال تقدم المعالجة على مراحل متساوية الوزن"""
+
+    def __init__(self, video, stages):
+        self.video = video
+        self.stages = stages
+        self.stage = 0
+        self.sent = -PROGRESS_STEP
+
+    def next_stage(self):
+        self.stage += 1
+        self(0.0)
+
+    def __call__(self, fraction):
+        percent = int((self.stage + fraction) / self.stages * 100)
+        if percent - self.sent < PROGRESS_STEP:
+            return
+        self.sent = percent
+        # update() دون save حتى لا تُبطل إشارات TripVideo مستند الرحلة مع كل خطوة
+        TripVideo.objects.filter(pk=self.video.pk).update(progress=percent)
+        notify_progress(self.video, 'processing', percent)
+
+
+def notify_progress(video, processing_status, progress):
+    """إرسال حالة المعالجة لصاحب الرحلة عبر WebSocket"""
+    from interactions.utils import send_video_progress
+    send_video_progress(video.trip.user_id, {
+        'video_id': video.id,
+        'trip_id': video.trip_id,
+        'status': processing_status,
+        'progress': progress,
+    })
+
+
+def process_video(video, storage=default_storage):
+    """
+    معالجة فيديو محجوز: probe ثم poster ثم MP4 ثم HLS (اختياري)
+
+    آمنة لإعادة التشغيل: الناتج الموجود بنفس المسار يُستبدل. الفيديو الذي
+    يشترك في نفس الملف مع فيديو جاهز (نفس المحتوى) يأخذ ناتجه دون ترميز.
+    أي خطأ (وليس VideoProcessingError فقط) يُسجل ويعلم الفيديو failed بدلاً
+    من إيقاف العامل وترك الفيديو في processing.
+
+    Returns:
+        TripVideo: بعد تحديث processing_status إلى ready أو failed
+    """
+    processed = TripVideo.objects.filter(
+        video=video.video.name, processing_status='ready'
+    ).exclude(pk=video.pk).first()
+    if processed is not None:
+        for field in ('duration', 'width', 'height', 'renditions', *PLACEHOLDER_FIELDS):
+            setattr(video, field, getattr(processed, field))
+        return _finish(video, 'ready')
+
+    hls_enabled = getattr(settings, 'VIDEO_HLS_ENABLED', False)
+    timeout = getattr(settings, 'VIDEO_PROCESSING_TIMEOUT', PROCESSING_TIMEOUT).total_seconds()
+    work_dir = tempfile.mkdtemp(prefix='video-')
+    try:
+        source = video.video.path
+        info = probe_video(source)
+        video.duration, video.width, video.height = info['duration'], info['width'], info['height']
+        duration = info['duration'] or 0
+
+        ladder = []
+        if hls_enabled:
+            # لا تُكبَّر الجودات فوق المصدر، وأدنى جودة تُولد دائماً
+            ladder = [
+                rung for rung in HLS_LADDER if rung[0] <= min(info['width'], info['height'])
+            ] or [HLS_LADDER[0]]
+        progress = VideoProgress(video, stages=1 + len(ladder))
+        name = video.video.name
+        renditions = {}
+
+        poster = os.path.join(work_dir, 'poster.jpg')
+        _run([
+            _ffmpeg(), '-v', 'error', '-y', '-ss', str(min(1.0, duration / 2)), '-i', source,
+            '-frames:v', '1', '-vf', f"scale={'%d:%d' % _scaled(info['width'], info['height'], 1080)}",
+            '-q:v', '3', poster
+        ], timeout=120)
+        renditions['poster'] = _store(storage, poster, output_path(name, 'poster.jpg'))
+        with open(poster, 'rb') as file:
+            placeholder = placeholder_from_file(file) or {}
+        for field, value in placeholder.items():
+            setattr(video, field, value)
+        if info['height']:
+            video.aspect_ratio = round(info['width'] / info['height'], 4)
+
+        size = _scaled(info['width'], info['height'], MP4_SHORT_SIDE)
+        mp4 = os.path.join(work_dir, 'video.mp4')
+        _transcode(
+            ['-i', source] + _encode_args(size, MP4_VIDEO_BITRATE, info['has_audio'])
+            + ['-movflags', '+faststart', mp4],
+            duration, progress, timeout
+        )
+        suffix = f'{min(size)}p.mp4'
+        renditions['mp4'] = {
+            'path': _store(storage, mp4, output_path(name, suffix)), 'width': size[0], 'height': size[1]
+        }
+
+        if ladder:
+            renditions['hls'] = _build_hls(video, source, info, ladder, work_dir, storage, progress, timeout)
+
+        video.renditions = renditions
+        return _finish(video, 'ready')
+    except VideoProcessingError as e:
+        logger.warning(f"Cannot process TripVideo {video.id}: {str(e)}")
+        video.processing_error = str(e)
+        return _finish(video, 'failed')
+    except Exception as e:
+        logger.exception(f"Unexpected error while processing TripVideo {video.id}")
+        video.processing_error = f'{type(e).__name__}: {e}'
+        return _finish(video, 'failed')
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def _build_hls(video, source, info, ladder, work_dir, storage, progress, timeout):
+    """ترميز كل جودة في السلم ثم كتابة master playlist؛ يعيد مسارها"""
+    name = video.video.name
+    stem = os.path.basename(os.path.splitext(name)[0])
+    master = ['#EXTM3U', '#EXT-X-VERSION:3']
+    for short_side, bitrate in ladder:
+        progress.next_stage()
+        size = _scaled(info['width'], info['height'], short_side)
+        rung = f'hls_{short_side}p'
+        # أسماء المقاطع تبدأ بـ stem حتى تُنسب للأصل في collect_garbage
+        _transcode(
+            ['-i', source] + _encode_args(size, bitrate, info['has_audio']) + [
+                '-f', 'hls', '-hls_time', str(HLS_SEGMENT_SECONDS), '-hls_playlist_type', 'vod',
+                '-hls_segment_filename', os.path.join(work_dir, f'{stem}_{rung}_%04d.ts'),
+                os.path.join(work_dir, f'{stem}_{rung}.m3u8')
+            ],
+            info['duration'], progress, timeout
+        )
+        bandwidth = (int(bitrate[:-1]) + (int(AUDIO_BITRATE[:-1]) if info['has_audio'] else 0)) * 1000
+        master += [
+            f'#EXT-X-STREAM-INF:BANDWIDTH={bandwidth},RESOLUTION={size[0]}x{size[1]}',
+            f'{stem}_{rung}.m3u8',
+        ]
+
+    directory = os.path.dirname(name)
+    for filename in sorted(os.listdir(work_dir)):
+        if filename.startswith(f'{stem}_hls_'):
+            _store(storage, os.path.join(work_dir, filename), f'{directory}/{filename}')
+    playlist = os.path.join(work_dir, 'master.m3u8')
+    with open(playlist, 'w') as file:
+        file.write('\n'.join(master) + '\n')
+    return _store(storage, playlist, output_path(name, 'hls.m3u8'))
+
+
+def _finish(video, processing_status):
+    video.processing_status = processing_status
+    video.progress = 100 if processing_status == 'ready' else video.progress
+    if processing_status == 'ready':
+        video.processing_error = ''
+    video.save(update_fields=[
+        'processing_status', 'progress', 'processing_error',
+        'duration', 'width', 'height', 'renditions', *PLACEHOLDER_FIELDS
+    ])
+    notify_progress(video, processing_status, video.progress)
+    return video
+
+
+def claim_next_video(max_concurrent=None, now=None):
+    """
+    حجز أقدم فيديو ينتظر المعالجة
+
+    الحجز تحديث شرطي على processing_status وعلى عدد المعالجات الجارية، فلا يحجز
+    عاملان نفس الفيديو ولا يتجاوزان VIDEO_MAX_CONCURRENT معاً.
+    الفيديو العالق في processing بعد PROCESSING_TIMEOUT يُعاد حجزه.
+
+    Args:
+        max_concurrent (int, optional): أقصى عدد معالجات متزامنة بين كل العمال
+
+    Returns:
+        TripVideo | None: الفيديو المحجوز، أو None إذا لا يوجد أو تم بلوغ الحد
+    """
+    now = now or timezone.now()
+    if max_concurrent is None:
+        max_concurrent = getattr(settings, 'VIDEO_MAX_CONCURRENT', 2)
+    timeout = getattr(settings, 'VIDEO_PROCESSING_TIMEOUT', PROCESSING_TIMEOUT)
+    stale = Q(processing_status='processing', processing_started_at__lt=now - timeout)
+
+    running = TripVideo.objects.filter(processing_status='processing', processing_started_at__gte=now - timeout)
+    # العدّ داخل جملة الحجز نفسها: عاملان لا يريان نفس العدد ثم يتجاوزان الحد معاً
+    active = Coalesce(Subquery(
+        running.order_by().values('processing_status').annotate(total=Count('id')).values('total')
+    ), 0)
+
+    with transaction.atomic():
+        # فحص سريع قبل المرور على المرشحين؛ الضمان في التحديث الشرطي
+        if running.count() >= max_concurrent:
+            return None
+        candidates = TripVideo.objects.filter(Q(processing_status='pending') | stale)
+        for video_id in candidates.order_by('id').values_list('id', flat=True)[:10]:
+            claimed = TripVideo.objects.alias(active=active).filter(
+                Q(processing_status='pending') | stale, pk=video_id, active__lt=max_concurrent
+            ).update(processing_status='processing', processing_started_at=now, progress=0)
+            if claimed:
+                return TripVideo.objects.select_related('trip').get(pk=video_id)
+    return None
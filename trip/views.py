@@ -7,14 +7,33 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.pagination import PageNumberPagination
 from accounts.permissons import IsVerifiedUser, IsOwner
 from .models import Trip, TripImage, TripVideo, TripTag
-from .serializers import TripSerializer, TripImageSerializer, TripVideoSerializer, TripTagSerializer
+from .serializers import (TripSerializer, TripImageSerializer, TripVideoSerializer, TripTagSerializer,
+                          TripImportSerializer)
 from .ai_services import TourismAIService
+from .uploads import UploadError, attach_uploads
+from . import destinations
+from .creation import MAX_IMPORT_BATCH, add_media, create_trip, import_trips
+from .geo import valid_coordinates
+from .read_model import TRIPS_SCOPE, get_trip_document, get_trip_versions, trip_etag
+from Rahala.conditional import ConditionalGetMixin, get_version, get_viewer_key
+from interactions.serializers import FeedTripSerializer
+from interactions.relationships import ViewerRelationships
+from django.db import transaction
+from django.http import Http404
 from django.shortcuts import get_object_or_404
-from django.db.models import Count
+from django.utils.http import parse_etags
 import logging
 
 logger = logging.getLogger(__name__)
 
+def _get_upload_ids(request):
+    """معرفات الرفعات المكتملة من multipart أو JSON"""
+    if hasattr(request.data, 'getlist'):
+        return request.data.getlist('upload_ids')
+    upload_ids = request.data.get('upload_ids') or []
+    return upload_ids if isinstance(upload_ids, list) else [upload_ids]
+
+
 class TripCreateAPIView(generics.CreateAPIView):
     serializer_class = TripSerializer
     permission_classes = [IsAuthenticated, IsVerifiedUser]
@@ -27,13 +46,18 @@ class TripCreateAPIView(generics.CreateAPIView):
         images = request.FILES.getlist('images')
         videos = request.FILES.getlist('videos')
         tags = request.data.getlist('tags')  # Assuming tag names
+        upload_ids = _get_upload_ids(request)
 
-        if not images and not videos:
+        if not images and not videos and not upload_ids:
             return Response({'detail': 'You must upload at least one image or one video.'},
                             status=status.HTTP_400_BAD_REQUEST)
 
+        # إحداثيات من جهاز المستخدم إن أرسلها، وإلا من الـ AI أو قاموس المدن
+        coordinates = valid_coordinates(request.data.get('latitude'), request.data.get('longitude'))
+
         # الحصول على معلومات سياحية من AI
         tourism_data = {}
+        tourism_info = {}
         country = ""
         city = ""
 
@@ -46,6 +70,9 @@ class TripCreateAPIView(generics.CreateAPIView):
                 country = tourism_data.get('country', '')
                 city = tourism_data.get('city', '')
                 tourism_info = tourism_data.get('tourism_info', {})
+                coordinates = coordinates or valid_coordinates(
+                    tourism_data.get('latitude'), tourism_data.get('longitude')
+                )
 
                 logger.info(f"AI service returned data for {location}: country={country}, city={city}")
 
@@ -54,37 +81,104 @@ class TripCreateAPIView(generics.CreateAPIView):
                 # في حالة فشل AI، نستمر بدون المعلومات السياحية
                 tourism_info = {}
 
-        # إنشاء الرحلة مع المعلومات السياحية
-        trip = Trip.objects.create(
-            user=user,
-            caption=caption,
-            location=location,
-            country=country,
-            city=city,
-            tourism_info=tourism_info
-        )
+        try:
+            # الرحلة ووسائطها ووسومها في transaction واحد بعدد ثابت من الاستعلامات
+            trip = create_trip(
+                user,
+                location=location,
+                caption=caption,
+                country=country,
+                city=city,
+                tourism_info=tourism_info,
+                coordinates=coordinates,
+                images=images,
+                videos=videos,
+                tags=tags,
+                upload_ids=upload_ids,
+            )
+        except UploadError as e:
+            return Response({'error': str(e)}, status=e.status_code)
 
-        for image in images:
-            TripImage.objects.create(trip=trip, image=image)
+        serializer = self.get_serializer(trip)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-        for video in videos:
-            TripVideo.objects.create(trip=trip, video=video)
+class TripImportAPIView(APIView):
+    """
+    إنشاء عدة رحلات في طلب واحد (ترحيل محتوى من منصة أخرى)
 
-        for tag_name in tags:
-            tag, _ = TripTag.objects.get_or_create(trip=trip, tripTag=tag_name)
+    الجسم: {"trips": [{"location", "caption", "country", "city", "tourism_info",
+    "tags", "upload_ids"}, ...]} بحد أقصى MAX_IMPORT_BATCH رحلة. الوسائط تُرفع
+    أولاً عبر /uploads/. لا يُستدعى الـ AI: البيانات السياحية تؤخذ كما أُرسلت.
+    """
+    permission_classes = [IsAuthenticated, IsVerifiedUser]
 
-        serializer = self.get_serializer(trip)
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+    def post(self, request):
+        rows = request.data.get('trips')
+        if not isinstance(rows, list) or not rows:
+            return Response({'detail': 'trips must be a non-empty list.'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(rows) > MAX_IMPORT_BATCH:
+            return Response({'detail': f'At most {MAX_IMPORT_BATCH} trips per request.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = TripImportSerializer(data=rows, many=True)
+        serializer.is_valid(raise_exception=True)
+        if not all(row['upload_ids'] for row in serializer.validated_data):
+            return Response({'detail': 'Each trip needs at least one upload in upload_ids.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            trips = import_trips(request.user, serializer.validated_data)
+        except UploadError as e:
+            return Response({'error': str(e)}, status=e.status_code)
 
-class TripListAPIView(generics.ListAPIView):
-    queryset = Trip.objects.all().order_by('-created_at')
+        return Response({'created': [trip.id for trip in trips]}, status=status.HTTP_201_CREATED)
+
+
+class TripListAPIView(ConditionalGetMixin, generics.ListAPIView):
+    # الصور والفيديوهات (و cover) من الـ prefetch بدلاً من استعلامات لكل رحلة
+    queryset = Trip.objects.select_related('user').prefetch_related(
+        'images', 'videos', 'tags'
+    ).order_by('-created_at')
     serializer_class = TripSerializer
 
+    def get_etag_version(self, request):
+        return (get_version(TRIPS_SCOPE),)
+
 class TripDetailAPIView(generics.RetrieveAPIView):
+    """
+    تفاصيل الرحلة مجمعة: الوسائط والتاجات والعدادات وأول التعليقات وحالة المستخدم
+
+    المستند يُقرأ من نموذج القراءة المخزن، ويُرد بـ 304 عند تطابق If-None-Match
+    دون استعلام قاعدة البيانات.
+    """
     queryset = Trip.objects.all()
     serializer_class = TripSerializer
     lookup_field = 'id'
 
+    def perform_authentication(self, request):
+        # المصادقة عند أول استخدام لـ request.user حتى لا يستعلم رد 304 عن المستخدم
+        pass
+
+    def retrieve(self, request, *args, **kwargs):
+        trip_id = self.kwargs['id']
+        viewer_key = get_viewer_key(request)
+        headers = {'Cache-Control': 'private, no-cache'}
+
+        if viewer_key is not None:
+            etag = trip_etag(trip_id, viewer_key)
+            headers['ETag'] = etag
+            if etag in parse_etags(request.headers.get('If-None-Match', '')):
+                return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        document = get_trip_document(trip_id, request)
+        if document is None:
+            raise Http404
+
+        relationships = ViewerRelationships(request.user)
+        data = dict(document)
+        data['is_liked'] = relationships.is_liked(trip_id)
+        data['is_saved'] = relationships.is_saved(trip_id)
+        return Response(data, headers=headers)
+
 
 class TripUpdateAPIView(generics.UpdateAPIView):
     queryset = Trip.objects.all()
@@ -93,7 +187,12 @@ class TripUpdateAPIView(generics.UpdateAPIView):
     lookup_field = 'id'
 
     def perform_update(self, serializer):
-        serializer.save()
+        trip = serializer.instance
+        previous = Trip(id=trip.id, user_id=trip.user_id, country=trip.country, city=trip.city)
+        with transaction.atomic():
+            trip = serializer.save()
+            # نقل الرحلة بين ملخصات الوجهات عند تغيير country / city
+            destinations.move_trip(previous, trip)
 
 class TripDeleteAPIView(generics.DestroyAPIView):
     queryset = Trip.objects.all()
@@ -110,14 +209,18 @@ class TripImageUploadAPIView(APIView):
         self.check_object_permissions(request, trip)
 
         images = request.FILES.getlist('images')
-        if not images:
+        upload_ids = _get_upload_ids(request)
+        if not images and not upload_ids:
             return Response({'detail': 'No images uploaded.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        uploaded = []
-        for image in images:
-            trip_image = TripImage.objects.create(trip=trip, image=image)
-            uploaded.append(TripImageSerializer(trip_image).data)
+        try:
+            with transaction.atomic():
+                trip_images = add_media(trip, images=images)[0]
+                trip_images += attach_uploads(trip, request.user, upload_ids, kinds=('image',))[0]
+        except UploadError as e:
+            return Response({'error': str(e)}, status=e.status_code)
 
+        uploaded = [TripImageSerializer(trip_image).data for trip_image in trip_images]
         return Response(uploaded, status=status.HTTP_201_CREATED)
     
 class TripVideoUploadAPIView(APIView):
@@ -128,14 +231,18 @@ class TripVideoUploadAPIView(APIView):
         self.check_object_permissions(request, trip)
 
         videos = request.FILES.getlist('videos')
-        if not videos:
+        upload_ids = _get_upload_ids(request)
+        if not videos and not upload_ids:
             return Response({'detail': 'No videos uploaded.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        uploaded = []
-        for video in videos:
-            trip_video = TripVideo.objects.create(trip=trip, video=video)
-            uploaded.append(TripVideoSerializer(trip_video).data)
+        try:
+            with transaction.atomic():
+                trip_videos = add_media(trip, videos=videos)[1]
+                trip_videos += attach_uploads(trip, request.user, upload_ids, kinds=('video',))[1]
+        except UploadError as e:
+            return Response({'error': str(e)}, status=e.status_code)
 
+        uploaded = [TripVideoSerializer(trip_video).data for trip_video in trip_videos]
         return Response(uploaded, status=status.HTTP_201_CREATED)
     
 class TripImageDeleteAPIView(APIView):
@@ -210,11 +317,51 @@ class StandardResultsSetPagination(PageNumberPagination):
     max_page_size = 100
 
 
-class TagTripsView(generics.ListAPIView):
+class TripPageConditionalMixin(ConditionalGetMixin):
+    """
+    ETag لقائمة رحلات مرقمة بالصفحات
+
+    الإصدار من TRIPS_SCOPE (إنشاء وحذف وتعديل الرحلات) وإصدارات رحلات الصفحة
+    المطلوبة فقط، فالتفاعل على رحلة خارج الصفحة لا يغير الـ ETag. معرفات الصفحة
+    تُقرأ باستعلام واحد على الفهرس دون تحميل الرحلات.
+    """
+
+    def get_page_trip_ids(self, request):
+        """
+        معرفات رحلات الصفحة المطلوبة
+
+        Returns:
+            list | None: المعرفات، أو None لرقم صفحة غير رقمي (مثل last)
+        """
+        paginator = self.paginator
+        try:
+            page = int(request.query_params.get(paginator.page_query_param, 1))
+        except ValueError:
+            return None
+        if page < 1:
+            return None
+        size = paginator.get_page_size(request)
+        start = (page - 1) * size
+        trips = self.get_queryset().prefetch_related(None).values_list('id', flat=True)
+        return list(trips[start:start + size])
+
+    def get_etag_version(self, request):
+        # إصدار القوائم يُقرأ قبل المعرفات حتى لا يُربط ETag جديد بصفحة قديمة
+        version = get_version(TRIPS_SCOPE)
+        trip_ids = self.get_page_trip_ids(request)
+        if trip_ids is None:
+            return None
+        return (version, *trip_ids, *get_trip_versions(trip_ids))
+
+
+class TagTripsView(TripPageConditionalMixin, generics.ListAPIView):
     """عرض جميع الرحلات التي تحتوي على تاج معين"""
-    serializer_class = TripSerializer
+    serializer_class = FeedTripSerializer
     permission_classes = [permissions.AllowAny]
     pagination_class = StandardResultsSetPagination
+    # العدادات وحالة الإعجاب والحفظ تختلف لكل مستخدم
+    cache_control = 'private, no-cache'
+    etag_vary_on_viewer = True
 
     def get_queryset(self):
         tag_name = self.kwargs.get('tag_name')
@@ -223,9 +370,7 @@ class TagTripsView(generics.ListAPIView):
         return Trip.objects.filter(
             tags__tripTag__iexact=tag_name
         ).select_related('user').prefetch_related(
-            'images', 'videos', 'tags', 'likes', 'comments', 'saves'
-        ).annotate(
-            likes_count=Count('likes')
+            'images', 'videos', 'tags'
         ).order_by('-created_at').distinct()
 
     def get(self, request, *args, **kwargs):